@@ -0,0 +1,264 @@
+"""
+Auction equilibrium
+-------------------
+
+Licytacja większości (AuctionPhase) to aukcja pierwszej ceny z zakrytymi ofertami: wygrywa
+najwyższa oferta i płaci swoją stawkę; oferta 0 nic nie daje, remis na górze oznacza brak
+większości — chyba że działa Sejmik w Środzie i wśród remisujących jest kontrolujący
+Wielkopolskę (`holder`), wtedy większość jest jego.
+
+`solve` liczy przybliżoną równowagę w strategiach mieszanych dla (złoto, wartość ustawy w złocie,
+holder) metodą fikcyjnej gry: każdy gracz w kolejnych iteracjach odpowiada najlepiej na
+empiryczny rozkład dotychczasowych ofert pozostałych, a strategią jest rozkład jego odpowiedzi.
+Oferty powyżej wartości ustawy są zdominowane, więc gracz licytuje 0..min(złoto, wartość).
+
+Liczenie równowagi przy każdej licytacji w symulacji byłoby za wolne, dlatego `BidTable`
+zapamiętuje wyniki w zwartej tabeli: klucz to kanoniczna (posortowana) krotka (limit oferty,
+wartość, holder) graczy, wartość — rzadkie rozkłady ofert z prawdopodobieństwami co 0,001.
+Tabelę można wypełnić z góry i zapisać do JSON.
+
+    $ python auction.py solve --gold 8 5 3 --value 6 6 2 --holder 0
+    $ python auction.py precompute --players 3 --max-value 10 --out bids.json --jobs 8
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+
+import rules
+
+Strategy = Tuple[Tuple[int, float], ...]   # rzadki rozkład: (oferta, prawdopodobieństwo)
+Key = Tuple[Tuple[int, int, bool], ...]    # (limit oferty, wartość, holder) wg miejsc
+
+ITERATIONS = 400
+MAX_VALUE = 20          # wartości ustawy powyżej traktujemy jak MAX_VALUE
+MIN_PROB = 0.01         # rzadsze oferty pomijamy w tabeli
+
+
+def tiebreak_holder(state: rules.GameState) -> Optional[int]:
+    """Gracz, który wygrywa remisy (Sejmik w Środzie: kontrolujący Wielkopolskę), albo None."""
+    if not state.flags.sejm_tiebreak_wlkp:
+        return None
+    prov = state.board.slot.get("WIELKOPOLSKA")
+    return rules.single_controller(state, prov) if prov is not None else None
+
+
+# --------------- Fikcyjna gra --------------- #
+
+def _win_chances(i: int, caps: Sequence[int], mixes: Sequence[Sequence[float]], holder: Optional[int]) -> List[float]:
+    """P(gracz `i` zdobywa większość ofertą b) dla b = 0..caps[i], przy mieszankach pozostałych."""
+    chances = [0.0] + [1.0] * caps[i]
+    for j, mix in enumerate(mixes):
+        if j == i:
+            continue
+        below = 0.0                     # P(oferta j < b)
+        for b in range(caps[i] + 1):
+            at = mix[b] if b < len(mix) else 0.0
+            if b > 0:
+                chances[b] *= below + at if i == holder else below
+            below += at
+    return chances
+
+
+def _payoffs(i: int, caps: Sequence[int], values: Sequence[int], mixes: Sequence[Sequence[float]],
+             holder: Optional[int]) -> List[float]:
+    return [p * (values[i] - b) for b, p in enumerate(_win_chances(i, caps, mixes, holder))]
+
+
+def exploitability(caps: Sequence[int], values: Sequence[int], mixes: Sequence[Sequence[float]],
+                   holder: Optional[int]) -> float:
+    """Suma zysków graczy z najlepszej odpowiedzi na mieszanki (0 = dokładna równowaga)."""
+    total = 0.0
+    for i, mix in enumerate(mixes):
+        pay = _payoffs(i, caps, values, mixes, holder)
+        total += max(pay) - sum(p * v for p, v in zip(mix, pay))
+    return total
+
+
+def solve(gold: Sequence[int], values: Sequence[int], holder: Optional[int] = None,
+          iterations: int = ITERATIONS) -> Tuple[List[List[float]], float]:
+    """
+    Przybliżona równowaga licytacji: mieszanki ofert wg miejsc (lista prawdopodobieństw ofert
+    0..limit) i ich exploitability. Remisy najlepszej odpowiedzi rozstrzyga niższa oferta.
+    """
+    caps = [max(0, min(g, v)) for g, v in zip(gold, values)]
+    counts = [[1] + [0] * c for c in caps]      # start: wszyscy licytują 0
+    mixes = [[1.0] + [0.0] * c for c in caps]
+    for t in range(1, iterations + 1):
+        replies = []
+        for i in range(len(caps)):
+            pay = _payoffs(i, caps, values, mixes, holder)
+            replies.append(max(range(len(pay)), key=lambda b: (pay[b], -b)))
+        for i, b in enumerate(replies):
+            counts[i][b] += 1
+        mixes = [[c / (t + 1) for c in row] for row in counts]
+    return mixes, exploitability(caps, values, mixes, holder)
+
+
+def compact(mix: Sequence[float]) -> Strategy:
+    """Rozkład bez ofert rzadszych niż MIN_PROB, znormalizowany i zaokrąglony do 0,001."""
+    kept = [(b, p) for b, p in enumerate(mix) if p >= MIN_PROB] or [(max(range(len(mix)), key=mix.__getitem__), 1.0)]
+    total = sum(p for _, p in kept)
+    return tuple((b, round(p / total, 3)) for b, p in kept)
+
+
+def sample(strategy: Strategy, rng: random.Random) -> int:
+    x = rng.random() * sum(p for _, p in strategy)
+    for bid, p in strategy:
+        x -= p
+        if x < 0:
+            return bid
+    return strategy[-1][0]
+
+
+# --------------- Tabela --------------- #
+
+def canonical(gold: Sequence[int], values: Sequence[float], holder: Optional[int]) -> Tuple[Key, List[int]]:
+    """Klucz tabeli i permutacja miejsc: key[k] opisuje gracza order[k]."""
+    entries = []
+    for i, (g, v) in enumerate(zip(gold, values)):
+        value = max(0, min(MAX_VALUE, int(round(v))))
+        entries.append((max(0, min(g, value)), value, i == holder))
+    order = sorted(range(len(entries)), key=lambda i: entries[i], reverse=True)
+    return tuple(entries[i] for i in order), order
+
+
+def _solve_key(key: Key, iterations: int = ITERATIONS) -> Tuple[Key, Tuple[Strategy, ...]]:
+    holder = next((k for k, (_, _, h) in enumerate(key) if h), None)
+    mixes, _ = solve([c for c, _, _ in key], [v for _, v, _ in key], holder, iterations)
+    return key, tuple(compact(m) for m in mixes)
+
+
+def _key_str(key: Key) -> str:
+    return ";".join(f"{c},{v},{int(h)}" for c, v, h in key)
+
+
+def _key_parse(text: str) -> Key:
+    return tuple((int(c), int(v), h == "1") for c, v, h in (part.split(",") for part in text.split(";")))
+
+
+class BidTable:
+    """Zapamiętane równowagi licytacji; brakujące klucze liczy przy pierwszym użyciu."""
+
+    def __init__(self, iterations: int = ITERATIONS) -> None:
+        self.iterations = iterations
+        self.entries: Dict[Key, Tuple[Strategy, ...]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def strategies(self, gold: Sequence[int], values: Sequence[float], holder: Optional[int] = None) -> List[Strategy]:
+        """Strategie ofert wg miejsc dla złota i wartości ustawy (w złocie) graczy."""
+        key, order = canonical(gold, values, holder)
+        found = self.entries.get(key)
+        if found is None:
+            self.misses += 1
+            found = self.entries[key] = _solve_key(key, self.iterations)[1]
+        else:
+            self.hits += 1
+        out: List[Strategy] = [()] * len(order)
+        for k, seat in enumerate(order):
+            out[seat] = found[k]
+        return out
+
+    def bid(self, seat: int, gold: Sequence[int], values: Sequence[float], holder: Optional[int],
+            rng: random.Random) -> int:
+        return sample(self.strategies(gold, values, holder)[seat], rng)
+
+    def precompute(self, keys: Iterable[Key], jobs: int = 1) -> int:
+        """Liczy brakujące klucze (w puli procesów, gdy jobs > 1); zwraca liczbę nowych."""
+        todo = [k for k in keys if k not in self.entries]
+        if jobs > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                solved = pool.map(_solve_key, todo, itertools.repeat(self.iterations), chunksize=16)
+                self.entries.update(solved)
+        else:
+            self.entries.update(_solve_key(k, self.iterations) for k in todo)
+        return len(todo)
+
+    # --- zapis ---
+    def to_dict(self) -> Dict[str, object]:
+        return {"iterations": self.iterations,
+                "entries": {_key_str(k): [[list(pair) for pair in s] for s in v] for k, v in self.entries.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "BidTable":
+        table = cls(data["iterations"])
+        table.entries = {_key_parse(k): tuple(tuple((int(b), float(p)) for b, p in s) for s in v)
+                         for k, v in data["entries"].items()}
+        return table
+
+    def save(self, path: str) -> None:
+        """Atomowy zapis (plik tymczasowy + os.replace), jak ranking w rating.py."""
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BidTable":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+TABLE = BidTable()   # wspólna tabela procesu (boty sim.EquilibriumBot)
+
+
+def grid(players: int, max_value: int) -> Iterable[Key]:
+    """Wszystkie kanoniczne klucze dla `players` graczy z wartościami 0..max_value."""
+    cells = [(c, v) for v in range(max_value + 1) for c in range(v + 1)]
+    for combo in itertools.combinations_with_replacement(cells, players):
+        gold = [c for c, _ in combo]
+        values = [v for _, v in combo]
+        for holder in [None] + list(range(players)):
+            yield canonical(gold, values, holder)[0]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Równowaga licytacji większości (fikcyjna gra) i tabela ofert.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    one = sub.add_parser("solve", help="równowaga dla jednej licytacji")
+    one.add_argument("--gold", type=int, nargs="+", required=True)
+    one.add_argument("--value", type=int, nargs="+", required=True, help="wartość większości w złocie, wg miejsc")
+    one.add_argument("--holder", type=int, help="miejsce gracza wygrywającego remisy (Sejmik w Środzie)")
+    one.add_argument("--iterations", type=int, default=ITERATIONS)
+
+    pre = sub.add_parser("precompute", help="wypełnia tabelę ofert i zapisuje ją do JSON")
+    pre.add_argument("--players", type=int, default=3)
+    pre.add_argument("--max-value", type=int, default=10)
+    pre.add_argument("--iterations", type=int, default=ITERATIONS)
+    pre.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    pre.add_argument("--out", default="bids.json", help="plik tabeli (uzupełniany, jeśli istnieje)")
+    args = parser.parse_args(argv[1:])
+
+    if args.command == "solve":
+        if len(args.gold) != len(args.value):
+            parser.error("--gold i --value muszą mieć tyle samo liczb.")
+        caps = [max(0, min(g, v)) for g, v in zip(args.gold, args.value)]
+        mixes, gap = solve(args.gold, args.value, args.holder, args.iterations)
+        for i, mix in enumerate(mixes):
+            offers = ", ".join(f"{b}: {p:.0%}" for b, p in compact(mix))
+            print(f"Gracz {i} (złoto {args.gold[i]}, wartość {args.value[i]}, limit {caps[i]}): {offers}")
+        print(f"Exploitability: {gap:.3f} zł")
+        return 0
+
+    table = BidTable.load(args.out) if os.path.exists(args.out) else BidTable(args.iterations)
+    added = table.precompute(set(grid(args.players, args.max_value)), args.jobs)
+    table.save(args.out)
+    print(f"Tabela: {len(table)} kluczy (+{added}), {os.path.getsize(args.out) / 1024:.0f} KiB -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,805 @@
+"""
+Tactical battle
+---------------
+
+Bitwa taktyczna z battle.html w Pythonie, na tych samych zasadach: plansza 5 rzędów (X, A, B, C, Y;
+skrajne to bufory) × 8 kolumn ze strefą bitwy w kolumnach 2–7, teren (równina, las, wzgórze, woda,
+bród), piechota w linii / szachownicy / czworoboku, kawaleria w klinie, rozkazy (UTRZYMAJ, SZARZA,
+skosy, piony), doktryny D1–D6, starcia k10 z modyfikatorami, ucieczki i zwycięstwo wg jednostek
+zdolnych do walki i strat.
+
+Jednostki trzymamy w równoległych listach (indeks jednostki), planszę jako listę 40 pól z numerem
+jednostki. Sąsiedztwo, maski frontu (jak Game.isFrontal — kontakt od strony pleców obrońcy)
+i odległości między polami liczymy raz przy imporcie, a cele ruchu dla każdego rozkazu i kierunku
+oraz drogi ucieczek — raz na układ terenu (`layout`, lru_cache). Tryb wsadowy (`batch`) rozgrywa
+tysiące bitew w puli procesów.
+
+Różnice wobec przeglądarki: losowość idzie z random.Random (ziarno), bitwa kończy się po
+`MAX_STEPS` mikrokrokach (jak przycisk „do końca”), a uciekający zawsze schodzą z planszy za swoją
+krawędzią (w battle.html atakujący na kolumnie 1 zawracał i nigdy nie uciekał).
+
+    $ python battle.py --attacker P,P,K --defender P,P,K --doctrines D1 D4 --battles 5000 --jobs 8
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import os
+import random
+import sys
+import time
+
+import rules
+
+ROWS = ("X", "A", "B", "C", "Y")
+SETUP_ROWS = (1, 2, 3)                  # rozstawienie tylko w rzędach A–C
+NCOLS = 8
+BTL_MIN, BTL_MAX = 2, 7
+CELLS = len(ROWS) * NCOLS
+SIDES = ("A", "O")                      # 0 = atakujący (idzie w prawo), 1 = obrońca (w lewo)
+ORIENT = (+1, -1)
+START_COLS = ((2, 3), (7, 6))
+MAX_PER_SIDE = 6
+MAX_STEPS = 160
+ESCAPE = -2                             # próba ucieczki za krawędź planszy
+
+PLAIN, FOREST, HILL, WATER, FORD = ".", "L", "W", "~", "="
+TERRAIN_NAMES = {PLAIN: "równina", FOREST: "las", HILL: "wzgórze", WATER: "woda", FORD: "bród"}
+POGODNIE, DESZCZ, BLOTO = "pogodnie", "deszcz", "bloto"
+WEATHERS = (POGODNIE, DESZCZ, BLOTO)
+
+HOLD, CHARGE, SKOS_L, SKOS_P, PION_GORA, PION_DOL = range(6)
+ORDER_NAMES = ("UTRZYMAJ", "SZARZA", "SKOS_L", "SKOS_P", "PION_GORA", "PION_DOL")
+MOVE_ORDERS = (CHARGE, SKOS_L, SKOS_P, PION_GORA, PION_DOL)   # kolejność jak w battle.html
+_ORDER_STEP = {CHARGE: (0, 1), SKOS_L: (-1, 1), SKOS_P: (1, 1), PION_GORA: (-1, 0), PION_DOL: (1, 0)}
+
+INF, CAV = 0, 1
+KIND_LETTERS = ("P", "K")
+LINIA, SZACH, CZWOR, KLIN = range(4)
+_WAVES = ((0, CAV), (1, CAV), (0, INF), (1, INF), (None, None))   # (strona, rodzaj) kolejnych fal ruchu
+UNIT_TYPES: Dict[str, Tuple[int, int]] = {
+    "P": (INF, LINIA), "P~": (INF, SZACH), "P□": (INF, CZWOR), "P[]": (INF, CZWOR), "P#": (INF, CZWOR),
+    "K": (CAV, KLIN), "K_lin": (CAV, LINIA),
+}
+
+DOCTRINES = {
+    "D1": "Przebicie Centrum (ofensywna)",
+    "D2": "Sierp na Skrzydłach (ofensywna)",
+    "D3": "Frontalny atak",
+    "D4": "Forteca Liniowa (statyczna)",
+    "D5": "Elastyczna Obrona (2-na-1 po kontakcie)",
+    "D6": "Jeż i Kolce (zwarta po kontakcie)",
+}
+DEFAULT_DOCTRINES = ("D1", "D4")        # jak domyślnie w battle.html
+
+
+def cell(row: int, col: int) -> int:
+    return row * NCOLS + col - 1
+
+
+ROW = tuple(c // NCOLS for c in range(CELLS))       # rząd pola (0 = X)
+COL = tuple(c % NCOLS + 1 for c in range(CELLS))    # kolumna pola (1..8)
+
+
+# --------------- Układ terenu --------------- #
+
+@dataclass(frozen=True)
+class Layout:
+    terrain: str                                     # CELLS znaków, rzędami X, A, B, C, Y
+    move: Tuple[Tuple[Tuple[int, ...], ...], ...]    # [kierunek 0:+1/1:-1][rozkaz][pole] -> cel albo -1
+    neighbors: Tuple[Tuple[int, ...], ...]           # prawo, lewo, góra, dół (jak adjEnemies)
+    front: Tuple[Tuple[int, ...], ...]               # [strona][pole] -> maska pól „frontalnego” kontaktu
+    retreat: Tuple[Tuple[Tuple[int, ...], ...], ...]  # [strona][pole] -> kolejne próby ucieczki
+    dist: Tuple[Tuple[int, ...], ...]
+
+
+def _inside(r: int, c: int) -> bool:
+    return 0 <= r < len(ROWS) and 1 <= c <= NCOLS
+
+
+def _base_tables():
+    """Części tablic niezależne od terenu: cele ruchu i ucieczek bez wody, sąsiedztwo, front, odległości."""
+    move = []
+    for d in ORIENT:
+        per_order = [(-1,) * CELLS]                  # UTRZYMAJ
+        for order in MOVE_ORDERS:
+            dr, dc = _ORDER_STEP[order]
+            per_order.append(tuple(
+                cell(r + dr, k + dc * d) if 0 <= r + dr < len(ROWS) and BTL_MIN <= k + dc * d <= BTL_MAX else -1
+                for r, k in zip(ROW, COL)))
+        move.append(tuple(per_order))
+    neighbors, front = [], ([], [])
+    for r, k in zip(ROW, COL):
+        near = tuple(cell(r + dr, k + dc) for dr, dc in ((0, 1), (0, -1), (-1, 0), (1, 0)) if _inside(r + dr, k + dc))
+        neighbors.append(near)
+        for side, d in enumerate(ORIENT):
+            # Game.isFrontal(att, def): dc = att.col − def.col; front obrońcy A to dc < 0, obrońcy O dc > 0
+            front[side].append(sum(1 << n for n in near if (COL[n] - k) * d < 0))
+    retreat = ([], [])
+    for side, h in enumerate((-1, 1)):               # A ucieka w lewo, O w prawo
+        for r, k in zip(ROW, COL):
+            tries = []
+            for r2, c2 in ((r, k + h), (r - 1, k + h), (r + 1, k + h), (r - 1, k), (r + 1, k)):
+                if not 0 <= r2 < len(ROWS):
+                    continue
+                if not 1 <= c2 <= NCOLS:
+                    tries.append(ESCAPE)
+                    break
+                tries.append(cell(r2, c2))
+            retreat[side].append(tuple(tries))
+    dist = tuple(tuple(abs(ROW[a] - ROW[b]) + abs(COL[a] - COL[b]) for b in range(CELLS)) for a in range(CELLS))
+    return (tuple(move), tuple(neighbors), (tuple(front[0]), tuple(front[1])),
+            (tuple(retreat[0]), tuple(retreat[1])), dist)
+
+
+_MOVE, NEIGHBORS, FRONT, _RETREAT, DIST = _base_tables()
+
+
+@lru_cache(maxsize=4096)
+def layout(terrain: str) -> Layout:
+    """Tablice ruchu i ucieczek dla układu terenu (woda blokuje), liczone raz na układ."""
+    if len(terrain) != CELLS or any(t not in TERRAIN_NAMES for t in terrain):
+        raise ValueError(f"Teren to {CELLS} znaków z {''.join(TERRAIN_NAMES)}.")
+    dry = [t != WATER for t in terrain]
+    move = tuple(tuple(tuple(t if t >= 0 and dry[t] else -1 for t in targets) for targets in per_order)
+                 for per_order in _MOVE)
+    retreat = tuple(tuple(tuple(t for t in tries if t == ESCAPE or dry[t]) for tries in per_side)
+                    for per_side in _RETREAT)
+    return Layout(terrain, move, NEIGHBORS, FRONT, retreat, DIST)
+
+
+def random_terrain(rng: random.Random) -> str:
+    """Losowy teren jak Game.randomMap: woda w buforze, 1–3 lasy, 1–2 wzgórza."""
+    t = [PLAIN] * CELLS
+    water_rows = [r for r in range(len(ROWS)) if r not in SETUP_ROWS]
+    if rng.random() < 0.35:
+        r = water_rows[int(rng.random() * len(water_rows))]
+        for c in range(4 + int(rng.random() * 2), BTL_MAX + 1):
+            t[cell(r, c)] = WATER
+    for _ in range(1 + int(rng.random() * 3)):
+        r = int(rng.random() * len(ROWS))
+        c = BTL_MIN + int(rng.random() * (BTL_MAX - BTL_MIN + 1))
+        t[cell(r, c)] = FOREST
+        if c < BTL_MAX and rng.random() < 0.6:
+            t[cell(r, c + 1)] = FOREST
+    for _ in range(1 + int(rng.random() * 2)):
+        r = int(rng.random() * len(ROWS))
+        c = 2 + int(rng.random() * 5)
+        t[cell(r, c)] = HILL
+    return "".join(t)
+
+
+def army(infantry: int, cavalry: int) -> List[str]:
+    """Skład strony z liczników (najpierw piechota, potem kawaleria), najwyżej MAX_PER_SIDE jednostek."""
+    cav = min(cavalry, MAX_PER_SIDE)
+    inf = min(infantry, MAX_PER_SIDE - cav)
+    return ["P"] * inf + ["K"] * cav
+
+
+# --------------- Bitwa --------------- #
+
+@dataclass
+class BattleResult:
+    winner: Optional[int]                    # 0 = atakujący, 1 = obrońca, None = remis
+    steps: int
+    reason: str
+    dead: Tuple[Tuple[int, int], ...]        # [strona][INF, CAV]
+    escaped: Tuple[Tuple[int, int], ...]
+    active: Tuple[int, int]
+
+    def losses(self, side: int) -> Tuple[int, ...]:
+        """Zabici strony wg rules.UNITS (uciekinierzy wracają do armii)."""
+        return tuple(self.dead[side][KIND_LETTERS.index(u)] for u in rules.UNITS)
+
+
+class Battle:
+    """
+    Jedna bitwa. `run(doctrines)` rozgrywa ją do końca (albo MAX_STEPS mikrokroków): przed każdym
+    mikrokrokiem obie strony wydają rozkazy wg swojej doktryny.
+    """
+
+    def __init__(self, attacker: Sequence[str], defender: Sequence[str], terrain: Optional[str] = None,
+                 weather: str = POGODNIE, rng: Optional[random.Random] = None,
+                 log: Optional[Callable[[str], None]] = None) -> None:
+        if weather not in WEATHERS:
+            raise ValueError(f"Nieznana pogoda: {weather} (dostępne: {', '.join(WEATHERS)})")
+        self.rng = rng if rng is not None else random.Random()
+        self.layout = layout(terrain if terrain is not None else random_terrain(self.rng))
+        self.weather = weather
+        self.log = log
+        self.side: List[int] = []
+        self.kind: List[int] = []
+        self.form: List[int] = []
+        self.num: List[int] = []
+        for s, units in enumerate((attacker, defender)):
+            if len(units) > MAX_PER_SIDE:
+                raise ValueError(f"Najwyżej {MAX_PER_SIDE} jednostek na stronę.")
+            counts = [0, 0]
+            for t in units:
+                if t not in UNIT_TYPES:
+                    raise ValueError(f"Nieznany typ jednostki: {t} (dostępne: {', '.join(UNIT_TYPES)})")
+                kind, form = UNIT_TYPES[t]
+                counts[kind] += 1
+                self.side.append(s)
+                self.kind.append(kind)
+                self.form.append(form)
+                self.num.append(counts[kind])
+        n = self.n = len(self.side)
+        self.ids = range(n)
+        self.pos = [-1] * n                  # pole albo -1 (zabity / uciekł z planszy)
+        self.order = [HOLD] * n
+        self.hits = [0] * n
+        self.routed = [False] * n
+        self.bloodied = [False] * n
+        self.dead = [False] * n
+        self.escaped = [False] * n
+        self.did_kill = [False] * n
+        self.wedge_done = [False] * n        # klin zużył premię pierwszego ataku
+        self.occ = [-1] * CELLS
+        self.step = 0
+        self.first_contact: Optional[int] = None
+        self.finished = False
+        self.reason = ""
+        for s in (0, 1):
+            slots = [cell(r, c) for c in START_COLS[s] for r in SETUP_ROWS]
+            for u, slot in zip((u for u in self.ids if self.side[u] == s), slots):
+                self._place(u, slot)
+
+    # --- plansza ---
+    def _place(self, u: int, c: int) -> None:
+        if self.pos[u] >= 0:
+            self.occ[self.pos[u]] = -1
+        self.pos[u] = c
+        if c >= 0:
+            self.occ[c] = u
+
+    def label(self, u: int) -> str:
+        return f"{KIND_LETTERS[self.kind[u]]}{self.num[u]}({SIDES[self.side[u]]})"
+
+    def board(self) -> str:
+        """Plansza tekstem: teren, a na nim jednostki (wielka litera = atakujący, mała = obrońca)."""
+        lines = []
+        for r, name in enumerate(ROWS):
+            row = []
+            for c in range(1, NCOLS + 1):
+                u = self.occ[cell(r, c)]
+                if u < 0:
+                    row.append(self.layout.terrain[cell(r, c)])
+                else:
+                    letter = KIND_LETTERS[self.kind[u]]
+                    row.append(letter if self.side[u] == 0 else letter.lower())
+            lines.append(f"{name} {' '.join(row)}")
+        return "\n".join(lines)
+
+    def active(self, u: int) -> bool:
+        return self.pos[u] >= 0 and not self.routed[u]
+
+    def units_side(self, side: int) -> List[int]:
+        return [u for u in self.ids if self.side[u] == side and self.pos[u] >= 0 and not self.routed[u]]
+
+    def adj_enemies(self, u: int) -> List[int]:
+        if self.routed[u]:
+            return []
+        s, occ, side, routed = self.side[u], self.occ, self.side, self.routed
+        return [v for v in (occ[c] for c in self.layout.neighbors[self.pos[u]])
+                if v >= 0 and side[v] != s and not routed[v]]
+
+    # --- walka ---
+    def _register_hit(self, v: int) -> None:
+        self.hits[v] += 1
+        if self.hits[v] >= 2:
+            self.dead[v] = True
+            self._place(v, -1)
+            if self.log:
+                self.log(f"   ✖ {self.label(v)} GINIE (2. trafienie).")
+            return
+        if self.rng.random() < 0.5:
+            self.routed[v], self.bloodied[v] = True, False
+            if self.log:
+                self.log(f"   ⚑ {self.label(v)} UCIEKA (załamanie szyku).")
+        else:
+            self.bloodied[v], self.routed[v] = True, False
+            if self.log:
+                self.log(f"   ✚ {self.label(v)} POZOSTAJE (krwawi).")
+
+    def _cav_penalty(self, ter: str) -> int:
+        pen = 2 if ter == FOREST else 0
+        if self.weather == BLOTO:
+            pen = max(pen, 2)
+        elif self.weather == DESZCZ:
+            pen = max(pen, 1)
+        return pen
+
+    def _needs(self, u1: int, u2: int) -> Tuple[int, int]:
+        """Progi trafienia k10 obu stron (kontakt zawsze frontalny, jak isFrontalFrom w battle.html)."""
+        ter = self.layout.terrain
+        t1, t2 = ter[self.pos[u1]], ter[self.pos[u2]]
+        kind, form, order = self.kind, self.form, self.order
+        need = [8, 8]
+        pair = ((u1, u2, t1, t2), (u2, u1, t2, t1))
+        for k, (u, o, tu, to) in enumerate(pair):
+            if kind[u] == CAV:
+                need[k] += self._cav_penalty(tu)
+                if order[u] == CHARGE and to == PLAIN and self.weather == POGODNIE:
+                    need[k] -= 1             # szarża na równinie
+        for k, (u, o, tu, to) in enumerate(pair):
+            if tu == HILL:                   # obrona na wzgórzu, atak pod górę
+                need[k] -= 1
+                need[1 - k] += 1
+        for k, (u, o, tu, to) in enumerate(pair):
+            if tu == FORD and kind[u] == INF and order[u] != CHARGE:
+                need[k] -= 2
+                need[1 - k] += 1
+        for k, (u, o, tu, to) in enumerate(pair):
+            if kind[u] == INF and form[u] == SZACH:
+                need[k] -= (tu == FOREST) + (to == FOREST)
+        for k, (u, o, tu, to) in enumerate(pair):
+            if kind[u] == INF and form[u] == CZWOR and kind[o] == CAV:
+                need[k] -= 1
+        for k, (u, o, tu, to) in enumerate(pair):
+            if len(self.adj_enemies(u)) >= 2:    # okrążenie
+                need[k] += 2
+                need[1 - k] -= 1
+        for k, (u, o, tu, to) in enumerate(pair):
+            if form[u] == KLIN:
+                if order[u] == CHARGE and not self.wedge_done[u]:
+                    need[k] -= 3             # pierwszy atak klinem w szarży
+                    self.wedge_done[u] = True
+                else:
+                    need[k] += 1             # kolejne starcia albo obrona
+        for k, (u, o, tu, to) in enumerate(pair):
+            if kind[u] == INF and form[u] in (CZWOR, SZACH) and kind[o] == INF and form[o] == LINIA:
+                need[k] += 1
+        return max(2, min(10, need[0])), max(2, min(10, need[1]))
+
+    def combat(self, u1: int, u2: int) -> None:
+        if self.pos[u1] < 0 or self.pos[u2] < 0 or self.routed[u1] or self.routed[u2]:
+            return
+        need1, need2 = self._needs(u1, u2)
+        r1, r2 = self.rng.randint(1, 10), self.rng.randint(1, 10)
+        hit1 = r1 >= need1 and not self.did_kill[u1]
+        hit2 = r2 >= need2 and not self.did_kill[u2]
+        if self.log:
+            self.log(f"Starcie {self.label(u1)} ⇄ {self.label(u2)}: ≥{need1} rzut {r1} | ≥{need2} rzut {r2}")
+        if hit1:
+            self._register_hit(u2)
+            self.did_kill[u1] = True
+        if hit2:
+            self._register_hit(u1)
+            self.did_kill[u2] = True
+
+    # --- ruch ---
+    def advance_dir(self, u: int) -> int:
+        """Kierunek natarcia: domyślny strony, chyba że wszyscy zdolni do walki wrogowie są za plecami."""
+        d = ORIENT[self.side[u]]
+        col = COL[self.pos[u]]
+        foes = [COL[self.pos[f]] for f in self.ids if self.side[f] != self.side[u] and self.active(f)]
+        if foes and all((fc - col) * d < 0 for fc in foes):
+            return -d
+        return d
+
+    def _dir_index(self, d: int) -> int:
+        return 0 if d > 0 else 1
+
+    def _apply_move(self, u: int) -> bool:
+        target = self.layout.move[self._dir_index(self.advance_dir(u))][self.order[u]][self.pos[u]]
+        if target < 0 or self.occ[target] >= 0:
+            return False
+        if self.log:
+            self.log(f"ruch {self.label(u)}: {self._cell_name(self.pos[u])} → {self._cell_name(target)}")
+        self._place(u, target)
+        if self.kind[u] == INF and self.form[u] == CZWOR:
+            self.form[u] = LINIA             # czworobok po ruchu staje się linią
+        return True
+
+    def _retreat(self, u: int) -> None:
+        for t in self.layout.retreat[self.side[u]][self.pos[u]]:
+            if t == ESCAPE:
+                self.escaped[u] = True
+                self._place(u, -1)
+                return
+            if self.occ[t] < 0:
+                self._place(u, t)
+                return
+
+    @staticmethod
+    def _cell_name(c: int) -> str:
+        return f"{ROWS[ROW[c]]}{COL[c]}"
+
+    # --- mikrokrok ---
+    def micro_step(self) -> bool:
+        """Walka w kontakcie, ucieczki, ruch falami; zwraca True, gdy bitwa się skończyła."""
+        if self.finished:
+            return True
+        self.did_kill = [False] * self.n
+        pairs, seen = [], set()
+        for u in self.ids:
+            if not self.active(u):
+                continue
+            for e in self.adj_enemies(u):
+                key = (u, e) if u < e else (e, u)
+                if key not in seen:
+                    seen.add(key)
+                    pairs.append((u, e))
+        engaged = {u for pair in pairs for u in pair}
+
+        # priorytet mają starcia „frontalne” w obie strony (maski Layout.front); reszta czeka
+        front, pos, side = self.layout.front, self.pos, self.side
+        frontal = [(a, b) for a, b in pairs
+                   if front[side[b]][pos[b]] >> pos[a] & 1 and front[side[a]][pos[a]] >> pos[b] & 1]
+        to_resolve = frontal or pairs
+        if self.first_contact is None and to_resolve:
+            self.first_contact = self.step
+        for a, b in to_resolve:
+            self.combat(a, b)
+
+        for u in self.ids:
+            if self.pos[u] >= 0 and self.routed[u]:
+                self._retreat(u)
+
+        # fale ruchu: kawaleria A, kawaleria O, piechota A, piechota O, potem druga szansa dla wszystkich
+        movers = sorted((u for u in self.ids if self.order[u] != HOLD and self.active(u) and u not in engaged),
+                        key=self.num.__getitem__)
+        moved = set()
+        for wave_side, wave_kind in _WAVES if movers else ():
+            for order in MOVE_ORDERS:
+                for u in [u for u in movers if self.order[u] == order and u not in moved
+                          and (wave_side is None or (self.side[u] == wave_side and self.kind[u] == wave_kind))]:
+                    if self._apply_move(u):
+                        moved.add(u)
+
+        a_active = any(self.active(u) for u in self.ids if self.side[u] == 0)
+        o_active = any(self.active(u) for u in self.ids if self.side[u] == 1)
+        if not a_active or not o_active:
+            self.finished = True
+            if a_active == o_active:
+                self.reason = "obie strony bez aktywnych"
+            else:
+                self.reason = f"armia {SIDES[0 if not a_active else 1]} nie ma już zdolnych do walki"
+            return True
+        self.step += 1
+        return False
+
+    def run(self, doctrines: Sequence[str] = DEFAULT_DOCTRINES, max_steps: int = MAX_STEPS) -> BattleResult:
+        for d in doctrines:
+            if d not in DOCTRINES:
+                raise ValueError(f"Nieznana doktryna: {d} (dostępne: {', '.join(DOCTRINES)})")
+        guard = 0
+        while not self.finished and guard < max_steps:
+            guard += 1
+            self.apply_doctrine(0, doctrines[0])
+            self.apply_doctrine(1, doctrines[1])
+            self.ensure_progress()
+            self.micro_step()
+        if not self.finished:
+            self.finished = True
+            self.reason = f"limit {max_steps} mikrokroków"
+        return self.result()
+
+    def result(self) -> BattleResult:
+        dead = [[0, 0], [0, 0]]
+        escaped = [[0, 0], [0, 0]]
+        active = [0, 0]
+        for u in self.ids:
+            s, k = self.side[u], self.kind[u]
+            dead[s][k] += self.dead[u]
+            escaped[s][k] += self.escaped[u]
+            active[s] += self.active(u)
+        lost = [sum(dead[s]) + sum(escaped[s]) for s in (0, 1)]
+        if active[0] == 0 and active[1] > 0:
+            winner: Optional[int] = 1
+        elif active[1] == 0 and active[0] > 0:
+            winner = 0
+        elif lost[0] != lost[1]:
+            winner = 0 if lost[0] < lost[1] else 1
+        else:
+            winner = None
+        return BattleResult(winner, self.step, self.reason, (tuple(dead[0]), tuple(dead[1])),
+                            (tuple(escaped[0]), tuple(escaped[1])), (active[0], active[1]))
+
+    # --------------- Doktryny --------------- #
+
+    def _foes(self, u: int) -> List[int]:
+        s = self.side[u]
+        return [f for f in self.ids if self.side[f] != s and self.pos[f] >= 0 and not self.routed[f]]
+
+    def _nearest_enemy(self, u: int) -> Optional[int]:
+        here = self.layout.dist[self.pos[u]]
+        return min(self._foes(u), key=lambda f: here[self.pos[f]], default=None)
+
+    def _moves_toward(self, u: int, target: int) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """(dozwolone, skracające dystans) ruchy (rozkaz, pole) w kierunku strony — legalOrdersToward."""
+        table = self.layout.move[self._dir_index(ORIENT[self.side[u]])]
+        at = self.pos[u]
+        playable = [(o, table[o][at]) for o in MOVE_ORDERS if table[o][at] >= 0 and self.occ[table[o][at]] < 0]
+        dist = self.layout.dist[self.pos[target]]
+        better = [m for m in playable if dist[m[1]] < dist[at]]
+        return playable, better
+
+    def _choose_toward(self, u: int, target: Optional[int]) -> int:
+        if target is None:
+            return HOLD
+        playable, better = self._moves_toward(u, target)
+        if better:
+            return better[0][0]
+        if playable:
+            dist = self.layout.dist[self.pos[target]]
+            return min(playable, key=lambda m: dist[m[1]])[0]
+        return HOLD
+
+    def _next_toward(self, u: int, target: Optional[int]) -> int:
+        if target is None:
+            return HOLD
+        playable, better = self._moves_toward(u, target)
+        return better[0][0] if better else playable[0][0] if playable else HOLD
+
+    def _center_row(self) -> int:
+        rows = [ROW[self.pos[u]] for u in self.ids if self.active(u)]
+        if not rows:
+            return ROWS.index("B")
+        return (min(rows) + max(rows) + 1) // 2      # Math.round
+
+    def _target_nearest_to_center(self, u: int) -> Optional[int]:
+        ci = self._center_row()
+        here = self.layout.dist[self.pos[u]]
+        return min(self._foes(u), default=None,
+                   key=lambda f: (abs(ROW[self.pos[f]] - ci), here[self.pos[f]], COL[self.pos[f]], ROW[self.pos[f]]))
+
+    def _free(self, u: int) -> bool:
+        return self.active(u) and not self.adj_enemies(u)
+
+    def _one_gap_enemy_ahead(self, u: int) -> bool:
+        d = ORIENT[self.side[u]]
+        r, c = ROW[self.pos[u]], COL[self.pos[u]]
+        if not BTL_MIN <= c + d <= BTL_MAX:
+            return False
+        mid = cell(r, c + d)
+        if self.layout.terrain[mid] == WATER or self.occ[mid] >= 0:
+            return False
+        if not 1 <= c + 2 * d <= NCOLS:
+            return False
+        e = self.occ[cell(r, c + 2 * d)]
+        return e >= 0 and self.side[e] != self.side[u]
+
+    def _charge_creates_contact(self, u: int) -> bool:
+        target = self.layout.move[self._dir_index(ORIENT[self.side[u]])][CHARGE][self.pos[u]]
+        if target < 0 or self.occ[target] >= 0:
+            return False
+        for c in self.layout.neighbors[target]:
+            v = self.occ[c]
+            if v >= 0 and self.side[v] != self.side[u] and not self.routed[v]:
+                return True
+        return False
+
+    def _engaged_enemies(self, side: int) -> List[int]:
+        out: Dict[int, None] = {}
+        for u in self.units_side(side):
+            for e in self.adj_enemies(u):
+                out[e] = None
+        return list(out)
+
+    def _cohesion_order(self, u: int) -> int:
+        """Ruch zacieśniający szyk piechoty: do mediany rzędu, potem najbliżej innego piechura."""
+        s = self.side[u]
+        infantry = [self.pos[v] for v in self.ids if self.side[v] == s and self.kind[v] == INF and self.active(v)]
+        median = sorted(ROW[p] for p in infantry)[len(infantry) // 2]
+        table = self.layout.move[self._dir_index(ORIENT[s])]
+        best, best_score = HOLD, None
+        for o in (PION_GORA, PION_DOL, SKOS_L, SKOS_P):
+            t = table[o][self.pos[u]]
+            if t < 0 or self.occ[t] >= 0:
+                continue
+            # jak w battle.html: „najbliższy kolega” może być sam oddział na starym polu
+            buddy = min((self.layout.dist[t][p] for p in infantry), default=3)
+            score = abs(ROW[t] - median) * 10 + buddy
+            if best_score is None or score < best_score:
+                best, best_score = o, score
+        return best
+
+    def apply_doctrine(self, side: int, doctrine: str) -> None:
+        mine = self.units_side(side)
+        for u in mine:
+            self.order[u] = HOLD
+        contact = self.first_contact is not None
+        order = self.order
+
+        if doctrine == "D1":                 # Przebicie Centrum
+            for u in mine:
+                if not contact:
+                    order[u] = CHARGE
+                elif not self.adj_enemies(u):
+                    order[u] = self._choose_toward(u, self._target_nearest_to_center(u))
+
+        elif doctrine == "D2":               # Sierp na Skrzydłach
+            if not contact:
+                for u in mine:
+                    if not self.adj_enemies(u):
+                        order[u] = CHARGE
+                if mine:
+                    top = min(mine, key=lambda u: ROW[self.pos[u]])
+                    bottom = max(mine, key=lambda u: ROW[self.pos[u]])
+                    table = self.layout.move[self._dir_index(ORIENT[side])]
+                    for unit, skos in ((top, SKOS_L), (bottom, SKOS_P)):
+                        t = table[skos][self.pos[unit]]
+                        if self._free(unit) and self._one_gap_enemy_ahead(unit) and t >= 0 and self.occ[t] < 0:
+                            order[unit] = skos
+                return
+            engaged = self._engaged_enemies(side)
+            for u in mine:
+                if self.adj_enemies(u):
+                    continue
+                if self._charge_creates_contact(u):
+                    order[u] = CHARGE
+                elif engaged:
+                    here = self.layout.dist[self.pos[u]]
+                    order[u] = self._choose_toward(u, min(engaged, key=lambda e: here[self.pos[e]]))
+                else:
+                    order[u] = self._choose_toward(u, self._nearest_enemy(u))
+
+        elif doctrine == "D3":               # Frontalny atak
+            for u in mine:
+                order[u] = self._next_toward(u, self._nearest_enemy(u))
+
+        elif doctrine == "D5" and contact:   # Elastyczna Obrona
+            engaged = self._engaged_enemies(side)
+            for u in mine:
+                if self.adj_enemies(u):
+                    continue
+                best_d = None
+                for e in engaged:
+                    playable, better = self._moves_toward(u, e)
+                    if not playable:
+                        continue
+                    d = self.layout.dist[self.pos[u]][self.pos[e]]
+                    if best_d is None or d < best_d:
+                        best_d = d
+                        order[u] = (better or playable)[0][0]
+
+        elif doctrine == "D6" and contact:   # Jeż i Kolce
+            infantry = [u for u in mine if self.kind[u] == INF]
+            for k in mine:
+                if self.kind[k] == CAV and not self.adj_enemies(k):
+                    order[k] = self._next_toward(k, self._nearest_enemy(k))
+            dist = self.layout.dist
+            for p in infantry:
+                if self.adj_enemies(p):
+                    continue
+                if any(v != p and dist[self.pos[p]][self.pos[v]] <= 1 for v in infantry):
+                    continue             # blisko sojusznika: utrzymaj
+                order[p] = self._cohesion_order(p)
+        # D4 (Forteca Liniowa): wszyscy trzymają pozycje
+
+    def ensure_progress(self) -> None:
+        """Gdy obie strony tylko trzymają pozycje, atakujący rusza jednym oddziałem (ensureProgressPair)."""
+        if any(self.order[u] != HOLD and self.active(u) for u in self.ids):
+            return
+        mine = self.units_side(0)
+        cand = next((u for u in mine if self.kind[u] == CAV), None)
+        if cand is None:
+            best = None
+            for u in mine:
+                for e in self.units_side(1):
+                    d = self.layout.dist[self.pos[u]][self.pos[e]]
+                    if best is None or d < best:
+                        best, cand = d, u
+        if cand is None:
+            return
+        r = ROW[self.pos[cand]]
+        if r in (ROWS.index("A"), ROWS.index("C")):
+            self.order[cand] = SKOS_L if r <= self._center_row() else SKOS_P
+        else:
+            self.order[cand] = CHARGE
+
+
+def fight(attacker: Sequence[str], defender: Sequence[str], doctrines: Sequence[str] = DEFAULT_DOCTRINES,
+          weather: str = POGODNIE, terrain: Optional[str] = None, rng: Optional[random.Random] = None,
+          log: Optional[Callable[[str], None]] = None) -> BattleResult:
+    return Battle(attacker, defender, terrain, weather, rng, log).run(doctrines)
+
+
+# --------------- Tryb wsadowy --------------- #
+
+@dataclass
+class BatchStats:
+    battles: int = 0
+    wins: List[int] = field(default_factory=lambda: [0, 0, 0])        # atakujący, obrońca, remis
+    dead: List[List[int]] = field(default_factory=lambda: [[0, 0], [0, 0]])
+    escaped: List[List[int]] = field(default_factory=lambda: [[0, 0], [0, 0]])
+    steps: int = 0
+
+    def add(self, r: BattleResult) -> None:
+        self.battles += 1
+        self.wins[2 if r.winner is None else r.winner] += 1
+        for s in (0, 1):
+            for k in (INF, CAV):
+                self.dead[s][k] += r.dead[s][k]
+                self.escaped[s][k] += r.escaped[s][k]
+        self.steps += r.steps
+
+    def merge(self, other: "BatchStats") -> None:
+        self.battles += other.battles
+        self.steps += other.steps
+        for i in range(3):
+            self.wins[i] += other.wins[i]
+        for s in (0, 1):
+            for k in (INF, CAV):
+                self.dead[s][k] += other.dead[s][k]
+                self.escaped[s][k] += other.escaped[s][k]
+
+
+def _batch_chunk(seeds: Sequence[int], attacker: Sequence[str], defender: Sequence[str],
+                 doctrines: Sequence[str], weather: str, terrain: Optional[str]) -> BatchStats:
+    stats = BatchStats()
+    for seed in seeds:
+        stats.add(fight(attacker, defender, doctrines, weather, terrain, random.Random(seed)))
+    return stats
+
+
+def batch(battles: int, attacker: Sequence[str], defender: Sequence[str],
+          doctrines: Sequence[str] = DEFAULT_DOCTRINES, weather: str = POGODNIE, terrain: Optional[str] = None,
+          seed: int = 0, jobs: int = 1, chunk: int = 500) -> BatchStats:
+    """Rozgrywa `battles` bitew (bitwa i z ziarnem seed·1000003 + i), w puli procesów, gdy jobs > 1."""
+    seeds = [seed * 1_000_003 + i for i in range(battles)]
+    chunks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+    stats = BatchStats()
+    if jobs > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(_batch_chunk, c, attacker, defender, doctrines, weather, terrain) for c in chunks]
+            for fut in futures:
+                stats.merge(fut.result())
+    else:
+        for c in chunks:
+            stats.merge(_batch_chunk(c, attacker, defender, doctrines, weather, terrain))
+    return stats
+
+
+def format_stats(stats: BatchStats) -> str:
+    n = max(1, stats.battles)
+    lines = [f"Bitwy: {stats.battles}, średnio {stats.steps / n:.1f} mikrokroków",
+             f"Wygrane: atakujący {stats.wins[0] / n:.1%}, obrońca {stats.wins[1] / n:.1%}, remisy {stats.wins[2] / n:.1%}"]
+    for s, name in enumerate(("Atakujący", "Obrońca")):
+        lines.append(f"{name}: zabici P {stats.dead[s][INF] / n:.2f}, K {stats.dead[s][CAV] / n:.2f}; "
+                     f"uciekli P {stats.escaped[s][INF] / n:.2f}, K {stats.escaped[s][CAV] / n:.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Bitwy taktyczne (zasady battle.html) — pojedynczo albo wsadowo.")
+    parser.add_argument("--attacker", default="P,P,K", help="skład atakującego, np. P,P~,K (P□ = czworobok)")
+    parser.add_argument("--defender", default="P,P,K")
+    parser.add_argument("--doctrines", nargs=2, default=list(DEFAULT_DOCTRINES), choices=sorted(DOCTRINES),
+                        metavar=("ATAKUJĄCY", "OBROŃCA"))
+    parser.add_argument("--weather", choices=WEATHERS, default=POGODNIE)
+    parser.add_argument("--terrain", help=f"teren: {CELLS} znaków rzędami X,A,B,C,Y (domyślnie losowy dla każdej bitwy)")
+    parser.add_argument("--battles", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--show", action="store_true", help="rozegraj jedną bitwę z pełnym zapisem")
+    args = parser.parse_args(argv[1:])
+
+    attacker = [t.strip() for t in args.attacker.split(",") if t.strip()]
+    defender = [t.strip() for t in args.defender.split(",") if t.strip()]
+    try:
+        if args.show:
+            b = Battle(attacker, defender, args.terrain, args.weather, random.Random(args.seed), print)
+            print(b.board())
+            r = b.run(args.doctrines)
+            print(b.board())
+            who = {0: "Atakujący", 1: "Obrońca", None: "brak (remis)"}[r.winner]
+            print(f"KONIEC: {r.reason}. Zwycięzca: {who} po {r.steps} mikrokrokach.")
+            return 0
+        t0 = time.perf_counter()
+        stats = batch(args.battles, attacker, defender, args.doctrines, args.weather, args.terrain, args.seed, args.jobs)
+    except ValueError as e:
+        parser.error(str(e))
+    dt = time.perf_counter() - t0
+    print(format_stats(stats))
+    print(f"Czas: {dt:.2f} s ({stats.battles / dt:.0f} bitew/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,230 @@
+"""
+Score bounds
+------------
+
+Dolne i górne ograniczenia wyniku końcowego (rules.score_breakdown) każdego gracza w trakcie
+partii, przy założeniu dowolnych decyzji i dowolnych rzutów w pozostałych fazach. Gdy dolne
+ograniczenie jednego gracza przekracza górne ograniczenia wszystkich pozostałych, zwycięzca
+jest już pewny — symulacja może przerwać partię (sim.Simulation(early_stop=True)),
+a przeszukiwanie może odciąć gałęzie graczy, którzy nie mają już szans (`hopeless`).
+
+Ograniczenia liczymy po składnikach wyniku, z tego, co może się zmienić w pozostałych fazach:
+- honor tylko rośnie, wyłącznie w ataku na najeźdźców (rzut zdejmuje jednostkę albo pole toru),
+- złoto przybywa z wydarzeń, dochodu, ustawy i Administracji; do zera może spaść tylko przez
+  licytację, potem ubywa go najwyżej o koszt dwóch akcji i żołd,
+- posiadłości przybywają w akcjach, giną w wydarzeniach, w paleniu i w spustoszeniu,
+- szlachciców dokładają akcje, zabierają wydarzenia; po akcjach kontrola zmienia się tylko
+  przez rozstrzyganie remisów wojskiem, którego już tylko ubywa.
+
+Ograniczenia są zachowawcze (poprawne, nie zawsze ciasne); najwięcej dają w ostatniej rundzie.
+"""
+from __future__ import annotations
+
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+
+import rules
+from main import DEFAULT_PHASE_ORDER
+
+# domyślna kolejność faz rundy — ta sama lista, którą planuje konsola (main.RoundEngine) i sim.Simulation
+ROUND_PHASES: Tuple[str, ...] = DEFAULT_PHASE_ORDER
+
+
+def decisive_phases(order: Sequence[str]) -> FrozenSet[str]:
+    """
+    Fazy, po których warto liczyć ograniczenia: dopóki zostają akcje, możliwy honor z ataków (dowolne
+    rzuty, dowolnie zebrane wojsko) jest zbyt duży, by cokolwiek rozstrzygnąć — od akcji ostatniej rundy.
+    """
+    order = tuple(order)
+    return frozenset(order[order.index("ActionPhase"):] if "ActionPhase" in order else order)
+
+
+DECISIVE_PHASES = decisive_phases(ROUND_PHASES)
+
+ACTIONS_PER_ROUND = 2
+_EVENT_GOLD = 2          # Cła morskie
+_EVENT_TRACK = 2         # Potop szwedzki, Wojna z Moskwą
+_LAW_GOLD = 4            # Podatek, wariant B dla zwycięzcy licytacji
+_MAX_ADMIN_YIELD = 3     # Reformy skarbowe
+_MAX_COST_OVERRIDE = 3   # Susza (Zamożność), Szlak Warta–Odra (Posiadłość w Wlkp)
+_EVENT_FINE = 2          # Bunt chłopski, Bunt i Pożar w Poznaniu
+
+
+def remaining_phases(state: rules.GameState, done: Optional[str],
+                     order: Sequence[str] = ROUND_PHASES) -> List[str]:
+    """Fazy do rozegrania po fazie `done` bieżącej rundy (None: runda jeszcze się nie zaczęła) przy kolejności `order`."""
+    order = list(order)
+    start = 0 if done is None else order.index(done) + 1
+    return order[start:] + order * (state.total_rounds - state.round)
+
+
+class ScoreBounds:
+    """
+    Ograniczenia wyników dla jednej partii. `update(state, done)` po każdej fazie przelicza
+    `lo`/`hi` (krotki wg miejsc) kosztem jednego przejścia po planszy. `phases` to kolejność faz
+    rundy partii (wariant zasad); `decisive` — fazy, po których warto wołać `update`.
+    """
+
+    def __init__(self, board: rules.Board, config: rules.RulesConfig = rules.DEFAULT_RULES,
+                 phases: Sequence[str] = ROUND_PHASES) -> None:
+        self.board = board
+        self.config = config
+        self.phases: Tuple[str, ...] = tuple(phases)
+        self.decisive = decisive_phases(self.phases)
+        self.lo: Tuple[int, ...] = ()
+        self.hi: Tuple[int, ...] = ()
+
+    @property
+    def winner(self) -> Optional[int]:
+        """Miejsce gracza, który wygra niezależnie od dalszej gry (jednoznacznie), albo None."""
+        for seat, low in enumerate(self.lo):
+            if all(low > high for other, high in enumerate(self.hi) if other != seat):
+                return seat
+        return None
+
+    def hopeless(self, seat: int) -> bool:
+        """Gracz nie może już nawet zremisować na pierwszym miejscu."""
+        return any(low > self.hi[seat] for other, low in enumerate(self.lo) if other != seat)
+
+    def update(self, state: rules.GameState, done: Optional[str]) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        rest = remaining_phases(state, done, self.phases)
+        cfg = self.config
+        n, v = state.pcount, len(state.provinces)
+        events = rest.count("EventsPhase")
+        actions = rest.count("ActionPhase") * ACTIONS_PER_ROUND
+        building = "ActionPhase" in rest
+        max_cost = max([cfg.action_cost(k) for k in rules.ACTION_COST]
+                       + [cfg.recruit_cost(u) for u in rules.UNITS] + [_MAX_COST_OVERRIDE])
+
+        # --- posiadłości ---
+        owned = [0] * n
+        for prov in state.provinces:
+            for owner in prov.estates:
+                if 0 <= owner < n:
+                    owned[owner] += 1
+        est_hi = [e + actions for e in owned]
+        est_lo = [max(0, e - events - self._plunder_losses(state, rest, seat, building)
+                      - self._arson_losses(state, rest, seat, building))
+                  for seat, e in enumerate(owned)]
+        estate_lo = [int(est_lo[i] > 0 and all(est_lo[i] >= est_hi[j] for j in range(n) if j != i)) for i in range(n)]
+        estate_hi = [int(est_hi[i] > 0 and all(est_hi[i] >= est_lo[j] for j in range(n) if j != i)) for i in range(n)]
+
+        # --- wpływy ---
+        infl_lo = [0] * n
+        infl_hi = [0] * n
+        for prov in range(v):
+            nobles = state.nobles[prov * n:(prov + 1) * n]
+            for seat in range(n):
+                mine = nobles[seat]
+                rival = max((x for j, x in enumerate(nobles) if j != seat), default=0)
+                if actions or events:
+                    infl_lo[seat] += mine - events > rival + actions
+                    infl_hi[seat] += mine + actions > 0 and mine + actions >= rival - events
+                else:
+                    # szlachta już się nie zmieni; remis rozstrzyga wojsko, którego tylko ubywa
+                    infl_lo[seat] += mine > rival
+                    infl_hi[seat] += mine > rival or (mine > 0 and mine == rival and state.units(prov, seat) > 0)
+
+        # --- honor i złoto ---
+        per_point = max(1, cfg.gold_per_point)
+        per_unit = cfg.upkeep_per_unit
+        lo, hi = [], []
+        for seat, p in enumerate(state.players):
+            honor_hi = p.honor + self._honor_gain(state, rest, seat)
+            gold_hi = p.gold + self._gold_gain(rest, est_hi[seat], v)
+            gold_lo = p.gold
+            units = state.player_units(seat)
+            for phase in rest:
+                if phase == "EventsPhase":
+                    gold_lo = max(0, gold_lo - _EVENT_FINE * v)
+                    units += 1
+                elif phase == "AuctionPhase":
+                    gold_lo = 0                     # oferta do wysokości całego złota
+                elif phase == "SejmPhase":
+                    units += 1
+                elif phase == "ActionPhase":
+                    gold_lo = max(0, gold_lo - ACTIONS_PER_ROUND * max_cost)
+                    units += ACTIONS_PER_ROUND
+                elif phase == "UpkeepPhase" and per_unit > 0:
+                    gold_lo -= per_unit * min(units, gold_lo // per_unit)
+            lo.append(estate_lo[seat] + infl_lo[seat] + p.honor + gold_lo // per_point)
+            hi.append(estate_hi[seat] + infl_hi[seat] + honor_hi + gold_hi // per_point)
+        self.lo, self.hi = tuple(lo), tuple(hi)
+        return self.lo, self.hi
+
+    # --- składniki ---
+    def _plunder_losses(self, state: rules.GameState, rest: Sequence[str], seat: int, open_board: bool) -> int:
+        """Ile posiadłości gracz może stracić w spustoszeniach (najwyżej jedna na plądrujący tor)."""
+        phases = rest.count("DevastationPhase")
+        if not phases:
+            return 0
+        exact = rest[0] in ("DefensePhase", "DevastationPhase") and not open_board
+        lost = 0
+        for key, provs in self.board.plunder.items():
+            if exact and state.track(key) < state.config.plunder_threshold:
+                continue  # tory są już ustalone: ten nie plądruje
+            if open_board or any(seat in state.provinces[p].estates for p in provs):
+                lost += phases if not exact else 1
+        return lost
+
+    def _arson_losses(self, state: rules.GameState, rest: Sequence[str], seat: int, open_board: bool) -> int:
+        """Ile posiadłości gracz może stracić w paleniu: wszystkie tam, gdzie przeciwnik ma (albo zdąży mieć) wojsko."""
+        if "ArsonPhase" not in rest:
+            return 0
+        lost = 0
+        for p, prov in enumerate(state.provinces):
+            mine = sum(1 for o in prov.estates if o == seat)
+            if mine and (open_board or any(state.units(p, i) > 0 for i in range(state.pcount) if i != seat)):
+                lost += mine
+        return lost
+
+    def _honor_gain(self, state: rules.GameState, rest: Sequence[str], seat: int) -> int:
+        """Rzuty w atakach: każdy zdejmuje jednostkę albo pole toru; +1 kość Artylerii na rundę."""
+        units = state.player_units(seat)
+        tracks = dict(zip(rules.TRACKS, (max(0, t) for t in state.tracks)))
+        bonus = state.flags.extra_honor_vs_tatars
+        artillery = state.flags.artillery_defense_active
+        fixed = True    # wojsko stoi tam, gdzie stoi (do ataku nie ma już akcji ani wydarzeń)
+        gain = 0
+        for phase in rest:
+            if phase == "EventsPhase":
+                units += 1                  # Kozacy na służbie
+                for key in tracks:
+                    tracks[key] += _EVENT_TRACK
+                bonus = artillery = True    # Bitwa pod Wiedniem, Artyleria koronna
+                fixed = False
+            elif phase == "SejmPhase":
+                units += 1                  # Pospolite ruszenie
+                fixed = False
+            elif phase == "ActionPhase":
+                units += ACTIONS_PER_ROUND
+                fixed = False
+            elif phase == "EnemyReinforcementPhase":
+                for key in tracks:
+                    tracks[key] += rules.reinforcement(6)
+            elif phase == "AttackInvadersPhase":
+                if fixed:
+                    # tylko tory, na które gracz ma skąd uderzyć, i tylko wojsko w takich prowincjach
+                    keys = [k for k in rules.TRACKS
+                            if any(state.units(p, seat) for p in self.board.attack_from.get(k, ()))]
+                    fronts = {p for k in keys for p in self.board.attack_from[k]}
+                    rolls = sum(state.units(p, seat) for p in fronts) + sum(tracks[k] for k in keys)
+                    rolls += bool(keys) and artillery
+                else:
+                    rolls = units + sum(tracks.values()) + 1
+                gain += rolls * (2 if bonus else 1)
+        return gain
+
+    def _gold_gain(self, rest: Sequence[str], estates_hi: int, provinces: int) -> int:
+        per_estate = rules.estate_income(self.config.wealth_max)
+        admin = max(_MAX_ADMIN_YIELD, self.config.admin_yield)
+        gain = 0
+        for phase in rest:
+            if phase == "EventsPhase":
+                gain += _EVENT_GOLD
+            elif phase == "IncomePhase":
+                gain += 1 + provinces + per_estate * estates_hi   # Jarmarki + kontrola + posiadłości
+            elif phase == "SejmPhase":
+                gain += _LAW_GOLD
+            elif phase == "ActionPhase":
+                gain += ACTIONS_PER_ROUND * admin
+        return gain
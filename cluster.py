@@ -0,0 +1,361 @@
+"""
+Simulation cluster
+------------------
+
+Rozproszone symulacje bez zewnętrznej kolejki: koordynator rozdaje jednostki pracy przez TCP,
+procesy robocze (na dowolnych hostach) rozgrywają je silnikiem bez konsoli (sim.py) i odsyłają
+rekordy partii.
+
+Jednostka pracy to: zasady (pola rules.RulesConfig + ich skrót), liczba graczy i rund, bot
+(nazwa + wersja), mapa (ścieżka + skrót) i lista ziaren. Proces roboczy odmawia jednostki, gdy
+skrót zasad, wersja bota albo plik mapy nie zgadzają się z jego kopią kodu.
+
+Protokół: jedna wiadomość JSON na linię. Proces roboczy wysyła `hello`, potem na zmianę `next`
+(koordynator odpowiada `unit`, `wait` albo `done`) i `result`; w tle co kilka sekund `heartbeat`.
+Jednostka zerwanego połączenia wraca do kolejki od razu, jednostka procesu, który milczy dłużej
+niż `heartbeat_timeout`, po upływie tego czasu. Spóźniony wynik przyjmujemy, jeśli jednostka nie
+została jeszcze policzona gdzie indziej.
+
+Postęp zapisuje się w cache wyników przeglądu (sweep.ResultCache): po restarcie koordynator
+rozdaje tylko partie, których tam nie ma.
+
+    $ python cluster.py coordinator --port 5555 --grid start_gold=4,6,8 --games 2000
+    $ python cluster.py worker --host 10.0.0.5 --port 5555      # na każdym węźle, dowolnie wiele razy
+"""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Sequence, Set, Tuple
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import rules
+import sim
+import sweep
+from history import GameRecord
+from stats import TournamentStats
+
+DEFAULT_PORT = 5555
+HEARTBEAT_TIMEOUT = 15.0
+
+
+@dataclass
+class Unit:
+    id: str
+    cell: int                 # indeks komórki przeglądu
+    seeds: List[int]
+
+
+def _unit_message(unit: Unit, cell: sweep.Cell) -> Dict[str, object]:
+    return {
+        "op": "unit", "id": unit.id, "seeds": unit.seeds,
+        "rules": cell.config.to_dict(), "digest": cell.config.digest(),
+        "players": cell.players, "rounds": cell.rounds,
+        "bot": cell.bot, "version": sim.BOTS[cell.bot].version,
+        "map": cell.map_path, "map_digest": sweep.map_digest(cell.map_path),
+    }
+
+
+# --------------- Koordynator --------------- #
+
+class Coordinator:
+    """
+    Serwer TCP (wątek na połączenie) z kolejką jednostek. `run()` blokuje do policzenia wszystkich
+    partii i zwraca agregaty w kolejności komórek (jak sweep.run_sweep).
+    """
+
+    def __init__(self, cells: Sequence[sweep.Cell], seeds: Sequence[int], unit_size: int = sweep.CHUNK,
+                 cache: Optional[sweep.ResultCache] = None, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 heartbeat_timeout: float = HEARTBEAT_TIMEOUT, verbose: bool = False) -> None:
+        self.cells = list(cells)
+        self.cache = cache
+        self.heartbeat_timeout = heartbeat_timeout
+        self.verbose = verbose
+        self.results = [sweep.CellResult(cell, TournamentStats()) for cell in self.cells]
+        self.units: Dict[str, Unit] = {}
+        self._pending: Deque[str] = deque()
+        self._leases: Dict[str, str] = {}          # jednostka -> proces roboczy
+        self._seen: Dict[str, float] = {}          # proces roboczy -> ostatni sygnał
+        self._done: Set[str] = set()
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self.requeued = 0
+        self._connections = 0
+
+        for idx, cell in enumerate(self.cells):
+            missing = []
+            for seed in seeds:
+                data = cache.get(cell.key(seed)) if cache is not None else None
+                if data is None:
+                    missing.append(seed)
+                else:
+                    self.results[idx].stats.add(GameRecord.from_dict(data))
+                    self.results[idx].cached += 1
+            for i in range(0, len(missing), unit_size):
+                unit = Unit(f"{idx}:{missing[i]}", idx, missing[i:i + unit_size])
+                self.units[unit.id] = unit
+                self._pending.append(unit.id)
+        if not self._pending:
+            self._finished.set()
+
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                coordinator._serve(self)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address[:2]
+
+    @property
+    def progress(self) -> Tuple[int, int]:
+        """(policzone jednostki, wszystkie jednostki) w tym przebiegu."""
+        return len(self._done), len(self.units)
+
+    def run(self, timeout: Optional[float] = None) -> List[sweep.CellResult]:
+        serving = threading.Thread(target=self._server.serve_forever, name="cluster-server", daemon=True)
+        reaper = threading.Thread(target=self._reap, name="cluster-reaper", daemon=True)
+        serving.start()
+        reaper.start()
+        try:
+            if not self._finished.wait(timeout):
+                raise TimeoutError(f"Klaster nie skończył w czasie ({self.progress[0]}/{self.progress[1]} jednostek).")
+            # połączone procesy robocze dostają `done` przy najbliższym `next` i same się rozłączają
+            deadline = time.monotonic() + self.heartbeat_timeout
+            while self._connections and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            self._server.shutdown()
+            self._server.server_close()
+        return self.results
+
+    # --- obsługa połączenia ---
+    def _serve(self, conn: socketserver.StreamRequestHandler) -> None:
+        worker = f"{conn.client_address[0]}:{conn.client_address[1]}"
+
+        def send(msg: Dict[str, object]) -> None:
+            conn.wfile.write(json.dumps(msg).encode() + b"\n")
+            conn.wfile.flush()
+
+        with self._lock:
+            self._connections += 1
+        try:
+            for line in conn.rfile:
+                msg = json.loads(line)
+                op = msg.get("op")
+                with self._lock:
+                    self._seen[worker] = time.monotonic()
+                if op == "hello":
+                    with self._lock:
+                        del self._seen[worker]
+                        worker = f"{msg.get('worker', 'worker')}@{worker}"
+                        self._seen[worker] = time.monotonic()
+                    send({"op": "welcome", "heartbeat": self.heartbeat_timeout / 3})
+                elif op == "next":
+                    send(self._lease(worker))
+                elif op == "result":
+                    self._complete(worker, msg["id"], msg["games"])
+                elif op == "heartbeat":
+                    pass
+                else:
+                    send({"op": "error", "reason": f"nieznana operacja: {op}"})
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self._drop(worker, "rozłączony")
+            with self._lock:
+                self._connections -= 1
+
+    def _lease(self, worker: str) -> Dict[str, object]:
+        with self._lock:
+            while self._pending:
+                uid = self._pending.popleft()
+                if uid not in self._done:
+                    self._leases[uid] = worker
+                    unit = self.units[uid]
+                    return _unit_message(unit, self.cells[unit.cell])
+            if self._finished.is_set():
+                return {"op": "done"}
+            # wszystko rozdane, ale jeszcze nie wróciło — może wróci do kolejki
+            return {"op": "wait", "delay": min(1.0, self.heartbeat_timeout / 3)}
+
+    def _complete(self, worker: str, uid: str, games: List[Dict]) -> None:
+        with self._lock:
+            if uid not in self.units or uid in self._done:
+                return  # duplikat po ponownym rozdaniu
+            self._done.add(uid)
+            self._leases.pop(uid, None)
+            unit = self.units[uid]
+            res = self.results[unit.cell]
+            for data in games:
+                res.stats.add(GameRecord.from_dict(data))
+            res.computed += len(games)
+            done, total = len(self._done), len(self.units)
+            if done == total:
+                self._finished.set()
+        if self.cache is not None:
+            cell = self.cells[unit.cell]
+            for data in games:
+                self.cache.put(cell.key(data["seed"]), data)
+        if self.verbose:
+            print(f"[Klaster] {uid} od {worker}: {done}/{total}")
+
+    def _drop(self, worker: str, reason: str) -> None:
+        with self._lock:
+            self._seen.pop(worker, None)
+            lost = [uid for uid, w in self._leases.items() if w == worker]
+            for uid in lost:
+                del self._leases[uid]
+                self._pending.appendleft(uid)
+            self.requeued += len(lost)
+        if lost and self.verbose:
+            print(f"[Klaster] {worker} {reason}; wracają do kolejki: {', '.join(lost)}")
+
+    def _reap(self) -> None:
+        while not self._finished.wait(self.heartbeat_timeout / 3):
+            now = time.monotonic()
+            with self._lock:
+                silent = [w for w, t in self._seen.items() if now - t > self.heartbeat_timeout]
+            for worker in silent:
+                self._drop(worker, "milczy")
+
+
+# --------------- Proces roboczy --------------- #
+
+def _check_unit(msg: Dict) -> Tuple[rules.RulesConfig, Optional[str]]:
+    """Zasady jednostki i ewentualny powód odmowy (niezgodny kod lub mapa)."""
+    config = rules.RulesConfig.from_dict(msg["rules"])
+    if config.digest() != msg["digest"]:
+        return config, "skrót zasad się nie zgadza"
+    bot = sim.BOTS.get(msg["bot"])
+    if bot is None or bot.version != msg["version"]:
+        return config, f"inna wersja bota {msg['bot']}"
+    try:
+        if sweep.map_digest(msg["map"]) != msg["map_digest"]:
+            return config, f"inna mapa {msg['map']}"
+    except OSError:
+        return config, f"brak mapy {msg['map']}"
+    return config, None
+
+
+def work(host: str, port: int = DEFAULT_PORT, name: Optional[str] = None, max_units: Optional[int] = None) -> int:
+    """
+    Pętla procesu roboczego: bierze jednostki, aż koordynator powie `done` (albo po `max_units`).
+    Zwraca liczbę rozegranych partii.
+    """
+    played = 0
+    units = 0
+    stop = threading.Event()
+    lock = threading.Lock()
+    with socket.create_connection((host, port)) as sock:
+        rfile = sock.makefile("rb")
+        wfile = sock.makefile("wb")
+
+        def send(msg: Dict[str, object]) -> None:
+            with lock:
+                wfile.write(json.dumps(msg).encode() + b"\n")
+                wfile.flush()
+
+        def receive() -> Dict:
+            line = rfile.readline()
+            if not line:
+                raise ConnectionError("Koordynator zamknął połączenie.")
+            return json.loads(line)
+
+        send({"op": "hello", "worker": name or f"{socket.gethostname()}:{os.getpid()}"})
+        interval = receive()["heartbeat"]
+
+        def beat() -> None:
+            while not stop.wait(interval):
+                try:
+                    send({"op": "heartbeat"})
+                except OSError:
+                    return
+
+        threading.Thread(target=beat, name="cluster-heartbeat", daemon=True).start()
+        try:
+            while max_units is None or units < max_units:
+                send({"op": "next"})
+                msg = receive()
+                if msg["op"] == "done":
+                    break
+                if msg["op"] == "wait":
+                    time.sleep(msg["delay"])
+                    continue
+                config, problem = _check_unit(msg)
+                if problem is not None:
+                    raise RuntimeError(f"Odmowa jednostki {msg['id']}: {problem}")
+                games = [sim.play(msg["players"], msg["rounds"], config, seed, msg["bot"], msg["map"]).to_dict()
+                         for seed in msg["seeds"]]
+                send({"op": "result", "id": msg["id"], "games": games})
+                played += len(games)
+                units += 1
+        finally:
+            stop.set()
+    return played
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Symulacje rozproszone: koordynator i procesy robocze po TCP.")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coord = sub.add_parser("coordinator", help="rozdaje jednostki i zbiera wyniki")
+    coord.add_argument("--host", default="0.0.0.0")
+    coord.add_argument("--port", type=int, default=DEFAULT_PORT)
+    coord.add_argument("--grid", action="append", default=[], metavar="PARAM=v1,v2,...",
+                       help="wartości parametru zasad (jak w sweep.py; można powtarzać)")
+    coord.add_argument("--games", type=int, default=100, help="partii na konfigurację (ziarna 0..N-1)")
+    coord.add_argument("--players", type=int, default=3)
+    coord.add_argument("--rounds", type=int, default=3)
+    coord.add_argument("--bot", choices=sorted(sim.BOTS), default="random")
+    coord.add_argument("--map", default=str(sim.DEFAULT_MAP_PATH))
+    coord.add_argument("--unit", type=int, default=sweep.CHUNK, help="partii na jednostkę pracy")
+    coord.add_argument("--cache", default=str(sweep.DEFAULT_CACHE_DIR), help="katalog cache/postępu ('' = bez)")
+    coord.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT)
+
+    wrk = sub.add_parser("worker", help="rozgrywa jednostki od koordynatora")
+    wrk.add_argument("--host", default="127.0.0.1")
+    wrk.add_argument("--port", type=int, default=DEFAULT_PORT)
+    wrk.add_argument("--name", help="nazwa w logach koordynatora")
+    args = parser.parse_args(argv[1:])
+
+    if args.role == "worker":
+        try:
+            played = work(args.host, args.port, args.name)
+        except (ConnectionError, RuntimeError) as e:
+            print(f"[Klaster] {e}")
+            return 1
+        print(f"[Klaster] rozegrano {played} partii")
+        return 0
+
+    try:
+        space = dict(sweep._parse_values(s, False) for s in args.grid)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    cells = [sweep.Cell(cfg, args.players, args.rounds, args.bot, args.map) for cfg in sweep.grid(space)]
+    cache = sweep.ResultCache(args.cache) if args.cache else None
+    coordinator = Coordinator(cells, range(args.games), args.unit, cache, args.host, args.port,
+                              args.heartbeat_timeout, verbose=True)
+    print(f"[Klaster] {coordinator.address[0]}:{coordinator.address[1]}, "
+          f"jednostek do policzenia: {coordinator.progress[1]}")
+    for res in coordinator.run():
+        print(sweep.summary(res))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
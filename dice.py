@@ -0,0 +1,217 @@
+"""
+Counter-based dice
+------------------
+
+Kości z generatora licznikowego Philox4x32-10 (Salmon i in., Random123): wynik to czysta funkcja
+(ziarno partii, runda, faza, gracz, numer rzutu), więc dowolną kość da się policzyć od razu,
+bez odtwarzania wcześniejszych losowań. Procesy robocze, powtórki partii i gałęzie przeszukiwania
+widzą te same kości bez żadnej koordynacji, a hurtowe generowanie idzie wektorowo w NumPy.
+
+Adresowanie: klucz Philoxa to 64-bitowe ziarno partii, licznik to (numer rzutu // 4, gracz, faza,
+runda); jeden blok daje 4 słowa, czyli 4 kolejne kości tego samego strumienia. Słowo u32 zamieniamy
+na kość jako 1 + (u · 6) >> 32 (obciążenie poniżej 6/2³², bez odrzucania — dostęp swobodny
+zostaje O(1)). „Gracz” to dowolny numer strumienia w fazie: sim.py daje graczom ich miejsca,
+a torom najeźdźców osobne numery (TRACK_STREAM).
+
+Pojedyncze kości (`die`, `CounterDice`) liczymy w czystym Pythonie; ścieżki hurtowe (`philox`,
+`dice`, `stream`) i CLI wymagają NumPy.
+
+    $ python dice.py --seed 7 --round 2 --phase 5 --player 1 --count 12
+    $ python dice.py --bench 100000000
+    $ python dice.py --selftest          # wektory kontrolne Random123 i zgodność ścieżek
+"""
+from __future__ import annotations
+
+from typing import Tuple
+import argparse
+import sys
+import time
+
+TRACK_STREAM = 64          # numery strumieni torów najeźdźców: TRACK_STREAM + indeks toru
+
+_M0, _M1 = 0xD2511F53, 0xCD9E8D57
+_W0, _W1 = 0x9E3779B9, 0xBB67AE85
+_MASK = 0xFFFFFFFF
+_MASK64 = (1 << 64) - 1
+ROUNDS = 10
+
+# wektory kontrolne Philox4x32-10 z Random123 (kat_vectors): (licznik, klucz) -> wynik
+KNOWN_ANSWERS = (
+    ((0, 0, 0, 0), (0, 0), (0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8)),
+    ((_MASK,) * 4, (_MASK, _MASK), (0x408F276D, 0x41C83B0E, 0xA20BC7C6, 0x6D5451FD)),
+    ((0x243F6A88, 0x85A308D3, 0x13198A2E, 0x03707344), (0xA4093822, 0x299F31D0),
+     (0xD16CFE09, 0x94FDCCEB, 0x5001E420, 0x24126EA1)),
+)
+
+
+# --------------- Philox4x32 --------------- #
+
+def philox_block(c0: int, c1: int, c2: int, c3: int, k0: int, k1: int) -> Tuple[int, int, int, int]:
+    """Jeden blok Philox4x32-10 na liczbach Pythona (szybsze niż NumPy dla pojedynczych kości)."""
+    for r in range(ROUNDS):
+        if r:
+            k0 = (k0 + _W0) & _MASK
+            k1 = (k1 + _W1) & _MASK
+        p0 = _M0 * c0
+        p1 = _M1 * c2
+        c0, c1, c2, c3 = (p1 >> 32) ^ c1 ^ k0, p1 & _MASK, (p0 >> 32) ^ c3 ^ k1, p0 & _MASK
+    return c0, c1, c2, c3
+
+
+def philox(counters: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Philox4x32-10 wektorowo: `counters` (..., 4) i `keys` (..., 2) jako uint32 (z broadcastingiem),
+    wynik (..., 4) uint32. Iloczyny 32×32 liczymy w uint64.
+    """
+    import numpy as np
+    counters = np.asarray(counters, dtype=np.uint32)
+    keys = np.asarray(keys, dtype=np.uint32)
+    c0, c1, c2, c3 = (counters[..., i].astype(np.uint64) for i in range(4))
+    k0, k1 = keys[..., 0].astype(np.uint64), keys[..., 1].astype(np.uint64)
+    mask, shift = np.uint64(_MASK), np.uint64(32)
+    m0, m1, w0, w1 = np.uint64(_M0), np.uint64(_M1), np.uint64(_W0), np.uint64(_W1)
+    for r in range(ROUNDS):
+        if r:
+            k0 = (k0 + w0) & mask
+            k1 = (k1 + w1) & mask
+        p0 = m0 * c0
+        p1 = m1 * c2
+        c0, c1, c2, c3 = (p1 >> shift) ^ c1 ^ k0, p1 & mask, (p0 >> shift) ^ c3 ^ k1, p0 & mask
+    return np.stack([c0, c1, c2, c3], axis=-1).astype(np.uint32)
+
+
+def _key(seed: int) -> Tuple[int, int]:
+    seed &= _MASK64
+    return seed & _MASK, seed >> 32
+
+
+def _seeds(seed) -> np.ndarray:
+    """Ziarna jako uint64 modulo 2^64 — ujemne i duże liczby jak w `_key`."""
+    import numpy as np
+    if isinstance(seed, int):
+        return np.asarray(seed & _MASK64, dtype=np.uint64)
+    arr = np.asarray(seed)
+    if arr.dtype == object:
+        return np.array([int(x) & _MASK64 for x in arr.flat], dtype=np.uint64).reshape(arr.shape)
+    return arr.astype(np.uint64)
+
+
+def _face(word):
+    return 1 + ((word * 6) >> 32)
+
+
+# --------------- Kości --------------- #
+
+def die(seed: int, rnd: int, phase: int, player: int, index: int) -> int:
+    """Kość nr `index` strumienia (runda, faza, gracz) partii o ziarnie `seed`."""
+    block = philox_block(index >> 2, player & _MASK, phase & _MASK, rnd & _MASK, *_key(seed))
+    return _face(block[index & 3])
+
+
+def dice(seed, rnd, phase, player, index) -> np.ndarray:
+    """
+    Kości hurtem: wszystkie argumenty to liczby albo tablice (broadcasting NumPy), np. wszystkie
+    rzuty gracza w fazie: dice(seed, 2, 5, 1, np.arange(100)); albo ta sama kość w wielu
+    partiach: dice(np.arange(10**6), 1, 0, 0, 0). Wynik int8 w kształcie po broadcastingu.
+    """
+    import numpy as np
+    seed = _seeds(seed)
+    index = np.asarray(index, dtype=np.uint64)
+    seed, rnd, phase, player, index = np.broadcast_arrays(seed, np.asarray(rnd, dtype=np.uint32),
+                                                          np.asarray(phase, dtype=np.uint32),
+                                                          np.asarray(player, dtype=np.uint32), index)
+    counters = np.stack([(index >> np.uint64(2)).astype(np.uint32), player, phase, rnd], axis=-1)
+    keys = np.stack([(seed & np.uint64(_MASK)).astype(np.uint32), (seed >> np.uint64(32)).astype(np.uint32)], axis=-1)
+    words = philox(counters, keys)
+    word = np.take_along_axis(words, (index & np.uint64(3)).astype(np.intp)[..., None], axis=-1)[..., 0]
+    return _face(word.astype(np.uint64)).astype(np.int8)
+
+
+def stream(seed: int, rnd: int, phase: int, player: int, count: int) -> np.ndarray:
+    """Pierwsze `count` kości strumienia — po jednym bloku Philoxa na 4 kości (najtańsza droga hurtem)."""
+    import numpy as np
+    blocks = (count + 3) // 4
+    counters = np.empty((blocks, 4), dtype=np.uint32)
+    counters[:, 0] = np.arange(blocks, dtype=np.uint32)
+    counters[:, 1:] = (player & _MASK, phase & _MASK, rnd & _MASK)
+    words = philox(counters, np.array(_key(seed), dtype=np.uint32))
+    return _face(words.reshape(-1)[:count].astype(np.uint64)).astype(np.int8)
+
+
+class CounterDice:
+    """Kości jednej partii (ziarno = klucz); `rolls` dla kilku kolejnych rzutów strumienia."""
+
+    def __init__(self, seed: int) -> None:
+        self.seed = seed
+        self._key = _key(seed)
+
+    def die(self, rnd: int, phase: int, player: int, index: int) -> int:
+        block = philox_block(index >> 2, player & _MASK, phase & _MASK, rnd & _MASK, *self._key)
+        return _face(block[index & 3])
+
+    def rolls(self, rnd: int, phase: int, player: int, start: int, count: int) -> Tuple[int, ...]:
+        out = []
+        block, base = None, -1
+        for i in range(start, start + count):
+            if i >> 2 != base:
+                base = i >> 2
+                block = philox_block(base, player & _MASK, phase & _MASK, rnd & _MASK, *self._key)
+            out.append(_face(block[i & 3]))
+        return tuple(out)
+
+
+def selftest() -> None:
+    """Wektory kontrolne Random123 (obie implementacje Philoxa) i zgodność ścieżek kości; AssertionError przy błędzie."""
+    import numpy as np
+    for ctr, key, expected in KNOWN_ANSWERS:
+        assert philox_block(*ctr, *key) == expected, ("philox_block", ctr, key)
+        got = tuple(int(x) for x in philox(np.array(ctr, dtype=np.uint32), np.array(key, dtype=np.uint32)))
+        assert got == expected, ("philox", ctr, key)
+    for seed in (0, 7, -1, -12345, 1 << 63, (1 << 64) + 5):
+        idx = np.arange(37)
+        scalar = tuple(die(seed, 3, 5, 2, i) for i in range(37))
+        assert tuple(dice(seed, 3, 5, 2, idx).tolist()) == scalar, ("dice", seed)
+        assert tuple(stream(seed, 3, 5, 2, 37).tolist()) == scalar, ("stream", seed)
+        assert CounterDice(seed).rolls(3, 5, 2, 0, 37) == scalar, ("CounterDice", seed)
+    assert dice([-1, 7], 1, 0, 0, 0).tolist() == [die(-1, 1, 0, 0, 0), die(7, 1, 0, 0, 0)]
+
+
+# --------------- CLI --------------- #
+
+def main(argv: list) -> int:
+    import numpy as np
+    parser = argparse.ArgumentParser(description="Kości z generatora licznikowego (Philox4x32-10).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--round", type=int, default=1)
+    parser.add_argument("--phase", type=int, default=0)
+    parser.add_argument("--player", type=int, default=0)
+    parser.add_argument("--index", type=int, default=0, help="numer pierwszego rzutu")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--bench", type=int, metavar="N", help="zmierz hurtowe generowanie N kości (paczki po 2^22)")
+    parser.add_argument("--selftest", action="store_true", help="sprawdź wektory kontrolne Random123 i zgodność ścieżek")
+    args = parser.parse_args(argv[1:])
+
+    if args.selftest:
+        selftest()
+        print(f"OK: {len(KNOWN_ANSWERS)} wektory Random123, ścieżki skalarna/wektorowa/strumień zgodne")
+        return 0
+
+    if args.bench:
+        chunk = 1 << 22
+        done, t0 = 0, time.perf_counter()
+        counts = np.zeros(7, dtype=np.int64)
+        while done < args.bench:
+            n = min(chunk, args.bench - done)
+            counts += np.bincount(stream(args.seed, args.round, args.phase, done // chunk, n), minlength=7)
+            done += n
+        dt = time.perf_counter() - t0
+        print(f"{done} kości w {dt:.2f} s ({done / dt / 1e6:.1f} mln/s); częstości 1–6: "
+              + " ".join(f"{c / done:.4f}" for c in counts[1:]))
+        return 0
+    idx = np.arange(args.index, args.index + args.count)
+    print(" ".join(map(str, dice(args.seed, args.round, args.phase, args.player, idx))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
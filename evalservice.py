@@ -0,0 +1,341 @@
+"""
+Evaluation service
+------------------
+
+Wspólny ewaluator pozycji dla wielu równoległych partii (albo wątków przeszukiwania).
+Zamiast wołać ewaluator pozycja po pozycji, gry wrzucają pozycje do kolejki; serwis zbiera
+je w mikro-paczki (do `max_batch` albo do upływu `max_delay` od pierwszej pozycji w paczce),
+woła ewaluator raz na paczkę i rozwiązuje przyszłości (futures) wołających.
+
+Dwa tryby:
+- `BatchingService` — w jednym procesie, wątki; dowolne obiekty na wejściu (np. (stan, miejsce)).
+- `SharedMemoryService` — między procesami: wektory obserwacji i wyniki leżą w pamięci
+  współdzielonej (multiprocessing.shared_memory), kolejką idą tylko numery slotów.
+  Klienta (`client(k)`) przekazuje się do multiprocessing.Process jako argument. Wymaga NumPy.
+  Błąd ewaluatora oznacza sloty paczki w tablicy statusów (też w pamięci współdzielonej),
+  a `SlotFuture.result()` rzuca wtedy `EvaluationError`; serwis działa dalej.
+
+`ServiceBot` to bot heurystyczny, który ocenia wszystkich kandydatów ruchu jedną paczką przez serwis.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+import multiprocessing as mp
+import queue
+import random
+import threading
+import time
+
+import rules
+import sim
+
+
+# --------------- Wątki --------------- #
+
+class BatchingService:
+    """Serwis mikro-paczek w wątku tła; `submit` zwraca concurrent.futures.Future."""
+
+    def __init__(self, fn: Callable[[Sequence[Any]], Sequence[Any]], max_batch: int = 256,
+                 max_delay: float = 0.002) -> None:
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.batches = 0
+        self.items = 0
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="eval-service", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "BatchingService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, item: Any) -> Future:
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def submit_many(self, items: Sequence[Any]) -> List[Future]:
+        return [self.submit(item) for item in items]
+
+    def evaluate(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    @property
+    def mean_batch(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    # najpierw to, co już czeka; potem czekamy najwyżej do terminu paczki
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        nxt = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._run(batch)
+            if stop:
+                return
+
+    def _run(self, batch: List[Tuple[Any, Future]]) -> None:
+        live = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            results = self.fn([item for item, _ in live])
+        except BaseException as e:  # błąd ewaluatora wraca do wszystkich wołających z tej paczki
+            for _, fut in live:
+                fut.set_exception(e)
+            return
+        for (_, fut), res in zip(live, results):
+            fut.set_result(res)
+        self.batches += 1
+        self.items += len(live)
+
+
+# --------------- Pamięć współdzielona --------------- #
+
+SLOT_OK, SLOT_FAILED = 0, 1
+
+
+class EvaluationError(RuntimeError):
+    """Ewaluator serwisu zgłosił wyjątek dla paczki, w której było zlecenie klienta."""
+
+
+class SlotFuture:
+    """Wynik oczekujący w slocie pamięci współdzielonej (odpowiednik Future po stronie klienta)."""
+
+    def __init__(self, client: "ShmClient", slot: int) -> None:
+        self._client = client
+        self._slot = slot
+        self._value = None
+
+    def done(self) -> bool:
+        return self._value is not None or self._client._events[self._slot].is_set()
+
+    def _collect(self, timeout: Optional[float] = None) -> None:
+        """Czeka na slot, przenosi wynik (albo błąd) do future i zwalnia slot — bez zgłaszania błędu."""
+        if self._value is not None:
+            return
+        if not self._client._events[self._slot].wait(timeout):
+            raise TimeoutError("Serwis ewaluacji nie odpowiedział w czasie.")
+        if self._client._status[self._slot] == SLOT_FAILED:
+            self._value = EvaluationError("Ewaluator serwisu zgłosił błąd (szczegóły w procesie serwisu).")
+        else:
+            self._value = self._client._out[self._slot].copy()
+        self._client._release(self._slot)
+
+    def result(self, timeout: Optional[float] = None):
+        self._collect(timeout)
+        if isinstance(self._value, EvaluationError):
+            raise self._value
+        return self._value
+
+
+class ShmClient:
+    """Klient serwisu w innym procesie: własne sloty wejścia/wyjścia w pamięci współdzielonej."""
+
+    def __init__(self, names: Tuple[str, str, str], shape_in: Tuple[int, int], shape_out: Tuple[int, int],
+                 requests: "mp.Queue", events: Sequence[Any], slots: Sequence[int]) -> None:
+        self._names = names
+        self._shape_in, self._shape_out = shape_in, shape_out
+        self._requests = requests
+        self._events = events
+        self._slots = list(slots)
+        self._attached = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_attached"] = None   # segmenty pamięci podłączamy na nowo w procesie potomnym
+        return state
+
+    def _attach(self) -> None:
+        import numpy as np
+        from multiprocessing import shared_memory
+        shm_in, shm_out, shm_status = (shared_memory.SharedMemory(name=name) for name in self._names)
+        self._attached = (shm_in, shm_out, shm_status)
+        self._in = np.ndarray(self._shape_in, dtype=np.float32, buffer=shm_in.buf)
+        self._out = np.ndarray(self._shape_out, dtype=np.float32, buffer=shm_out.buf)
+        self._status = np.ndarray((self._shape_in[0],), dtype=np.uint8, buffer=shm_status.buf)
+        self._free = list(self._slots)
+        self._pending: List[SlotFuture] = []
+
+    def _release(self, slot: int) -> None:
+        self._free.append(slot)
+
+    def submit(self, obs) -> SlotFuture:
+        if self._attached is None:
+            self._attach()
+        while not self._free:
+            # wszystkie sloty zajęte — czekamy na najstarsze zlecenie; jego wynik (albo błąd) zostaje
+            # w jego future, zwalniamy tylko slot
+            self._pending.pop(0)._collect()
+        self._pending = [f for f in self._pending if f._value is None]
+        slot = self._free.pop()
+        self._in[slot] = obs
+        self._events[slot].clear()
+        self._requests.put(slot)
+        fut = SlotFuture(self, slot)
+        self._pending.append(fut)
+        return fut
+
+    def submit_many(self, rows) -> List[SlotFuture]:
+        return [self.submit(row) for row in rows]
+
+    def evaluate(self, obs):
+        return self.submit(obs).result()
+
+
+class SharedMemoryService:
+    """
+    Serwis dla klientów w innych procesach. Ewaluator `fn` dostaje tablicę float32 [B, in_dim]
+    i zwraca [B, out_dim]. Każdy klient ma `slots_per_client` własnych slotów (tyle zleceń naraz).
+    Wyjątek z `fn` trafia do `last_error` (licznik `errors`), a klienci dostają EvaluationError.
+    """
+
+    def __init__(self, fn: Callable[[Any], Any], in_dim: int, out_dim: int, clients: int,
+                 slots_per_client: int = 64, max_batch: int = 256, max_delay: float = 0.002) -> None:
+        import numpy as np
+        from multiprocessing import shared_memory
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.clients = clients
+        self.slots_per_client = slots_per_client
+        n = clients * slots_per_client
+        self._shape_in, self._shape_out = (n, in_dim), (n, out_dim)
+        self._shm_in = shared_memory.SharedMemory(create=True, size=max(1, n * in_dim * 4))
+        self._shm_out = shared_memory.SharedMemory(create=True, size=max(1, n * out_dim * 4))
+        self._in = np.ndarray(self._shape_in, dtype=np.float32, buffer=self._shm_in.buf)
+        self._out = np.ndarray(self._shape_out, dtype=np.float32, buffer=self._shm_out.buf)
+        self._shm_status = shared_memory.SharedMemory(create=True, size=max(1, n))
+        self._status = np.ndarray((n,), dtype=np.uint8, buffer=self._shm_status.buf)
+        self._status[:] = SLOT_OK
+        self._requests: "mp.Queue" = mp.Queue()
+        self._events = [mp.Event() for _ in range(n)]
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.last_error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._loop, name="eval-service-shm", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "SharedMemoryService":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def client(self, k: int) -> ShmClient:
+        first = k * self.slots_per_client
+        return ShmClient((self._shm_in.name, self._shm_out.name, self._shm_status.name), self._shape_in, self._shape_out,
+                         self._requests, self._events, range(first, first + self.slots_per_client))
+
+    @property
+    def mean_batch(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def _loop(self) -> None:
+        import numpy as np
+        while True:
+            first = self._requests.get()
+            if first is None:
+                return
+            slots = [first]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(slots) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._requests.get(timeout=max(0.0, remaining)) if remaining > 0 else self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                slots.append(nxt)
+            idx = np.asarray(slots)
+            try:
+                self._out[idx] = self.fn(self._in[idx])
+                self._status[idx] = SLOT_OK
+            except BaseException as e:  # błąd ewaluatora wraca do klientów tej paczki; serwis działa dalej
+                self._status[idx] = SLOT_FAILED
+                self.errors += 1
+                self.last_error = e
+            else:
+                self.batches += 1
+                self.items += len(slots)
+            for s in slots:
+                self._events[s].set()
+            if stop:
+                return
+
+    def close(self) -> None:
+        self._requests.put(None)
+        self._thread.join()
+        del self._in, self._out, self._status
+        for shm in (self._shm_in, self._shm_out, self._shm_status):
+            shm.close()
+            shm.unlink()
+
+
+# --------------- Ewaluatory i bot --------------- #
+
+def heuristic_batch(weights: sim.Weights = sim.DEFAULT_WEIGHTS) -> Callable[[Sequence[Tuple[rules.GameState, int]]], List[float]]:
+    """Ewaluator paczek (stan, miejsce) oparty na sim.evaluate."""
+    def fn(items: Sequence[Tuple[rules.GameState, int]]) -> List[float]:
+        return [sim.evaluate(state, seat, weights) for state, seat in items]
+    return fn
+
+
+def array_batch(model: Callable[[Any], Any]) -> Callable[[Sequence[Tuple[rules.GameState, int]]], List[float]]:
+    """
+    Ewaluator paczek (stan, miejsce) dla modelu na tablicach (np. mała sieć NumPy): koduje pozycje
+    przez selfplay.encode, woła model raz na całą paczkę [B, D] i zwraca pierwszą kolumnę wyniku.
+    """
+    import numpy as np
+    import selfplay
+
+    def fn(items: Sequence[Tuple[rules.GameState, int]]) -> List[float]:
+        obs = np.stack([selfplay.encode(state, seat, selfplay.KIND_ACTION) for state, seat in items])
+        out = np.asarray(model(obs), dtype=np.float32).reshape(len(items), -1)
+        return out[:, 0].tolist()
+    return fn
+
+
+class ServiceBot(sim.HeuristicBot):
+    """Bot heurystyczny oceniający wszystkie pozycje po ruchach jedną paczką przez serwis ewaluacji."""
+    version = "service-1"
+
+    def __init__(self, seat: int, rng: random.Random, service: BatchingService,
+                 weights: sim.Weights = sim.DEFAULT_WEIGHTS) -> None:
+        super().__init__(seat, rng, weights)
+        self.service = service
+
+    def action(self, state: rules.GameState) -> rules.Action:
+        legal = rules.legal_actions(state, self.seat)
+        futures = self.service.submit_many([(rules.step(state, d), self.seat) for d in legal])
+        return self._best([(f.result(), d) for f, d in zip(futures, legal)])
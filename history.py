@@ -0,0 +1,353 @@
+"""
+Game history store
+------------------
+
+Zapis ukończonych partii do lokalnej bazy SQLite: gracze, ziarno losowania, numery wydarzeń
+w rundach, zwycięzcy licytacji i oferty, ustawy i warianty, wyniki po każdej fazie
+oraz końcowy rozkład punktacji (rules.score_breakdown).
+
+`GameJournal` zbiera dane jednej partii, obserwując decyzje kernela zasad (rules.py),
+więc działa tak samo dla gry w konsoli i dla symulacji. `HistoryStore` wstawia gotowe
+rekordy paczkami: jedna transakcja na paczkę, tryb WAL, stałe zapytania z parametrami
+(sqlite3 trzyma je w cache jako przygotowane). Indeksy na wydarzeniu, ustawie, zwycięzcy
+i liczbie graczy obsługują typowe pytania analityków, np.:
+
+    $ python history.py games.db --law 6 --variant B --round 1
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import sqlite3
+import sys
+import time
+
+import rules
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id          INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    seed        INTEGER,
+    map         TEXT NOT NULL,
+    players     INTEGER NOT NULL,
+    rounds      INTEGER NOT NULL,
+    winner      INTEGER              -- miejsce zwycięzcy; NULL przy remisie na pierwszym miejscu
+);
+CREATE TABLE IF NOT EXISTS game_players (
+    game_id     INTEGER NOT NULL REFERENCES games(id),
+    seat        INTEGER NOT NULL,
+    name        TEXT NOT NULL,
+    score       INTEGER NOT NULL,
+    estates     INTEGER NOT NULL,
+    estate_pts  INTEGER NOT NULL,
+    influence   INTEGER NOT NULL,
+    honor       INTEGER NOT NULL,
+    gold        INTEGER NOT NULL,
+    gold_pts    INTEGER NOT NULL,
+    PRIMARY KEY (game_id, seat)
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    game_id        INTEGER NOT NULL REFERENCES games(id),
+    round          INTEGER NOT NULL,
+    marshal        INTEGER NOT NULL,
+    event          INTEGER,
+    auction_winner INTEGER,
+    winning_bid    INTEGER,
+    law            INTEGER,
+    variant        TEXT,
+    PRIMARY KEY (game_id, round)
+);
+CREATE TABLE IF NOT EXISTS bids (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    round   INTEGER NOT NULL,
+    seat    INTEGER NOT NULL,
+    amount  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phase_scores (
+    game_id INTEGER NOT NULL REFERENCES games(id),
+    round   INTEGER NOT NULL,
+    phase   TEXT NOT NULL,
+    seat    INTEGER NOT NULL,
+    score   INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_games_winner ON games(winner);
+CREATE INDEX IF NOT EXISTS ix_games_players ON games(players);
+CREATE INDEX IF NOT EXISTS ix_rounds_event ON rounds(event);
+CREATE INDEX IF NOT EXISTS ix_rounds_law ON rounds(law, variant, round);
+CREATE INDEX IF NOT EXISTS ix_rounds_winner ON rounds(auction_winner);
+CREATE INDEX IF NOT EXISTS ix_bids_game ON bids(game_id, round);
+CREATE INDEX IF NOT EXISTS ix_phase_scores_game ON phase_scores(game_id, round);
+"""
+
+_INSERT_GAME = "INSERT INTO games (finished_at, seed, map, players, rounds, winner) VALUES (?, ?, ?, ?, ?, ?)"
+_INSERT_PLAYER = ("INSERT INTO game_players (game_id, seat, name, score, estates, estate_pts, influence, honor, gold, gold_pts)"
+                  " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_INSERT_ROUND = ("INSERT INTO rounds (game_id, round, marshal, event, auction_winner, winning_bid, law, variant)"
+                 " VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+_INSERT_BID = "INSERT INTO bids (game_id, round, seat, amount) VALUES (?, ?, ?, ?)"
+_INSERT_PHASE = "INSERT INTO phase_scores (game_id, round, phase, seat, score) VALUES (?, ?, ?, ?, ?)"
+
+
+# --------------- Rekord partii --------------- #
+
+@dataclass
+class RoundRecord:
+    round: int
+    marshal: int
+    event: Optional[int] = None
+    auction_winner: Optional[int] = None
+    winning_bid: Optional[int] = None
+    law: Optional[int] = None
+    variant: Optional[str] = None
+    bids: Dict[int, int] = field(default_factory=dict)
+
+
+@dataclass
+class GameRecord:
+    seed: Optional[int]
+    map: str
+    names: Tuple[str, ...]
+    rounds: List[RoundRecord]
+    phase_scores: List[Tuple[int, str, Tuple[int, ...]]]   # (runda, faza, wyniki wg miejsc)
+    final: Tuple[rules.ScoreLine, ...]
+    gold: Tuple[int, ...]
+    finished_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, object]:
+        """Postać JSON (cache wyników symulacji)."""
+        return {
+            "seed": self.seed, "map": self.map, "names": list(self.names),
+            "rounds": [asdict(r) for r in self.rounds],
+            "phase_scores": [[rnd, phase, list(scores)] for rnd, phase, scores in self.phase_scores],
+            "final": [list(sl) for sl in self.final], "gold": list(self.gold), "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GameRecord":
+        rounds = []
+        for r in data["rounds"]:
+            r = dict(r)
+            r["bids"] = {int(k): v for k, v in r["bids"].items()}  # klucze JSON to napisy
+            rounds.append(RoundRecord(**r))
+        return cls(
+            seed=data["seed"], map=data["map"], names=tuple(data["names"]), rounds=rounds,
+            phase_scores=[(rnd, phase, tuple(scores)) for rnd, phase, scores in data["phase_scores"]],
+            final=tuple(rules.ScoreLine(*sl) for sl in data["final"]), gold=tuple(data["gold"]),
+            finished_at=data["finished_at"],
+        )
+
+    @property
+    def winner(self) -> Optional[int]:
+        """Miejsce zwycięzcy albo None, gdy najwyższy wynik jest remisowy."""
+        totals = [sl.total for sl in self.final]
+        if not totals:
+            return None
+        best = max(totals)
+        return totals.index(best) if totals.count(best) == 1 else None
+
+
+class GameJournal:
+    """Zbiera przebieg jednej partii z decyzji kernela; `finish` zwraca GameRecord."""
+
+    def __init__(self, seed: Optional[int] = None, map_name: str = "?") -> None:
+        self.seed = seed
+        self.map_name = map_name
+        self._rounds: Dict[int, RoundRecord] = {}
+        self._phase_scores: List[Tuple[int, str, Tuple[int, ...]]] = []
+
+    def _round(self, state: rules.GameState) -> RoundRecord:
+        rec = self._rounds.get(state.round)
+        if rec is None:
+            rec = self._rounds[state.round] = RoundRecord(state.round, state.marshal)
+        return rec
+
+    def observe(self, decision: rules.Decision, state: rules.GameState) -> None:
+        """Wołane po każdej wykonanej decyzji ze stanem po niej."""
+        if isinstance(decision, rules.EndRound):
+            return
+        rec = self._round(state)
+        if isinstance(decision, rules.Event):
+            rec.event = decision.number
+        elif isinstance(decision, rules.Bid):
+            rec.bids[decision.seat] = decision.amount
+        elif isinstance(decision, rules.CloseAuction):
+            winner = next((i for i, p in enumerate(state.players) if p.majority), None)
+            rec.auction_winner = winner
+            rec.winning_bid = None if winner is None else state.players[winner].last_bid
+        elif isinstance(decision, rules.Law):
+            rec.law = decision.law
+        elif isinstance(decision, rules.Variant):
+            rec.variant = state.last_law_choice
+
+    def phase_done(self, phase: str, state: rules.GameState) -> None:
+        """Migawka wyników (wg zasad punktacji końcowej) po zakończonej fazie."""
+        self._round(state)
+        self._phase_scores.append((state.round, phase, tuple(sl.total for sl in rules.score_breakdown(state))))
+
+    def to_dict(self) -> Dict[str, object]:
+        """Postać JSON niedokończonej partii (punkty kontrolne gry w konsoli)."""
+        return {
+            "seed": self.seed, "map": self.map_name,
+            "rounds": [asdict(r) for _, r in sorted(self._rounds.items())],
+            "phase_scores": [[rnd, phase, list(scores)] for rnd, phase, scores in self._phase_scores],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "GameJournal":
+        journal = cls(data["seed"], data["map"])
+        for r in data["rounds"]:
+            r = dict(r)
+            r["bids"] = {int(k): v for k, v in r["bids"].items()}
+            journal._rounds[r["round"]] = RoundRecord(**r)
+        journal._phase_scores = [(rnd, phase, tuple(scores)) for rnd, phase, scores in data["phase_scores"]]
+        return journal
+
+    def finish(self, state: rules.GameState) -> GameRecord:
+        return GameRecord(
+            seed=self.seed,
+            map=self.map_name,
+            names=state.names,
+            rounds=[self._rounds[r] for r in sorted(self._rounds)],
+            phase_scores=list(self._phase_scores),
+            final=rules.score_breakdown(state),
+            gold=tuple(p.gold for p in state.players),
+        )
+
+
+# --------------- Baza --------------- #
+
+class HistoryStore:
+    """
+    Baza historii partii. `add` buforuje rekordy; co `batch_size` rekordów (i przy `flush`/`close`)
+    wstawiamy je w jednej transakcji przez executemany.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500) -> None:
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self._pending: List[GameRecord] = []
+        self.conn = sqlite3.connect(path, isolation_level=None)  # transakcje sterujemy sami
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, record: GameRecord) -> None:
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, records: Iterable[GameRecord]) -> None:
+        for rec in records:
+            self.add(rec)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            players, rounds, bids, phases = [], [], [], []
+            for rec in batch:
+                cur.execute(_INSERT_GAME, (rec.finished_at, rec.seed, rec.map, len(rec.names),
+                                           len(rec.rounds), rec.winner))
+                gid = cur.lastrowid
+                for seat, (name, sl) in enumerate(zip(rec.names, rec.final)):
+                    players.append((gid, seat, name, sl.total, sl.estates, sl.estate_pts, sl.influence,
+                                    sl.honor, rec.gold[seat], sl.gold_pts))
+                for r in rec.rounds:
+                    rounds.append((gid, r.round, r.marshal, r.event, r.auction_winner, r.winning_bid, r.law, r.variant))
+                    bids.extend((gid, r.round, seat, amount) for seat, amount in sorted(r.bids.items()))
+                for rnd, phase, scores in rec.phase_scores:
+                    phases.extend((gid, rnd, phase, seat, score) for seat, score in enumerate(scores))
+            cur.executemany(_INSERT_PLAYER, players)
+            cur.executemany(_INSERT_ROUND, rounds)
+            cur.executemany(_INSERT_BID, bids)
+            cur.executemany(_INSERT_PHASE, phases)
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    # --- zapytania ---
+    def law_win_rate(self, law: int, variant: Optional[str] = None, round_no: Optional[int] = None,
+                     players: Optional[int] = None) -> Tuple[int, int]:
+        """(liczba partii, wygrane) gracza, który przegłosował ustawę `law`/`variant` w rundzie `round_no`."""
+        sql = ("SELECT COUNT(*), COALESCE(SUM(g.winner = r.auction_winner), 0) FROM rounds r "
+               "JOIN games g ON g.id = r.game_id WHERE r.law = ?")
+        params: List[object] = [law]
+        if variant is not None:
+            sql += " AND r.variant = ?"
+            params.append(variant)
+        if round_no is not None:
+            sql += " AND r.round = ?"
+            params.append(round_no)
+        if players is not None:
+            sql += " AND g.players = ?"
+            params.append(players)
+        games, wins = self.conn.execute(sql, params).fetchone()
+        return games, wins
+
+    def event_win_rates(self) -> List[Tuple[int, int, int]]:
+        """Dla każdego wydarzenia: (numer, partie, wygrane marszałka rundy z tym wydarzeniem)."""
+        return self.conn.execute(
+            "SELECT r.event, COUNT(*), COALESCE(SUM(g.winner = r.marshal), 0) FROM rounds r "
+            "JOIN games g ON g.id = r.game_id WHERE r.event IS NOT NULL GROUP BY r.event ORDER BY r.event"
+        ).fetchall()
+
+    def standings(self) -> Iterator[Tuple[int, List[Tuple[str, int]]]]:
+        """Partie w kolejności zapisu: (id, [(gracz, wynik) wg miejsc]) — np. do przeliczenia rankingu."""
+        self.flush()
+        rows = self.conn.execute("SELECT game_id, name, score FROM game_players ORDER BY game_id, seat")
+        game, table = None, []
+        for gid, name, score in rows:
+            if gid != game and table:
+                yield game, table
+                table = []
+            game = gid
+            table.append((name, score))
+        if table:
+            yield game, table
+
+    def seat_win_rates(self) -> List[Tuple[int, int, int]]:
+        """(liczba graczy, miejsce, wygrane) — przewaga kolejności."""
+        return self.conn.execute(
+            "SELECT players, winner, COUNT(*) FROM games WHERE winner IS NOT NULL "
+            "GROUP BY players, winner ORDER BY players, winner"
+        ).fetchall()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Zapytania do bazy historii partii.")
+    parser.add_argument("db", help="plik bazy SQLite (np. z main.py --history)")
+    parser.add_argument("--law", type=int, help="ustawa 1..6: skuteczność gracza, który ją przegłosował")
+    parser.add_argument("--variant", choices=("A", "B"))
+    parser.add_argument("--round", type=int, dest="round_no")
+    parser.add_argument("--players", type=int)
+    args = parser.parse_args(argv[1:])
+
+    with HistoryStore(args.db) as store:
+        if args.law is not None:
+            games, wins = store.law_win_rate(args.law, args.variant, args.round_no, args.players)
+            rate = f"{100.0 * wins / games:.1f}%" if games else "—"
+            print(f"Ustawa {args.law}{args.variant or ''}: partie={games}, wygrane={wins}, skuteczność={rate}")
+            return 0
+        for players, seat, wins in store.seat_win_rates():
+            print(f"{players} graczy, miejsce {seat}: wygrane={wins}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
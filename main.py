@@ -14,16 +14,34 @@ built around a finite state machine (FSM). The structure supports:
 
 How to run:
   $ python console_game_state_machine.py
+  $ python main.py --selftest          # regresja kernela zasad i adaptera konsoli
 
 """
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from enum import Enum, auto
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Deque, Iterator, Callable, Sequence
+from array import array
+import base64
+from collections import deque
+from contextlib import nullcontext
+from functools import lru_cache
+import heapq
+from pathlib import Path
+import argparse
+import json
+import os
 import random
+import tempfile
+import unicodedata
 import sys
 
+import battle
+import rules
+from history import GameJournal, HistoryStore
+from memprof import MemProfile, cache_sizes, container_sizes
+
 # --------------- Core Data Models --------------- #
 
 class StateID(Enum):
@@ -31,12 +49,24 @@ class StateID(Enum):
     GAMEPLAY = auto()
     GAME_OVER = auto()
 
-class ProvinceID(Enum):
-    PRUSY = "Prusy"
-    LITWA = "Litwa"
-    UKRAINA = "Ukraina"
-    WIELKOPOLSKA = "Wielkopolska"
-    MALOPOLSKA = "Małopolska"
+@dataclass(frozen=True)
+class ProvinceID:
+    """
+    Identyfikator prowincji. Prowincje definiuje plik mapy (maps/*.json), więc nie jest to Enum;
+    tożsamość wyznacza `key`, a `value` to nazwa wyświetlana (jak w dawnym Enum).
+    Stałe PRUSY, LITWA, ... to prowincje mapy podstawowej, do których odwołują się wydarzenia.
+    """
+    key: str
+    value: str = field(compare=False)
+
+    def __repr__(self) -> str:
+        return f"<ProvinceID.{self.key}: {self.value!r}>"
+
+ProvinceID.PRUSY = ProvinceID("PRUSY", "Prusy")
+ProvinceID.LITWA = ProvinceID("LITWA", "Litwa")
+ProvinceID.UKRAINA = ProvinceID("UKRAINA", "Ukraina")
+ProvinceID.WIELKOPOLSKA = ProvinceID("WIELKOPOLSKA", "Wielkopolska")
+ProvinceID.MALOPOLSKA = ProvinceID("MALOPOLSKA", "Małopolska")
 
 class RaidTrackID(Enum):
     N = "Szwecja"
@@ -51,6 +81,7 @@ class RaidTrack:
 @dataclass
 class Player:
     name: str
+    seat: int = 0           # stały indeks gracza (miejsce przy stole) = indeks w settings.players
     score: int = 0
     gold: int = 0
     honor: int = 0
@@ -58,10 +89,23 @@ class Player:
     last_bid: int = 0       # ostatnia oferta z licytacji
 
 
+# domyślna kolejność faz rundy (nazwy klas, rejestr PHASES); warianty mogą ją zmienić (--phases)
+DEFAULT_PHASE_ORDER: Tuple[str, ...] = (
+    "EventsPhase", "IncomePhase", "AuctionPhase", "SejmPhase", "ActionPhase", "PlayerBattlePhase", "ArsonPhase",
+    "EnemyReinforcementPhase", "AttackInvadersPhase", "DefensePhase", "DevastationPhase", "UpkeepPhase",
+)
+
+
 @dataclass
 class Settings:
     players: List[Player] = field(default_factory=list)
     max_rounds: int = 3
+    headless: bool = False  # (--headless) bez pytań o statystyki; kości żołdu i doktryny z ctx.rng
+    seed: Optional[int] = None  # ziarno ctx.rng (--seed); zapisywane w historii partii
+    config: rules.RulesConfig = rules.DEFAULT_RULES  # stałe balansu (--rules), patrz rules.RulesConfig
+    whatif: float = 0.0  # budżet (s) podglądu skutków ustaw dla gracza z większością (--whatif), 0 = wyłączony
+    tactical: bool = False  # potyczki graczy na planszy taktycznej (battle.py) zamiast rzutów (--tactical)
+    phase_order: Tuple[str, ...] = DEFAULT_PHASE_ORDER  # fazy rundy po kolei (--phases)
 
 
 @dataclass
@@ -84,40 +128,172 @@ class RoundStatus:
     sejm_tiebreak_wlkp: bool = False                 # „Sejmik w Środzie”: remisy w licytacji wygrywa kontrolujący Wlkp
     wlkp_influence_cost_override: Optional[int] = None  # „Szlak Warta–Odra”: Wpływ w Wlkp = 1 zł
     wlkp_estate_cost_override: Optional[int] = None     # „Szlak Warta–Odra”: Posiadłość w Wlkp = 3 zł
+    raid_targets: Tuple[Tuple[str, int, int], ...] = ()  # obrona kraju: (tor, indeks prowincji celu, wróg)
 
 
 @dataclass
 class Province:
     id: ProvinceID
     has_fort: bool = False
-    # 5 slotów posiadłości; -1 oznacza brak, a liczba to indeks gracza (0..N-1)
-    estates: List[int] = field(default_factory=lambda: [-1] * 5)
-    wealth: int = 2  # zamożność prowincji (0–3)
+    # sloty posiadłości (domyślnie 5); -1 oznacza brak, a liczba to indeks gracza (0..N-1).
+    # Po restore to krotka ze stanu kernela — snapshot oddaje ten sam obiekt (carry_indexes).
+    estates: Sequence[int] = field(default_factory=lambda: [-1] * rules.ESTATE_SLOTS)
+    wealth: int = rules.START_WEALTH  # zamożność prowincji (0–wealth_max)
+
+
+class UnitType(Enum):
+    P = "Piechota"
+    K = "Kawaleria"
+
+UNIT_TYPES: Tuple[UnitType, ...] = tuple(UnitType)
 
 
-@dataclass
 class TroopBoard:
-    # Dla każdej prowincji trzymamy listę [units_gracza0, units_gracza1, ...]
-    per_province: Dict[ProvinceID, List[int]] = field(default_factory=dict)
+    """
+    Wojska konsoli: widok tylko do odczytu na tablicę [prowincja × gracz × typ jednostki] ostatniego
+    stanu kernela (`load` w restore). Zmiany idą wyłącznie przez rules.apply, a sumy (gracz na
+    prowincji, gracz) to indeksy utrzymywane przez kernel (rules.GameState.stacks/player_totals) —
+    `load` i odczyty są O(1), total_on i grand_total O(liczba graczy).
+    """
+
+    def __init__(self, provinces: Tuple[ProvinceID, ...] = (), pcount: int = 0) -> None:
+        self.reset(provinces, pcount)
+
+    def reset(self, provinces, pcount: int) -> None:
+        self.provinces: Tuple[ProvinceID, ...] = tuple(provinces)
+        self.pcount = int(pcount)
+        self._pslot: Dict[ProvinceID, int] = {pid: k for k, pid in enumerate(self.provinces)}
+        self.state: Optional[rules.GameState] = None   # ostatni stan z restore; None = plansza bez wojsk
+
+    def load(self, state: rules.GameState) -> None:
+        self.state = state
+
+    # --- odczyty ---
+    def count(self, pid: ProvinceID, pidx: int, utype: Optional[UnitType] = None) -> int:
+        """Jednostki gracza na prowincji (danego typu albo wszystkie)."""
+        if self.state is None:
+            return 0
+        return self.state.units(self._pslot[pid], pidx, None if utype is None else utype.name)
+
+    def total_on(self, pid: ProvinceID) -> int:
+        if self.state is None:
+            return 0
+        base = self._pslot[pid] * self.pcount
+        return sum(self.state.stacks()[base:base + self.pcount])
+
+    def player_total(self, pidx: int) -> int:
+        return self.state.player_units(pidx) if self.state is not None else 0
+
+    def grand_total(self) -> int:
+        return sum(self.state.player_totals()) if self.state is not None else 0
+
+    def players_on(self, pid: ProvinceID) -> List[int]:
+        return [i for i in range(self.pcount) if self.count(pid, i) > 0]
+
+    def cells(self) -> Tuple[int, ...]:
+        """Cała tablica [prowincja × gracz × typ] (układ jak w rules.GameState.troops)."""
+        if self.state is None:
+            return (0,) * (len(self.provinces) * self.pcount * len(UNIT_TYPES))
+        return self.state.troops
 
 @dataclass
 class NoblesBoard:
     # Dla każdej prowincji trzymamy listę [nobles_gracza0, nobles_gracza1, ...]
     per_province: Dict[ProvinceID, List[int]] = field(default_factory=dict)
 
+# --------------- Map --------------- #
+
+DEFAULT_MAP_PATH = Path(__file__).resolve().parent / "maps" / "rzeczpospolita.json"
+_UNREACHABLE = 0x7FFF
+
+
+class GameMap:
+    """
+    Mapa wczytana z pliku danych: prowincje, skróty literowe, graf sąsiedztwa,
+    zasięgi ataków i pary spustoszeń dla torów najazdów.
+    Przy wczytaniu liczymy najkrótsze ścieżki między wszystkimi parami (BFS z każdej prowincji);
+    zapytania o odległość i zasięg marszu odpowiada plansza kernela (`board`, rules.Board).
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.name: str = data.get("name", "?")
+        by_key: Dict[str, ProvinceID] = {}
+        short: Dict[str, ProvinceID] = {}
+        border: List[ProvinceID] = []
+        for entry in data["provinces"]:
+            pid = ProvinceID(entry["key"], entry.get("name", entry["key"]))
+            if pid.key in by_key:
+                raise ValueError(f"Mapa {self.name}: zdublowana prowincja {pid.key}")
+            by_key[pid.key] = pid
+            if entry.get("short"):
+                short[entry["short"].lower()] = pid
+            if entry.get("border"):
+                border.append(pid)
+        self.provinces: Tuple[ProvinceID, ...] = tuple(by_key.values())
+        self.by_key = by_key
+        self.short = short
+        self.border: Tuple[ProvinceID, ...] = tuple(border)
+        self.index: Dict[ProvinceID, int] = {pid: k for k, pid in enumerate(self.provinces)}
+
+        neigh: List[List[int]] = [[] for _ in self.provinces]
+        for a, b in data.get("adjacency", []):
+            ia, ib = self.index[by_key[a]], self.index[by_key[b]]
+            if ib not in neigh[ia]:
+                neigh[ia].append(ib)
+                neigh[ib].append(ia)
+        self.adjacency: Dict[ProvinceID, Tuple[ProvinceID, ...]] = {
+            pid: tuple(self.provinces[j] for j in neigh[i]) for i, pid in enumerate(self.provinces)
+        }
+
+        self.attack_sources: Dict[RaidTrackID, frozenset] = {}
+        self.plunder_pairs: Dict[RaidTrackID, Tuple[ProvinceID, ProvinceID]] = {}
+        for tkey, spec in data.get("tracks", {}).items():
+            rid = RaidTrackID[tkey]
+            self.attack_sources[rid] = frozenset(by_key[k] for k in spec.get("attack_from", []))
+            if spec.get("plunder"):
+                first, second = spec["plunder"]
+                self.plunder_pairs[rid] = (by_key[first], by_key[second])
+
+        # all-pairs shortest paths: graf nieważony, więc BFS z każdego węzła (O(V·(V+E)))
+        n = len(self.provinces)
+        rows: List[array] = []
+        for src in range(n):
+            dist = array("h", [_UNREACHABLE]) * n
+            dist[src] = 0
+            order = [src]
+            for u in order:  # kolejka BFS: lista rośnie w trakcie iteracji
+                for v in neigh[u]:
+                    if dist[v] == _UNREACHABLE:
+                        dist[v] = dist[u] + 1
+                        order.append(v)
+            rows.append(dist)
+
+        # ta sama mapa w postaci indeksowej dla kernela zasad (rules.py)
+        self.board = rules.Board(
+            keys=tuple(pid.key for pid in self.provinces),
+            names=tuple(pid.value for pid in self.provinces),
+            border=tuple(self.index[pid] for pid in self.border),
+            dist=tuple(tuple(-1 if d == _UNREACHABLE else d for d in row) for row in rows),
+            attack_from={rid.name: frozenset(self.index[p] for p in srcs) for rid, srcs in self.attack_sources.items()},
+            plunder={rid.name: (self.index[a], self.index[b]) for rid, (a, b) in self.plunder_pairs.items()},
+        )
+
+
+@lru_cache(maxsize=None)
+def load_map(path: str = str(DEFAULT_MAP_PATH)) -> GameMap:
+    """Wczytuje (i cache'uje) mapę z pliku JSON."""
+    with open(path, encoding="utf-8") as fh:
+        return GameMap(json.load(fh))
+
+
 @dataclass
 class GameContext:
     settings: Settings = field(default_factory=Settings)
     round_status: RoundStatus = field(default_factory=RoundStatus)
     rng: random.Random = field(default_factory=random.Random)
     last_output: str = ""
-    provinces: Dict[ProvinceID, Province] = field(default_factory=lambda: {
-        ProvinceID.PRUSY: Province(ProvinceID.PRUSY),
-        ProvinceID.LITWA: Province(ProvinceID.LITWA),
-        ProvinceID.UKRAINA: Province(ProvinceID.UKRAINA),
-        ProvinceID.WIELKOPOLSKA: Province(ProvinceID.WIELKOPOLSKA),
-        ProvinceID.MALOPOLSKA: Province(ProvinceID.MALOPOLSKA),
-    })
+    map: GameMap = field(default_factory=load_map)
+    provinces: Dict[ProvinceID, Province] = field(default_factory=dict)
     raid_tracks: Dict[RaidTrackID, RaidTrack] = field(default_factory=lambda: {
         RaidTrackID.N: RaidTrack(RaidTrackID.N, 0),
         RaidTrackID.S: RaidTrack(RaidTrackID.S, 0),
@@ -125,19 +301,229 @@ class GameContext:
     })
     troops: TroopBoard = field(default_factory=TroopBoard)
     nobles: NoblesBoard = field(default_factory=NoblesBoard)
+    history: Optional[HistoryStore] = None   # baza historii partii (--history)
+    journal: Optional[GameJournal] = None    # przebieg bieżącej partii, gdy historia włączona
+    autosave: Optional["Autosave"] = None     # punkty kontrolne partii (--autosave / --resume)
+    memprofile: Optional[MemProfile] = None   # profil pamięci per faza i per partia (--memprofile)
+
+    def __post_init__(self) -> None:
+        if not self.provinces:
+            cfg = self.settings.config
+            self.provinces = {pid: Province(pid, estates=[-1] * cfg.estate_slots, wealth=cfg.start_wealth)
+                              for pid in self.map.provinces}
+
+    @property
+    def parser(self) -> CommandParser:
+        return command_parser(self.map)
+
+# --------------- Command parsing --------------- #
+
+_FOLD = str.maketrans({"ł": "l", "Ł": "L"})  # NFKD nie rozkłada 'ł'
+
+@lru_cache(maxsize=4096)
+def norm_token(s: str) -> str:
+    """Normalizacja tokenu: bez polskich znaków diakrytycznych, małe litery. Tekst ASCII omija NFKD."""
+    s = (s or "").strip().translate(_FOLD)
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return s.lower().strip()
+
+
+class PrefixTrie:
+    """
+    Drzewo prefiksowe znormalizowanych kluczy. Każdy węzeł pamięta pierwszą wstawioną wartość
+    ze swojego poddrzewa (kolejność wstawiania = priorytet), więc dopasowanie prefiksu kosztuje O(len(token)).
+    """
+    __slots__ = ("_root",)
+
+    def __init__(self) -> None:
+        self._root: list = [None, {}, None]  # [pierwsza wartość poddrzewa, dzieci, wartość klucza kończącego się tu]
+
+    def insert(self, key: str, value: Any) -> None:
+        node = self._root
+        for ch in key:
+            if node[0] is None:
+                node[0] = value
+            node = node[1].setdefault(ch, [None, {}, None])
+        if node[0] is None:
+            node[0] = value
+        if node[2] is None:
+            node[2] = value
+
+    def match(self, token: str) -> Any:
+        """
+        Wartość klucza równego tokenowi; dla tokenu będącego prefiksem któregoś klucza (np. 'lit' -> Litwa)
+        pierwsza wartość poddrzewa; w przeciwnym razie wartość najdłuższego klucza, który jest prefiksem
+        tokenu ('wplywy' -> wplyw).
+        """
+        node = self._root
+        longest = None
+        for ch in token:
+            if node[2] is not None:
+                longest = node[2]
+            node = node[1].get(ch)
+            if node is None:
+                return longest
+        return node[2] if node[2] is not None else node[0]
+
+
+class CommandParser:
+    """
+    Wspólny parser poleceń (akcje, prowincje, najeźdźcy, typy jednostek).
+    Drzewa prefiksowe budujemy raz dla mapy; kolejne dopasowania nie skanują list ani nie normalizują kandydatów.
+    """
+
+    ACTION_KEYS = {
+        "wplyw": ["wplyw", "wpl", "wp", "w"],
+        "posiadlosc": ["posiadlosc", "posiadłość", "posiad", "pos", "p"],
+        "rekrutacja": ["rekrutacja", "rekr", "rek", "r"],
+        "marsz": ["marsz", "mar", "m"],
+        "zamoznosc": ["zamoznosc", "zamożność", "zamoz", "z"],
+        "administracja": ["administracja", "admin", "adm", "a"],
+    }
+    ENEMY_KEYS = {"n": RaidTrackID.N, "s": RaidTrackID.S, "e": RaidTrackID.E}
+    ENEMY_NAMES = {"szwecja": RaidTrackID.N, "tatarzy": RaidTrackID.S, "moskwa": RaidTrackID.E}
+
+    def __init__(self, game_map: GameMap) -> None:
+        self._actions = PrefixTrie()
+        for act, keys in self.ACTION_KEYS.items():
+            for k in keys:
+                self._actions.insert(norm_token(k), act)
+        # jednoznaczne skróty literowe mają pierwszeństwo przed prefiksami nazw
+        self._prov_short = dict(game_map.short)
+        self._provinces = PrefixTrie()
+        for pid in game_map.provinces:
+            self._provinces.insert(norm_token(pid.value), pid)
+        self._enemies = PrefixTrie()
+        for name, rid in self.ENEMY_NAMES.items():
+            self._enemies.insert(name, rid)
+        self._unit_types: Dict[str, UnitType] = {}
+        for ut in UNIT_TYPES:
+            full = norm_token(ut.value)
+            self._unit_types[ut.name.lower()] = ut
+            for k in range(3, len(full) + 1):
+                self._unit_types[full[:k]] = ut
+
+    def action(self, token: str) -> str:
+        """Zwraca canonical action id po skrócie/prefiksie ('' gdy nie rozpoznano)."""
+        t = norm_token(token)
+        return (self._actions.match(t) or "") if t else ""
+
+    def province(self, text: str) -> Optional[ProvinceID]:
+        """Akceptuje: pełną nazwę, prefiks lub pojedynczą literę (np. 'P' -> Prusy)."""
+        t = norm_token(text)
+        if not t:
+            return None
+        if len(t) == 1 and t in self._prov_short:
+            return self._prov_short[t]
+        return self._provinces.match(t)
+
+    def enemy(self, text: str) -> Optional[RaidTrackID]:
+        t = norm_token(text)
+        if not t:
+            return None
+        if t in self.ENEMY_KEYS:
+            return self.ENEMY_KEYS[t]
+        return self._enemies.match(t)
+
+    def split_unit_type(self, text: str) -> Tuple[str, Optional[UnitType]]:
+        """Odcina opcjonalny typ jednostki z końca argumentów: 'Litwa k' -> ('Litwa', K)."""
+        toks = (text or "").split()
+        if len(toks) >= 2:
+            ut = self._unit_types.get(norm_token(toks[-1]))
+            if ut is not None:
+                return " ".join(toks[:-1]), ut
+        return text, None
+
+
+@lru_cache(maxsize=None)
+def command_parser(game_map: GameMap) -> CommandParser:
+    """Parser budowany raz na mapę (przy starcie gry)."""
+    return CommandParser(game_map)
+
 
 # --------------- Helpers --------------- #
 
+_script: Deque[str] = deque()            # polecenia ze skryptu czekające na kolejne prompty
+_script_stream: Optional[Iterator[str]] = None
+_recorder: Optional[Callable[[str], None]] = None  # dostaje każdą odpowiedź na prompt (Autosave.answered)
+
+
+def split_commands(text: str) -> List[str]:
+    """
+    Dzieli skrypt na kolejne odpowiedzi: jedna linia = jedna odpowiedź (pusta linia = Enter),
+    w linii polecenia można łączyć średnikami ('w L; m L->P; r P'). Linie '#' to komentarze.
+    """
+    out: List[str] = []
+    for line in text.splitlines():
+        if line.lstrip().startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split(";")]
+        if len(parts) > 1:
+            parts = [part for part in parts if part]
+        out.extend(parts)
+    return out
+
+
+def stream_commands(path: str) -> None:
+    """Odpowiedzi na prompty czytane leniwie z pliku, linia po linii (nagrane partie, testy regresyjne)."""
+    global _script_stream
+    _script_stream = open(path, encoding="utf-8")
+
+
+def _next_scripted() -> Optional[str]:
+    global _script_stream
+    while not _script and _script_stream is not None:
+        line = next(_script_stream, None)
+        if line is None:
+            _script_stream.close()
+            _script_stream = None
+            break
+        _script.extend(split_commands(line))
+    return _script.popleft() if _script else None
+
+
 def prompt(text: str) -> str:
+    scripted = _next_scripted()
+    if scripted is not None:
+        print(text + scripted)
+        return _answered(scripted)
     try:
-        return input(text)
+        raw = input(text)
     except EOFError:
         return ""
+    if ";" in raw:  # kilka poleceń naraz: pierwsze teraz, reszta odpowie na kolejne prompty
+        cmds = split_commands(raw)
+        if cmds:
+            raw = cmds[0]
+            _script.extend(cmds[1:])
+    return _answered(raw)
+
+
+def _answered(answer: str) -> str:
+    if _recorder is not None:
+        _recorder(answer)
+    return answer
 
 
 def println(*args: Any) -> None:
     print(*args)
 
+
+def memspan(ctx: GameContext, name: str):
+    """Odcinek profilu pamięci (--memprofile); bez profilu nic nie robi."""
+    return ctx.memprofile.span(name) if ctx.memprofile is not None else nullcontext()
+
+
+_D6 = (1, 2, 3, 4, 5, 6)
+
+def roll_dice(ctx: GameContext, count: int) -> List[int]:
+    """Rzuca `count` kośćmi k6 jednym wywołaniem generatora (ctx.rng)."""
+    if count <= 0:
+        return []
+    return ctx.rng.choices(_D6, k=count)
+
 def show_player_stats(ctx: GameContext):
     println("--- Player Stats ---")
     for p in ctx.settings.players:
@@ -159,13 +545,12 @@ def show_player_stats(ctx: GameContext):
             something_printed = True
 
         # Wojsko (tylko jeśli ktokolwiek ma >0)
-        troops_arr = ctx.troops.per_province.get(pid, [])
-        if troops_arr and sum(troops_arr) > 0:
+        if ctx.troops.total_on(pid) > 0:
             println("    Wojsko:")
-            for i, player in enumerate(ctx.settings.players):
-                units = troops_arr[i] if i < len(troops_arr) else 0
-                if units > 0:
-                    println(f"      - {player.name}: {units}")
+            for i in ctx.troops.players_on(pid):
+                kinds = " ".join(f"{ut.name}{ctx.troops.count(pid, i, ut)}" for ut in UNIT_TYPES
+                                 if ctx.troops.count(pid, i, ut) > 0)
+                println(f"      - {ctx.settings.players[i].name}: {ctx.troops.count(pid, i)} ({kinds})")
             something_printed = True
 
         # Posiadłości (tylko jeśli jakakolwiek zajęta)
@@ -199,285 +584,242 @@ def show_player_stats(ctx: GameContext):
 
     println("--------------------")
 
-def set_province_wealth(ctx: GameContext, province_id: ProvinceID, value: int) -> int:
-    """Ustawia zamożność prowincji (0–3)."""
-    prov = ctx.provinces[province_id]
-    prov.wealth = max(0, min(3, int(value)))
-    return prov.wealth
-
-def add_province_wealth(ctx: GameContext, province_id: ProvinceID, delta: int) -> int:
-    """Dodaje (lub odejmuje) zamożność w zakresie 0–3."""
-    prov = ctx.provinces[province_id]
-    prov.wealth = max(0, min(3, prov.wealth + int(delta)))
-    return prov.wealth
-
-def set_raid(ctx: GameContext, track_id: RaidTrackID, value: int) -> int:
-    """Ustawia konkretną wartość toru najazdu. Zwraca nową wartość."""
-    ctx.raid_tracks[track_id].value = int(value)
-    return ctx.raid_tracks[track_id].value
-
-def add_raid(ctx: GameContext, track_id: RaidTrackID, delta: int) -> int:
-    """Dodaje (może być ujemne) do licznika toru. Zwraca nową wartość."""
-    t = ctx.raid_tracks[track_id]
-    t.value += int(delta)
-    return t.value
-
-def build_estate(ctx: GameContext, province_id: ProvinceID, player_index: int) -> bool:
+def compute_final_scores(ctx: GameContext) -> str:
     """
-    Zajmuje pierwsze wolne (=-1) miejsce w liście posiadłości danej prowincji.
-    Zwraca True, jeśli się udało; False, gdy brak wolnych slotów.
+    Punktacja końcowa wg rules.final_scores (posiadłości, wpływy, honor, złoto/3).
+    Ustawia p.score i zwraca tekstowy raport.
     """
-    prov = ctx.provinces[province_id]
-    for i, v in enumerate(prov.estates):
-        if v == -1:
-            prov.estates[i] = player_index
-            return True
-    return False
+    scores, lines = rules.final_scores(snapshot(ctx))
+    for p, score in zip(ctx.settings.players, scores):
+        p.score = score
+    return "\n".join(lines)
 
-def remove_last_estate(ctx: GameContext, province_id: ProvinceID, player_index: int) -> bool:
-    """
-    Usuwa najpóźniej postawioną posiadłość danego gracza (czyli od końca listy).
-    Zwraca True, jeśli coś usunięto.
-    """
-    prov = ctx.provinces[province_id]
-    for i in range(len(prov.estates)-1, -1, -1):
-        if prov.estates[i] == player_index:
-            prov.estates[i] = -1
-            return True
-    return False
 
-def toggle_fort(ctx: GameContext, province_id: ProvinceID, value: Optional[bool] = None) -> bool:
-    """
-    Ustawia/flipuje fort w prowincji. Jeśli value jest None, to flip (NOT).
-    Zwraca bieżący stan fortu po operacji.
-    """
-    prov = ctx.provinces[province_id]
-    prov.has_fort = (not prov.has_fort) if value is None else bool(value)
-    return prov.has_fort
+# --------------- Rules kernel adapter --------------- #
 
-def destroy_last_estate_any(ctx: GameContext, province_id: ProvinceID) -> Optional[int]:
-    """
-    Usuwa 'ostatnio zbudowaną' posiadłość w prowincji, niezależnie od właściciela.
-    Interpretujemy to jako ostatni zajęty slot od końca listy.
-    Zwraca indeks gracza, któremu zniszczono posiadłość, albo None gdy brak.
-    """
-    prov = ctx.provinces[province_id]
-    for i in range(len(prov.estates) - 1, -1, -1):
-        if prov.estates[i] != -1:
-            owner = prov.estates[i]
-            prov.estates[i] = -1
-            return owner
-    return None
+_FLAG_FIELDS = tuple(f.name for f in fields(rules.RoundFlags))
 
 
-def plunder_province(ctx: GameContext, province_id: ProvinceID) -> str:
+def snapshot(ctx: GameContext) -> rules.GameState:
     """
-    Spustoszenie prowincji:
-      - Jeśli jest fort: niszczymy fort.
-      - W przeciwnym razie niszczymy ostatnio zbudowaną posiadłość (jeśli jest).
-      - Zamożność zawsze spada o 1 (do min 0).
-    Zwraca opis tekstowy tego, co się stało.
+    Niemutowalna kopia stanu gry dla kernela zasad. Indeksy ostatniego stanu z restore (wojska,
+    posiadłości) przechodzą do kopii, o ile dane, z których je liczono, się nie zmieniły.
     """
-    prov = ctx.provinces[province_id]
-    msgs = [f"[Spustoszenie] {province_id.value}: "]
-
-    if prov.has_fort:
-        prov.has_fort = False
-        msgs.append("zniszczono fort; ")
-    else:
-        owner = destroy_last_estate_any(ctx, province_id)
-        if owner is not None:
-            owner_name = ctx.settings.players[owner].name if 0 <= owner < len(ctx.settings.players) else "?"
-            msgs.append(f"zniszczono posiadłość gracza {owner_name}; ")
-        else:
-            msgs.append("brak fortu i posiadłości do zniszczenia; ")
-
-    before = prov.wealth
-    prov.wealth = max(0, prov.wealth - 1)
-    msgs.append(f"zamożność {before}→{prov.wealth}.")
-    return "".join(msgs)
-
-
-
-def set_units(ctx: GameContext, province_id: ProvinceID, player_index: int, value: int) -> int:
-    """Ustaw dokładną liczbę jednostek gracza na prowincji (nieujemną). Zwraca nową wartość."""
-    arr = ctx.troops.per_province[province_id]
-    arr[player_index] = max(0, int(value))
-    return arr[player_index]
-
-def add_units(ctx: GameContext, province_id: ProvinceID, player_index: int, delta: int) -> int:
-    """Dodaj/odejmij jednostki (może być ujemne). Zwraca nową wartość (nie spadnie poniżej 0)."""
-    arr = ctx.troops.per_province[province_id]
-    arr[player_index] = max(0, arr[player_index] + int(delta))
-    return arr[player_index]
-
-def move_units(ctx: GameContext, from_pid: ProvinceID, to_pid: ProvinceID, player_index: int, amount: int) -> bool:
-    """Przenieś amount jednostek między prowincjami dla danego gracza. Zwraca True, jeśli się udało."""
-    amount = int(amount)
-    if amount <= 0:
-        return False
-    from_arr = ctx.troops.per_province[from_pid]
-    to_arr = ctx.troops.per_province[to_pid]
-    if from_arr[player_index] < amount:
-        return False
-    from_arr[player_index] -= amount
-    to_arr[player_index] += amount
-    return True
-
-def total_units_on(ctx: GameContext, province_id: ProvinceID) -> int:
-    """Suma wszystkich jednostek (wszyscy gracze) na danej prowincji."""
-    return sum(ctx.troops.per_province[province_id])
-
-def set_nobles(ctx: GameContext, province_id: ProvinceID, player_index: int, value: int) -> int:
-    """Ustaw dokładną liczbę szlachciców gracza na prowincji (nieujemną). Zwraca nową wartość."""
-    arr = ctx.nobles.per_province[province_id]
-    arr[player_index] = max(0, int(value))
-    return arr[player_index]
-
-def add_nobles(ctx: GameContext, province_id: ProvinceID, player_index: int, delta: int) -> int:
-    """Dodaj/odejmij szlachciców (może być ujemne). Zwraca nową wartość (nie spadnie poniżej 0)."""
-    arr = ctx.nobles.per_province[province_id]
-    arr[player_index] = max(0, arr[player_index] + int(delta))
-    return arr[player_index]
-
-def move_nobles(ctx: GameContext, from_pid: ProvinceID, to_pid: ProvinceID, player_index: int, amount: int) -> bool:
-    """Przenieś amount szlachciców między prowincjami dla danego gracza. Zwraca True, jeśli się udało."""
-    amount = int(amount)
-    if amount <= 0:
-        return False
-    from_arr = ctx.nobles.per_province[from_pid]
-    to_arr = ctx.nobles.per_province[to_pid]
-    if from_arr[player_index] < amount:
-        return False
-    from_arr[player_index] -= amount
-    to_arr[player_index] += amount
-    return True
-
-def total_nobles_on(ctx: GameContext, province_id: ProvinceID) -> int:
-    """Suma wszystkich szlachciców (wszyscy gracze) na danej prowincji."""
-    return sum(ctx.nobles.per_province[province_id])
-
-def count_estates_for_player_in_province(ctx: GameContext, province_id: ProvinceID, pidx: int) -> int:
-    """Ile slotów posiadłości w danej prowincji należy do gracza pidx."""
-    prov = ctx.provinces[province_id]
-    return sum(1 for v in prov.estates if v == pidx)
-
-from typing import Tuple
-
-def influence_winners_in_province(ctx: GameContext, province_id: ProvinceID) -> List[int]:
+    rs = ctx.round_status
+    pcount = len(ctx.settings.players)
+    flags = {name: getattr(rs, name) for name in _FLAG_FIELDS}
+    used = tuple(bool(u) for u in flags["artillery_defense_used"])
+    flags["artillery_defense_used"] = used + (False,) * (pcount - len(used))
+    nobles: List[int] = []
+    for pid in ctx.map.provinces:
+        nobles.extend(ctx.nobles.per_province.get(pid, [0] * pcount))
+    return rules.carry_indexes(rules.GameState(
+        board=ctx.map.board,
+        names=tuple(p.name for p in ctx.settings.players),
+        players=tuple(rules.PlayerState(p.gold, p.honor, p.majority, p.last_bid) for p in ctx.settings.players),
+        provinces=tuple(rules.ProvinceState(prov.has_fort, tuple(prov.estates), prov.wealth)
+                        for prov in (ctx.provinces[pid] for pid in ctx.map.provinces)),
+        tracks=tuple(ctx.raid_tracks[RaidTrackID[k]].value for k in rules.TRACKS),
+        troops=ctx.troops.cells() if ctx.troops.pcount == pcount else (0,) * (len(ctx.map.provinces) * pcount * len(UNIT_TYPES)),
+        nobles=tuple(nobles),
+        round=rs.current_round,
+        total_rounds=rs.total_rounds,
+        marshal=rs.marshal_index,
+        last_law=rs.last_law,
+        last_law_choice=rs.last_law_choice,
+        flags=rules.RoundFlags(**flags),
+        config=ctx.settings.config,
+    ), ctx.troops.state)
+
+
+def restore(ctx: GameContext, state: rules.GameState) -> None:
+    """Przepisuje stan z kernela z powrotem do GameContext."""
+    for p, ps in zip(ctx.settings.players, state.players):
+        p.gold, p.honor, p.majority, p.last_bid = ps.gold, ps.honor, ps.majority, ps.last_bid
+    for pid, ps in zip(ctx.map.provinces, state.provinces):
+        prov = ctx.provinces[pid]
+        prov.has_fort, prov.estates, prov.wealth = ps.fort, ps.estates, ps.wealth
+    for k, v in zip(rules.TRACKS, state.tracks):
+        ctx.raid_tracks[RaidTrackID[k]].value = v
+    if ctx.troops.pcount != state.pcount:
+        ctx.troops.reset(ctx.map.provinces, state.pcount)
+    ctx.troops.load(state)
+    n = state.pcount
+    for k, pid in enumerate(ctx.map.provinces):
+        ctx.nobles.per_province[pid] = list(state.nobles[k * n:(k + 1) * n])
+    rs = ctx.round_status
+    rs.current_round, rs.total_rounds, rs.marshal_index = state.round, state.total_rounds, state.marshal
+    rs.last_law, rs.last_law_choice = state.last_law, state.last_law_choice
+    for name in _FLAG_FIELDS:
+        setattr(rs, name, getattr(state.flags, name))
+    rs.artillery_defense_used = list(state.flags.artillery_defense_used)
+
+
+def commit(ctx: GameContext, decision: rules.Decision) -> rules.Transition:
     """
-    Zwraca listę indeksów graczy mających kontrolę (wpływ) w danej prowincji.
-    Zasada:
-      - najwięcej szlachciców wygrywa,
-      - remis: jeśli dokładnie jeden z remisujących ma >0 wojsk w tej prowincji, wygrywa on,
-      - w przeciwnym razie kontrolę mają wszyscy remisujący.
+    Wykonuje decyzję w kernelu zasad, przepisuje wynik do ctx i drukuje komunikaty.
+    Niedozwolona decyzja rzuca rules.IllegalMove, a ctx pozostaje bez zmian.
     """
-    players = ctx.settings.players
-    pcount = len(players)
-    nobles = ctx.nobles.per_province.get(province_id, [0]*pcount)
-    troops = ctx.troops.per_province.get(province_id, [0]*pcount)
-
-    max_n = max(nobles) if nobles else 0
-    if max_n == 0:
-        return []  # nikt nie ma wpływu
+    t = rules.apply(snapshot(ctx), decision)
+    restore(ctx, t.state)
+    if ctx.journal is not None:
+        ctx.journal.observe(decision, t.state)
+    for note in t.notes:
+        println(note)
+    return t
 
-    leaders = [i for i, v in enumerate(nobles) if v == max_n]
-    if len(leaders) == 1:
-        return leaders
 
-    with_troops = [i for i in leaders if troops[i] > 0]
-    if len(with_troops) == 1:
-        return with_troops
+SELFTEST_DIGEST = "1eabadbbaca4fc49f9b05ba81086b930cfbf04f5976359007ca714b6bfe35aa7"   # sha256 stanów końcowych partii z `selftest` — zmienia się tylko ze zmianą zasad
 
-    return leaders  # remis utrzymany — wielu zwycięzców
 
-def single_controller_of(ctx: GameContext, province_id: ProvinceID) -> Optional[int]:
-    winners = influence_winners_in_province(ctx, province_id)
-    return winners[0] if len(winners) == 1 else None
-
-
-def estate_income_by_wealth(wealth: int) -> int:
+def selftest(games: int = 12) -> str:
     """
-    Dochód z jednej posiadłości w zależności od zamożności prowincji:
-      0–1 -> 0; 2 -> 1; 3 -> 2
+    Kontrola regresji kernela i adaptera konsoli na partiach botów (sim.Simulation). Po każdej
+    decyzji: rules.apply jest powtarzalne, indeksy stanu (także przeniesione przez snapshot)
+    zgadzają się z przeliczeniem od zera, restore → snapshot oddaje ten sam stan, a stan przechodzi przez zapis JSON. Na końcu skrót
+    stanów końcowych porównujemy z SELFTEST_DIGEST. AssertionError przy błędzie.
     """
-    w = max(0, min(3, int(wealth)))
-    if w <= 1:
-        return 0
-    if w == 2:
-        return 1
-    return 2  # w == 3
-
-def compute_final_scores(ctx: GameContext) -> str:
+    import hashlib
+    import sim   # sim importuje main
+    from dataclasses import replace
+
+    game_map = load_map()
+    checked = 0
+
+    class Checked(sim.Simulation):
+        def do(self, decision: rules.Decision) -> rules.GameState:
+            nonlocal checked
+            before = self.state
+            after = super().do(decision)
+            assert rules.apply(before, decision).state == after, f"apply nie jest powtarzalne: {decision}"
+            fresh = replace(after)
+            restore(ctx, after)
+            snap = snapshot(ctx)
+            assert snap == after, f"restore/snapshot zmienia stan po {decision}"
+            for st in (after, snap):
+                assert (st.stacks(), st.player_totals(), st.presence(), st.estate_tops()) == \
+                       (fresh.stacks(), fresh.player_totals(), fresh.presence(), fresh.estate_tops()), \
+                       f"indeksy stanu rozjechane po {decision}"
+            assert rules.state_from_dict(game_map.board, rules.state_to_dict(after)) == after
+            checked += 1
+            return after
+
+    digest = hashlib.sha256()
+    for seed in range(games):
+        pcount = 3 + seed % 3
+        bots = [sim.BOTS["heuristic" if seed % 2 else "random"](i, random.Random(f"{seed}:{i}")) for i in range(pcount)]
+        game = Checked(game_map.board, bots, 4, rules.DEFAULT_RULES, seed)
+        ctx = GameContext(settings=Settings(players=[Player(name=name, seat=i) for i, name in enumerate(game.state.names)],
+                                            max_rounds=4),
+                          map=game_map)
+        restore(ctx, game.state)
+        final = game.run()
+        digest.update(json.dumps(rules.state_to_dict(final), sort_keys=True).encode())
+    assert digest.hexdigest() == SELFTEST_DIGEST, f"stany końcowe inne niż wzorcowe: {digest.hexdigest()}"
+    return f"OK: {games} partii, {checked} decyzji"
+
+
+# --------------- Autosave --------------- #
+
+CHECKPOINT_VERSION = 1
+
+
+def _rng_to_json(rng: random.Random) -> list:
+    version, internal, gauss = rng.getstate()
+    return [version, base64.b64encode(array("I", internal).tobytes()).decode("ascii"), gauss]
+
+
+def _rng_from_json(data: list) -> tuple:
+    version, blob, gauss = data
+    return version, tuple(array("I", base64.b64decode(blob))), gauss
+
+
+class Autosave:
     """
-    Zasady:
-      1) +1 pkt dla gracza(ów) z największą liczbą posiadłości (suma po całej mapie).
-      2) Wpływy z prowincji: +1 pkt TYLKO jeśli jest dokładnie jeden zwycięzca.
-         Zwycięża najwięcej szlachciców; remis -> jeśli dokładnie jeden z remisujących ma wojsko w tej prowincji,
-         to on wygrywa; w przeciwnym razie (brak rozstrzygnięcia) NIKT nie dostaje punktu.
-      3) +punkty honoru (dodajemy p.honor do wyniku).
-      4) Za każde 3 złota +1 pkt (floor(gold/3)).
-    Zwraca tekstowy raport.
+    Punkty kontrolne partii w pliku JSON. Na granicy faz zapisujemy stan kernela (snapshot), stan
+    ctx.rng, ustawienia, dziennik i indeks fazy, od której runda ma ruszyć; postęp wewnątrz fazy
+    to lista odpowiedzi na prompty od tej granicy — przy wznowieniu odgrywa się je jak skrypt
+    (fazy są deterministyczne przy danym rng i odpowiedziach). Nagłówek kodujemy raz na fazę,
+    a przy `every_input` po każdej odpowiedzi dopisujemy do niego tylko listę odpowiedzi.
+    Zapis jest atomowy: plik tymczasowy w tym samym katalogu + os.replace.
     """
-    players = ctx.settings.players
-    pcount = len(players)
-    # wyzeruj wynik, liczymy od zera
-    for p in players:
-        p.score = 0
-
-    # (1) NAJWIĘCEJ POSIADŁOŚCI – globalnie
-    estates_total = [0] * pcount
-    for prov in ctx.provinces.values():
-        for owner in prov.estates:
-            if 0 <= owner < pcount:
-                estates_total[owner] += 1
-    max_est = max(estates_total) if estates_total else 0
-    estate_winners = [i for i, v in enumerate(estates_total) if v == max_est and max_est > 0]
-    for i in estate_winners:
-        players[i].score += 1
-
-    # (2) WPŁYWY Z PROWINCJI – punkt tylko przy JEDNYM zwycięzcy
-    influence_lines = []
-    for pid in ProvinceID:
-        winners = influence_winners_in_province(ctx, pid)  # już uwzględnia tie-break wojskiem
-        if not winners:
-            influence_lines.append(f"{pid.value}: brak wpływu")
-            continue
-        if len(winners) == 1:
-            w = winners[0]
-            players[w].score += 1
-            influence_lines.append(f"{pid.value}: {players[w].name}")
-        else:
-            # remis nierozstrzygnięty -> nikt nie dostaje punktu
-            influence_lines.append(f"{pid.value}: remis – nikt")
-
-    # (3) HONOR
-    for p in players:
-        p.score += p.honor
-
-    # (4) ZŁOTO → PUNKTY (co 3 złota)
-    gold_pts = [p.gold // 3 for p in players]
-    for i, gp in enumerate(gold_pts):
-        players[i].score += gp
-
-    # raport
-    lines = []
-    lines.append("[Punktacja końcowa]")
-    lines.append("Posiadłości (łącznie): " + ", ".join(f"{players[i].name}={estates_total[i]}" for i in range(pcount)))
-    if estate_winners:
-        lines.append("Najwięcej posiadłości: " + ", ".join(players[i].name for i in estate_winners) + " (+1)")
-    else:
-        lines.append("Najwięcej posiadłości: nikt (brak posiadłości)")
 
-    lines.append("Wpływy z prowincji:")
-    for s in influence_lines:
-        lines.append("  • " + s)
+    def __init__(self, path: str, map_path: str, every_input: bool = False) -> None:
+        self.path = path
+        self.map_path = map_path
+        self.every_input = every_input
+        self.inputs: List[str] = []
+        self._head: Optional[str] = None   # JSON bez listy odpowiedzi, zakończony '"inputs":'
+
+    def checkpoint(self, ctx: GameContext, phase: int) -> None:
+        """Stan tuż przed wejściem w fazę `phase` bieżącej rundy."""
+        st = ctx.settings
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "map": self.map_path,
+            "phase": phase,
+            "settings": {"scores": [p.score for p in st.players], "max_rounds": st.max_rounds,
+                         "headless": st.headless, "seed": st.seed, "whatif": st.whatif, "tactical": st.tactical,
+                         "phase_order": list(st.phase_order)},
+            "state": rules.state_to_dict(snapshot(ctx)),
+            "rng": _rng_to_json(ctx.rng),
+            "journal": ctx.journal.to_dict() if ctx.journal is not None else None,
+        }
+        self.rebase(data)
+        self._write()
 
-    lines.append("Honor: " + ", ".join(f"{p.name}=+{p.honor}" for p in players))
-    lines.append("Złoto→pkt: " + ", ".join(f"{players[i].name}=+{gold_pts[i]} (z {players[i].gold} zł)" for i in range(pcount)))
+    def rebase(self, data: Dict[str, Any]) -> None:
+        """Nowa granica faz: nagłówek z `data` (bez odpowiedzi), lista odpowiedzi od zera."""
+        head = json.dumps({k: v for k, v in data.items() if k != "inputs"}, ensure_ascii=False, separators=(",", ":"))
+        self._head = head[:-1] + ',"inputs":'
+        self.inputs = []
 
-    return "\n".join(lines)
+    def answered(self, text: str) -> None:
+        if self._head is None:   # menu startowe: przed pierwszym punktem kontrolnym
+            return
+        self.inputs.append(text)
+        if self.every_input:
+            self._write()
 
+    def _write(self) -> None:
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._head)
+                f.write(json.dumps(self.inputs, ensure_ascii=False, separators=(",", ":")))
+                f.write("}")
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: nieobsługiwana wersja punktu kontrolnego {data.get('version')!r}")
+    return data
+
+
+def context_from_checkpoint(data: Dict[str, Any]) -> GameContext:
+    """GameContext odtworzony z punktu kontrolnego (bez historii i autozapisu)."""
+    game_map = load_map(data["map"])
+    state = rules.state_from_dict(game_map.board, data["state"])
+    st = data["settings"]
+    settings = Settings(
+        players=[Player(name=name, seat=i, score=score) for i, (name, score) in enumerate(zip(state.names, st["scores"]))],
+        max_rounds=st["max_rounds"], headless=st["headless"], seed=st["seed"], config=state.config,
+        whatif=st["whatif"], tactical=st["tactical"],
+        phase_order=tuple(st.get("phase_order", DEFAULT_PHASE_ORDER)),
+    )
+    ctx = GameContext(settings=settings, map=game_map)
+    restore(ctx, state)
+    ctx.rng.setstate(_rng_from_json(data["rng"]))
+    if data["journal"] is not None:
+        ctx.journal = GameJournal.from_dict(data["journal"])
+    return ctx
 
 
 # --------------- Phase System --------------- #
@@ -488,8 +830,28 @@ class PhaseResult:
         self.done = done
 
 
+SkipRule = Callable[[rules.GameState], bool]
+
+
 class BasePhase:
+    """
+    Faza rundy. Deklaracje dla RoundEngine:
+      • central — faza prowadzi całą turę sama (jedno handle_input bez gracza, bez pytań per gracz),
+      • skip_when — reguły na stanie kernela, z których dowolna oznacza, że faza nic w tej rundzie
+        nie zrobi; w trybie headless silnik ją wtedy pomija (bez enter/exit), w konsoli gracz widzi
+        jej komunikaty. Te same reguły pomijają fazy w symulacji (sim.Simulation.play_round).
+    Instancje żyją całą partię: przed każdą rundą silnik woła `reset`.
+    """
     name: str = "BasePhase"
+    central: bool = False
+    skip_when: Tuple[SkipRule, ...] = ()
+
+    def reset(self) -> None:
+        pass
+
+    @classmethod
+    def skipped(cls, state: rules.GameState) -> bool:
+        return any(rule(state) for rule in cls.skip_when)
 
     def enter(self, ctx: GameContext) -> None:
         pass
@@ -501,483 +863,102 @@ class BasePhase:
         return PhaseResult(done=True)
 
     def exit(self, ctx: GameContext) -> None:
-        # Po każdej fazie pytamy, czy wyświetlić statystyki
+        # Po każdej fazie pytamy, czy wyświetlić statystyki (w trybie headless nie pytamy)
+        if ctx.settings.headless:
+            return
         ans = (prompt("Wyświetlić statystyki po tej fazie? [T/n]: ") or "").strip().lower()
         yes_tokens = {"", "t", "tak", "y", "yes"}
         if ans in yes_tokens:
-            show_player_stats(ctx)
+            with memspan(ctx, "show_player_stats"):
+                show_player_stats(ctx)
 
-class EventsPhase(BasePhase):
-    name = "EventsPhase"
 
-    def __init__(self) -> None:
-        self._ran = False
-        self.events: Dict[int, Any] = {}
-        # === Rejestr pierwszego wydarzenia ===
-        self.events[1] = self._ev_liberum_veto  
-        self.events[2] = self._ev_elekcja_viritim
-        self.events[3] = self._ev_skarb_pusty          # Skarb pusty
-        self.events[4] = self._ev_reformy_skarbowe     # Reformy skarbowe
-        self.events[5]  = self._ev_potop_szwedzki          # Potop szwedzki
-        self.events[6]  = self._ev_wojna_polnocna          # Wojna północna
-        self.events[7]  = self._ev_powstanie_chmielnickiego# Powstanie Chmielnickiego
-        self.events[8]  = self._ev_kozacy_na_sluzbie       # Kozacy na służbie
-        self.events[9]  = self._ev_wojna_z_moskwa          # Wojna z Moskwą
-        self.events[10] = self._ev_bitwa_pod_wiedniem      # Bitwa pod Wiedniem
-        self.events[11] = self._ev_pokoj_w_oliwie          # Pokój w Oliwie
-        self.events[12] = self._ev_zaciag_pospolity            # Zaciąg pospolity
-        self.events[13] = self._ev_fortyfikacja_pogranicza     # Fortyfikacja pogranicza
-        self.events[14] = self._ev_artyleria_koronna           # Artyleria koronna
-        self.events[15] = self._ev_glod_ekonomia               # Głód (ekonomia)
-        self.events[16] = self._ev_susza                       # Susza
-        self.events[17] = self._ev_urodzaj                     # Urodzaj
-        self.events[18] = self._ev_jarmarki_krolewskie         # Jarmarki królewskie
-        self.events[19] = self._ev_bunt_chlopski             # Bunt chłopski
-        self.events[20] = self._ev_magnackie_roszady         # Magnackie roszady
-        self.events[21] = self._ev_bunt_w_poznaniu           # Bunt w Poznaniu (Wlkp)
-        self.events[22] = self._ev_sejmik_w_srodzie          # Sejmik w Środzie (Wlkp)
-        self.events[23] = self._ev_pozar_w_poznaniu          # Pożar w Poznaniu (Wlkp)
-        self.events[24] = self._ev_szlak_warta_odra          # Szlak handlowy Warta–Odra (Wlkp)
-        self.events[25] = self._ev_cła_morskie               # Cła morskie (ekonomia – Północ)
+# reguły pomijania faz (BasePhase.skip_when) — na stanie kernela, z jego indeksów wojsk i posiadłości
 
+def sejm_canceled(state: rules.GameState) -> bool:
+    return state.flags.sejm_canceled
+
+
+def no_troops(state: rules.GameState) -> bool:
+    return not any(state.presence())
+
+
+def no_contested_province(state: rules.GameState) -> bool:
+    seen = contested = 0
+    for mask in state.presence():
+        contested |= seen & mask
+        seen |= mask
+    return not contested
+
+
+def no_arson_targets(state: rules.GameState) -> bool:
+    return not any(rules.arson_targets(state, seat) for seat in range(state.pcount))
+
+
+def no_attack_reach(state: rules.GameState) -> bool:
+    anywhere = 0
+    for mask in state.presence():
+        anywhere |= mask
+    return not any(anywhere >> src & 1 for key, sources in state.board.attack_from.items() if state.track(key) > 0
+                   for src in sources)
+
+
+def no_raids(state: rules.GameState) -> bool:
+    threshold = state.config.plunder_threshold
+    return not any(state.track(key) >= threshold for key in state.board.plunder)
+
+
+class EventsPhase(BasePhase):
+    name = "EventsPhase"
+    central = True
 
     def enter(self, ctx: GameContext) -> None:
         println("[Wydarzenia] Podaj numer wydarzenia 1–25. Następnie rozpatrzymy jego efekt.")
 
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        # faza sterowana centralnie; brak pytań per gracz
-        return ""
-
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
-        # --- DODANE: jeśli już rozpatrzyliśmy wydarzenie w tej rundzie, nic nie rób ---
-        if self._ran:
-            return PhaseResult(done=True)
-        self._ran = True
-
         # Jedno pytanie na całą rundę:
         while True:
             tok = (prompt("Numer wydarzenia [1–25]: ") or "").strip()
             try:
                 n = int(tok)
-                if 1 <= n <= 25:
+                if 1 <= n <= rules.EVENT_COUNT:
                     break
                 raise ValueError
             except ValueError:
                 println("Nieprawidłowe — wpisz liczbę 1–25.")
 
-        effect = self.events.get(n)
-        if effect is None:
-            println(f"[Wydarzenia] Brak zdefiniowanego efektu dla #{n}. (Na razie nic się nie dzieje.)")
-        else:
-            effect(ctx)
-
+        # efekty wydarzeń są w rules.EVENTS
+        commit(ctx, self._draw(ctx, n))
         return PhaseResult(done=True)
 
     def exit(self, ctx: GameContext) -> None:
         super().exit(ctx)  # pokaż stan po wydarzeniu
 
-    # --- KONKRETNE WYDARZENIA --- #
-
-    @staticmethod
-    def _ev_liberum_veto(ctx: GameContext) -> None:
-        """
-        Liberum veto – Sejm zerwany.
-        Natychmiast. W tej rundzie nie ma Sejmu (pomijacie licytację i efekt uchwały).
-        """
-        ctx.round_status.sejm_canceled = True
-        println("[Wydarzenia] Liberum veto – Sejm zerwany. W tej rundzie pomijacie licytację i ustawę.")
-
-    @staticmethod
-    def _ev_elekcja_viritim(ctx: GameContext) -> None:
-        """
-        Elekcja viritim.
-        W tej rundzie: Zwycięzca sejmu ciągnie 2 różne uchwały i wybiera 1 do zastosowania.
-        """
-        println("[Wydarzenia] Elekcja viritim — w tej rundzie zwycięzca sejmu ciągnie 2 różne uchwały i wybiera 1 do zastosowania.")
-
-    @staticmethod
-    def _ev_skarb_pusty(ctx: GameContext) -> None:
-        """
-        Skarb pusty.
-        Administracja daje 0 zł w tej rundzie.
-        """
-        ctx.round_status.admin_yield = 0
-        println("[Wydarzenia] Skarb pusty — w tej rundzie Administracja daje 0 zł.")
-
-    @staticmethod
-    def _ev_reformy_skarbowe(ctx: GameContext) -> None:
-        """
-        Reformy skarbowe.
-        Administracja daje +3 zł (zamiast 2) w tej rundzie.
-        """
-        ctx.round_status.admin_yield = 3
-        println("[Wydarzenia] Reformy skarbowe — w tej rundzie Administracja daje +3 zł (zamiast 2).")
-
-    @staticmethod
-    def _ev_potop_szwedzki(ctx: GameContext) -> None:
-        """
-        Potop szwedzki.
-        Natychmiast: tor Północ (N/Szwecja) +2.
-        """
-        add_raid(ctx, RaidTrackID.N, +2)
-        println("[Wydarzenia] Potop szwedzki — Szwecja +2.")
-
-    @staticmethod
-    def _ev_wojna_polnocna(ctx: GameContext) -> None:
-        """
-        Wojna północna.
-        N +1 natychmiast. W tej rundzie: dochód z POSIADŁOŚCI w Prusach −1 każda (min. 0).
-        """
-        add_raid(ctx, RaidTrackID.N, +1)
-        ctx.round_status.prusy_estate_income_penalty = 1
-        println("[Wydarzenia] Wojna północna — Szwecja +1; w tej rundzie posiadłości w Prusach płacą o 1 mniej (min. 0).")
-
     @staticmethod
-    def _ev_powstanie_chmielnickiego(ctx: GameContext) -> None:
-        """
-        Powstanie Chmielnickiego.
-        Natychmiast: E +1, S +1.
-        """
-        add_raid(ctx, RaidTrackID.E, +1)
-        add_raid(ctx, RaidTrackID.S, +1)
-        println("[Wydarzenia] Powstanie Chmielnickiego — Moskwa +1, Tatarzy +1.")
-
-    @staticmethod
-    def _ev_kozacy_na_sluzbie(ctx: GameContext) -> None:
-        """
-        Kozacy na służbie.
-        Każdy gracz, który MA armię na Ukrainie, natychmiast dostaje tam +1 jednostkę.
-        """
-        pid = ProvinceID.UKRAINA
-        arr = ctx.troops.per_province.get(pid, [])
-        if not arr:
-            println("[Wydarzenia] (Brak tablicy wojsk — nic nie zrobiono.)")
-            return
-        gains = []
-        for i, units in enumerate(arr):
-            if units > 0:
-                add_units(ctx, pid, i, +1)
-                gains.append(ctx.settings.players[i].name)
-        if gains:
-            println("[Wydarzenia] Kozacy na służbie — +1 jednostka na Ukrainie dla: " + ", ".join(gains) + ".")
-        else:
-            println("[Wydarzenia] Kozacy na służbie — nikt nie ma tam armii (brak efektu).")
-
-    @staticmethod
-    def _ev_wojna_z_moskwa(ctx: GameContext) -> None:
-        """
-        Wojna z Moskwą.
-        E +2 natychmiast. W tej rundzie Wpływ/Posiadłość w Litwie kosztują −1 zł (min. 0).
-        """
-        add_raid(ctx, RaidTrackID.E, +2)
-        ctx.round_status.discount_litwa_wplyw_pos = 1
-        println("[Wydarzenia] Wojna z Moskwą — Moskwa +2; w tej rundzie Wpływ/Posiadłość w Litwie tańsze o 1 zł.")
-
-    @staticmethod
-    def _ev_bitwa_pod_wiedniem(ctx: GameContext) -> None:
-        """
-        Bitwa pod Wiedniem.
-        S −1 natychmiast. W tej rundzie: za ataki na Tatarów dostajesz +1 honor DODATKOWO.
-        """
-        add_raid(ctx, RaidTrackID.S, -1)
-        ctx.round_status.extra_honor_vs_tatars = True
-        println("[Wydarzenia] Bitwa pod Wiedniem — Tatarzy −1; w tej rundzie dodatkowy +1 honor za ataki na Tatarów.")
-
-    @staticmethod
-    def _ev_pokoj_w_oliwie(ctx: GameContext) -> None:
-        """
-        Pokój w Oliwie.
-        N −1 natychmiast.
-        """
-        add_raid(ctx, RaidTrackID.N, -1)
-        println("[Wydarzenia] Pokój w Oliwie — Szwecja −1.")
-
-    @staticmethod
-    def _ev_zaciag_pospolity(ctx: GameContext) -> None:
-        """
-        Zaciąg pospolity.
-        W tej rundzie Rekrutacja kosztuje 1 zł (zamiast 2).
-        """
-        ctx.round_status.recruit_cost_override = 1
-        println("[Wydarzenia] Zaciąg pospolity — w tej rundzie Rekrutacja kosztuje 1 zł.")
-
-    @staticmethod
-    def _ev_fortyfikacja_pogranicza(ctx: GameContext) -> None:
-        """
-        Fortyfikacja pogranicza.
-        Losowa prowincja przygraniczna dostaje fort.
-        Przygraniczne: Prusy, Litwa, Ukraina, Małopolska.
-        """
-        border = [ProvinceID.PRUSY, ProvinceID.LITWA, ProvinceID.UKRAINA, ProvinceID.MALOPOLSKA]
-        no_fort = [pid for pid in border if not ctx.provinces[pid].has_fort]
-        pool = no_fort if no_fort else border  # jeśli wszędzie są forty, wybieramy mimo to
-        pid = ctx.rng.choice(pool) if pool else None
-        if pid is None:
-            println("[Wydarzenia] Fortyfikacja pogranicza — brak dostępnych prowincji.")
-            return
-        toggle_fort(ctx, pid, True)
-        println(f"[Wydarzenia] Fortyfikacja pogranicza — fort w {pid.value}.")
-
-    @staticmethod
-    def _ev_artyleria_koronna(ctx: GameContext) -> None:
-        """
-        Artyleria koronna.
-        W tej rundzie: w PIERWSZEJ bitwie, w której uczestniczysz jako obrońca,
-        rzucasz +1 kością.
-        """
-        ctx.round_status.artillery_defense_active = True
-        # bezpieczeństwo: dopasuj listę do liczby graczy
-        ctx.round_status.artillery_defense_used = [False] * len(ctx.settings.players)
-        println("[Wydarzenia] Artyleria koronna — w tej rundzie pierwszy raz w obronie: +1 kość do rzutów.")
-
-    @staticmethod
-    def _ev_glod_ekonomia(ctx: GameContext) -> None:
-        """
-        Głód (ekonomia).
-        Natychmiast: w każdej prowincji o zamożności 3 obniż ją do 2.
-        """
-        changed = []
-        for pid, prov in ctx.provinces.items():
-            if prov.wealth >= 3:
-                prov.wealth = 2
-                changed.append(pid.value)
-        if changed:
-            println("[Wydarzenia] Głód — zamożność 3 → 2 w: " + ", ".join(changed) + ".")
-        else:
-            println("[Wydarzenia] Głód — brak prowincji o zamożności 3.")
-
-    @staticmethod
-    def _ev_susza(ctx: GameContext) -> None:
-        """
-        Susza.
-        W tej rundzie akcja Zamożność +1 kosztuje 3 zł (zamiast 2).
-        """
-        ctx.round_status.zamoznosc_cost_override = 3
-        println("[Wydarzenia] Susza — w tej rundzie Zamożność kosztuje 3 zł.")
-
-    @staticmethod
-    def _ev_urodzaj(ctx: GameContext) -> None:
-        """
-        Urodzaj.
-        W tej rundzie akcja Zamożność +1 kosztuje 1 zł (zamiast 2).
-        """
-        ctx.round_status.zamoznosc_cost_override = 1
-        println("[Wydarzenia] Urodzaj — w tej rundzie Zamożność kosztuje 1 zł.")
-
-    @staticmethod
-    def _ev_jarmarki_krolewskie(ctx: GameContext) -> None:
-        """
-        Jarmarki królewskie.
-        Na początku Dochodu każdy gracz dostaje +1 zł.
-        """
-        ctx.round_status.fairs_plus_one_income = True
-        println("[Wydarzenia] Jarmarki królewskie — na początku Dochodu każdy otrzyma +1 zł.")
-
-    @staticmethod
-    def _ev_bunt_chlopski(ctx: GameContext) -> None:
-        """
-        Bunt chłopski.
-        Każda prowincja o zamożności 0–1:
-          • jej JEDNOZNACZNY kontrolujący płaci 2 zł, aby uspokoić bunt,
-          • jeśli nie może zapłacić (ma <2 zł): traci 1 wpływ (szlachcica) w tej prowincji.
-        """
-        affected = []
-        for pid, prov in ctx.provinces.items():
-            if prov.wealth <= 1:
-                ctrl = single_controller_of(ctx, pid)
-                if ctrl is None:
-                    continue
-                player = ctx.settings.players[ctrl]
-                if player.gold >= 2:
-                    player.gold -= 2
-                    affected.append(f"{pid.value}: {player.name} zapłacił 2 zł")
-                else:
-                    # usuwamy 1 wpływ (szlachcica), min 0
-                    add_nobles(ctx, pid, ctrl, -1)
-                    affected.append(f"{pid.value}: {player.name} nie stać — −1 wpływ")
-        if affected:
-            println("[Wydarzenia] Bunt chłopski — " + "; ".join(affected) + ".")
-        else:
-            println("[Wydarzenia] Bunt chłopski — brak efektów.")
-
-    @staticmethod
-    def _ev_magnackie_roszady(ctx: GameContext) -> None:
-        """
-        Magnackie roszady.
-        Z jednej losowej prowincji usuwamy 1 wpływ (szlachcica) losowego gracza,
-        ale NIE zwycięzcy licytacji (jeśli w tej rundzie ktoś ma większość).
-        """
-        # zbuduj listę (pid, [gracze_z_noblem_do_losowania])
-        majority_idx = None
-        for i, p in enumerate(ctx.settings.players):
-            if p.majority:
-                majority_idx = i
-                break
-
-        candidates: List[tuple[ProvinceID, List[int]]] = []
-        for pid in ProvinceID:
-            nobles = ctx.nobles.per_province.get(pid, [])
-            present = [i for i, n in enumerate(nobles) if n > 0]
-            if majority_idx is not None:
-                present = [i for i in present if i != majority_idx]
-            if present:
-                candidates.append((pid, present))
-
-        if not candidates:
-            println("[Wydarzenia] Magnackie roszady — brak kandydatów (nikt, kogo można ruszyć).")
-            return
-
-        pid, present = ctx.rng.choice(candidates)
-        victim = ctx.rng.choice(present)
-        add_nobles(ctx, pid, victim, -1)
-        println(f"[Wydarzenia] Magnackie roszady — w {pid.value} usunięto 1 wpływ gracza {ctx.settings.players[victim].name}.")
-
-    @staticmethod
-    def _ev_bunt_w_poznaniu(ctx: GameContext) -> None:
-        """
-        Bunt w Poznaniu (Wlkp).
-        Kontrolujący Wielkopolskę płaci 2 zł; jeśli nie może, traci 1 posiadłość (ostatnią) w Wlkp.
-        """
-        pid = ProvinceID.WIELKOPOLSKA
-        ctrl = single_controller_of(ctx, pid)
-        if ctrl is None:
-            println("[Wydarzenia] Bunt w Poznaniu — nikt nie kontroluje Wlkp (brak efektu).")
-            return
-        player = ctx.settings.players[ctrl]
-        if player.gold >= 2:
-            player.gold -= 2
-            println(f"[Wydarzenia] Bunt w Poznaniu — {player.name} zapłacił 2 zł.")
-        else:
-            removed = remove_last_estate(ctx, pid, ctrl)
-            if removed:
-                println(f"[Wydarzenia] Bunt w Poznaniu — {player.name} nie stać, usunięto 1 posiadłość w Wlkp.")
-            else:
-                println(f"[Wydarzenia] Bunt w Poznaniu — {player.name} nie stać, ale nie miał posiadłości w Wlkp.")
-
-    @staticmethod
-    def _ev_sejmik_w_srodzie(ctx: GameContext) -> None:
-        """
-        Sejmik w Środzie (Wlkp).
-        W tej rundzie remisy w licytacji sejmowej wygrywa gracz kontrolujący Wlkp.
-        Jeśli nikt nie kontroluje — pozostaje standard (remis=brak większości).
-        """
-        ctx.round_status.sejm_tiebreak_wlkp = True
-        println("[Wydarzenia] Sejmik w Środzie — remisy w licytacji rozstrzyga kontrolujący Wlkp (w tej rundzie).")
-
-    @staticmethod
-    def _ev_pozar_w_poznaniu(ctx: GameContext) -> None:
-        """
-        Pożar w Poznaniu (Wlkp).
-        Zamożność Wlkp −1. Kontrolujący Wlkp płaci 2 zł; jeśli nie może — traci 1 posiadłość (ostatnią).
-        """
-        pid = ProvinceID.WIELKOPOLSKA
-        # zamożność -1 (min 0)
-        add_province_wealth(ctx, pid, -1)
-        ctrl = single_controller_of(ctx, pid)
-        if ctrl is None:
-            println("[Wydarzenia] Pożar w Poznaniu — zamożność Wlkp −1; brak kontrolującego (brak dalszych efektów).")
-            return
-        player = ctx.settings.players[ctrl]
-        if player.gold >= 2:
-            player.gold -= 2
-            println(f"[Wydarzenia] Pożar w Poznaniu — zamożność −1; {player.name} zapłacił 2 zł.")
-        else:
-            removed = remove_last_estate(ctx, pid, ctrl)
-            if removed:
-                println(f"[Wydarzenia] Pożar w Poznaniu — zamożność −1; {player.name} nie stać — usunięto 1 posiadłość.")
-            else:
-                println(f"[Wydarzenia] Pożar w Poznaniu — zamożność −1; {player.name} nie stać i nie ma posiadłości do usunięcia.")
-
-    @staticmethod
-    def _ev_szlak_warta_odra(ctx: GameContext) -> None:
-        """
-        Szlak handlowy Warta–Odra (Wlkp).
-        W tej rundzie: Wpływ w Wlkp kosztuje 1 zł, ale Posiadłość w Wlkp kosztuje 3 zł.
-        """
-        ctx.round_status.wlkp_influence_cost_override = 1
-        ctx.round_status.wlkp_estate_cost_override = 3
-        println("[Wydarzenia] Szlak Warta–Odra — w tej rundzie Wplyw(Wlkp)=1 zł, Posiadlosc(Wlkp)=3 zł.")
-
-    @staticmethod
-    def _ev_cła_morskie(ctx: GameContext) -> None:
-        """
-        Cła morskie (ekonomia – Północ).
-        Natychmiast: gracz kontrolujący Prusy otrzymuje +2 zł (jeśli nikt — nikt).
-        """
-        pid = ProvinceID.PRUSY
-        ctrl = single_controller_of(ctx, pid)
-        if ctrl is not None:
-            ctx.settings.players[ctrl].gold += 2
-            println(f"[Wydarzenia] Cła morskie — {ctx.settings.players[ctrl].name} (kontroluje Prusy) otrzymuje +2 zł.")
-        else:
-            println("[Wydarzenia] Cła morskie — nikt nie kontroluje Prus (brak efektu).")
+    def _draw(ctx: GameContext, n: int) -> rules.Event:
+        """Losowania wydarzeń robimy tu z ctx.rng; kernel dostaje gotowy wynik."""
+        if n == 13:  # Fortyfikacja pogranicza
+            pool = rules.fortification_pool(snapshot(ctx))
+            return rules.Event(n, province=ctx.rng.choice(pool) if pool else None)
+        if n == 20:  # Magnackie roszady
+            candidates = rules.roszady_candidates(snapshot(ctx))
+            if candidates:
+                prov, present = ctx.rng.choice(candidates)
+                return rules.Event(n, province=prov, victim=ctx.rng.choice(present))
+        return rules.Event(n)
 
 
 # --- Phases: #
 class IncomePhase(BasePhase):
     name = "IncomePhase"
-
-    def __init__(self) -> None:
-        self._ran = False
+    central = True
 
     def enter(self, ctx: GameContext) -> None:
         println("[Dochód] Pobieranie dochodów: +1 zł za kontrolę prowincji; posiadłości wg zamożności (0–1:0, 2:1, 3:2).")
         println("Uwaga: Wielkopolska daje dochód tylko graczom mającym w niej kontrolę (zarówno +1, jak i z posiadłości).")
 
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        return ""  # sterowanie centralne
-
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
-        if self._ran:
-            return PhaseResult(done=True)
-        self._ran = True
-
-        players = ctx.settings.players
-        pcount = len(players)
-        gained_control = [0]*pcount
-        gained_estates = [0]*pcount
-
-        if ctx.round_status.fairs_plus_one_income:
-            for p in ctx.settings.players:
-                p.gold += 1
-            println("[Dochód] Jarmarki królewskie: każdy gracz +1 zł na start.")
-
-        for pid, prov in ctx.provinces.items():
-            controllers = influence_winners_in_province(ctx, pid)
-            single_controller = controllers[0] if len(controllers) == 1 else None
-
-            # (A) +1 za kontrolę — TYLKO jeśli kontrola jest jednoznaczna (brak remisu)
-            if single_controller is not None:
-                players[single_controller].gold += 1
-                gained_control[single_controller] += 1
-
-            # (B) dochód z posiadłości
-            per_estate = estate_income_by_wealth(prov.wealth)
-            # Wojna północna: w tej rundzie posiadłości w Prusach płacą o 1 mniej (min. 0)
-            if pid == ProvinceID.PRUSY and ctx.round_status.prusy_estate_income_penalty > 0:
-                per_estate = max(0, per_estate - ctx.round_status.prusy_estate_income_penalty)
-
-            if per_estate > 0:
-                if pid == ProvinceID.WIELKOPOLSKA:
-                    # Wielkopolska płaci tylko, gdy jest JEDEN kontrolujący.
-                    if single_controller is not None:
-                        # tylko posiadłości należące do kontrolującego przynoszą dochód
-                        for owner in prov.estates:
-                            if owner == single_controller:
-                                players[owner].gold += per_estate
-                                gained_estates[owner] += per_estate
-                    # przy remisie: nic (również z posiadłości)
-                else:
-                    # inne prowincje płacą posiadłościom niezależnie od wyniku kontroli/remisu
-                    for owner in prov.estates:
-                        if 0 <= owner < pcount:
-                            players[owner].gold += per_estate
-                            gained_estates[owner] += per_estate
-
-        # Podsumowanie logu
-        for i, p in enumerate(players):
-            println(f"[Dochód] {p.name}: +{gained_control[i]} (kontrola) +{gained_estates[i]} (posiadłości) = +{gained_control[i]+gained_estates[i]} zł. (razem złoto: {p.gold})")
-
+        commit(ctx, rules.Income())
         return PhaseResult(done=True)
 
     def exit(self, ctx: GameContext) -> None:
@@ -986,15 +967,14 @@ class IncomePhase(BasePhase):
 
 class AuctionPhase(BasePhase):
     name = "AuctionPhase"
+    skip_when = (sejm_canceled,)
 
     def enter(self, ctx: GameContext) -> None:
         if ctx.round_status.sejm_canceled:
             println("[Auction] Sejm zerwany w wydarzeniach — pomijamy licytację w tej rundzie.")
             return
         # reset większości i ostatnich ofert na początku rundy
-        for p in ctx.settings.players:
-            p.majority = False
-            p.last_bid = 0
+        commit(ctx, rules.OpenAuction())
         println("[Auction] Każdy gracz wpisuje ofertę w złocie. Najwyższa oferta wygrywa większość.")
 
     def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
@@ -1008,64 +988,23 @@ class AuctionPhase(BasePhase):
         if ctx.round_status.sejm_canceled or not player:
             return PhaseResult(done=True)
         raw = (raw or "").strip()
-        # walidacja — pytamy dopóki nieprawidłowe
+        # walidacja w kernelu — pytamy dopóki nieprawidłowe
         while True:
             try:
-                bid = int(raw)
-                if bid < 0 or bid > player.gold:
-                    raise ValueError
-                break
-            except ValueError:
+                commit(ctx, rules.Bid(player.seat, int(raw)))
+                return PhaseResult(done=True)
+            except ValueError:  # także rules.IllegalMove
                 raw = prompt(f"Nieprawidłowe. {player.name}, wpisz 0..{player.gold}: ")
-                continue
-        player.last_bid = bid
-        return PhaseResult(message=f"{player.name} licytuje {bid} złota.", done=True)
 
     def exit(self, ctx: GameContext) -> None:
-        if ctx.round_status.sejm_canceled:
-            super().exit(ctx)  # tylko podsumowanie stanu
-            return
-        # wyłonienie zwycięzcy
-        bids = [(p.last_bid, idx) for idx, p in enumerate(ctx.settings.players)]
-        if not bids:
-            return
-        bids.sort(reverse=True)  # najwyższa oferta pierwsza
-        top_bid, top_idx = bids[0]
-        # sprawdź remis
-        tie = len(bids) > 1 and bids[1][0] == top_bid
-        if top_bid == 0:
-            for p in ctx.settings.players:
-                p.majority = False
-            println("[Auction] Brak ofert > 0 — nikt nie ma większości.")
-        elif tie:
-            # Sejmik w Środzie: remisy rozstrzyga kontrolujący Wlkp (jeśli ktoś kontroluje i jest wśród remisujących)
-            if ctx.round_status.sejm_tiebreak_wlkp:
-                ctrl = single_controller_of(ctx, ProvinceID.WIELKOPOLSKA)
-                if ctrl is not None:
-                    tied_idxs = [idx for bid, idx in bids if bid == top_bid]
-                    if ctrl in tied_idxs:
-                        winner = ctx.settings.players[ctrl]
-                        winner.gold -= top_bid
-                        for p in ctx.settings.players:
-                            p.majority = (p is winner)
-                        println(f"[Auction] Remis — tie-break Wlkp: większość zdobywa {winner.name} (zapłacił {top_bid}).")
-                        super().exit(ctx); return
-            # standard: nikt nie ma większości
-            for p in ctx.settings.players:
-                p.majority = False
-            println("[Auction] Remis — nikt nie ma większości.")
-        else:
-            # zwycięzca płaci i ma większość
-            winner = ctx.settings.players[top_idx]
-            winner.gold -= top_bid
-            for p in ctx.settings.players:
-                p.majority = (p is winner)
-            println(f"[Auction] Większość: {winner.name} (zapłacił {top_bid}).")
+        if not ctx.round_status.sejm_canceled and ctx.settings.players:
+            commit(ctx, rules.CloseAuction())  # wyłonienie zwycięzcy (remisy, Sejmik w Środzie)
         super().exit(ctx)
 
 
 class SejmPhase(BasePhase):
     name = "SejmPhase"
+    skip_when = (sejm_canceled,)
 
     def enter(self, ctx: GameContext) -> None:
         if ctx.round_status.sejm_canceled:
@@ -1077,6 +1016,13 @@ class SejmPhase(BasePhase):
         println("3–4 Pospolite ruszenie: A) każdy stawia 1 wojsko w kontrolowanej prowincji  |  B) −2 na wybranym torze (N/E/S)")
         println("5 Fortyfikacje (A i B): połóż fort w kontrolowanej przez siebie prowincji")
         println("6 Pokój: A) wszystkie tory N/E/S −1  |  B) jeden wybrany tor −2")
+        majority = self._majority_player(ctx)
+        if ctx.settings.whatif > 0 and majority is not None:
+            import whatif  # sim.py importuje main.py, więc dopiero tutaj
+            rows = whatif.evaluate(snapshot(ctx), majority.seat, ctx.settings.whatif,
+                                   jobs=os.cpu_count() or 1, seed=ctx.settings.seed or 0)
+            println(f"[Sejm] Podgląd ustaw dla {majority.name} (dogrywki botów, {ctx.settings.whatif:g} s):")
+            println(whatif.format_table(rows))
 
     def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
         if ctx.round_status.sejm_canceled:
@@ -1091,13 +1037,9 @@ class SejmPhase(BasePhase):
         raw = (raw or "").strip()
         while True:
             try:
-                val = int(raw)
-                if 1 <= val <= 6:
-                    ctx.round_status.last_law = val
-                    ctx.round_status.last_law_choice = None
-                    return PhaseResult(message=f"[Sejm] {player.name} wybrał ustawę nr {val}.", done=True)
-                raise ValueError
-            except ValueError:
+                commit(ctx, rules.Law(player.seat, int(raw)))
+                return PhaseResult(done=True)
+            except ValueError:  # także rules.IllegalMove
                 raw = prompt("Nieprawidłowe. Wpisz liczbę 1..6: ")
 
     def exit(self, ctx: GameContext) -> None:
@@ -1110,80 +1052,41 @@ class SejmPhase(BasePhase):
             super().exit(ctx)
             return
 
-        majority = self._majority_player(ctx)
-        if not majority:
+        if not self._majority_player(ctx):
             println("[Sejm] Nikt nie ma większości — ustawa nie wchodzi w życie.")
             super().exit(ctx)
             return
 
-        # wygodny indeks gracza z większością
-        maj_idx = ctx.settings.players.index(majority)
-
-        # ====== USTAWY 1..6 ======
+        # ====== USTAWY 1..6: tu tylko zbieramy wybory, efekty liczy rules.Variant ======
+        players = ctx.settings.players
         if law in (1, 2):  # Podatek
             println("[Sejm] Podatek.")
-            choice = self._prompt_choice_ab()
-            ctx.round_status.last_law_choice = choice
-
-            if choice == "A":
-                for p in ctx.settings.players:
-                    p.gold += 2
-                println("Każdy otrzymuje +2 zł.")
-            else:  # B
-                for p in ctx.settings.players:
-                    p.gold += 1
-                majority.gold += 3  # 1 już dostał z pętli powyżej => 1+3 = 4
-                println(f"{majority.name} (zwycięzca licytacji) otrzymuje łącznie +4 zł, pozostali +1 zł.")
+            commit(ctx, rules.Variant(self._prompt_choice_ab()))
 
         elif law in (3, 4):  # Pospolite ruszenie
             println("[Sejm] Pospolite ruszenie.")
             choice = self._prompt_choice_ab()
-            ctx.round_status.last_law_choice = choice
-
             if choice == "A":
                 # Każdy gracz, który kontroluje jakąś prowincję, kładzie 1 wojsko w JEDNEJ kontrolowanej prowincji
-                for i, p in enumerate(ctx.settings.players):
-                    choices = self._controlled_provinces(ctx, i)
-                    if not choices:
-                        continue
-                    labels = [pid.value for pid in choices]
-                    pick = self._prompt_pick_from(labels, f"{p.name}: wybierz prowincję kontrolowaną do postawienia 1 jednostki")
-                    if pick is not None:
-                        add_units(ctx, choices[pick], i, 1)
-                        println(f"  {p.name}: +1 jednostka w {choices[pick].value}")
+                picks = [self._pick_controlled(ctx, i, f"{p.name}: wybierz prowincję kontrolowaną do postawienia 1 jednostki")
+                         for i, p in enumerate(players)]
+                commit(ctx, rules.Variant("A", picks=tuple(picks)))
             else:  # B: −2 na jednym wybranym torze
-                rid = self._prompt_track()
-                if rid:
-                    add_raid(ctx, rid, -2)
-                    println(f"Tor {rid.value} −2.")
+                commit(ctx, rules.Variant("B", track=self._prompt_track().name))
 
         elif law == 5:  # Fortyfikacje (A i B to samo)
             println("[Sejm] Fortyfikacje: połóż fort w kontrolowanej prowincji.")
-            for i, p in enumerate(ctx.settings.players):
-                choices = [pid for pid in self._controlled_provinces(ctx, i) if not ctx.provinces[pid].has_fort]
-                if not choices:
-                    continue
-                labels = [pid.value for pid in choices]
-                pick = self._prompt_pick_from(labels, f"{p.name}: wybierz prowincję do położenia fortu")
-                if pick is not None:
-                    toggle_fort(ctx, choices[pick], True)
-                    println(f"  {p.name}: fort w {choices[pick].value}")
+            picks = [self._pick_controlled(ctx, i, f"{p.name}: wybierz prowincję do położenia fortu", no_fort=True)
+                     for i, p in enumerate(players)]
+            commit(ctx, rules.Variant(picks=tuple(picks)))
 
         elif law == 6:  # Pokój
             println("[Sejm] Pokój.")
             choice = self._prompt_choice_ab()
-            ctx.round_status.last_law_choice = choice
-
             if choice == "A":
-                # Wszystkie tory −1
-                for rid in (RaidTrackID.N, RaidTrackID.E, RaidTrackID.S):
-                    add_raid(ctx, rid, -1)
-                println("Wszystkie tory N/E/S −1.")
+                commit(ctx, rules.Variant("A"))
             else:  # B: jeden wybrany tor −2
-                rid = self._prompt_track()
-                if rid:
-                    add_raid(ctx, rid, -2)
-                    println(f"Tor {rid.value} −2.")
+                commit(ctx, rules.Variant("B", track=self._prompt_track().name))
 
         super().exit(ctx)
 
@@ -1197,12 +1100,15 @@ class SejmPhase(BasePhase):
 
     @staticmethod
     def _controlled_provinces(ctx: GameContext, pidx: int) -> List[ProvinceID]:
-        out: List[ProvinceID] = []
-        for pid in ProvinceID:
-            winners = influence_winners_in_province(ctx, pid)
-            if len(winners) == 1 and winners[0] == pidx:
-                out.append(pid)
-        return out
+        return [ctx.map.provinces[k] for k in rules.controlled(snapshot(ctx), pidx)]
+
+    def _pick_controlled(self, ctx: GameContext, pidx: int, title: str, no_fort: bool = False) -> Optional[int]:
+        """Numer (w mapie) prowincji wybranej przez gracza spośród kontrolowanych; None, gdy nie ma wyboru."""
+        choices = self._controlled_provinces(ctx, pidx)
+        if no_fort:
+            choices = [pid for pid in choices if not ctx.provinces[pid].has_fort]
+        pick = self._prompt_pick_from([pid.value for pid in choices], title)
+        return None if pick is None else ctx.map.index[choices[pick]]
 
     @staticmethod
     def _prompt_choice_ab() -> str:
@@ -1230,7 +1136,7 @@ class SejmPhase(BasePhase):
             println("Nieprawidłowe — podaj numer z listy.")
 
     @staticmethod
-    def _prompt_track() -> Optional[RaidTrackID]:
+    def _prompt_track() -> RaidTrackID:
         mapping = {"n": RaidTrackID.N, "e": RaidTrackID.E, "s": RaidTrackID.S}
         println("Wybierz tor: N (Szwecja), E (Moskwa), S (Tatarzy)")
         while True:
@@ -1241,94 +1147,9 @@ class SejmPhase(BasePhase):
 
 class ActionPhase(BasePhase):
     name = "ActionPhase"
+    central = True
 
-    COST_PAID = {
-        "wplyw": 2,
-        "posiadlosc": 2,
-        "rekrutacja": 2,
-        "marsz": 0,
-        "zamoznosc": 2,
-        "administracja": 0,
-    }
-
-    def __init__(self) -> None:
-        self._ran = False
-        # <<< MAPA INICJAŁÓW PROWINCJI >>>
-        self._prov_short = {
-            "p": ProvinceID.PRUSY,
-            "l": ProvinceID.LITWA,
-            "u": ProvinceID.UKRAINA,
-            "w": ProvinceID.WIELKOPOLSKA,
-            "m": ProvinceID.MALOPOLSKA,
-        }
-
-    # ====== NOWE HELPERY DLA SKRÓTÓW ======
-    @staticmethod
-    def _norm(s: str) -> str:
-        import unicodedata
-        s = (s or "").strip()
-        s = unicodedata.normalize("NFKD", s)
-        s = "".join(ch for ch in s if not unicodedata.combining(ch))
-        return s.lower().strip()
-
-    def _match_action(self, token: str) -> str:
-        """Zwraca canonical action id po skrócie/prefiksie."""
-        t = self._norm(token)
-        if not t:
-            return ""
-        # jednoznaczne skróty literowe
-        letter_map = {
-            "w": "wplyw",
-            "p": "posiadlosc",
-            "r": "rekrutacja",
-            "m": "marsz",
-            "z": "zamoznosc",
-            "a": "administracja",
-        }
-        if t in letter_map:
-            return letter_map[t]
-
-        # pełne/prefiksy nazw
-        candidates = {
-            "wplyw": ["wplyw", "wpl", "wp", "w"],
-            "posiadlosc": ["posiadlosc", "posiadłość", "posiad", "pos", "p"],
-            "rekrutacja": ["rekrutacja", "rekr", "rek", "r"],
-            "marsz": ["marsz", "mar", "m"],
-            "zamoznosc": ["zamoznosc", "zamożność", "zamoz", "z"],
-            "administracja": ["administracja", "admin", "adm", "a"],
-        }
-        for act, keys in candidates.items():
-            if any(self._norm(k).startswith(t) or t.startswith(self._norm(k)) for k in keys):
-                return act
-        return ""
-
-    def _parse_province(self, text: str) -> Optional[ProvinceID]:
-        """Akceptuje: pełną nazwę, prefiks lub pojedynczą literę (np. 'P' -> Prusy)."""
-        t = self._norm(text)
-        if not t:
-            return None
-
-        # 1) jednoznaczny skrót literowy (P/L/U/W/M)
-        if len(t) == 1 and t in self._prov_short:
-            return self._prov_short[t]
-
-        # 2) pełna nazwa lub prefiks (np. 'Lit', 'Prus', 'Malop')
-        for pid in ProvinceID:
-            name_n = self._norm(pid.value)
-            if t == name_n or name_n.startswith(t) or t.startswith(name_n):
-                return pid
-
-        # 3) awaryjnie: dopasuj po inicjale, gdyby nie było w mapie
-        if len(t) == 1:
-            for pid in ProvinceID:
-                if self._norm(pid.value)[0] == t:
-                    return pid
-
-        return None
-
-    # ====== RESZTA KLASY BEZ ZMIAN... (pokazuję tylko fragmenty, które trzeba podmienić) ======
-
-    def _prompt_action(self, player: Player) -> tuple[str, str]:
+    def _prompt_action(self, ctx: GameContext, player: Player) -> tuple[str, str]:
         """Zwraca (action, args_str). Obsługuje skróty typu 'w L' lub 'm L->P'."""
         println(f"[Akcje] Tura gracza {player.name} (złoto={player.gold}).")
         raw = (prompt("Podaj akcję: ").strip() or "")
@@ -1341,7 +1162,7 @@ class ActionPhase(BasePhase):
         action_token = parts[0]
         args = parts[1] if len(parts) > 1 else ""
 
-        action = self._match_action(action_token)
+        action = ctx.parser.action(action_token)
         if not action:
             return "", ""
 
@@ -1354,31 +1175,24 @@ class ActionPhase(BasePhase):
             else:
                 args = ""
 
-        # Normalizacja skrótu marszu: L->P itd. rozwiążemy później w _one_action_turn
+        # Normalizacja skrótu marszu: L->P itd. rozwiążemy później w _decision
         return action, args
 
     def enter(self, ctx: GameContext) -> None:
         println("[Akcje] Dwie kolejki akcji. Kolejność: od marszałka, po 1 akcji na kolejkę.")
-        println("Dostępne: Wplyw(2), Posiadlosc(2), Rekrutacja(2), Marsz(0), Zamoznosc(2), Administracja(0)")
+        cfg = ctx.settings.config  # koszty z konfiguracji zasad; kawaleria droższa (jak w game.js)
+        println(f"Dostępne: Wplyw({cfg.cost_wplyw}), Posiadlosc({cfg.cost_posiadlosc}), "
+                f"Rekrutacja(piechota {cfg.recruit_p} / kawaleria {cfg.recruit_k}), Marsz({cfg.cost_marsz}), "
+                f"Zamoznosc({cfg.cost_zamoznosc}), Administracja({cfg.cost_administracja})")
         println("Przykłady:")
         println("  wplyw Litwa")
         println("  posiadlosc Prusy")
-        println("  rekrutacja Ukraina")
-        println("  marsz Litwa->Prusy")
+        println("  rekrutacja Ukraina        (piechota; 'rekrutacja Ukraina k' = kawaleria)")
+        println("  marsz Litwa->Prusy        (najpierw piechota; 'marsz L->P k' = kawaleria)")
         println("  zamoznosc Malopolska")
         println("  administracja")
 
-    # RoundEngine i tak woła ask/handle per gracz, ale my sterujemy całą fazą wewnętrznie,
-    # więc ask nic nie pyta (unikamy podwójnych promptów).
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        return ""
-
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
-        # Uruchom pełną fazę tylko przy pierwszym wywołaniu
-        if self._ran:
-            return PhaseResult(done=True)
-        self._ran = True
-
         players = ctx.settings.players
         m = ctx.round_status.marshal_index
         order = players[m:] + players[:m]
@@ -1393,165 +1207,85 @@ class ActionPhase(BasePhase):
 
     # ---------- Helpers ----------
 
-    def _player_index(self, ctx: GameContext, player: Player) -> int:
-        return ctx.settings.players.index(player)
-
-    def _has_noble(self, ctx: GameContext, pid: ProvinceID, pidx: int) -> bool:
-        return ctx.nobles.per_province[pid][pidx] > 0
+    @staticmethod
+    def _slot(ctx: GameContext, pid: Optional[ProvinceID]) -> Optional[int]:
+        return None if pid is None else ctx.map.index[pid]
+
+    def _decision(self, ctx: GameContext, player: Player, action: str, args: str) -> rules.Action:
+        """Tłumaczy tekst polecenia na decyzję kernela (bez sprawdzania zasad)."""
+        if action == "administracja":
+            return rules.Action(player.seat, action)
+        if action == "marsz":
+            if "->" not in args:
+                raise rules.IllegalMove("Podaj format: Źródło->Cel (np. Litwa->Prusy).")
+            src_txt, dst_txt = [s.strip() for s in args.split("->", 1)]
+            dst_txt, utype = ctx.parser.split_unit_type(dst_txt)
+            return rules.Action(player.seat, action,
+                                province=self._slot(ctx, ctx.parser.province(src_txt)),
+                                target=self._slot(ctx, ctx.parser.province(dst_txt)),
+                                unit=utype.name if utype else None)
+        if action == "rekrutacja":
+            prov_txt, utype = ctx.parser.split_unit_type(args)
+            return rules.Action(player.seat, action, province=self._slot(ctx, ctx.parser.province(prov_txt)),
+                                unit=(utype or UnitType.P).name)
+        return rules.Action(player.seat, action, province=self._slot(ctx, ctx.parser.province(args)))
 
     def _one_action_turn(self, ctx: GameContext, player: Player) -> None:
         # pętla do skutku: jedna poprawnie wykonana akcja
         while True:
-            action, args = self._prompt_action(player)
+            action, args = self._prompt_action(ctx, player)
             if not action:
                 println("Nieznana akcja. Spróbuj ponownie.")
                 continue
-
-            cost = self.COST_PAID[action]
-            if player.gold < cost:
-                println(f"Za mało złota. Akcja '{action}' kosztuje {cost}, masz {player.gold}.")
+            try:
+                commit(ctx, self._decision(ctx, player, action, args))
+            except rules.IllegalMove as e:
+                println(str(e))
                 continue
+            # po jednej poprawnej akcji kończymy turę tego gracza
+            break
 
-            pidx = self._player_index(ctx, player)
-            ok = False
-            msg = ""
-
-            if action == "administracja":
-                gain = ctx.round_status.admin_yield
-                player.gold += gain
-                ok = True
-                msg = f"{player.name} otrzymuje +{gain} zł (teraz {player.gold})."
-
-            elif action == "wplyw":
-                pid = self._parse_province(args)
-                if not pid:
-                    println("Nie rozpoznano prowincji.")
-                    continue
-                cost = self.COST_PAID[action]
-                actual_cost = cost
-                if pid == ProvinceID.WIELKOPOLSKA and ctx.round_status.wlkp_influence_cost_override is not None:
-                    actual_cost = ctx.round_status.wlkp_influence_cost_override
-                if pid == ProvinceID.LITWA and ctx.round_status.discount_litwa_wplyw_pos > 0:
-                    actual_cost = max(0, cost - ctx.round_status.discount_litwa_wplyw_pos)
-                if player.gold < actual_cost:
-                    println(f"Za mało złota. Akcja 'wplyw' kosztuje {actual_cost}, masz {player.gold}.")
-                    continue
-                add_nobles(ctx, pid, pidx, 1)
-                player.gold -= actual_cost
-                ok = True
-                msg = f"{player.name} stawia szlachcica w {pid.value}. (złoto {player.gold}, koszt {actual_cost})"
-
-            elif action == "posiadlosc":
-                pid = self._parse_province(args)
-                if not pid:
-                    println("Nie rozpoznano prowincji.")
-                    continue
-                if not self._has_noble(ctx, pid, pidx):
-                    println("Musisz mieć szlachcica na tej prowincji.")
-                    continue
-                cost = self.COST_PAID[action]
-                actual_cost = cost
-                if pid == ProvinceID.WIELKOPOLSKA and ctx.round_status.wlkp_estate_cost_override is not None:
-                    actual_cost = ctx.round_status.wlkp_estate_cost_override
-
-                if pid == ProvinceID.LITWA and ctx.round_status.discount_litwa_wplyw_pos > 0:
-                    actual_cost = max(0, cost - ctx.round_status.discount_litwa_wplyw_pos)
-                if player.gold < actual_cost:
-                    println(f"Za mało złota. Akcja 'posiadlosc' kosztuje {actual_cost}, masz {player.gold}.")
-                    continue
-                if build_estate(ctx, pid, pidx):
-                    player.gold -= actual_cost
-                    ok = True
-                    msg = f"{player.name} buduje posiadłość w {pid.value}. (złoto {player.gold}, koszt {actual_cost})"
-                else:
-                    println("Brak wolnych slotów posiadłości w tej prowincji.")
-                    continue
+class DuelSchedule:
+    """
+    Kolejka priorytetowa (kopiec) miejsc graczy obecnych na prowincji, uporządkowana
+    wg kolejności tur od marszałka. Kolejną parę do potyczki zdejmujemy w O(log P).
+    """
 
-            elif action == "rekrutacja":
-                pid = self._parse_province(args)
-                if not pid:
-                    println("Nie rozpoznano prowincji.")
-                    continue
-                if not self._has_noble(ctx, pid, pidx):
-                    println("Musisz mieć szlachcica na tej prowincji.")
-                    continue
-                base = self.COST_PAID[action]
-                actual_cost = ctx.round_status.recruit_cost_override if ctx.round_status.recruit_cost_override is not None else base
-                if player.gold < actual_cost:
-                    println(f"Za mało złota. Akcja 'rekrutacja' kosztuje {actual_cost}, masz {player.gold}.")
-                    continue
-                add_units(ctx, pid, pidx, 1)
-                player.gold -= actual_cost
-                ok = True
-                msg = f"{player.name} rekrutuje 1 jednostkę w {pid.value}. (złoto {player.gold}, koszt {actual_cost})"
+    def __init__(self, seats: List[int], marshal: int, pcount: int) -> None:
+        self._marshal = marshal
+        self._pcount = max(1, pcount)
+        self._heap = [((s - marshal) % self._pcount, s) for s in seats]
+        heapq.heapify(self._heap)
 
+    def push(self, seat: int) -> None:
+        heapq.heappush(self._heap, ((seat - self._marshal) % self._pcount, seat))
 
-            elif action == "marsz":
-                if "->" not in args:
-                    println("Podaj format: Źródło->Cel (np. Litwa->Prusy).")
-                    continue
-                src_txt, dst_txt = [s.strip() for s in args.split("->", 1)]
-                src = self._parse_province(src_txt)
-                dst = self._parse_province(dst_txt)
-                if not src or not dst:
-                    println("Nie rozpoznano prowincji.")
-                    continue
-                if not self._has_noble(ctx, src, pidx) or not self._has_noble(ctx, dst, pidx):
-                    println("Marsz tylko między prowincjami, gdzie masz szlachcica na obu.")
-                    continue
-                if move_units(ctx, src, dst, pidx, 1):
-                    ok = True
-                    msg = f"{player.name} maszeruje 1 jednostką: {src.value} -> {dst.value}."
-                else:
-                    println("Brak jednostek do przesunięcia na prowincji źródłowej.")
-                    continue
+    def next_pair(self) -> Optional[Tuple[int, int]]:
+        if len(self._heap) < 2:
+            return None
+        a = heapq.heappop(self._heap)[1]
+        b = heapq.heappop(self._heap)[1]
+        return a, b
 
-            elif action == "zamoznosc":
-                pid = self._parse_province(args)
-                if not pid:
-                    println("Nie rozpoznano prowincji.")
-                    continue
-                before = ctx.provinces[pid].wealth
-                if before >= 3:
-                    println("Zamożność już wynosi 3 (maksimum).")
-                    continue
-                base = self.COST_PAID[action]
-                actual_cost = ctx.round_status.zamoznosc_cost_override if ctx.round_status.zamoznosc_cost_override is not None else base
-                if player.gold < actual_cost:
-                    println(f"Za mało złota. Akcja 'zamoznosc' kosztuje {actual_cost}, masz {player.gold}.")
-                    continue
-                add_province_wealth(ctx, pid, 1)
-                player.gold -= actual_cost
-                ok = True
-                msg = f"{player.name} podnosi zamożność {pid.value} z {before} do {ctx.provinces[pid].wealth}. (złoto {player.gold}, koszt {actual_cost})"
-
-            if ok:
-                println(msg)
-                # po jednej poprawnej akcji kończymy turę tego gracza
-                break
 
 class PlayerBattlePhase(BasePhase):
     name = "PlayerBattlePhase"
-
-    def __init__(self) -> None:
-        self._ran = False
+    skip_when = (no_contested_province,)
+    central = True
 
     def enter(self, ctx: GameContext) -> None:
         println("[Starcia] Rozstrzyganie bitew między graczami na tych samych prowincjach.")
+        if ctx.settings.tactical:
+            println(f"Zasady: bitwa taktyczna (do {battle.MAX_PER_SIDE} jednostek na stronę); każdy gracz wybiera doktrynę.")
+            println("Giną jednostki zabite w bitwie; ocalali pokonanego rozpraszają się, przy remisie wracają do armii.")
+            for key, name in battle.DOCTRINES.items():
+                println(f"  {key}: {name}")
+            return
         println("Zasady: każdy gracz podaje tyle rzutów (1–6), ile ma jednostek.")
         println("Wynik 5–6 zabija 1 jednostkę przeciwnika; 1–4 nic. Straty odejmujemy po obu seriach rzutów.")
 
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        return ""  # sterowanie centralne
-
-    def _turn_order(self, ctx: GameContext) -> List[Player]:
-        m = ctx.round_status.marshal_index
-        players = ctx.settings.players
-        return players[m:] + players[:m]
-
     def _players_with_units(self, ctx: GameContext, pid: ProvinceID) -> List[int]:
-        arr = ctx.troops.per_province[pid]
-        return [i for i, n in enumerate(arr) if n > 0]
+        return ctx.troops.players_on(pid)
 
     @staticmethod
     def _read_rolls(name: str, count: int) -> List[int]:
@@ -1570,18 +1304,13 @@ class PlayerBattlePhase(BasePhase):
             except ValueError:
                 println("    Nieprawidłowe dane. Upewnij się, że liczba rzutów i wartości (1–6) się zgadzają.")
 
-    @staticmethod
-    def _kills_from_rolls(rolls: List[int]) -> int:
-        return sum(1 for r in rolls if r >= 5)
-
     def _resolve_duel(self, ctx: GameContext, pid: ProvinceID, i: int, j: int) -> None:
-        """Potyczka 1v1 na prowincji pid między graczami i oraz j. Straty po obu seriach."""
-        troops_arr = ctx.troops.per_province[pid]
+        """Potyczka 1v1 na prowincji pid między graczami i oraz j. Straty liczy rules.Duel."""
         pi = ctx.settings.players[i]
         pj = ctx.settings.players[j]
 
-        units_i_start = troops_arr[i]
-        units_j_start = troops_arr[j]
+        units_i_start = ctx.troops.count(pid, i)
+        units_j_start = ctx.troops.count(pid, j)
         println(f"[Starcia] {pid.value}: {pi.name} ({units_i_start}) vs {pj.name} ({units_j_start})")
 
         # brak sensu walczyć, jeśli ktoś jednak 0 (sprawdzamy defensywnie)
@@ -1589,47 +1318,58 @@ class PlayerBattlePhase(BasePhase):
             println("  (Ktoś nie ma jednostek — pomijam potyczkę.)")
             return
 
+        if ctx.settings.tactical:
+            self._resolve_battle(ctx, pid, i, j)
+            return
         rolls_i = self._read_rolls(pi.name, units_i_start)
         rolls_j = self._read_rolls(pj.name, units_j_start)
+        commit(ctx, rules.Duel(ctx.map.index[pid], i, j, tuple(rolls_i), tuple(rolls_j)))
 
-        kills_i = self._kills_from_rolls(rolls_i)  # zadaje straty przeciwnikowi
-        kills_j = self._kills_from_rolls(rolls_j)
-
-        # Straty stosujemy dopiero teraz, limitując do liczby jednostek przeciwnika na początku potyczki
-        loss_i = min(kills_j, units_i_start)
-        loss_j = min(kills_i, units_j_start)
-
-        troops_arr[i] = max(0, troops_arr[i] - loss_i)
-        troops_arr[j] = max(0, troops_arr[j] - loss_j)
-
-        println(f"  {pi.name} zadał {loss_j} strat; {pj.name} zadał {loss_i} strat.")
-        println(f"  Stan po potyczce: {pi.name}={troops_arr[i]}, {pj.name}={troops_arr[j]}.")
+    @staticmethod
+    def _read_doctrine(ctx: GameContext, name: str, default: str) -> str:
+        if ctx.settings.headless:
+            return default
+        while True:
+            raw = (prompt(f"  {name}: doktryna (D1–D6, Enter = {default}): ") or "").strip().upper()
+            if not raw:
+                return default
+            if raw in battle.DOCTRINES:
+                return raw
+            println("    Nieprawidłowe — wpisz D1..D6.")
+
+    def _resolve_battle(self, ctx: GameContext, pid: ProvinceID, i: int, j: int) -> None:
+        """Bitwa taktyczna: i atakuje (pierwszy wg kolejności od marszałka), j się broni."""
+        armies = [battle.army(ctx.troops.count(pid, seat, UnitType.P), ctx.troops.count(pid, seat, UnitType.K))
+                  for seat in (i, j)]
+        doctrines = [self._read_doctrine(ctx, ctx.settings.players[seat].name, default)
+                     for seat, default in zip((i, j), battle.DEFAULT_DOCTRINES)]
+        result = battle.fight(armies[0], armies[1], doctrines, rng=random.Random(ctx.rng.getrandbits(64)))
+        winner = {0: ctx.settings.players[i].name, 1: ctx.settings.players[j].name, None: "remis"}[result.winner]
+        println(f"  Bitwa ({' vs '.join(doctrines)}): {result.reason or 'koniec'}; zwycięzca: {winner} "
+                f"po {result.steps} mikrokrokach.")
+        loser = None if result.winner is None else (j, i)[result.winner]
+        commit(ctx, rules.TacticalBattle(ctx.map.index[pid], i, j, result.losses(0), result.losses(1), loser))
 
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
-        if self._ran:
-            return PhaseResult(done=True)
-        self._ran = True
-
-        order = self._turn_order(ctx)
-        name_to_idx = {p.name: idx for idx, p in enumerate(ctx.settings.players)}
+        marshal = ctx.round_status.marshal_index
+        pcount = len(ctx.settings.players)
 
         any_battle = False
         # Dla każdej prowincji rozstrzygamy kolejne potyczki aż zostanie ≤1 gracz z jednostkami.
-        for pid in ProvinceID:
-            # pętla kolejnych potyczek na tej prowincji
+        for pid in ctx.map.provinces:
+            schedule = DuelSchedule(self._players_with_units(ctx, pid), marshal, pcount)
+            # pętla kolejnych potyczek na tej prowincji: DWÓCH pierwszych wg kolejności tur od marszałka
             while True:
-                present = self._players_with_units(ctx, pid)
-                if len(present) < 2:
+                pair = schedule.next_pair()
+                if pair is None:
                     break
                 any_battle = True
-
-                # wybierz DWÓCH pierwszych wg kolejności tur od marszałka
-                ordered_present = [name_to_idx[p.name] for p in order if name_to_idx[p.name] in present]
-                a = ordered_present[0]
-                # drugi to następny różny od a
-                b = next(idx for idx in ordered_present if idx != a)
-
+                a, b = pair
                 self._resolve_duel(ctx, pid, a, b)
+                # ocaleni wracają do kolejki; wyeliminowani z niej wypadają
+                for seat in pair:
+                    if ctx.troops.count(pid, seat) > 0:
+                        schedule.push(seat)
 
         if not any_battle:
             println("[Starcia] Brak prowincji z armiami ≥2 graczy — nic do rozstrzygnięcia.")
@@ -1640,54 +1380,97 @@ class PlayerBattlePhase(BasePhase):
         super().exit(ctx)  # pokaż zaktualizowane statystyki po bitwach
 
 
-class EnemyReinforcementPhase(BasePhase):
-    name = "EnemyReinforcementPhase"
+def read_die(text: str) -> int:
+    """Pyta o jeden rzut k6, aż poda się liczbę 1–6."""
+    while True:
+        val = (prompt(text) or "").strip()
+        try:
+            roll = int(val)
+            if 1 <= roll <= 6:
+                return roll
+            raise ValueError
+        except ValueError:
+            println("Nieprawidłowe — wpisz liczbę 1–6.")
 
-    def __init__(self) -> None:
-        self._ran = False
+
+class ArsonPhase(BasePhase):
+    name = "ArsonPhase"
+    skip_when = (no_troops, no_arson_targets)
+    central = True
+
+    def enter(self, ctx: GameContext) -> None:
+        println("[Palenie] Gracz z wojskiem w prowincji może spalić w niej ostatnią posiadłość, jeśli należy do przeciwnika.")
+        println("Spalenie: posiadłość znika, zamożność prowincji −1. Po spaleniu wszyscy znów mają turę;")
+        println("faza kończy się, gdy wszyscy kolejno spasują. Tura gracza: prowincja albo 'pass'.")
 
     @staticmethod
-    def _roll_to_delta(roll: int) -> int:
-        if roll <= 2:
-            return 0
-        elif roll <= 4:
-            return 1
-        else:
-            return 2
+    def targets(ctx: GameContext, state: rules.GameState, pidx: int) -> List[ProvinceID]:
+        """Cele gracza z indeksów stanu kernela (maska wojsk i ostatnie sloty, rules.arson_targets)."""
+        return [ctx.map.provinces[slot] for slot in rules.arson_targets(state, pidx)]
+
+    def _turn(self, ctx: GameContext, pl: Player, targets: List[ProvinceID]) -> Optional[rules.GameState]:
+        """Jedna tura gracza; stan po spaleniu posiadłości albo None = pass."""
+        names = ", ".join(pid.value for pid in targets)
+        while True:
+            raw = (prompt(f"[Palenie] Tura {pl.name}. Cele: {names}. Prowincja albo 'pass': ") or "").strip()
+            if raw.lower() in ("", "pass"):
+                return None
+            pid = ctx.parser.province(raw)
+            if pid is None:
+                println("  Nie rozpoznano prowincji.")
+                continue
+            try:
+                return commit(ctx, rules.Arson(pl.seat, ctx.map.index[pid])).state
+            except rules.IllegalMove as e:
+                println(f"  {e}")
+
+    def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
+        players = ctx.settings.players
+        m = ctx.round_status.marshal_index
+        order = players[m:] + players[:m]
+        passed = [False] * len(players)
+        any_burned = False
+        state = snapshot(ctx)   # indeksy liczone raz; kolejne stany niesie kernel (commit)
+        k = 0
+        while not all(passed):
+            pl = order[k % len(order)]
+            k += 1
+            if passed[pl.seat]:
+                continue
+            targets = self.targets(ctx, state, pl.seat)
+            if not targets:
+                println(f"[Palenie] {pl.name} nie ma czego palić — PASS automatyczny.")
+                passed[pl.seat] = True
+                continue
+            burned = self._turn(ctx, pl, targets)
+            if burned is None:
+                passed[pl.seat] = True
+            else:
+                state = burned
+                any_burned = True
+                passed = [False] * len(players)  # po spaleniu nowa kolejka dla wszystkich
+
+        if not any_burned:
+            println("[Palenie] Nikt nie spalił posiadłości.")
+        return PhaseResult(done=True)
+
+    def exit(self, ctx: GameContext) -> None:
+        super().exit(ctx)
+
+
+class EnemyReinforcementPhase(BasePhase):
+    name = "EnemyReinforcementPhase"
+    central = True
 
     def enter(self, ctx: GameContext) -> None:
         println("[Wrogowie] Wzmacnianie wrogich armii.")
         println("Dla każdego toru podaj wynik 1–6. Modyfikacje: 1–2:+0, 3–4:+1, 5–6:+2.")
 
-    # Nie pytamy per gracza — faza sama prowadzi wejście/wyjście.
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        return ""
-
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
-        if self._ran:
-            return PhaseResult(done=True)
-        self._ran = True
-
         # stała kolejność: N, S, E (Szwecja, Tatarzy, Moskwa)
-        order = [RaidTrackID.N, RaidTrackID.S, RaidTrackID.E]
-        for rid in order:
-            name = rid.value
-            while True:
-                val = (prompt(f"[Wrogowie] Rzut dla {name} (1–6): ") or "").strip()
-                try:
-                    roll = int(val)
-                    if 1 <= roll <= 6:
-                        break
-                    raise ValueError
-                except ValueError:
-                    println("Nieprawidłowe — wpisz liczbę 1–6.")
-
-            delta = self._roll_to_delta(roll)
-            if delta != 0:
-                new_val = add_raid(ctx, rid, delta)
-                println(f"  {name}: +{delta} → {new_val}")
-            else:
-                println(f"  {name}: +0 (bez zmian)")
+        for rid in (RaidTrackID.N, RaidTrackID.S, RaidTrackID.E):
+            roll = read_die(f"[Wrogowie] Rzut dla {rid.value} (1–6): ")
+            commit(ctx, rules.Reinforce(rid.name, roll))
 
         return PhaseResult(done=True)
 
@@ -1696,166 +1479,46 @@ class EnemyReinforcementPhase(BasePhase):
 
 class AttackInvadersPhase(BasePhase):
     name = "AttackInvadersPhase"
-
-    def __init__(self) -> None:
-        # mapy skrótów i dozwolonych prowincji startowych
-        self._prov_short = {
-            "p": ProvinceID.PRUSY,
-            "l": ProvinceID.LITWA,
-            "u": ProvinceID.UKRAINA,
-            "w": ProvinceID.WIELKOPOLSKA,
-            "m": ProvinceID.MALOPOLSKA,
-        }
-        self._enemy_keys = {
-            "n": RaidTrackID.N,  # Szwecja
-            "s": RaidTrackID.S,  # Tatarzy
-            "e": RaidTrackID.E,  # Moskwa
-        }
-        self._allowed_sources = {
-            RaidTrackID.N: {ProvinceID.PRUSY, ProvinceID.LITWA},
-            RaidTrackID.E: {ProvinceID.LITWA, ProvinceID.UKRAINA},
-            RaidTrackID.S: {ProvinceID.MALOPOLSKA, ProvinceID.UKRAINA},
-        }
-
-    # --- utils ---
-    @staticmethod
-    def _norm(s: str) -> str:
-        import unicodedata
-        s = (s or "").strip()
-        s = unicodedata.normalize("NFKD", s)
-        s = "".join(ch for ch in s if not unicodedata.combining(ch))
-        return s.lower().strip()
-
-    def _parse_enemy(self, text: str) -> Optional[RaidTrackID]:
-        t = self._norm(text)
-        if not t:
-            return None
-        # skróty literowe
-        if t in self._enemy_keys:
-            return self._enemy_keys[t]
-        # nazwy
-        names = {
-            "szwecja": RaidTrackID.N,
-            "tatarzy": RaidTrackID.S,
-            "moskwa": RaidTrackID.E,
-        }
-        for k, v in names.items():
-            if t == k or k.startswith(t) or t.startswith(k):
-                return v
-        return None
-
-    def _parse_province(self, text: str) -> Optional[ProvinceID]:
-        t = self._norm(text)
-        if not t:
-            return None
-        if len(t) == 1 and t in self._prov_short:
-            return self._prov_short[t]
-        for pid in ProvinceID:
-            name_n = self._norm(pid.value)
-            if t == name_n or name_n.startswith(t) or t.startswith(name_n):
-                return pid
-        if len(t) == 1:
-            for pid in ProvinceID:
-                if self._norm(pid.value)[0] == t:
-                    return pid
-        return None
+    skip_when = (no_troops, no_attack_reach)
+    central = True
 
     def enter(self, ctx: GameContext) -> None:
         println("[Ataki] Gracze mogą atakować najeźdźców.")
-        println("Zasięgi: Szwecja z Prus/Litwy; Moskwa z Litwy/Ukrainy; Tatarzy z Małopolski/Ukrainy.")
+        reach = "; ".join(f"{rid.value}: {'/'.join(p.value for p in ctx.map.provinces if p in srcs)}"
+                          for rid, srcs in ctx.map.attack_sources.items())
+        println(f"Zasięgi (skąd można atakować): {reach}.")
         println("Tura gracza: 'atak' lub 'pass'.")
 
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        return ""  # sterujemy interaktywnie wewnątrz handle_input
-
     def _player_index(self, ctx: GameContext, player: Player) -> int:
-        return ctx.settings.players.index(player)
+        return player.seat
 
     def _has_any_attack_troops(self, ctx: GameContext, pidx: int) -> bool:
         # Czy gracz ma wojsko w prowincjach, z których da się atakować ktokolwiek?
-        for rid, sources in self._allowed_sources.items():
+        for rid, sources in ctx.map.attack_sources.items():
             if ctx.raid_tracks[rid].value <= 0:
                 continue
             for src in sources:
-                if ctx.troops.per_province[src][pidx] > 0:
+                if ctx.troops.count(src, pidx) > 0:
                     return True
         return False
 
     def _any_side_has_troops(self, ctx: GameContext) -> bool:
         # Czy istnieje gracz, który w ogóle ma wojsko (globalnie)?
-        for arr in ctx.troops.per_province.values():
-            if sum(arr) > 0:
-                return True
-        return False
-
-    def _attack_from(self, ctx: GameContext, rid: RaidTrackID, src: ProvinceID, pidx: int, player: Player) -> None:
-        units_here = ctx.troops.per_province[src][pidx]
-        if units_here <= 0:
-            println("Brak jednostek na wybranej prowincji.")
-            return
-        if ctx.raid_tracks[rid].value <= 0:
-            println("Ten tor najazdu ma już 0 — brak celu do bicia.")
-            return
+        return ctx.troops.grand_total() > 0
 
-        println(f"[Atak] {player.name} atakuje {rid.value} z {src.value}. Masz {units_here} jednostek.")
-
-        # Ile kości? Normalnie = liczba jednostek; „Artyleria koronna” daje +1 raz na rundę przeciw NAJEŹDŹCOM.
-        rolls_count = units_here
-        if ctx.round_status.artillery_defense_active:
-            used = ctx.round_status.artillery_defense_used
-            pidx_local = ctx.settings.players.index(player)
-            if not used[pidx_local]:
-                rolls_count += 1
-                used[pidx_local] = True
-                println("  (+1 kość dzięki Artylerii koronnej — obrona przed najazdem)")
-
-        # Zbierz rzuty
-        rolls = []
-        # Iteracyjnie: po każdym rzucie stosujemy efekt; jeśli tor spadnie do 0, przerywamy tę akcję
-        for i in range(rolls_count):
+    def _attack_from(self, ctx: GameContext, rid: RaidTrackID, src: ProvinceID, pidx: int, dice: int) -> None:
+        # Iteracyjnie: po każdym rzucie stosujemy efekt (rules.AttackRoll); jeśli tor spadnie do 0, przerywamy
+        slot = ctx.map.index[src]
+        for i in range(dice):
             if ctx.raid_tracks[rid].value <= 0:
                 println("  Tor już ma 0 — dalsze ataki w tej akcji są zabronione.")
                 break
-
-            # pobierz pojedynczy rzut
-            while True:
-                val = (prompt(f"  Rzut #{i+1} (1–6): ") or "").strip()
-                try:
-                    r = int(val)
-                    if 1 <= r <= 6:
-                        break
-                    raise ValueError
-                except ValueError:
-                    println("Nieprawidłowe — wpisz liczbę 1–6.")
-
-            # zastosuj efekt rzutu
-            if r == 1:
-                add_units(ctx, src, pidx, -1)
-                player.honor += 1
-                if rid == RaidTrackID.S and ctx.round_status.extra_honor_vs_tatars:
-                    player.honor += 1  # bonus z „Bitwy pod Wiedniem” (jeśli aktywny)
-                println("  Wynik 1 → porażka, tracisz 1 jednostkę.")
-            elif 2 <= r <= 5:
-                add_raid(ctx, rid, -1)
-                add_units(ctx, src, pidx, -1)
-                player.honor += 1
-                if rid == RaidTrackID.S and ctx.round_status.extra_honor_vs_tatars:
-                    player.honor += 1
-                println("  Wynik 2–5 → sukces: tor -1 i tracisz 1 jednostkę.")
-            else:  # r == 6
-                add_raid(ctx, rid, -1)
-                player.honor += 1
-                if rid == RaidTrackID.S and ctx.round_status.extra_honor_vs_tatars:
-                    player.honor += 1
-                println("  Wynik 6 → sukces: tor -1 i jednostka pozostaje.")
-
-            # po zastosowaniu rzutu sprawdź, czy tor nie spadł do 0 i ewentualnie przerwij
+            r = read_die(f"  Rzut #{i+1} (1–6): ")
+            commit(ctx, rules.AttackRoll(pidx, rid.name, slot, r))
             if ctx.raid_tracks[rid].value <= 0:
-                println("  Tor zbity do 0 — kończysz tę akcję.")
                 break
 
-
-        println(f"  Po ataku: {rid.value} = {ctx.raid_tracks[rid].value}, jednostek w {src.value} = {ctx.troops.per_province[src][pidx]}")
+        println(f"  Po ataku: {rid.value} = {ctx.raid_tracks[rid].value}, jednostek w {src.value} = {ctx.troops.count(src, pidx)}")
 
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
         players = ctx.settings.players
@@ -1863,11 +1526,11 @@ class AttackInvadersPhase(BasePhase):
         order = players[m:] + players[:m]
 
         # pętle tur do momentu aż wszyscy spasuja lub nie ma już znaczących wojsk
-        passed = {p.name: False for p in players}
+        passed = [False] * len(players)  # indeks = miejsce gracza (seat)
 
         while True:
             # zakończ, jeśli wszyscy spasuja
-            if all(passed.values()):
+            if all(passed):
                 println("[Ataki] Wszyscy spasu­ją — koniec fazy.")
                 break
             # albo jeśli nikt nie ma już wojsk (globalnie)
@@ -1879,12 +1542,12 @@ class AttackInvadersPhase(BasePhase):
                 # pomiń jeśli już spassował wcześniej, ale resetujemy po jego akcji jeśli zdecyduje się jednak atakować
                 if not self._has_any_attack_troops(ctx, self._player_index(ctx, pl)):
                     println(f"[Ataki] {pl.name} nie ma wojsk w zasięgu — PASS automatyczny.")
-                    passed[pl.name] = True
+                    passed[pl.seat] = True
                     continue
 
                 choice = (prompt(f"[Ataki] Tura {pl.name}. 'atak' czy 'pass'? ").strip() or "").lower()
                 if choice.startswith("p"):
-                    passed[pl.name] = True
+                    passed[pl.seat] = True
                     continue
 
                 if not choice.startswith("a"):
@@ -1892,105 +1555,175 @@ class AttackInvadersPhase(BasePhase):
                     # gracz nie traci kolejki, spróbujemy jeszcze raz
                     choice = (prompt(f"[Ataki] Tura {pl.name}. 'atak' czy 'pass'? ").strip() or "").lower()
                     if not choice.startswith("a"):
-                        passed[pl.name] = False
+                        passed[pl.seat] = False
                         continue
 
                 # atak — reset pasa dla tego gracza
-                passed[pl.name] = False
+                passed[pl.seat] = False
 
                 # wybór prowincji źródłowej zgodnej z mapą zasięgu
-                src_txt = prompt("  Z której prowincji? (np. Prusy/P, Litwa/L, Ukraina/U, Małopolska/M): ")
-                src = self._parse_province(src_txt)
+                hint = ", ".join(f"{pid.value}/{k.upper()}" for k, pid in ctx.map.short.items())
+                src_txt = prompt(f"  Z której prowincji? (np. {hint}): ")
+                src = ctx.parser.province(src_txt)
                 if not src:
                     println("  Nie rozpoznano prowincji.")
-                    passed[pl.name] = False
                     continue
 
                 pidx = self._player_index(ctx, pl)
-                if ctx.troops.per_province[src][pidx] <= 0:
+                if ctx.troops.count(src, pidx) <= 0:
                     println("  Nie masz tu jednostek.")
-                    passed[pl.name] = False
                     continue
 
                 # wybór najeźdźcy
                 enemy_txt = prompt("  Kogo atakujesz? (Szwecja/N, Tatarzy/S, Moskwa/E): ")
-                rid = self._parse_enemy(enemy_txt)
+                rid = ctx.parser.enemy(enemy_txt)
                 if not rid:
                     println("  Nie rozpoznano najeźdźcy.")
-                    passed[pl.name] = False
-                    continue
-
-                if ctx.raid_tracks[rid].value <= 0:
-                    println("  Tego najeźdźcy nie można już atakować (tor = 0). Wybierz innego lub 'pass'.")
-                    # pozwalamy graczowi spróbować jeszcze raz w tej samej turze
-                    passed[pl.name] = False
                     continue
 
-                if src not in self._allowed_sources[rid]:
-                    println("  Z tej prowincji nie można atakować wybranego najeźdźcy.")
-                    passed[pl.name] = False
+                # warunki ataku (tor > 0, zasięg z tej prowincji) sprawdza rules.Attack
+                slot = ctx.map.index[src]
+                dice = rules.attack_dice(snapshot(ctx), pidx, slot)
+                try:
+                    commit(ctx, rules.Attack(pidx, rid.name, slot))
+                except rules.IllegalMove as e:
+                    println(str(e))
                     continue
-
-                self._attack_from(ctx, rid, src, pidx, pl)
+                self._attack_from(ctx, rid, src, pidx, dice)
 
         return PhaseResult(done=True)
 
     def exit(self, ctx: GameContext) -> None:
         super().exit(ctx)  # pokaże podsumowanie i tory
 
-class DevastationPhase(BasePhase):
-    name = "DevastationPhase"
+class DefensePhase(BasePhase):
+    name = "DefensePhase"
+    skip_when = (no_raids,)
+    central = True
 
     def __init__(self) -> None:
-        # kolejność i mapowanie 'pierwsza/druga' prowincja dla każdego toru
-        self._pairs = {
-            RaidTrackID.N: (ProvinceID.PRUSY, ProvinceID.LITWA),       # Szwecja
-            RaidTrackID.E: (ProvinceID.LITWA, ProvinceID.UKRAINA),     # Moskwa
-            RaidTrackID.S: (ProvinceID.UKRAINA, ProvinceID.MALOPOLSKA) # Tatarzy
-        }
         self._order = [RaidTrackID.N, RaidTrackID.S, RaidTrackID.E]
-        self._ran = False
 
     def enter(self, ctx: GameContext) -> None:
-        println("[Spustoszenia] Jeśli tor najeźdźcy ≥ 3, następuje splądrowanie jednej prowincji.")
-        println("Wybór prowincji k6: 1–3 pierwsza z pary, 4–6 druga z pary.")
-        println("Pary: Szwecja: Prusy/Litwa; Moskwa: Litwa/Ukraina; Tatarzy: Ukraina/Małopolska.")
+        println(f"[Obrona] Każdy tor ≥ {ctx.settings.config.plunder_threshold} losuje cel spustoszenia "
+                "(k6: 1–3 pierwsza z pary, 4–6 druga); wróg ma tyle jednostek, ile wynosi tor.")
+        println("Obrona z prowincji celu, rzut k6: 1 → ginie obrońca; 2–5 → giną obie strony; 6 → ginie wróg.")
+        println("Rozbity wróg nie pustoszy prowincji. Tura gracza: prowincja albo 'pass'.")
 
-    def ask(self, ctx: GameContext, player: Optional[Player] = None) -> str:
-        return ""  # faza sterowana centralnie
+    @staticmethod
+    def options(ctx: GameContext, pidx: int) -> List[Tuple[RaidTrackID, ProvinceID, int]]:
+        """Możliwe obrony gracza: cele z wrogiem, na których ma wojsko (TroopBoard, O(1) na cel)."""
+        out = []
+        for key, slot, enemy in ctx.round_status.raid_targets:
+            pid = ctx.map.provinces[slot]
+            if enemy > 0 and ctx.troops.count(pid, pidx) > 0:
+                out.append((RaidTrackID[key], pid, enemy))
+        return out
 
-    def _pick_target(self, first: ProvinceID, second: ProvinceID) -> ProvinceID:
+    @staticmethod
+    def any_left(ctx: GameContext) -> bool:
+        """Czy ktokolwiek może jeszcze bronić (odpowiednik #anyEligibleDefensesLeft z game.js)."""
+        return any(enemy > 0 and ctx.troops.total_on(ctx.map.provinces[slot]) > 0
+                   for _, slot, enemy in ctx.round_status.raid_targets)
+
+    def _choose_targets(self, ctx: GameContext) -> bool:
+        threshold = ctx.settings.config.plunder_threshold
+        chosen = False
+        for rid in self._order:
+            track = ctx.raid_tracks[rid]
+            if track.value >= threshold and rid in ctx.map.plunder_pairs:
+                chosen = True
+                first, second = ctx.map.plunder_pairs[rid]
+                println(f"[Obrona] {rid.value} (tor={track.value}) wybiera cel: {first.value}/{second.value}.")
+                commit(ctx, rules.RaidTarget(rid.name, read_die("  Rzut k6 (1–6): ")))
+        return chosen
+
+    def _turn(self, ctx: GameContext, pl: Player, options: List[Tuple[RaidTrackID, ProvinceID, int]]) -> bool:
+        """Jedna tura gracza; True = bronił (jeden rzut), False = pass."""
+        listing = ", ".join(f"{pid.value} ⇄ {rid.value} (wróg {enemy})" for rid, pid, enemy in options)
         while True:
-            val = (prompt("  Rzut k6 (1–6): ") or "").strip()
-            try:
-                r = int(val)
-                if 1 <= r <= 6:
-                    break
-                raise ValueError
-            except ValueError:
-                println("Nieprawidłowe — wpisz liczbę 1–6.")
-        return first if r <= 3 else second
+            raw = (prompt(f"[Obrona] Tura {pl.name}. Możliwe: {listing}. Prowincja albo 'pass': ") or "").strip()
+            if raw.lower() in ("", "pass"):
+                return False
+            pid = ctx.parser.province(raw)
+            tracks = [rid for rid, p, _ in options if p == pid]
+            if not tracks:
+                println("  Nie rozpoznano prowincji pod najazdem.")
+                continue
+            rid = tracks[0]
+            if len(tracks) > 1:
+                rid = ctx.parser.enemy(prompt(f"  Przeciw komu? ({'/'.join(r.value for r in tracks)}): "))
+                if rid not in tracks:
+                    println("  Nie rozpoznano najeźdźcy.")
+                    continue
+            roll = read_die("  Rzut obrony k6 (1–6): ")
+            commit(ctx, rules.Defend(pl.seat, rid.name, ctx.map.index[pid], roll))
+            return True
 
     def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
-        if self._ran:
+        if not self._choose_targets(ctx):
+            println(f"[Obrona] Brak torów ≥ {ctx.settings.config.plunder_threshold} — nie ma najazdów do obrony.")
             return PhaseResult(done=True)
-        self._ran = True
 
+        players = ctx.settings.players
+        m = ctx.round_status.marshal_index
+        order = players[m:] + players[:m]
+        passed = [False] * len(players)
+        k = 0
+        while not all(passed):
+            if not self.any_left(ctx):
+                println("[Obrona] Nikt nie może już bronić — koniec fazy.")
+                break
+            pl = order[k % len(order)]
+            k += 1
+            if passed[pl.seat]:
+                continue
+            options = self.options(ctx, pl.seat)
+            if not options:
+                println(f"[Obrona] {pl.name} nie ma wojsk w atakowanych prowincjach — PASS automatyczny.")
+                passed[pl.seat] = True
+            elif self._turn(ctx, pl, options):
+                passed = [False] * len(players)  # po obronie nowa kolejka dla wszystkich
+            else:
+                passed[pl.seat] = True
+        return PhaseResult(done=True)
+
+    def exit(self, ctx: GameContext) -> None:
+        super().exit(ctx)
+
+
+class DevastationPhase(BasePhase):
+    name = "DevastationPhase"
+    skip_when = (no_raids,)
+    central = True
+
+    def __init__(self) -> None:
+        # kolejność torów; pary 'pierwsza/druga' prowincja dla każdego toru są w pliku mapy
+        self._order = [RaidTrackID.N, RaidTrackID.S, RaidTrackID.E]
+
+    def enter(self, ctx: GameContext) -> None:
+        println(f"[Spustoszenia] Jeśli tor najeźdźcy ≥ {ctx.settings.config.plunder_threshold}, następuje splądrowanie jednej prowincji.")
+        println("Cel wylosowany w fazie obrony; bez niego k6: 1–3 pierwsza z pary, 4–6 druga z pary.")
+        pairs = "; ".join(f"{rid.value}: {a.value}/{b.value}" for rid, (a, b) in ctx.map.plunder_pairs.items())
+        println(f"Pary: {pairs}.")
+
+    def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
+        threshold = ctx.settings.config.plunder_threshold
         any_happened = False
         for rid in self._order:
             track = ctx.raid_tracks[rid]
-            if track.value >= 3:
+            if track.value >= threshold and rid in ctx.map.plunder_pairs:
                 any_happened = True
-                first, second = self._pairs[rid]
+                # po splądrowaniu tor spada do 1 (rules.Plunder)
+                if any(t[0] == rid.name for t in ctx.round_status.raid_targets):
+                    commit(ctx, rules.Plunder(rid.name))
+                    continue
+                first, second = ctx.map.plunder_pairs[rid]
                 println(f"[Spustoszenia] {rid.value} (tor={track.value}) plądruje: {first.value}/{second.value}.")
-                target = self._pick_target(first, second)
-                msg = plunder_province(ctx, target)
-                # po splądrowaniu tor spada do 1
-                track.value = 1
-                println(msg + f" Tor {rid.value} ustawiony na 1.")
+                commit(ctx, rules.Plunder(rid.name, read_die("  Rzut k6 (1–6): ")))
 
         if not any_happened:
-            println("[Spustoszenia] Brak torów ≥ 3 — nic się nie dzieje.")
+            println(f"[Spustoszenia] Brak torów ≥ {threshold} — nic się nie dzieje.")
 
         return PhaseResult(done=True)
 
@@ -1998,22 +1731,117 @@ class DevastationPhase(BasePhase):
         super().exit(ctx)  # pokaże aktualny stan mapy i torów
 
 
+class UpkeepPhase(BasePhase):
+    name = "UpkeepPhase"
+    skip_when = (no_troops,)
+    central = True
+
+    def enter(self, ctx: GameContext) -> None:
+        cfg = ctx.settings.config  # żołd za jednostkę i próg dezercji (k6: 1–3 dezercja, 4–6 zostaje)
+        println(f"[Żołd] Każda jednostka kosztuje {cfg.upkeep_per_unit} zł. Płacimy automatycznie, ile się da.")
+        println(f"Za każdą nieopłaconą jednostkę rzut k6: 1–{cfg.desertion_max_roll} dezercja losowej jednostki gracza.")
+
+    def _collect_rolls(self, ctx: GameContext, player: Player, count: int) -> List[int]:
+        """Wszystkie rzuty dezercji gracza naraz: w trybie headless z ctx.rng, inaczej jeden prompt (Enter = losuj)."""
+        if ctx.settings.headless:
+            return roll_dice(ctx, count)
+        while True:
+            raw = (prompt(f"  {player.name}: podaj {count} rzutów 1–6 (Enter = losuj): ") or "").strip()
+            if not raw:
+                rolls = roll_dice(ctx, count)
+                println(f"    Wylosowano: {' '.join(map(str, rolls))}")
+                return rolls
+            toks = [t for t in raw.replace(",", " ").split() if t]
+            try:
+                rolls = [int(t) for t in toks]
+                if len(rolls) != count or any(r < 1 or r > 6 for r in rolls):
+                    raise ValueError
+                return rolls
+            except ValueError:
+                println("    Nieprawidłowe dane. Upewnij się, że liczba rzutów i wartości (1–6) się zgadzają.")
+
+    def handle_input(self, ctx: GameContext, raw: str, player: Optional[Player] = None) -> PhaseResult:
+        players = ctx.settings.players
+        pcount = len(players)
+
+        # Płatność: każdy płaci za tyle jednostek, na ile go stać
+        unpaid = [u for _, u in rules.upkeep_split(snapshot(ctx))]
+        commit(ctx, rules.PayUpkeep())
+
+        if not any(unpaid):
+            println("[Żołd] Wszystkie jednostki opłacone — brak dezercji.")
+            return PhaseResult(done=True)
+
+        # Dezercje: wszystkie rzuty gracza naraz, ofiary losowane jedną próbką bez zwracania
+        m = ctx.round_status.marshal_index
+        for i in list(range(m, pcount)) + list(range(0, m)):
+            if unpaid[i] == 0:
+                continue
+            rolls = self._collect_rolls(ctx, players[i], unpaid[i])
+            gone = rules.deserters(tuple(rolls), ctx.settings.config.desertion_max_roll)
+            victims = tuple(ctx.rng.sample(range(ctx.troops.player_total(i)), gone)) if gone else ()
+            commit(ctx, rules.Desertion(i, tuple(rolls), victims))
+
+        return PhaseResult(done=True)
+
+    def exit(self, ctx: GameContext) -> None:
+        super().exit(ctx)  # pokaże stan wojsk po wypłacie żołdu
+
+
+PHASES: Dict[str, type] = {cls.name: cls for cls in (
+    EventsPhase, IncomePhase, AuctionPhase, SejmPhase, ActionPhase, PlayerBattlePhase, ArsonPhase,
+    EnemyReinforcementPhase, AttackInvadersPhase, DefensePhase, DevastationPhase, UpkeepPhase,
+)}
+
+
+def build_phases(order: Tuple[str, ...]) -> List[BasePhase]:
+    """Instancje faz w podanej kolejności; ValueError dla nieznanej nazwy."""
+    unknown = [name for name in order if name not in PHASES]
+    if unknown:
+        raise ValueError(f"Nieznane fazy: {', '.join(unknown)} (dostępne: {', '.join(PHASES)})")
+    return [PHASES[name]() for name in order]
+
+
 # --------------- Round Engine --------------- #
 
 class RoundEngine:
+    """
+    Harmonogram rundy: fazy w kolejności z listy, te same instancje przez całą partię (reset przed
+    rundą). Fazy `central` dostają jedno handle_input; pozostałe pytają każdego gracza od marszałka.
+    W trybie headless fazy, których reguła skip_when jest spełniona, są pomijane bez wchodzenia.
+    """
+
     def __init__(self, phases: List[BasePhase]):
         self.phases = phases
         self._index = 0
         self._turn_order: List[Player] = []
 
-    def start(self, ctx: GameContext) -> None:
-        self._index = 0
+    def start(self, ctx: GameContext, index: int = 0) -> None:
+        self._index = index
+        for phase in self.phases:
+            phase.reset()
         marshal_idx = ctx.round_status.marshal_index
         players = ctx.settings.players
         # ustal kolejność: zaczyna marszałek, potem reszta w kolejności
         self._turn_order = players[marshal_idx:] + players[:marshal_idx]
-        if self.phases:
-            self.phases[0].enter(ctx)
+        self._enter(ctx)
+
+    def _enter(self, ctx: GameContext) -> None:
+        """Wchodzi w bieżącą fazę; w trybie headless przeskakuje fazy bez pracy."""
+        phase = self.current_phase()
+        state = snapshot(ctx) if phase is not None and ctx.settings.headless else None
+        while phase is not None and state is not None and phase.skipped(state):
+            if ctx.journal is not None:
+                ctx.journal.phase_done(phase.name, state)
+            self._index += 1
+            phase = self.current_phase()
+        if phase:
+            with memspan(ctx, phase.name):
+                phase.enter(ctx)
+
+    @property
+    def order(self) -> Tuple[str, ...]:
+        return tuple(phase.name for phase in self.phases)
 
     def current_phase(self) -> Optional[BasePhase]:
         if 0 <= self._index < len(self.phases):
@@ -2025,17 +1853,25 @@ class RoundEngine:
         if not phase:
             return None
 
-        for player in self._turn_order:
-            question = phase.ask(ctx, player)
-            raw = prompt(question) if question else ""
-            result = phase.handle_input(ctx, raw, player)
-            if result.message:
-                println(result.message)
-        phase.exit(ctx)
+        with memspan(ctx, phase.name):
+            if phase.central:
+                result = phase.handle_input(ctx, "", None)
+                if result.message:
+                    println(result.message)
+            else:
+                for player in self._turn_order:
+                    question = phase.ask(ctx, player)
+                    raw = prompt(question) if question else ""
+                    result = phase.handle_input(ctx, raw, player)
+                    if result.message:
+                        println(result.message)
+            phase.exit(ctx)
+        if ctx.journal is not None:
+            ctx.journal.phase_done(phase.name, snapshot(ctx))
         self._index += 1
-        nxt = self.current_phase()
-        if nxt:
-            nxt.enter(ctx)
+        if ctx.autosave is not None:
+            ctx.autosave.checkpoint(ctx, self._index)
+        self._enter(ctx)
         return None
 
     def finished(self) -> bool:
@@ -2065,15 +1901,16 @@ class StartMenuState(BaseState):
         println("Set up the game.")
 
     def tick(self, ctx: GameContext) -> Optional[StateID]:
+        start_gold = ctx.settings.config.start_gold  # startowo 6 złota
         try:
             num_players = int(prompt("Number of players: ").strip())
             ctx.settings.players = []
             for i in range(num_players):
                 name = prompt(f"Enter name for player {i+1}: ").strip() or f"Player{i+1}"
-                ctx.settings.players.append(Player(name=name, gold=6))  # startowo 6 złota
+                ctx.settings.players.append(Player(name=name, seat=i, gold=start_gold))
         except ValueError:
             println("Invalid input, defaulting to 1 player.")
-            ctx.settings.players = [Player(name="Player1", gold=6)]
+            ctx.settings.players = [Player(name="Player1", gold=start_gold)]
 
         try:
             rounds_raw = prompt("Number of rounds: ").strip()
@@ -2082,21 +1919,22 @@ class StartMenuState(BaseState):
         except ValueError:
             println("Invalid number, keeping default.")
 
-        ctx.round_status = RoundStatus(current_round=1, total_rounds=ctx.settings.max_rounds, marshal_index=0)
+        ctx.round_status = RoundStatus(current_round=1, total_rounds=ctx.settings.max_rounds, marshal_index=0,
+                                       admin_yield=ctx.settings.config.admin_yield)
         
-        # --- INIT TROOPS: po znaniu liczby graczy przygotuj tablice wojsk ---
+        # --- INIT TROOPS: po znaniu liczby graczy przygotuj tablicę wojsk [prowincja × gracz × typ] ---
         pcount = len(ctx.settings.players)
-        ctx.troops.per_province = {
-            pid: [0] * pcount
-            for pid in ctx.provinces.keys()
-        }
+        ctx.troops.reset(ctx.provinces.keys(), pcount)
 
         # --- INIT NOBLES: analogicznie do wojsk ---
         ctx.nobles.per_province = {
             pid: [0] * pcount
             for pid in ctx.provinces.keys()
         }
-        
+
+        if ctx.history is not None:
+            ctx.journal = GameJournal(seed=ctx.settings.seed, map_name=ctx.map.name)
+
         return StateID.GAMEPLAY
 
 
@@ -2111,45 +1949,34 @@ class GameplayState(BaseState):
         self._start_round(ctx)
 
     def _start_round(self, ctx: GameContext) -> None:
-        ctx.round_status.sejm_canceled = False
-        ctx.round_status.admin_yield = 2  
-        ctx.round_status.prusy_estate_income_penalty = 0
-        ctx.round_status.discount_litwa_wplyw_pos = 0
-        ctx.round_status.extra_honor_vs_tatars = False
-        ctx.round_status.recruit_cost_override = None
-        ctx.round_status.zamoznosc_cost_override = None
-        ctx.round_status.fairs_plus_one_income = False
-        ctx.round_status.artillery_defense_active = False
-        ctx.round_status.artillery_defense_used = [False] * len(ctx.settings.players)
-        ctx.round_status.sejm_tiebreak_wlkp = False
-        ctx.round_status.wlkp_influence_cost_override = None
-        ctx.round_status.wlkp_estate_cost_override = None
-
-
-        println(f"=== ROUND {ctx.round_status.current_round} / {ctx.round_status.total_rounds} ===")
-        self.round_engine = RoundEngine([
-            EventsPhase(),  
-            IncomePhase(),
-            AuctionPhase(),
-            SejmPhase(),
-            ActionPhase(),
-            PlayerBattlePhase(),
-            EnemyReinforcementPhase(),
-            AttackInvadersPhase(),
-            DevastationPhase(),   
-        ])
-        self.round_engine.start(ctx)
+        with memspan(ctx, "_start_round"):
+            commit(ctx, rules.StartRound())  # czyści efekty wydarzeń z poprzedniej rundy
+
+            println(f"=== ROUND {ctx.round_status.current_round} / {ctx.round_status.total_rounds} ===")
+            if ctx.autosave is not None:
+                ctx.autosave.checkpoint(ctx, 0)
+            engine = self._engine(ctx)
+        engine.start(ctx)
+
+    def resume(self, ctx: GameContext, index: int) -> None:
+        """Wejście w rozgrywkę z punktu kontrolnego: bieżąca runda od fazy `index`."""
+        println("=== GAMEPLAY ===")
+        println(f"=== ROUND {ctx.round_status.current_round} / {ctx.round_status.total_rounds} (wznowienie) ===")
+        self._engine(ctx).start(ctx, index)
+
+    def _engine(self, ctx: GameContext) -> RoundEngine:
+        """Silnik rundy z instancjami faz budowanymi raz (kolejne rundy i partie je resetują)."""
+        if self.round_engine is None or self.round_engine.order != ctx.settings.phase_order:
+            self.round_engine = RoundEngine(build_phases(ctx.settings.phase_order))
+        return self.round_engine
 
     def tick(self, ctx: GameContext) -> Optional[StateID]:
         assert self.round_engine is not None
         self.round_engine.step(ctx)
         if self.round_engine.finished():
             if ctx.round_status.current_round < ctx.round_status.total_rounds:
-                ctx.round_status.current_round += 1
-                # rotate marshal
-                ctx.round_status.marshal_index = (ctx.round_status.marshal_index + 1) % len(ctx.settings.players)
-                # reset wybranej ustawy na następną rundę
-                ctx.round_status.last_law = None
+                # kolejna runda, rotacja marszałka, reset wybranej ustawy
+                commit(ctx, rules.EndRound())
                 self._start_round(ctx)
             else:
                 return StateID.GAME_OVER
@@ -2168,6 +1995,13 @@ class GameOverState(BaseState):
         for p in ctx.settings.players:
             tag = " (MAJORITY)" if p.majority else ""
             println(f"  {p.name}: {p.score} points, {p.gold} gold, {p.honor} honor{tag}")
+        if ctx.history is not None and ctx.journal is not None:
+            ctx.history.add(ctx.journal.finish(snapshot(ctx)))
+            ctx.journal = None
+        if ctx.memprofile is not None:
+            sizes = container_sizes(ctx, "ctx")
+            sizes.update(cache_sizes((rules, battle, sys.modules[__name__])))
+            ctx.memprofile.game_done(sizes)
 
     def tick(self, ctx: GameContext) -> Optional[StateID]:
         again = prompt("Play again? [y/N]: ").strip().lower()
@@ -2185,8 +2019,9 @@ class StateMachine:
         self.states = states
         self.current: BaseState = self.states[start]
 
-    def run(self, ctx: GameContext) -> None:
-        self.current.enter(ctx)
+    def run(self, ctx: GameContext, entered: bool = False) -> None:
+        if not entered:  # wznowiona partia wchodzi w stan sama (GameplayState.resume)
+            self.current.enter(ctx)
         while True:
             nxt = self.current.tick(ctx)
             if nxt is None:
@@ -2201,14 +2036,87 @@ class StateMachine:
 # --------------- Entry Point --------------- #
 
 def main(argv: List[str]) -> int:
-    ctx = GameContext()
+    parser = argparse.ArgumentParser(description="Dzieje Rzeczypospolitej szlacheckiej — wersja konsolowa.")
+    parser.add_argument("--map", default=str(DEFAULT_MAP_PATH), help="plik mapy (JSON), domyślnie maps/rzeczpospolita.json")
+    parser.add_argument("--script", help="plik z poleceniami (jedna odpowiedź na linię, ';' łączy polecenia); potem wejście z klawiatury")
+    parser.add_argument("--seed", type=int, help="ziarno losowania (powtarzalne partie)")
+    parser.add_argument("--rules", help="plik JSON z parametrami zasad (pola rules.RulesConfig), np. {\"start_gold\": 8}")
+    parser.add_argument("--history", help="plik bazy SQLite, do którego dopisywane są ukończone partie")
+    parser.add_argument("--whatif", type=float, default=0.0, metavar="SEKUNDY",
+                        help="przed wyborem ustawy pokaż tabelę skutków wszystkich opcji (budżet dogrywek)")
+    parser.add_argument("--tactical", action="store_true",
+                        help="potyczki graczy rozgrywane na planszy taktycznej (battle.py) zamiast rzutów")
+    parser.add_argument("--headless", action="store_true",
+                        help="partia bez zbędnych pytań (np. ze --script): bez statystyk po fazach, "
+                             "kości dezercji i doktryny bitew z ctx.rng")
+    parser.add_argument("--autosave", metavar="PLIK", help="punkt kontrolny partii zapisywany po każdej fazie")
+    parser.add_argument("--autosave-every", choices=("phase", "input"), default="phase",
+                        help="'input': zapis także po każdej odpowiedzi na prompt (domyślnie 'phase')")
+    parser.add_argument("--resume", metavar="PLIK",
+                        help="wznów partię z punktu kontrolnego (mapa, zasady i ziarno z pliku; zapis dalej do niego)")
+    parser.add_argument("--phases", metavar="FAZY",
+                        help="kolejność faz rundy, nazwy po przecinku (wariant zasad), np. bez ArsonPhase")
+    parser.add_argument("--memprofile", action="store_true",
+                        help="profil pamięci (tracemalloc) per faza i per partia; raport na stderr po wyjściu")
+    parser.add_argument("--selftest", action="store_true",
+                        help="kontrola regresji kernela zasad i adaptera konsoli na partiach botów, potem wyjście")
+    args = parser.parse_args(argv[1:])
+    if args.selftest:
+        print(selftest())
+        return 0
+
+    global _recorder
+    checkpoint = load_checkpoint(args.resume) if args.resume else None
+    if checkpoint is not None:
+        ctx = context_from_checkpoint(checkpoint)
+        _script.extend(checkpoint["inputs"])  # postęp wewnątrz fazy: odpowiedzi od ostatniej granicy
+        map_path = checkpoint["map"]
+    else:
+        settings = Settings(whatif=args.whatif, tactical=args.tactical, headless=args.headless)
+        if args.phases:
+            settings.phase_order = tuple(name.strip() for name in args.phases.split(",") if name.strip())
+            try:
+                build_phases(settings.phase_order)
+            except ValueError as e:
+                parser.error(str(e))
+        if args.rules:
+            with open(args.rules, encoding="utf-8") as f:
+                settings.config = rules.RulesConfig.from_dict(json.load(f))
+        ctx = GameContext(settings=settings, map=load_map(args.map))
+        if args.seed is not None:
+            ctx.settings.seed = args.seed
+            ctx.rng = random.Random(args.seed)
+        map_path = args.map
+    if args.history:
+        ctx.history = HistoryStore(args.history)
+        if ctx.journal is None and checkpoint is not None:
+            ctx.journal = GameJournal(seed=ctx.settings.seed, map_name=ctx.map.name)
+    autosave_path = args.autosave or args.resume
+    if autosave_path:
+        ctx.autosave = Autosave(autosave_path, map_path, every_input=args.autosave_every == "input")
+        if checkpoint is not None:
+            ctx.autosave.rebase(checkpoint)
+        _recorder = ctx.autosave.answered
+    if args.memprofile:
+        ctx.memprofile = MemProfile()
+    command_parser(ctx.map)  # drzewa poleceń budujemy przy starcie, nie przy pierwszej akcji
+    if args.script:
+        stream_commands(args.script)
     states: Dict[StateID, BaseState] = {
         StateID.START_MENU: StartMenuState(),
         StateID.GAMEPLAY: GameplayState(),
         StateID.GAME_OVER: GameOverState(),
     }
-    sm = StateMachine(states, start=StateID.START_MENU)
-    sm.run(ctx)
+    sm = StateMachine(states, start=StateID.GAMEPLAY if checkpoint is not None else StateID.START_MENU)
+    try:
+        if checkpoint is not None:
+            states[StateID.GAMEPLAY].resume(ctx, checkpoint["phase"])
+        sm.run(ctx, entered=checkpoint is not None)
+    finally:
+        if ctx.history is not None:
+            ctx.history.close()
+    if ctx.memprofile is not None:
+        print(ctx.memprofile.report(), file=sys.stderr)
     return 0
 
 
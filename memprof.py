@@ -0,0 +1,207 @@
+"""
+Memory profiling
+----------------
+
+Gdzie idzie pamięć w długich przebiegach: tracemalloc liczy bajty, a sys.getallocatedblocks
+bloki. Każdy odcinek (`MemProfile.span`, np. faza rundy, show_player_stats, budowa faz
+w _start_round) dopisuje do swojej pozycji przyrost netto (bajty i bloki, które przetrwały
+odcinek) oraz szczyt ponad stan z początku — ten łapie pamięć chwilową, np. budowane i od razu
+drukowane napisy. Odcinki mogą się zagnieżdżać; liczby rodzica obejmują dzieci.
+
+Po każdej partii (`game_done`) robimy gc.collect() i zdjęcie tracemalloc. Pierwsza partia
+to rozgrzewka (cache, importy); przyrost kolejnych względem niej to pamięć zatrzymywana między
+partiami — raport pokazuje tempo wzrostu na partię, miejsca w kodzie, które rosną, oraz rozmiary
+kontenerów (listy kontekstu gry, cache lru), które zmieniły się od rozgrzewki.
+
+    $ python memprof.py --games 50 --bot heuristic     # partie sim.py w jednym procesie
+    $ python main.py --memprofile < partia.txt         # konsola: raport na stderr po wyjściu
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields, is_dataclass
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import argparse
+import fnmatch
+import gc
+import random
+import sys
+import tracemalloc
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, fnmatch.__file__),   # dopasowywanie samych filtrów
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+@dataclass
+class SpanStats:
+    calls: int = 0
+    bytes: int = 0       # przyrost netto (suma po wywołaniach)
+    blocks: int = 0      # przyrost netto bloków
+    peak: int = 0        # największy szczyt ponad stan z początku odcinka
+
+
+@dataclass
+class GameMem:
+    traced: int          # bajty śledzone przez tracemalloc po partii (po gc)
+    blocks: int
+    sizes: Dict[str, int] = field(default_factory=dict)
+
+
+class MemProfile:
+    def __init__(self, frames: int = 1, top: int = 10) -> None:
+        self.top = top
+        self.spans: Dict[str, SpanStats] = {}
+        self.games: List[GameMem] = []
+        self._stack: List[List[int]] = []    # [bajty na starcie, bloki na starcie, szczyt]
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._last: Optional[tracemalloc.Snapshot] = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        tracemalloc.take_snapshot().filter_traces(_FILTERS)  # rozgrzewa cache fnmatch/re filtrów
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:   # szczyt rodzica do tej chwili, zanim go wyzerujemy
+            self._stack[-1][2] = max(self._stack[-1][2], peak)
+        tracemalloc.reset_peak()
+        frame = [current, sys.getallocatedblocks(), current]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            current, peak = tracemalloc.get_traced_memory()
+            blocks = sys.getallocatedblocks()
+            peak = max(frame[2], peak)
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], peak)
+            tracemalloc.reset_peak()
+            st = self.spans.get(name)
+            if st is None:
+                st = self.spans[name] = SpanStats()
+            st.calls += 1
+            st.bytes += current - frame[0]
+            st.blocks += blocks - frame[1]
+            st.peak = max(st.peak, peak - frame[0])
+
+    def game_done(self, sizes: Optional[Dict[str, int]] = None) -> None:
+        gc.collect()
+        snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        self.games.append(GameMem(tracemalloc.get_traced_memory()[0], sys.getallocatedblocks(), dict(sizes or {})))
+        if self._baseline is None:
+            self._baseline = snap
+        self._last = snap
+
+    def growth(self) -> Optional[float]:
+        """Przyrost bajtów na partię po rozgrzewce (prosta najmniejszych kwadratów), gdy są ≥3 partie."""
+        ys = [g.traced for g in self.games[1:]]
+        n = len(ys)
+        if n < 2:
+            return None
+        mx, my = (n - 1) / 2, sum(ys) / n
+        return sum((i - mx) * (y - my) for i, y in enumerate(ys)) / sum((i - mx) ** 2 for i in range(n))
+
+    def report(self) -> str:
+        lines = ["--- Pamięć wg odcinków (suma po wywołaniach) ---",
+                 f"{'odcinek':<28} {'wywołań':>8} {'netto KiB':>10} {'bloki':>8} {'szczyt KiB':>11}"]
+        for name, st in sorted(self.spans.items(), key=lambda kv: -kv[1].peak):
+            lines.append(f"{name:<28} {st.calls:8d} {st.bytes / 1024:10.1f} {st.blocks:8d} {st.peak / 1024:11.1f}")
+        if not self.games:
+            return "\n".join(lines)
+
+        lines.append("")
+        lines.append("--- Pamięć po partiach (po gc) ---")
+        for i, g in enumerate(self.games, 1):
+            delta = g.traced - self.games[i - 2].traced if i > 1 else 0
+            lines.append(f"partia {i:4d}: {g.traced / 1024:10.1f} KiB ({delta / 1024:+.1f}), bloki {g.blocks}")
+        rate = self.growth()
+        if rate is not None:
+            lines.append(f"Wzrost po rozgrzewce: {rate / 1024:+.2f} KiB/partię")
+        first, last = self.games[0].sizes, self.games[-1].sizes
+        changed = [(k, first.get(k, 0), v) for k, v in last.items() if v != first.get(k, 0)]
+        if changed:
+            lines.append("Kontenery zmienione od pierwszej partii:")
+            lines.extend(f"  {k}: {a} -> {b}" for k, a, b in sorted(changed, key=lambda c: -abs(c[2] - c[1])))
+        if self._last is not None and self._last is not self._baseline:
+            stats = [s for s in self._last.compare_to(self._baseline, "lineno") if s.size_diff > 0][:self.top]
+            if stats:
+                lines.append("Miejsca zatrzymujące pamięć od pierwszej partii:")
+                lines.extend(f"  {s.traceback}: {s.size_diff / 1024:+.1f} KiB, {s.count_diff:+d} bloków" for s in stats)
+        return "\n".join(lines)
+
+
+# --------------- Rozmiary kontenerów --------------- #
+
+def container_sizes(obj: Any, prefix: str = "", depth: int = 2) -> Dict[str, int]:
+    """
+    Długości list/słowników/napisów w polach obiektu (dataclass albo zwykłego), rekurencyjnie do
+    `depth` poziomów — np. container_sizes(ctx, "ctx") daje {'ctx.settings.players': 3, ...}.
+    """
+    out: Dict[str, int] = {}
+    if is_dataclass(obj):
+        items: Iterable = ((f.name, getattr(obj, f.name)) for f in fields(obj))
+    elif hasattr(obj, "__dict__"):
+        items = vars(obj).items()
+    else:
+        return out
+    for name, value in items:
+        if isinstance(value, MemProfile):   # sam profil nie jest częścią mierzonego stanu
+            continue
+        path = f"{prefix}.{name}" if prefix else name
+        if hasattr(value, "__len__") and not isinstance(value, type):
+            out[path] = len(value)
+        elif depth > 0 and (is_dataclass(value) or hasattr(value, "__dict__")) and not isinstance(value, (type, Enum)):
+            out.update(container_sizes(value, path, depth - 1))
+    return out
+
+
+def cache_sizes(modules: Iterable[Any]) -> Dict[str, int]:
+    """Bieżące rozmiary funkcji z functools.lru_cache w podanych modułach."""
+    out: Dict[str, int] = {}
+    for mod in modules:
+        for name, value in vars(mod).items():
+            info = getattr(value, "cache_info", None)
+            if callable(info):
+                out[f"{mod.__name__}.{name}()"] = info().currsize
+    return out
+
+
+# --------------- CLI --------------- #
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Profil pamięci partii symulacji (tracemalloc) w jednym procesie.")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bot", default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=1, help="głębokość stosu zapamiętywana przy alokacji")
+    parser.add_argument("--top", type=int, default=10, help="ile miejsc zatrzymujących pamięć pokazać")
+    args = parser.parse_args(argv[1:])
+
+    prof = MemProfile(args.frames, args.top)
+    # dopiero tutaj: main.py importuje ten moduł, a sim importuje main
+    import battle
+    import main as console
+    import rules
+    import sim
+    board = sim.map_for().board
+    for g in range(args.games):
+        seed = args.seed + g
+        bots = [sim.BOTS[args.bot](i, random.Random(f"{seed}:{i}")) for i in range(args.players)]
+        sim.Simulation(board, bots, args.rounds, seed=seed, profile=prof).run()
+        prof.game_done(cache_sizes((rules, sim, battle, console)))
+    print(prof.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,196 @@
+"""
+Odds tables
+-----------
+
+Tabele prawdopodobieństw dla interfejsu w przeglądarce (app.js, battle.html), liczone z kernela
+zasad zamiast przepisywania matematyki do JS. Skutek pojedynczego rzutu k6 bierzemy z zasad
+(rules.duel_kills, rules.reinforcement, rules.AttackRoll i rules.RaidTarget na małym stanie),
+a rozkłady dla wielu kości liczymy dokładnie, rzut po rzucie. Plik JSON to same tablice
+indeksowane liczbami, więc front wczytuje go raz i odczytuje komórkę w O(1):
+
+- duel.kills[n][k]            — P(k trafień z n kości) w potyczce graczy (PlayerBattlePhase),
+- duel.at_least[n][k]         — P(co najmniej k trafień z n kości),
+- attack.plain[t][u][r][l]    — atak u jednostkami na tor t (AttackInvadersPhase): P(tor −r, strata l),
+- attack.artillery[t][u][r][l] — to samo z Artylerią koronną (+1 kość),
+- attack.clear_*[t][u]        — P(zbicia toru do 0); attack.honor_*[t][u] — oczekiwany honor,
+- reinforce.delta[x]          — P(wzmocnienia toru o +x) (EnemyReinforcementPhase),
+- plunder.after_reinforce[t]  — P(tor t po wzmocnieniu osiągnie próg spustoszenia),
+- plunder.target[i]           — P(i-tej prowincji pary jako celu najazdu).
+
+    $ python odds.py --out odds.json --max-track 10 --max-units 10
+"""
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import Any, Dict, List, Sequence, Tuple
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import rules
+from main import DEFAULT_MAP_PATH, load_map
+
+ODDS_VERSION = 1
+_FACES = range(1, 7)
+
+
+# --------------- Skutki pojedynczych rzutów --------------- #
+
+def _probe(board: rules.Board, track: int, units: int) -> rules.GameState:
+    """Jeden gracz z `units` piechoty w prowincji 0, wszystkie tory na `track`."""
+    state = rules.new_game(board, ("A",), 1)
+    troops = list(state.troops)
+    troops[rules.UNITS.index("P")] = units
+    return replace(state, tracks=(track,) * len(rules.TRACKS), troops=tuple(troops))
+
+
+def attack_effects(board: rules.Board) -> List[Tuple[int, int]]:
+    """Dla rzutów 1..6 w ataku na najeźdźcę: (spadek toru, strata jednostek) wg rules.AttackRoll."""
+    state = _probe(board, 2, 1)
+    out = []
+    for roll in _FACES:
+        after = rules.step(state, rules.AttackRoll(0, "N", 0, roll))
+        out.append((2 - after.track("N"), 1 - after.units(0, 0)))
+    return out
+
+
+def target_split(board: rules.Board, config: rules.RulesConfig) -> List[float]:
+    """P(pierwszej / drugiej prowincji pary jako celu) wg rules.RaidTarget."""
+    key = next(k for k in rules.TRACKS if k in board.plunder)
+    state = replace(_probe(board, config.plunder_threshold, 0), config=config)
+    hits = [0, 0]
+    for roll in _FACES:
+        prov = rules.step(state, rules.RaidTarget(key, roll)).flags.raid_targets[0][1]
+        hits[board.plunder[key].index(prov)] += 1
+    return [h / 6 for h in hits]
+
+
+# --------------- Rozkłady --------------- #
+
+def kills_table(max_dice: int) -> List[List[float]]:
+    """kills[n][k]: rozkład trafień z n kości potyczki (rzut po rzucie)."""
+    per_roll = [0.0] * 2
+    for roll in _FACES:
+        per_roll[rules.duel_kills((roll,))] += 1 / 6
+    rows = [[1.0]]
+    for _ in range(max_dice):
+        prev = rows[-1]
+        row = [0.0] * (len(prev) + 1)
+        for k, p in enumerate(prev):
+            for hit, q in enumerate(per_roll):
+                row[k + hit] += p * q
+        rows.append(row)
+    return rows
+
+
+def attack_outcome(track: int, units: int, bonus: int, effects: Sequence[Tuple[int, int]]) -> List[List[float]]:
+    """
+    P[r][l]: atak `units` jednostkami (+`bonus` kości) na tor `track`. Jak w AttackInvadersPhase
+    rzucamy kolejno, a gdy tor spadnie do 0, atak się kończy; strata nie przekracza `units`.
+    """
+    dist: Dict[Tuple[int, int], float] = {(0, 0): 1.0}
+    for _ in range(units + bonus):
+        nxt: Dict[Tuple[int, int], float] = {}
+        for (r, l), p in dist.items():
+            if r >= track:
+                nxt[r, l] = nxt.get((r, l), 0.0) + p
+                continue
+            for dr, dl in effects:
+                key = (min(track, r + dr), min(units, l + dl))
+                nxt[key] = nxt.get(key, 0.0) + p / 6
+        dist = nxt
+    out = [[0.0] * (units + 1) for _ in range(track + 1)]
+    for (r, l), p in dist.items():
+        out[r][l] += p
+    return out
+
+
+def expected_rolls(track: int, units: int, bonus: int, effects: Sequence[Tuple[int, int]]) -> float:
+    """Oczekiwana liczba rzutów ataku (każdy daje 1 honoru; Wiedeń dokłada drugi przeciw Tatarom)."""
+    reduce = sum(1 for dr, _ in effects if dr) / 6
+    alive = {0: 1.0}   # spadek toru -> P(atak trwa)
+    total = 0.0
+    for _ in range(units + bonus):
+        total += sum(p for r, p in alive.items() if r < track)
+        nxt: Dict[int, float] = {}
+        for r, p in alive.items():
+            if r >= track:
+                nxt[r] = nxt.get(r, 0.0) + p
+            else:
+                nxt[r + 1] = nxt.get(r + 1, 0.0) + p * reduce
+                nxt[r] = nxt.get(r, 0.0) + p * (1 - reduce)
+        alive = nxt
+    return total
+
+
+def build(board: rules.Board, config: rules.RulesConfig = rules.DEFAULT_RULES,
+          max_track: int = 10, max_units: int = 10, digits: int = 6) -> Dict[str, Any]:
+    """Wszystkie tabele jako słownik gotowy do json.dump (prawdopodobieństwa zaokrąglone do `digits`)."""
+    def rnd(x: Any) -> Any:
+        return [rnd(v) for v in x] if isinstance(x, list) else round(x, digits)
+
+    kills = kills_table(max_units)
+    at_least = [[sum(row[k:]) for k in range(len(row))] for row in kills]
+    effects = attack_effects(board)
+    attack: Dict[str, Any] = {"effects": [list(e) for e in effects]}
+    for label, bonus in (("plain", 0), ("artillery", 1)):
+        outcome = [[attack_outcome(t, u, bonus, effects) for u in range(max_units + 1)] for t in range(max_track + 1)]
+        attack[label] = rnd(outcome)
+        attack["clear_" + label] = rnd([[sum(table[t]) for table in row] for t, row in enumerate(outcome)])
+        attack["honor_" + label] = rnd([[expected_rolls(t, u, bonus, effects) for u in range(max_units + 1)]
+                                        for t in range(max_track + 1)])
+    delta = [0.0] * 3
+    for roll in _FACES:
+        delta[rules.reinforcement(roll)] += 1 / 6
+    thr = config.plunder_threshold
+    return {
+        "version": ODDS_VERSION,
+        "rules": config.to_dict(),
+        "max_track": max_track,
+        "max_units": max_units,
+        "duel": {"kills": rnd(kills), "at_least": rnd(at_least)},
+        "attack": attack,
+        "reinforce": {"delta": rnd(delta)},
+        "plunder": {
+            "threshold": thr,
+            "after_reinforce": rnd([sum(p for x, p in enumerate(delta) if t + x >= thr) for t in range(max_track + 1)]),
+            "target": rnd(target_split(board, config)),
+        },
+    }
+
+
+def save(data: Dict[str, Any], path: str) -> None:
+    """Zwarty JSON, zapis atomowy (plik tymczasowy + os.replace) — serwer nie poda połowy pliku."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+# --------------- CLI --------------- #
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Tabele szans (potyczki, ataki na najeźdźców, najazdy) jako JSON dla UI.")
+    parser.add_argument("--out", default="odds.json")
+    parser.add_argument("--map", default=str(DEFAULT_MAP_PATH))
+    parser.add_argument("--rules", help="plik JSON z parametrami zasad (pola rules.RulesConfig)")
+    parser.add_argument("--max-track", type=int, default=10)
+    parser.add_argument("--max-units", type=int, default=10)
+    parser.add_argument("--digits", type=int, default=6, help="miejsca po przecinku prawdopodobieństw")
+    args = parser.parse_args(argv[1:])
+
+    config = rules.DEFAULT_RULES
+    if args.rules:
+        with open(args.rules, encoding="utf-8") as f:
+            config = rules.RulesConfig.from_dict(json.load(f))
+    data = build(load_map(args.map).board, config, args.max_track, args.max_units, args.digits)
+    save(data, args.out)
+    print(f"Zapisano {args.out} ({os.path.getsize(args.out)} B)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
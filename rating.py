@@ -0,0 +1,257 @@
+"""
+Rating ladder
+-------------
+
+Ranking botów i graczy z wyników partii wieloosobowych. Każdy uczestnik ma ocenę gaussowską
+(μ, σ); po każdej partii kolejność wyników (rules.score_breakdown, remisy jako remisy) zmienia
+oceny wszystkich przy stole przybliżeniem bayesowskim Wenga–Lina (model Bradleya–Terry'ego, pełne
+pary). Aktualizacja jest przyrostowa — wyniki można dokładać na bieżąco — a ranking da się też
+przeliczyć od zera z bazy historii (history.HistoryStore).
+
+Zamiast pełnego turnieju każdy z każdym `suggest` dobiera następny stół: uczestników o największej
+niepewności (σ), z podobnym μ, bo taka partia mówi najwięcej o kolejności. Do porównania
+kilkudziesięciu wersji bota wystarcza ułamek partii pełnego turnieju.
+
+    $ python rating.py run --entrant random --entrant heuristic --entrant tuned=weights.json --games 300
+    $ python rating.py history games.db
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from math import exp, sqrt
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+
+import rules
+import sim
+from history import GameRecord, HistoryStore
+
+MU = 25.0
+SIGMA = MU / 3
+BETA = SIGMA / 2          # szum wyniku pojedynczej partii
+KAPPA = 1e-4              # dolne ograniczenie współczynnika zmniejszania wariancji
+
+
+@dataclass
+class Rating:
+    mu: float = MU
+    sigma: float = SIGMA
+    games: int = 0
+
+    @property
+    def conservative(self) -> float:
+        """μ − 3σ: ocena, której gracz z dużym prawdopodobieństwem nie jest gorszy (do sortowania)."""
+        return self.mu - 3 * self.sigma
+
+
+class Ladder:
+    """Oceny uczestników; `tau` dodaje wariancję przed każdą partią (dla graczy, którzy się zmieniają)."""
+
+    def __init__(self, beta: float = BETA, tau: float = 0.0) -> None:
+        self.beta = beta
+        self.tau = tau
+        self.ratings: Dict[str, Rating] = {}
+        self.games = 0
+
+    def rating(self, name: str) -> Rating:
+        return self.ratings.setdefault(name, Rating())
+
+    def update(self, table: Sequence[Tuple[str, float]]) -> None:
+        """Jedna partia: (uczestnik, wynik) wg miejsc; wyższy wynik = lepsze miejsce."""
+        players = [self.rating(name) for name, _ in table]
+        scores = [score for _, score in table]
+        if len(set(map(id, players))) != len(players):
+            raise ValueError("Ten sam uczestnik dwa razy przy stole.")
+        two_beta2 = 2 * self.beta ** 2
+        var = [p.sigma ** 2 + self.tau ** 2 for p in players]
+        deltas = []
+        for i, pi in enumerate(players):
+            omega = delta = 0.0
+            for q, pq in enumerate(players):
+                if q == i:
+                    continue
+                c = sqrt(var[i] + var[q] + two_beta2)
+                e_i, e_q = exp(pi.mu / c), exp(pq.mu / c)
+                p_iq = e_i / (e_i + e_q)
+                s = 1.0 if scores[i] > scores[q] else 0.5 if scores[i] == scores[q] else 0.0
+                omega += var[i] / c * (s - p_iq)
+                gamma = sqrt(var[i]) / c
+                delta += gamma * var[i] / (c * c) * p_iq * (1 - p_iq)
+            deltas.append((omega, delta))
+        for p, v, (omega, delta) in zip(players, var, deltas):
+            p.mu += omega
+            p.sigma = sqrt(v * max(1 - delta, KAPPA))
+            p.games += 1
+        self.games += 1
+
+    def update_record(self, rec: GameRecord) -> None:
+        self.update([(name, sl.total) for name, sl in zip(rec.names, rec.final)])
+
+    @classmethod
+    def from_history(cls, store: HistoryStore, beta: float = BETA, tau: float = 0.0,
+                     names: Optional[Iterable[str]] = None) -> "Ladder":
+        """Ranking przeliczony od zera ze wszystkich partii w bazie (opcjonalnie tylko stoły z `names`)."""
+        ladder = cls(beta, tau)
+        allowed = set(names) if names is not None else None
+        for _, table in store.standings():
+            if allowed is not None and not all(name in allowed for name, _ in table):
+                continue
+            if len({name for name, _ in table}) != len(table):
+                continue  # ten sam gracz na kilku miejscach (np. gra „sam ze sobą”) — bez informacji
+            ladder.update(table)
+        return ladder
+
+    def leaderboard(self) -> List[Tuple[str, Rating]]:
+        return sorted(self.ratings.items(), key=lambda kv: -kv[1].conservative)
+
+    # --- dobór stołu ---
+    def quality(self, names: Sequence[str]) -> float:
+        """Użyteczność stołu: łączna niepewność × bliskość ocen (jak prawdopodobieństwo remisu w TrueSkill)."""
+        rs = [self.rating(n) for n in names]
+        closeness = 1.0
+        for a, b in itertools.combinations(rs, 2):
+            spread = 2 * self.beta ** 2 + a.sigma ** 2 + b.sigma ** 2
+            closeness *= sqrt(2 * self.beta ** 2 / spread) * exp(-(a.mu - b.mu) ** 2 / (2 * spread))
+        pairs = len(rs) * (len(rs) - 1) // 2
+        return sum(r.sigma ** 2 for r in rs) * closeness ** (1 / max(1, pairs))
+
+    def suggest(self, pool: Sequence[str], players: int, rng: random.Random, samples: int = 200) -> List[str]:
+        """
+        Następny stół z `pool`: najlepszy wg `quality` spośród wszystkich kombinacji (albo `samples`
+        losowych, gdy jest ich więcej); kolejność miejsc losowa, żeby nie faworyzować pierwszego gracza.
+        """
+        if players > len(pool):
+            raise ValueError(f"Za mało uczestników ({len(pool)}) na stół {players}-osobowy.")
+        combos = list(itertools.islice(itertools.combinations(pool, players), samples + 1))
+        if len(combos) > samples:
+            combos = [tuple(rng.sample(list(pool), players)) for _ in range(samples)]
+        best = list(max(combos, key=self.quality))
+        rng.shuffle(best)
+        return best
+
+    # --- zapis ---
+    def to_dict(self) -> Dict[str, object]:
+        return {"beta": self.beta, "tau": self.tau, "games": self.games,
+                "ratings": {name: asdict(r) for name, r in self.ratings.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Ladder":
+        ladder = cls(data["beta"], data["tau"])
+        ladder.games = data["games"]
+        ladder.ratings = {name: Rating(**r) for name, r in data["ratings"].items()}
+        return ladder
+
+    def save(self, path: str) -> None:
+        """Atomowy zapis (plik tymczasowy + os.replace), jak punkty kontrolne tune.py."""
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Ladder":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# --------------- Uczestnicy --------------- #
+
+BotFactory = Callable[[int, random.Random], sim.RandomBot]
+
+
+def entrant(spec: str) -> Tuple[str, BotFactory]:
+    """`random`, `heuristic` albo `nazwa=wagi.json` (bot heurystyczny z wagami z pliku)."""
+    name, sep, path = spec.partition("=")
+    if not sep:
+        if spec not in sim.BOTS:
+            raise ValueError(f"Nieznany bot: {spec} (dostępne: {', '.join(sorted(sim.BOTS))})")
+        return spec, sim.BOTS[spec]
+    weights = sim.Weights.load(path)
+
+    def factory(seat: int, rng: random.Random) -> sim.RandomBot:
+        return sim.HeuristicBot(seat, rng, weights)
+    return name, factory
+
+
+def run_ladder(ladder: Ladder, entrants: Dict[str, BotFactory], games: int, players: int = 3,
+               rounds: int = 3, config: rules.RulesConfig = rules.DEFAULT_RULES, seed: int = 0,
+               store: Optional[HistoryStore] = None) -> Ladder:
+    """
+    Rozgrywa `games` partii stołami z `suggest` i aktualizuje ranking po każdej. Ziarna idą dalej
+    od `ladder.games`, więc wznowiony ranking nie powtarza partii.
+    """
+    pool = sorted(entrants)
+    for _ in range(games):
+        game_seed = seed * 1_000_003 + ladder.games
+        names = ladder.suggest(pool, players, random.Random(game_seed))
+        rec = sim.play(players, rounds, config, game_seed, lineup=[entrants[n] for n in names], names=names)
+        ladder.update_record(rec)
+        if store is not None:
+            store.add(rec)
+    return ladder
+
+
+def format_leaderboard(ladder: Ladder) -> str:
+    lines = [f"{'#':>3} {'uczestnik':<20} {'μ':>7} {'σ':>6} {'μ−3σ':>7} {'partie':>7}"]
+    for i, (name, r) in enumerate(ladder.leaderboard(), 1):
+        lines.append(f"{i:>3} {name:<20} {r.mu:7.2f} {r.sigma:6.2f} {r.conservative:7.2f} {r.games:7d}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Ranking botów i graczy (oceny gaussowskie, dobór stołów wg niepewności).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="rozgrywa partie i aktualizuje ranking")
+    run.add_argument("--entrant", action="append", required=True, metavar="BOT|NAZWA=WAGI.json")
+    run.add_argument("--games", type=int, default=100)
+    run.add_argument("--players", type=int, default=3)
+    run.add_argument("--rounds", type=int, default=3)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--tau", type=float, help="dryf umiejętności między partiami (domyślnie z pliku rankingu, nowy: 0)")
+    run.add_argument("--ratings", default="ratings.json", help="plik rankingu (wczytywany, jeśli istnieje)")
+    run.add_argument("--history", help="zapisuj partie do bazy historii")
+
+    hist = sub.add_parser("history", help="przelicza ranking od zera z bazy historii")
+    hist.add_argument("db")
+    hist.add_argument("--tau", type=float, default=0.0, help="dryf umiejętności między partiami (gracze ludzie)")
+    hist.add_argument("--out", help="zapisz ranking do pliku JSON")
+    args = parser.parse_args(argv[1:])
+
+    if args.command == "history":
+        with HistoryStore(args.db) as store:
+            ladder = Ladder.from_history(store, tau=args.tau)
+        print(format_leaderboard(ladder))
+        if args.out:
+            ladder.save(args.out)
+        return 0
+
+    try:
+        entrants = dict(entrant(spec) for spec in args.entrant)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if args.players > len(entrants):
+        parser.error(f"Za mało uczestników ({len(entrants)}) na stół {args.players}-osobowy (--players).")
+    ladder = Ladder.load(args.ratings) if os.path.exists(args.ratings) else Ladder()
+    if args.tau is not None:
+        ladder.tau = args.tau
+    store = HistoryStore(args.history) if args.history else None
+    try:
+        run_ladder(ladder, entrants, args.games, args.players, args.rounds, seed=args.seed, store=store)
+    finally:
+        if store is not None:
+            store.close()
+    ladder.save(args.ratings)
+    print(format_leaderboard(ladder))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,1715 @@
+"""
+Rules kernel
+------------
+
+Czysty rdzeń zasad gry: niemutowalny, hashowalny stan (`GameState`) i funkcja przejścia
+`step(state, decision) -> state` dla każdego typu decyzji (wydarzenie, oferta, ustawa, wariant,
+akcja, rzuty w potyczce, podpalenie, rzut ataku, rzut obrony, rzut spustoszenia, ...).
+
+Kernel nie pyta, nie drukuje i nie losuje. Wszystko, co losowe albo wybierane przez gracza,
+przychodzi w decyzji (np. wylosowana prowincja fortu, ofiary dezercji). Komunikaty dla gracza
+zwracamy obok stanu (`apply` -> `Transition(state, notes)`), a niedozwolone decyzje kończą się
+wyjątkiem `IllegalMove` z komunikatem do wyświetlenia.
+
+Fazy w main.py są cienkimi adapterami: zbierają wejście, budują decyzję, wołają `apply`
+i przepisują nowy stan do `GameContext`. Ten sam kernel mogą bezpiecznie wołać wyszukiwanie,
+symulacje i analityka — także z wielu wątków, bo nic tu nie jest współdzielone ani mutowane.
+"""
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Any, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+import hashlib
+import json
+
+# --------------- Stałe zasad --------------- #
+
+TRACKS: Tuple[str, ...] = ("N", "S", "E")
+TRACK_NAMES = {"N": "Szwecja", "S": "Tatarzy", "E": "Moskwa"}
+UNITS: Tuple[str, ...] = ("P", "K")
+UNIT_NAMES = {"P": "Piechota", "K": "Kawaleria"}
+
+START_GOLD = 6
+ESTATE_SLOTS = 5
+WEALTH_MAX = 3
+START_WEALTH = 2
+ADMIN_YIELD = 2
+ACTION_COST = {
+    "wplyw": 2,
+    "posiadlosc": 2,
+    "rekrutacja": 2,
+    "marsz": 0,
+    "zamoznosc": 2,
+    "administracja": 0,
+}
+RECRUIT_COST = {"P": 2, "K": 3}  # kawaleria droższa (jak w game.js)
+MARCH_RANGE = 2                  # marsz po sąsiednich prowincjach; podwójny marsz to jedna akcja
+PLUNDER_THRESHOLD = 3            # tor ≥ 3 -> spustoszenie
+UPKEEP_PER_UNIT = 1              # żołd za jedną jednostkę (zł)
+DESERTION_MAX_ROLL = 3           # k6: 1–3 dezercja, 4–6 jednostka zostaje
+EVENT_COUNT = 25
+GOLD_PER_POINT = 3               # punktacja końcowa: każde 3 zł = 1 pkt
+
+
+@dataclass(frozen=True)
+class RulesConfig:
+    """
+    Stałe balansu w jednym miejscu. Stan gry niesie swoją konfigurację (`GameState.config`),
+    więc ten sam kernel gra partie o różnych zasadach, np. w przeglądzie parametrów (sweep.py).
+    Domyślne wartości to zasady podstawowe (stałe modułu powyżej).
+    """
+    start_gold: int = START_GOLD
+    estate_slots: int = ESTATE_SLOTS
+    wealth_max: int = WEALTH_MAX
+    start_wealth: int = START_WEALTH
+    admin_yield: int = ADMIN_YIELD
+    cost_wplyw: int = ACTION_COST["wplyw"]
+    cost_posiadlosc: int = ACTION_COST["posiadlosc"]
+    cost_rekrutacja: int = ACTION_COST["rekrutacja"]
+    cost_marsz: int = ACTION_COST["marsz"]
+    cost_zamoznosc: int = ACTION_COST["zamoznosc"]
+    cost_administracja: int = ACTION_COST["administracja"]
+    recruit_p: int = RECRUIT_COST["P"]
+    recruit_k: int = RECRUIT_COST["K"]
+    march_range: int = MARCH_RANGE
+    plunder_threshold: int = PLUNDER_THRESHOLD
+    upkeep_per_unit: int = UPKEEP_PER_UNIT
+    desertion_max_roll: int = DESERTION_MAX_ROLL
+    gold_per_point: int = GOLD_PER_POINT
+
+    def action_cost(self, kind: str) -> int:
+        """Bazowy koszt akcji (bez modyfikatorów wydarzeń); KeyError dla nieznanej akcji."""
+        if kind not in ACTION_COST:
+            raise KeyError(kind)
+        return getattr(self, "cost_" + kind)
+
+    def recruit_cost(self, unit: str) -> int:
+        return self.recruit_k if unit == "K" else self.recruit_p
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "RulesConfig":
+        """Konfiguracja z (częściowego) słownika; nieznane klucze to błąd, brakujące — wartości domyślne."""
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError("Nieznane parametry zasad: " + ", ".join(sorted(unknown)))
+        return cls(**{k: int(v) for k, v in data.items()})
+
+    def digest(self) -> str:
+        """Stabilny skrót (sha256) konfiguracji — klucz cache wyników."""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()
+
+
+DEFAULT_RULES = RulesConfig()
+
+
+class IllegalMove(ValueError):
+    """Decyzja niezgodna z zasadami w danym stanie; treść wyjątku to komunikat dla gracza."""
+
+
+# --------------- Plansza (dane mapy) --------------- #
+
+@dataclass(frozen=True, eq=False)
+class Board:
+    """
+    Niezmienne dane mapy w postaci indeksowej: prowincje to 0..V-1, tory to klucze z TRACKS.
+    Porównanie i hash po tożsamości — jedna plansza na wczytaną mapę.
+
+    Przy budowie z macierzy odległości liczymy dla każdej prowincji pozostałe posortowane po
+    odległości (pierścienie) oraz maski bitowe zasięgu 1..d kroków: `reachable` kosztuje tyle,
+    ile wynosi wynik, a `within` i `reach_mask` O(1).
+    """
+    keys: Tuple[str, ...]
+    names: Tuple[str, ...]
+    border: Tuple[int, ...]
+    dist: Tuple[Tuple[int, ...], ...]           # -1 = nieosiągalne
+    attack_from: Dict[str, FrozenSet[int]]
+    plunder: Dict[str, Tuple[int, int]]
+    slot: Dict[str, int] = field(init=False, repr=False)
+    _rings: Tuple[Tuple[int, ...], ...] = field(init=False, repr=False)      # [źródło] -> prowincje 1..∞ kroków
+    _ring_end: Tuple[Tuple[int, ...], ...] = field(init=False, repr=False)   # [źródło][d] -> koniec zasięgu d
+    _reach: Tuple[Tuple[int, ...], ...] = field(init=False, repr=False)      # [źródło][d] -> maska zasięgu 1..d
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "slot", {k: i for i, k in enumerate(self.keys)})
+        rings, ring_end, reach = [], [], []
+        for row in self.dist:
+            order = sorted((j for j, d in enumerate(row) if d > 0), key=lambda j: row[j])
+            far = row[order[-1]] if order else 0
+            ends, masks, k, mask = [0], [0], 0, 0
+            for d in range(1, far + 1):
+                while k < len(order) and row[order[k]] == d:
+                    mask |= 1 << order[k]
+                    k += 1
+                ends.append(k)
+                masks.append(mask)
+            rings.append(tuple(order))
+            ring_end.append(tuple(ends))
+            reach.append(tuple(masks))
+        object.__setattr__(self, "_rings", tuple(rings))
+        object.__setattr__(self, "_ring_end", tuple(ring_end))
+        object.__setattr__(self, "_reach", tuple(reach))
+
+    def reachable(self, src: int, max_steps: int) -> Tuple[int, ...]:
+        """Prowincje w odległości 1..max_steps od `src`, od najbliższych."""
+        if max_steps <= 0:
+            return ()
+        ends = self._ring_end[src]
+        return self._rings[src][:ends[min(max_steps, len(ends) - 1)]]
+
+    def within(self, src: int, dst: int, max_steps: int) -> bool:
+        """Czy `dst` jest w odległości 1..max_steps od `src`."""
+        return 0 < self.dist[src][dst] <= max_steps
+
+    def reach_mask(self, src: int, max_steps: int) -> int:
+        """Maska bitowa prowincji w odległości 1..max_steps od `src`."""
+        if max_steps <= 0:
+            return 0
+        masks = self._reach[src]
+        return masks[min(max_steps, len(masks) - 1)]
+
+
+# --------------- Stan --------------- #
+
+@dataclass(frozen=True)
+class PlayerState:
+    gold: int = START_GOLD
+    honor: int = 0
+    majority: bool = False
+    last_bid: int = 0
+
+
+@dataclass(frozen=True)
+class ProvinceState:
+    fort: bool = False
+    estates: Tuple[int, ...] = (-1,) * ESTATE_SLOTS  # -1 = wolny slot, inaczej miejsce gracza
+    wealth: int = START_WEALTH
+
+
+@dataclass(frozen=True)
+class RoundFlags:
+    """Efekty obowiązujące do końca rundy (nazwy pól jak w RoundStatus)."""
+    sejm_canceled: bool = False
+    admin_yield: int = ADMIN_YIELD
+    prusy_estate_income_penalty: int = 0
+    discount_litwa_wplyw_pos: int = 0
+    extra_honor_vs_tatars: bool = False
+    recruit_cost_override: Optional[int] = None
+    zamoznosc_cost_override: Optional[int] = None
+    fairs_plus_one_income: bool = False
+    artillery_defense_active: bool = False
+    artillery_defense_used: Tuple[bool, ...] = ()
+    sejm_tiebreak_wlkp: bool = False
+    wlkp_influence_cost_override: Optional[int] = None
+    wlkp_estate_cost_override: Optional[int] = None
+    raid_targets: Tuple[Tuple[str, int, int], ...] = ()   # obrona kraju: (tor, prowincja celu, wróg)
+
+
+@dataclass(frozen=True)
+class GameState:
+    board: Board
+    names: Tuple[str, ...]
+    players: Tuple[PlayerState, ...]
+    provinces: Tuple[ProvinceState, ...]
+    tracks: Tuple[int, ...]              # wartości torów w kolejności TRACKS
+    troops: Tuple[int, ...]              # [prowincja × gracz × typ jednostki]
+    nobles: Tuple[int, ...]              # [prowincja × gracz]
+    round: int = 1
+    total_rounds: int = 3
+    marshal: int = 0
+    last_law: Optional[int] = None
+    last_law_choice: Optional[str] = None
+    flags: RoundFlags = RoundFlags()
+    config: RulesConfig = DEFAULT_RULES
+    # Indeksy dla zapytań o wojska, podpalenia i obronę: liczone przy pierwszym zapytaniu, potem
+    # utrzymywane przez przejścia kernela (_Work). init=False, więc replace() i wczytanie stanu liczą je od nowa.
+    _estate_top: Optional[Tuple[int, ...]] = field(default=None, init=False, repr=False, compare=False)
+    _presence: Optional[Tuple[int, ...]] = field(default=None, init=False, repr=False, compare=False)
+    _stacks: Optional[Tuple[int, ...]] = field(default=None, init=False, repr=False, compare=False)
+    _player_units: Optional[Tuple[int, ...]] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def pcount(self) -> int:
+        return len(self.players)
+
+    def estate_tops(self) -> Tuple[int, ...]:
+        """Ostatni zajęty slot posiadłości każdej prowincji (-1 = brak)."""
+        if self._estate_top is None:
+            object.__setattr__(self, "_estate_top", tuple(_top_slot(p.estates) for p in self.provinces))
+        return self._estate_top
+
+    def presence(self) -> Tuple[int, ...]:
+        """Dla każdego gracza maska bitowa prowincji (bit `prov`), w których ma wojsko."""
+        if self._presence is None:
+            n, stacks = self.pcount, self.stacks()
+            object.__setattr__(self, "_presence", tuple(
+                sum(1 << prov for prov, u in enumerate(stacks[seat::n]) if u > 0) for seat in range(n)))
+        return self._presence
+
+    def stacks(self) -> Tuple[int, ...]:
+        """Jednostki gracza na prowincji (wszystkie typy), płasko [prowincja × gracz]."""
+        if self._stacks is None:
+            t, k = self.troops, len(UNITS)
+            object.__setattr__(self, "_stacks", tuple(sum(t[i:i + k]) for i in range(0, len(t), k)))
+        return self._stacks
+
+    def player_totals(self) -> Tuple[int, ...]:
+        """Wszystkie jednostki każdego gracza."""
+        if self._player_units is None:
+            n, stacks = self.pcount, self.stacks()
+            object.__setattr__(self, "_player_units", tuple(sum(stacks[seat::n]) for seat in range(n)))
+        return self._player_units
+
+    def track(self, key: str) -> int:
+        return self.tracks[TRACKS.index(key)]
+
+    def units(self, prov: int, seat: int, utype: Optional[str] = None) -> int:
+        if utype is None:
+            return self.stacks()[prov * self.pcount + seat]
+        return self.troops[(prov * self.pcount + seat) * len(UNITS) + UNITS.index(utype)]
+
+    def player_units(self, seat: int) -> int:
+        return self.player_totals()[seat]
+
+    def noble_count(self, prov: int, seat: int) -> int:
+        return self.nobles[prov * self.pcount + seat]
+
+
+def carry_indexes(state: GameState, prev: Optional[GameState]) -> GameState:
+    """
+    Przenosi do `state` indeksy `prev`, których dane źródłowe to w obu stanach te same obiekty
+    (krotka wojsk, krotki posiadłości prowincji) — np. gdy adapter konsoli składa stan z powrotem
+    z wartości przepisanych z `prev`. Inaczej indeksy zostają do policzenia przy pierwszym zapytaniu.
+    """
+    if prev is None or prev.board is not state.board or prev.pcount != state.pcount:
+        return state
+    if state.troops is prev.troops:
+        for name in ("_stacks", "_player_units", "_presence"):
+            object.__setattr__(state, name, getattr(prev, name))
+    if prev._estate_top is not None and all(a.estates is b.estates for a, b in zip(state.provinces, prev.provinces)):
+        object.__setattr__(state, "_estate_top", prev._estate_top)
+    return state
+
+
+def _top_slot(estates: Sequence[int]) -> int:
+    for i in range(len(estates) - 1, -1, -1):
+        if estates[i] != -1:
+            return i
+    return -1
+
+
+def new_game(board: Board, names: Tuple[str, ...], total_rounds: int = 3,
+             config: RulesConfig = DEFAULT_RULES) -> GameState:
+    """Stan początkowy: puste prowincje, tory na 0, każdy gracz ze złotem startowym."""
+    n = len(names)
+    v = len(board.keys)
+    return GameState(
+        board=board,
+        names=tuple(names),
+        players=tuple(PlayerState(gold=config.start_gold) for _ in range(n)),
+        provinces=tuple(ProvinceState(False, (-1,) * config.estate_slots, config.start_wealth) for _ in range(v)),
+        tracks=(0,) * len(TRACKS),
+        troops=(0,) * (v * n * len(UNITS)),
+        nobles=(0,) * (v * n),
+        total_rounds=total_rounds,
+        flags=RoundFlags(admin_yield=config.admin_yield, artillery_defense_used=(False,) * n),
+        config=config,
+    )
+
+
+def _tuples(value: Any) -> Any:
+    """Listy z JSON-a z powrotem w krotki (stan musi być hashowalny)."""
+    return tuple(_tuples(v) for v in value) if isinstance(value, list) else value
+
+
+def state_to_dict(state: GameState) -> Dict[str, Any]:
+    """Postać JSON stanu bez planszy (tę odtwarza się z mapy), np. do punktów kontrolnych gry."""
+    return {
+        "names": list(state.names),
+        "players": [[p.gold, p.honor, p.majority, p.last_bid] for p in state.players],
+        "provinces": [[p.fort, list(p.estates), p.wealth] for p in state.provinces],
+        "tracks": list(state.tracks),
+        "troops": list(state.troops),
+        "nobles": list(state.nobles),
+        "round": state.round,
+        "total_rounds": state.total_rounds,
+        "marshal": state.marshal,
+        "last_law": state.last_law,
+        "last_law_choice": state.last_law_choice,
+        "flags": asdict(state.flags),
+        "config": state.config.to_dict(),
+    }
+
+
+def state_from_dict(board: Board, data: Mapping[str, Any]) -> GameState:
+    return GameState(
+        board=board,
+        names=tuple(data["names"]),
+        players=tuple(PlayerState(*p) for p in data["players"]),
+        provinces=tuple(ProvinceState(f, tuple(e), w) for f, e, w in data["provinces"]),
+        tracks=tuple(data["tracks"]),
+        troops=tuple(data["troops"]),
+        nobles=tuple(data["nobles"]),
+        round=data["round"],
+        total_rounds=data["total_rounds"],
+        marshal=data["marshal"],
+        last_law=data["last_law"],
+        last_law_choice=data["last_law_choice"],
+        flags=RoundFlags(**{k: _tuples(v) for k, v in data["flags"].items()}),
+        config=RulesConfig.from_dict(data["config"]),
+    )
+
+
+# --------------- Zapytania (czyste) --------------- #
+
+def influence_winners(state: GameState, prov: int) -> List[int]:
+    """
+    Gracze mający kontrolę (wpływ) w prowincji: najwięcej szlachciców; remis rozstrzyga
+    obecność wojska, jeśli dokładnie jeden z remisujących je ma; inaczej kontrolę mają wszyscy remisujący.
+    """
+    n = state.pcount
+    nobles = state.nobles[prov * n:(prov + 1) * n]
+    max_n = max(nobles) if nobles else 0
+    if max_n == 0:
+        return []
+    leaders = [i for i, v in enumerate(nobles) if v == max_n]
+    if len(leaders) == 1:
+        return leaders
+    with_troops = [i for i in leaders if state.units(prov, i) > 0]
+    if len(with_troops) == 1:
+        return with_troops
+    return leaders
+
+
+def single_controller(state: GameState, prov: int) -> Optional[int]:
+    winners = influence_winners(state, prov)
+    return winners[0] if len(winners) == 1 else None
+
+
+def controlled(state: GameState, seat: int) -> List[int]:
+    """Prowincje, w których gracz jest jedynym kontrolującym."""
+    return [p for p in range(len(state.provinces)) if single_controller(state, p) == seat]
+
+
+def estate_income(wealth: int) -> int:
+    """Dochód z jednej posiadłości wg zamożności: 0–1 -> 0; 2 -> 1; 3 -> 2."""
+    w = max(0, min(WEALTH_MAX, int(wealth)))
+    if w <= 1:
+        return 0
+    if w == 2:
+        return 1
+    return 2
+
+
+def march_targets(state: GameState, seat: int, src: int, max_steps: Optional[int] = None) -> List[int]:
+    """Dokąd gracz może pomaszerować z `src`: w zasięgu i ze swoim szlachcicem na celu."""
+    if max_steps is None:
+        max_steps = state.config.march_range
+    return [p for p in state.board.reachable(src, max_steps) if state.noble_count(p, seat) > 0]
+
+
+def march_reach(state: GameState, seat: int, max_steps: Optional[int] = None) -> int:
+    """
+    Maska bitowa prowincji, do których gracz może dojść marszem (1..max_steps kroków) z którejkolwiek
+    prowincji ze swoim wojskiem — suma masek zasięgu po bitach maski obecności, bez przeglądania mapy.
+    """
+    if max_steps is None:
+        max_steps = state.config.march_range
+    mask, out = state.presence()[seat], 0
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        out |= state.board.reach_mask(low.bit_length() - 1, max_steps)
+    return out
+
+
+def fortification_pool(state: GameState) -> List[int]:
+    """Kandydaci wydarzenia „Fortyfikacja pogranicza” (prowincje przygraniczne, najpierw bez fortu)."""
+    border = list(state.board.border)
+    no_fort = [p for p in border if not state.provinces[p].fort]
+    return no_fort if no_fort else border
+
+
+def roszady_candidates(state: GameState) -> List[Tuple[int, List[int]]]:
+    """Kandydaci „Magnackich roszad”: (prowincja, gracze ze szlachcicem) bez zwycięzcy licytacji."""
+    majority = next((i for i, p in enumerate(state.players) if p.majority), None)
+    out: List[Tuple[int, List[int]]] = []
+    for prov in range(len(state.provinces)):
+        present = [i for i in range(state.pcount) if state.noble_count(prov, i) > 0 and i != majority]
+        if present:
+            out.append((prov, present))
+    return out
+
+
+def last_estate(state: GameState, prov: int) -> Optional[Tuple[int, int]]:
+    """Ostatnia zajęta posiadłość prowincji: (slot, właściciel) albo None."""
+    slot = state.estate_tops()[prov]
+    return (slot, state.provinces[prov].estates[slot]) if slot >= 0 else None
+
+
+def arson_targets(state: GameState, seat: int) -> List[int]:
+    """
+    Prowincje, w których gracz ma wojsko, a ostatnia posiadłość należy do przeciwnika. Z indeksów
+    stanu: idziemy tylko po bitach maski wojsk gracza, bez przeglądania slotów.
+    """
+    tops = state.estate_tops()
+    mask = state.presence()[seat]
+    out = []
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        prov = low.bit_length() - 1
+        slot = tops[prov]
+        if slot >= 0 and state.provinces[prov].estates[slot] != seat:
+            out.append(prov)
+    return out
+
+
+def raid_target(state: GameState, key: str) -> Optional[Tuple[int, int]]:
+    """Cel najazdu toru wylosowany w fazie obrony: (prowincja, pozostały wróg) albo None."""
+    for track, prov, enemy in state.flags.raid_targets:
+        if track == key:
+            return prov, enemy
+    return None
+
+
+def defense_options(state: GameState, seat: int) -> List[Tuple[str, int]]:
+    """Dozwolone obrony: (tor, prowincja celu z wrogiem i własnym wojskiem)."""
+    mask = state.presence()[seat]
+    return [(key, prov) for key, prov, enemy in state.flags.raid_targets
+            if enemy > 0 and mask >> prov & 1]
+
+
+def attack_dice(state: GameState, seat: int, prov: int) -> int:
+    """Ile kości w ataku na najeźdźcę: jednostki + 1 za niewykorzystaną Artylerię koronną."""
+    dice = state.units(prov, seat)
+    flags = state.flags
+    if flags.artillery_defense_active and not flags.artillery_defense_used[seat]:
+        dice += 1
+    return dice
+
+
+def upkeep_split(state: GameState) -> List[Tuple[int, int]]:
+    """Dla każdego gracza (opłacone, nieopłacone) jednostki przy wypłacie żołdu."""
+    out = []
+    per_unit = state.config.upkeep_per_unit
+    for seat, p in enumerate(state.players):
+        units = state.player_units(seat)
+        paid = min(units, p.gold // per_unit) if per_unit > 0 else units
+        out.append((paid, units - paid))
+    return out
+
+
+def deserters(rolls: Tuple[int, ...], max_roll: int = DESERTION_MAX_ROLL) -> int:
+    return sum(1 for r in rolls if r <= max_roll)
+
+
+def reinforcement(roll: int) -> int:
+    """Wzmocnienie toru za rzut k6: 1–2:+0, 3–4:+1, 5–6:+2."""
+    if roll <= 2:
+        return 0
+    elif roll <= 4:
+        return 1
+    return 2
+
+
+def duel_kills(rolls: Tuple[int, ...]) -> int:
+    """Trafienia w potyczce: wynik 5–6 zabija 1 jednostkę przeciwnika."""
+    return sum(1 for r in rolls if r >= 5)
+
+
+def defense_losses(roll: int) -> Tuple[int, int]:
+    """Straty (obrońca, wróg) za rzut obrony k6: 1 → (1, 0); 2–5 → (1, 1); 6 → (0, 1)."""
+    if roll == 1:
+        return 1, 0
+    if roll <= 5:
+        return 1, 1
+    return 0, 1
+
+
+# --------------- Decyzje --------------- #
+
+@dataclass(frozen=True)
+class StartRound:
+    """Początek rundy: czyści efekty poprzedniej rundy."""
+
+@dataclass(frozen=True)
+class Event:
+    number: int
+    province: Optional[int] = None   # wylosowana prowincja (Fortyfikacja pogranicza, Magnackie roszady)
+    victim: Optional[int] = None     # wylosowany gracz (Magnackie roszady)
+
+@dataclass(frozen=True)
+class Income:
+    pass
+
+@dataclass(frozen=True)
+class OpenAuction:
+    pass
+
+@dataclass(frozen=True)
+class Bid:
+    seat: int
+    amount: int
+
+@dataclass(frozen=True)
+class CloseAuction:
+    pass
+
+@dataclass(frozen=True)
+class Law:
+    seat: int
+    law: int
+
+@dataclass(frozen=True)
+class Variant:
+    choice: Optional[str] = None                 # 'A'/'B' (Fortyfikacje: None)
+    track: Optional[str] = None                  # wybrany tor (warianty B)
+    picks: Tuple[Optional[int], ...] = ()        # prowincja na gracza (Pospolite ruszenie A, Fortyfikacje)
+
+@dataclass(frozen=True)
+class Action:
+    seat: int
+    kind: str
+    province: Optional[int] = None
+    target: Optional[int] = None                 # cel marszu
+    unit: Optional[str] = None                   # 'P'/'K'
+
+@dataclass(frozen=True)
+class Duel:
+    province: int
+    a: int
+    b: int
+    rolls_a: Tuple[int, ...]
+    rolls_b: Tuple[int, ...]
+
+@dataclass(frozen=True)
+class TacticalBattle:                            # potyczka z planszy taktycznej (battle.py) zamiast rzutów
+    province: int
+    a: int
+    b: int
+    losses_a: Tuple[int, ...]                    # zabici wg UNITS
+    losses_b: Tuple[int, ...]
+    loser: Optional[int] = None                  # pokonany (a albo b): jego ocalali rozpraszają się
+
+@dataclass(frozen=True)
+class Arson:
+    seat: int
+    province: int
+
+@dataclass(frozen=True)
+class Reinforce:
+    track: str
+    roll: int
+
+@dataclass(frozen=True)
+class Attack:
+    seat: int
+    track: str
+    province: int
+
+@dataclass(frozen=True)
+class AttackRoll:
+    seat: int
+    track: str
+    province: int
+    roll: int
+
+@dataclass(frozen=True)
+class RaidTarget:
+    track: str
+    roll: int                                    # k6: 1–3 pierwsza prowincja pary, 4–6 druga
+
+@dataclass(frozen=True)
+class Defend:
+    seat: int
+    track: str
+    province: int
+    roll: int
+
+@dataclass(frozen=True)
+class Plunder:
+    track: str
+    roll: Optional[int] = None                   # None: cel wylosowany już w fazie obrony (RaidTarget)
+
+@dataclass(frozen=True)
+class PayUpkeep:
+    pass
+
+@dataclass(frozen=True)
+class Desertion:
+    seat: int
+    rolls: Tuple[int, ...]
+    victims: Tuple[int, ...] = ()                # numery jednostek gracza (0..units-1) które odchodzą
+
+@dataclass(frozen=True)
+class EndRound:
+    pass
+
+
+Decision = Union[StartRound, Event, Income, OpenAuction, Bid, CloseAuction, Law, Variant, Action,
+                 Duel, TacticalBattle, Arson, Reinforce, Attack, AttackRoll, RaidTarget, Defend, Plunder,
+                 PayUpkeep, Desertion, EndRound]
+
+
+class Transition(NamedTuple):
+    state: GameState
+    notes: Tuple[str, ...]
+
+
+# --------------- Robocza kopia stanu --------------- #
+
+class _Work:
+    """Mutowalna kopia stanu na czas jednego przejścia; nie wychodzi poza kernel."""
+
+    def __init__(self, s: GameState) -> None:
+        self.s = s
+        self.b = s.board
+        self.n = s.pcount
+        self.gold = [p.gold for p in s.players]
+        self.honor = [p.honor for p in s.players]
+        self.majority = [p.majority for p in s.players]
+        self.last_bid = [p.last_bid for p in s.players]
+        self.fort = [p.fort for p in s.provinces]
+        self.estates = [list(p.estates) for p in s.provinces]
+        self.wealth = [p.wealth for p in s.provinces]
+        self.tracks = dict(zip(TRACKS, s.tracks))
+        self.troops = list(s.troops)
+        self.nobles = list(s.nobles)
+        self.flags = s.flags
+        self.cfg = s.config
+        self.round = s.round
+        self.marshal = s.marshal
+        self.last_law = s.last_law
+        self.last_law_choice = s.last_law_choice
+        # indeksy stanu jedziemy dalej tylko, jeśli już są (None: policzy je pierwsze zapytanie)
+        self.tops = list(s._estate_top) if s._estate_top is not None else None
+        self.presence = list(s._presence) if s._presence is not None else None
+        self.stacks = list(s._stacks) if s._stacks is not None else None
+        self.totals = list(s._player_units) if s._player_units is not None and self.stacks is not None else None
+        self.notes: List[str] = []
+
+    def freeze(self) -> GameState:
+        s = self.s
+        state = GameState(
+            board=s.board,
+            names=s.names,
+            players=tuple(PlayerState(g, h, m, lb) for g, h, m, lb
+                          in zip(self.gold, self.honor, self.majority, self.last_bid)),
+            provinces=tuple(ProvinceState(f, tuple(e), w) for f, e, w
+                            in zip(self.fort, self.estates, self.wealth)),
+            tracks=tuple(self.tracks[k] for k in TRACKS),
+            troops=tuple(self.troops),
+            nobles=tuple(self.nobles),
+            round=self.round,
+            total_rounds=s.total_rounds,
+            marshal=self.marshal,
+            last_law=self.last_law,
+            last_law_choice=self.last_law_choice,
+            flags=self.flags,
+            config=s.config,
+        )
+        if self.tops is not None:
+            object.__setattr__(state, "_estate_top", tuple(self.tops))
+        if self.presence is not None:
+            object.__setattr__(state, "_presence", tuple(self.presence))
+        if self.stacks is not None:
+            object.__setattr__(state, "_stacks", tuple(self.stacks))
+        if self.totals is not None:
+            object.__setattr__(state, "_player_units", tuple(self.totals))
+        return state
+
+    def note(self, msg: str) -> None:
+        self.notes.append(msg)
+
+    def name(self, seat: int) -> str:
+        return self.s.names[seat] if 0 <= seat < self.n else "?"
+
+    def pname(self, prov: int) -> str:
+        return self.b.names[prov]
+
+    def slot(self, key: str) -> Optional[int]:
+        return self.b.slot.get(key)
+
+    # --- wojska / szlachta ---
+    def _cell(self, prov: int, seat: int, utype: str) -> int:
+        return (prov * self.n + seat) * len(UNITS) + UNITS.index(utype)
+
+    def units(self, prov: int, seat: int, utype: Optional[str] = None) -> int:
+        if utype is not None:
+            return self.troops[self._cell(prov, seat, utype)]
+        if self.stacks is not None:
+            return self.stacks[prov * self.n + seat]
+        base = (prov * self.n + seat) * len(UNITS)
+        return sum(self.troops[base:base + len(UNITS)])
+
+    def players_on(self, prov: int) -> List[int]:
+        return [i for i in range(self.n) if self.units(prov, i) > 0]
+
+    def _troops_changed(self, prov: int, seat: int) -> None:
+        """Po każdej zmianie wojsk (prowincja, gracz): poprawia sumy i maskę obecności, jeśli stan je niesie."""
+        k = prov * self.n + seat
+        now = sum(self.troops[k * len(UNITS):(k + 1) * len(UNITS)])
+        if self.stacks is not None:
+            if self.totals is not None:
+                self.totals[seat] += now - self.stacks[k]
+            self.stacks[k] = now
+        if self.presence is not None:
+            if now > 0:
+                self.presence[seat] |= 1 << prov
+            else:
+                self.presence[seat] &= ~(1 << prov)
+
+    def add_units(self, prov: int, seat: int, delta: int, utype: Optional[str] = None) -> int:
+        """Dodaje typ `utype` (domyślnie piechota); przy odejmowaniu bez typu najpierw giną piechurzy."""
+        if delta > 0:
+            self.troops[self._cell(prov, seat, utype or "P")] += delta
+            self._troops_changed(prov, seat)
+        elif delta < 0:
+            self.remove_units(prov, seat, -delta, UNITS if utype is None else (utype,))
+        return self.units(prov, seat)
+
+    def remove_units(self, prov: int, seat: int, amount: int, order: Tuple[str, ...] = UNITS) -> int:
+        left = max(0, amount)
+        for ut in order:
+            c = self._cell(prov, seat, ut)
+            take = min(self.troops[c], left)
+            self.troops[c] -= take
+            left -= take
+        self._troops_changed(prov, seat)
+        return max(0, amount) - left
+
+    def nobles_of(self, prov: int, seat: int) -> int:
+        return self.nobles[prov * self.n + seat]
+
+    def add_nobles(self, prov: int, seat: int, delta: int) -> int:
+        k = prov * self.n + seat
+        self.nobles[k] = max(0, self.nobles[k] + delta)
+        return self.nobles[k]
+
+    def add_raid(self, key: str, delta: int) -> int:
+        self.tracks[key] += delta
+        return self.tracks[key]
+
+    def add_wealth(self, prov: int, delta: int) -> int:
+        self.wealth[prov] = max(0, min(self.cfg.wealth_max, self.wealth[prov] + delta))
+        return self.wealth[prov]
+
+    # --- posiadłości ---
+    def top_slot(self, prov: int) -> int:
+        """Ostatni zajęty slot prowincji (-1 = brak): z indeksu, gdy stan go niesie."""
+        return self.tops[prov] if self.tops is not None else _top_slot(self.estates[prov])
+
+    def _clear_slot(self, prov: int, i: int) -> None:
+        self.estates[prov][i] = -1
+        if self.tops is not None and self.tops[prov] == i:
+            self.tops[prov] = _top_slot(self.estates[prov])
+
+    def build_estate(self, prov: int, seat: int) -> bool:
+        slots = self.estates[prov]
+        for i, v in enumerate(slots):
+            if v == -1:
+                slots[i] = seat
+                if self.tops is not None and i > self.tops[prov]:
+                    self.tops[prov] = i
+                return True
+        return False
+
+    def remove_last_estate(self, prov: int, seat: int) -> bool:
+        slots = self.estates[prov]
+        for i in range(self.top_slot(prov), -1, -1):
+            if slots[i] == seat:
+                self._clear_slot(prov, i)
+                return True
+        return False
+
+    def destroy_last_estate_any(self, prov: int) -> Optional[int]:
+        i = self.top_slot(prov)
+        if i < 0:
+            return None
+        owner = self.estates[prov][i]
+        self._clear_slot(prov, i)
+        return owner
+
+    # --- kontrola (na bieżącym stanie roboczym) ---
+    def influence_winners(self, prov: int) -> List[int]:
+        nobles = self.nobles[prov * self.n:(prov + 1) * self.n]
+        max_n = max(nobles) if nobles else 0
+        if max_n == 0:
+            return []
+        leaders = [i for i, v in enumerate(nobles) if v == max_n]
+        if len(leaders) == 1:
+            return leaders
+        with_troops = [i for i in leaders if self.units(prov, i) > 0]
+        if len(with_troops) == 1:
+            return with_troops
+        return leaders
+
+    def single_controller(self, prov: int) -> Optional[int]:
+        winners = self.influence_winners(prov)
+        return winners[0] if len(winners) == 1 else None
+
+    def honor_for(self, seat: int, key: str) -> None:
+        self.honor[seat] += 1
+        if key == "S" and self.flags.extra_honor_vs_tatars:
+            self.honor[seat] += 1  # bonus z „Bitwy pod Wiedniem” (jeśli aktywny)
+
+
+# --------------- Wydarzenia --------------- #
+
+def _ev_liberum_veto(w: _Work, d: Event) -> None:
+    """Liberum veto – Sejm zerwany. W tej rundzie nie ma Sejmu (pomijacie licytację i efekt uchwały)."""
+    w.flags = replace(w.flags, sejm_canceled=True)
+    w.note("[Wydarzenia] Liberum veto – Sejm zerwany. W tej rundzie pomijacie licytację i ustawę.")
+
+def _ev_elekcja_viritim(w: _Work, d: Event) -> None:
+    """Elekcja viritim. W tej rundzie zwycięzca sejmu ciągnie 2 różne uchwały i wybiera 1."""
+    w.note("[Wydarzenia] Elekcja viritim — w tej rundzie zwycięzca sejmu ciągnie 2 różne uchwały i wybiera 1 do zastosowania.")
+
+def _ev_skarb_pusty(w: _Work, d: Event) -> None:
+    """Skarb pusty. Administracja daje 0 zł w tej rundzie."""
+    w.flags = replace(w.flags, admin_yield=0)
+    w.note("[Wydarzenia] Skarb pusty — w tej rundzie Administracja daje 0 zł.")
+
+def _ev_reformy_skarbowe(w: _Work, d: Event) -> None:
+    """Reformy skarbowe. Administracja daje +3 zł (zamiast 2) w tej rundzie."""
+    w.flags = replace(w.flags, admin_yield=3)
+    w.note("[Wydarzenia] Reformy skarbowe — w tej rundzie Administracja daje +3 zł (zamiast 2).")
+
+def _ev_potop_szwedzki(w: _Work, d: Event) -> None:
+    """Potop szwedzki. Natychmiast: tor Północ (N/Szwecja) +2."""
+    w.add_raid("N", +2)
+    w.note("[Wydarzenia] Potop szwedzki — Szwecja +2.")
+
+def _ev_wojna_polnocna(w: _Work, d: Event) -> None:
+    """Wojna północna. N +1 natychmiast; w tej rundzie dochód z posiadłości w Prusach −1 każda (min. 0)."""
+    w.add_raid("N", +1)
+    w.flags = replace(w.flags, prusy_estate_income_penalty=1)
+    w.note("[Wydarzenia] Wojna północna — Szwecja +1; w tej rundzie posiadłości w Prusach płacą o 1 mniej (min. 0).")
+
+def _ev_powstanie_chmielnickiego(w: _Work, d: Event) -> None:
+    """Powstanie Chmielnickiego. Natychmiast: E +1, S +1."""
+    w.add_raid("E", +1)
+    w.add_raid("S", +1)
+    w.note("[Wydarzenia] Powstanie Chmielnickiego — Moskwa +1, Tatarzy +1.")
+
+def _ev_kozacy_na_sluzbie(w: _Work, d: Event) -> None:
+    """Kozacy na służbie. Każdy gracz, który ma armię na Ukrainie, dostaje tam +1 jednostkę."""
+    prov = w.slot("UKRAINA")
+    if prov is None:
+        w.note("[Wydarzenia] Kozacy na służbie — na tej mapie nie ma Ukrainy (brak efektu).")
+        return
+    gains = []
+    for i in w.players_on(prov):
+        w.add_units(prov, i, +1)
+        gains.append(w.name(i))
+    if gains:
+        w.note("[Wydarzenia] Kozacy na służbie — +1 jednostka na Ukrainie dla: " + ", ".join(gains) + ".")
+    else:
+        w.note("[Wydarzenia] Kozacy na służbie — nikt nie ma tam armii (brak efektu).")
+
+def _ev_wojna_z_moskwa(w: _Work, d: Event) -> None:
+    """Wojna z Moskwą. E +2 natychmiast; w tej rundzie Wpływ/Posiadłość w Litwie kosztują −1 zł (min. 0)."""
+    w.add_raid("E", +2)
+    w.flags = replace(w.flags, discount_litwa_wplyw_pos=1)
+    w.note("[Wydarzenia] Wojna z Moskwą — Moskwa +2; w tej rundzie Wpływ/Posiadłość w Litwie tańsze o 1 zł.")
+
+def _ev_bitwa_pod_wiedniem(w: _Work, d: Event) -> None:
+    """Bitwa pod Wiedniem. S −1 natychmiast; w tej rundzie za ataki na Tatarów +1 honor dodatkowo."""
+    w.add_raid("S", -1)
+    w.flags = replace(w.flags, extra_honor_vs_tatars=True)
+    w.note("[Wydarzenia] Bitwa pod Wiedniem — Tatarzy −1; w tej rundzie dodatkowy +1 honor za ataki na Tatarów.")
+
+def _ev_pokoj_w_oliwie(w: _Work, d: Event) -> None:
+    """Pokój w Oliwie. N −1 natychmiast."""
+    w.add_raid("N", -1)
+    w.note("[Wydarzenia] Pokój w Oliwie — Szwecja −1.")
+
+def _ev_zaciag_pospolity(w: _Work, d: Event) -> None:
+    """Zaciąg pospolity. W tej rundzie Rekrutacja kosztuje 1 zł."""
+    w.flags = replace(w.flags, recruit_cost_override=1)
+    w.note("[Wydarzenia] Zaciąg pospolity — w tej rundzie Rekrutacja kosztuje 1 zł.")
+
+def _ev_fortyfikacja_pogranicza(w: _Work, d: Event) -> None:
+    """Fortyfikacja pogranicza. Wylosowana (d.province) prowincja przygraniczna dostaje fort."""
+    pool = fortification_pool(w.s)
+    if not pool:
+        w.note("[Wydarzenia] Fortyfikacja pogranicza — brak dostępnych prowincji.")
+        return
+    if d.province not in pool:
+        raise IllegalMove("Fortyfikacja pogranicza: prowincja spoza puli kandydatów.")
+    w.fort[d.province] = True
+    w.note(f"[Wydarzenia] Fortyfikacja pogranicza — fort w {w.pname(d.province)}.")
+
+def _ev_artyleria_koronna(w: _Work, d: Event) -> None:
+    """Artyleria koronna. W tej rundzie w pierwszej bitwie w obronie rzucasz +1 kością."""
+    w.flags = replace(w.flags, artillery_defense_active=True, artillery_defense_used=(False,) * w.n)
+    w.note("[Wydarzenia] Artyleria koronna — w tej rundzie pierwszy raz w obronie: +1 kość do rzutów.")
+
+def _ev_glod_ekonomia(w: _Work, d: Event) -> None:
+    """Głód (ekonomia). Natychmiast: w każdej prowincji o zamożności 3 obniż ją do 2."""
+    changed = []
+    for prov in range(len(w.wealth)):
+        if w.wealth[prov] >= 3:
+            w.wealth[prov] = 2
+            changed.append(w.pname(prov))
+    if changed:
+        w.note("[Wydarzenia] Głód — zamożność 3 → 2 w: " + ", ".join(changed) + ".")
+    else:
+        w.note("[Wydarzenia] Głód — brak prowincji o zamożności 3.")
+
+def _ev_susza(w: _Work, d: Event) -> None:
+    """Susza. W tej rundzie akcja Zamożność kosztuje 3 zł."""
+    w.flags = replace(w.flags, zamoznosc_cost_override=3)
+    w.note("[Wydarzenia] Susza — w tej rundzie Zamożność kosztuje 3 zł.")
+
+def _ev_urodzaj(w: _Work, d: Event) -> None:
+    """Urodzaj. W tej rundzie akcja Zamożność kosztuje 1 zł."""
+    w.flags = replace(w.flags, zamoznosc_cost_override=1)
+    w.note("[Wydarzenia] Urodzaj — w tej rundzie Zamożność kosztuje 1 zł.")
+
+def _ev_jarmarki_krolewskie(w: _Work, d: Event) -> None:
+    """Jarmarki królewskie. Na początku Dochodu każdy gracz dostaje +1 zł."""
+    w.flags = replace(w.flags, fairs_plus_one_income=True)
+    w.note("[Wydarzenia] Jarmarki królewskie — na początku Dochodu każdy otrzyma +1 zł.")
+
+def _ev_bunt_chlopski(w: _Work, d: Event) -> None:
+    """
+    Bunt chłopski. Każda prowincja o zamożności 0–1: jej jednoznaczny kontrolujący płaci 2 zł,
+    a jeśli nie może — traci 1 wpływ (szlachcica) w tej prowincji.
+    """
+    affected = []
+    for prov in range(len(w.wealth)):
+        if w.wealth[prov] <= 1:
+            ctrl = w.single_controller(prov)
+            if ctrl is None:
+                continue
+            if w.gold[ctrl] >= 2:
+                w.gold[ctrl] -= 2
+                affected.append(f"{w.pname(prov)}: {w.name(ctrl)} zapłacił 2 zł")
+            else:
+                w.add_nobles(prov, ctrl, -1)
+                affected.append(f"{w.pname(prov)}: {w.name(ctrl)} nie stać — −1 wpływ")
+    if affected:
+        w.note("[Wydarzenia] Bunt chłopski — " + "; ".join(affected) + ".")
+    else:
+        w.note("[Wydarzenia] Bunt chłopski — brak efektów.")
+
+def _ev_magnackie_roszady(w: _Work, d: Event) -> None:
+    """
+    Magnackie roszady. Z wylosowanej prowincji usuwamy 1 wpływ wylosowanego gracza
+    (nie zwycięzcy licytacji); losowanie z roszady_candidates() robi wołający.
+    """
+    candidates = dict(roszady_candidates(w.s))
+    if not candidates:
+        w.note("[Wydarzenia] Magnackie roszady — brak kandydatów (nikt, kogo można ruszyć).")
+        return
+    if d.victim not in candidates.get(d.province, ()):
+        raise IllegalMove("Magnackie roszady: wylosowany gracz/prowincja spoza kandydatów.")
+    w.add_nobles(d.province, d.victim, -1)
+    w.note(f"[Wydarzenia] Magnackie roszady — w {w.pname(d.province)} usunięto 1 wpływ gracza {w.name(d.victim)}.")
+
+def _ev_bunt_w_poznaniu(w: _Work, d: Event) -> None:
+    """Bunt w Poznaniu (Wlkp). Kontrolujący Wielkopolskę płaci 2 zł; jeśli nie może, traci ostatnią posiadłość w Wlkp."""
+    prov = w.slot("WIELKOPOLSKA")
+    ctrl = w.single_controller(prov) if prov is not None else None
+    if ctrl is None:
+        w.note("[Wydarzenia] Bunt w Poznaniu — nikt nie kontroluje Wlkp (brak efektu).")
+        return
+    name = w.name(ctrl)
+    if w.gold[ctrl] >= 2:
+        w.gold[ctrl] -= 2
+        w.note(f"[Wydarzenia] Bunt w Poznaniu — {name} zapłacił 2 zł.")
+    elif w.remove_last_estate(prov, ctrl):
+        w.note(f"[Wydarzenia] Bunt w Poznaniu — {name} nie stać, usunięto 1 posiadłość w Wlkp.")
+    else:
+        w.note(f"[Wydarzenia] Bunt w Poznaniu — {name} nie stać, ale nie miał posiadłości w Wlkp.")
+
+def _ev_sejmik_w_srodzie(w: _Work, d: Event) -> None:
+    """Sejmik w Środzie (Wlkp). W tej rundzie remisy w licytacji wygrywa kontrolujący Wlkp."""
+    w.flags = replace(w.flags, sejm_tiebreak_wlkp=True)
+    w.note("[Wydarzenia] Sejmik w Środzie — remisy w licytacji rozstrzyga kontrolujący Wlkp (w tej rundzie).")
+
+def _ev_pozar_w_poznaniu(w: _Work, d: Event) -> None:
+    """Pożar w Poznaniu (Wlkp). Zamożność Wlkp −1; kontrolujący płaci 2 zł albo traci ostatnią posiadłość."""
+    prov = w.slot("WIELKOPOLSKA")
+    if prov is None:
+        w.note("[Wydarzenia] Pożar w Poznaniu — na tej mapie nie ma Wielkopolski (brak efektu).")
+        return
+    w.add_wealth(prov, -1)
+    ctrl = w.single_controller(prov)
+    if ctrl is None:
+        w.note("[Wydarzenia] Pożar w Poznaniu — zamożność Wlkp −1; brak kontrolującego (brak dalszych efektów).")
+        return
+    name = w.name(ctrl)
+    if w.gold[ctrl] >= 2:
+        w.gold[ctrl] -= 2
+        w.note(f"[Wydarzenia] Pożar w Poznaniu — zamożność −1; {name} zapłacił 2 zł.")
+    elif w.remove_last_estate(prov, ctrl):
+        w.note(f"[Wydarzenia] Pożar w Poznaniu — zamożność −1; {name} nie stać — usunięto 1 posiadłość.")
+    else:
+        w.note(f"[Wydarzenia] Pożar w Poznaniu — zamożność −1; {name} nie stać i nie ma posiadłości do usunięcia.")
+
+def _ev_szlak_warta_odra(w: _Work, d: Event) -> None:
+    """Szlak handlowy Warta–Odra (Wlkp). W tej rundzie Wpływ w Wlkp = 1 zł, Posiadłość w Wlkp = 3 zł."""
+    w.flags = replace(w.flags, wlkp_influence_cost_override=1, wlkp_estate_cost_override=3)
+    w.note("[Wydarzenia] Szlak Warta–Odra — w tej rundzie Wplyw(Wlkp)=1 zł, Posiadlosc(Wlkp)=3 zł.")
+
+def _ev_cla_morskie(w: _Work, d: Event) -> None:
+    """Cła morskie (ekonomia – Północ). Gracz kontrolujący Prusy otrzymuje +2 zł."""
+    prov = w.slot("PRUSY")
+    ctrl = w.single_controller(prov) if prov is not None else None
+    if ctrl is not None:
+        w.gold[ctrl] += 2
+        w.note(f"[Wydarzenia] Cła morskie — {w.name(ctrl)} (kontroluje Prusy) otrzymuje +2 zł.")
+    else:
+        w.note("[Wydarzenia] Cła morskie — nikt nie kontroluje Prus (brak efektu).")
+
+
+EVENTS = {
+    1: _ev_liberum_veto,
+    2: _ev_elekcja_viritim,
+    3: _ev_skarb_pusty,
+    4: _ev_reformy_skarbowe,
+    5: _ev_potop_szwedzki,
+    6: _ev_wojna_polnocna,
+    7: _ev_powstanie_chmielnickiego,
+    8: _ev_kozacy_na_sluzbie,
+    9: _ev_wojna_z_moskwa,
+    10: _ev_bitwa_pod_wiedniem,
+    11: _ev_pokoj_w_oliwie,
+    12: _ev_zaciag_pospolity,
+    13: _ev_fortyfikacja_pogranicza,
+    14: _ev_artyleria_koronna,
+    15: _ev_glod_ekonomia,
+    16: _ev_susza,
+    17: _ev_urodzaj,
+    18: _ev_jarmarki_krolewskie,
+    19: _ev_bunt_chlopski,
+    20: _ev_magnackie_roszady,
+    21: _ev_bunt_w_poznaniu,
+    22: _ev_sejmik_w_srodzie,
+    23: _ev_pozar_w_poznaniu,
+    24: _ev_szlak_warta_odra,
+    25: _ev_cla_morskie,
+}
+
+
+# --------------- Przejścia --------------- #
+
+def _start_round(w: _Work, d: StartRound) -> None:
+    w.flags = RoundFlags(admin_yield=w.cfg.admin_yield, artillery_defense_used=(False,) * w.n)
+
+
+def _event(w: _Work, d: Event) -> None:
+    if not 1 <= d.number <= EVENT_COUNT:
+        raise IllegalMove("Nieprawidłowe — wpisz liczbę 1–25.")
+    effect = EVENTS.get(d.number)
+    if effect is None:
+        w.note(f"[Wydarzenia] Brak zdefiniowanego efektu dla #{d.number}. (Na razie nic się nie dzieje.)")
+        return
+    effect(w, d)
+
+
+def _income(w: _Work, d: Income) -> None:
+    gained_control = [0] * w.n
+    gained_estates = [0] * w.n
+    if w.flags.fairs_plus_one_income:
+        for i in range(w.n):
+            w.gold[i] += 1
+        w.note("[Dochód] Jarmarki królewskie: każdy gracz +1 zł na start.")
+
+    for prov, key in enumerate(w.b.keys):
+        single = w.single_controller(prov)
+        # (A) +1 za kontrolę — tylko jeśli kontrola jest jednoznaczna (brak remisu)
+        if single is not None:
+            w.gold[single] += 1
+            gained_control[single] += 1
+        # (B) dochód z posiadłości
+        per_estate = estate_income(w.wealth[prov])
+        if key == "PRUSY" and w.flags.prusy_estate_income_penalty > 0:
+            per_estate = max(0, per_estate - w.flags.prusy_estate_income_penalty)
+        if per_estate <= 0:
+            continue
+        if key == "WIELKOPOLSKA":
+            # Wielkopolska płaci tylko posiadłościom JEDNEGO kontrolującego
+            if single is not None:
+                for owner in w.estates[prov]:
+                    if owner == single:
+                        w.gold[owner] += per_estate
+                        gained_estates[owner] += per_estate
+        else:
+            for owner in w.estates[prov]:
+                if 0 <= owner < w.n:
+                    w.gold[owner] += per_estate
+                    gained_estates[owner] += per_estate
+
+    for i in range(w.n):
+        w.note(f"[Dochód] {w.name(i)}: +{gained_control[i]} (kontrola) +{gained_estates[i]} (posiadłości) "
+               f"= +{gained_control[i] + gained_estates[i]} zł. (razem złoto: {w.gold[i]})")
+
+
+def _open_auction(w: _Work, d: OpenAuction) -> None:
+    w.majority = [False] * w.n
+    w.last_bid = [0] * w.n
+
+
+def _bid(w: _Work, d: Bid) -> None:
+    if w.flags.sejm_canceled:
+        raise IllegalMove("Sejm zerwany — w tej rundzie nie ma licytacji.")
+    if d.amount < 0 or d.amount > w.gold[d.seat]:
+        raise IllegalMove(f"Nieprawidłowe. {w.name(d.seat)}, wpisz 0..{w.gold[d.seat]}: ")
+    w.last_bid[d.seat] = d.amount
+    w.note(f"{w.name(d.seat)} licytuje {d.amount} złota.")
+
+
+def _close_auction(w: _Work, d: CloseAuction) -> None:
+    bids = sorted(((b, i) for i, b in enumerate(w.last_bid)), reverse=True)
+    if not bids:
+        return
+    top_bid, top_idx = bids[0]
+    tie = len(bids) > 1 and bids[1][0] == top_bid
+    w.majority = [False] * w.n
+    if top_bid == 0:
+        w.note("[Auction] Brak ofert > 0 — nikt nie ma większości.")
+    elif tie:
+        # Sejmik w Środzie: remisy rozstrzyga kontrolujący Wlkp (jeśli jest wśród remisujących)
+        prov = w.slot("WIELKOPOLSKA")
+        if w.flags.sejm_tiebreak_wlkp and prov is not None:
+            ctrl = w.single_controller(prov)
+            if ctrl is not None and ctrl in [i for b, i in bids if b == top_bid]:
+                w.gold[ctrl] -= top_bid
+                w.majority[ctrl] = True
+                w.note(f"[Auction] Remis — tie-break Wlkp: większość zdobywa {w.name(ctrl)} (zapłacił {top_bid}).")
+                return
+        w.note("[Auction] Remis — nikt nie ma większości.")
+    else:
+        w.gold[top_idx] -= top_bid
+        w.majority[top_idx] = True
+        w.note(f"[Auction] Większość: {w.name(top_idx)} (zapłacił {top_bid}).")
+
+
+def _law(w: _Work, d: Law) -> None:
+    if w.flags.sejm_canceled or not w.majority[d.seat]:
+        raise IllegalMove("Ustawę wybiera tylko gracz z większością.")
+    if not 1 <= d.law <= 6:
+        raise IllegalMove("Nieprawidłowe. Wpisz liczbę 1..6: ")
+    w.last_law = d.law
+    w.last_law_choice = None
+    w.note(f"[Sejm] {w.name(d.seat)} wybrał ustawę nr {d.law}.")
+
+
+def _variant(w: _Work, d: Variant) -> None:
+    law = w.last_law
+    maj = next((i for i in range(w.n) if w.majority[i]), None)
+    if w.flags.sejm_canceled or law is None or maj is None:
+        raise IllegalMove("Brak ustawy do zastosowania.")
+    if law != 5 and d.choice not in ("A", "B"):
+        raise IllegalMove("Wpisz 'A' lub 'B'.")
+    if d.choice == "B" and law != 5 and law not in (1, 2) and d.track not in TRACKS:
+        raise IllegalMove("Podaj N/E/S.")
+    picks = tuple(d.picks) + (None,) * (w.n - len(d.picks))
+
+    if law in (1, 2):  # Podatek
+        w.last_law_choice = d.choice
+        if d.choice == "A":
+            for i in range(w.n):
+                w.gold[i] += 2
+            w.note("Każdy otrzymuje +2 zł.")
+        else:
+            for i in range(w.n):
+                w.gold[i] += 1
+            w.gold[maj] += 3  # 1 już dostał wyżej => 1+3 = 4
+            w.note(f"{w.name(maj)} (zwycięzca licytacji) otrzymuje łącznie +4 zł, pozostali +1 zł.")
+
+    elif law in (3, 4):  # Pospolite ruszenie
+        w.last_law_choice = d.choice
+        if d.choice == "A":
+            # każdy kontrolujący kładzie 1 wojsko w JEDNEJ kontrolowanej prowincji
+            for i in range(w.n):
+                prov = picks[i]
+                if prov is None:
+                    continue
+                if w.single_controller(prov) != i:
+                    raise IllegalMove(f"{w.name(i)} nie kontroluje {w.pname(prov)}.")
+                w.add_units(prov, i, 1)
+                w.note(f"  {w.name(i)}: +1 jednostka w {w.pname(prov)}")
+        else:
+            w.add_raid(d.track, -2)
+            w.note(f"Tor {TRACK_NAMES[d.track]} −2.")
+
+    elif law == 5:  # Fortyfikacje (A i B to samo)
+        for i in range(w.n):
+            prov = picks[i]
+            if prov is None:
+                continue
+            if w.single_controller(prov) != i or w.fort[prov]:
+                raise IllegalMove(f"{w.name(i)} nie może postawić fortu w {w.pname(prov)}.")
+            w.fort[prov] = True
+            w.note(f"  {w.name(i)}: fort w {w.pname(prov)}")
+
+    elif law == 6:  # Pokój
+        w.last_law_choice = d.choice
+        if d.choice == "A":
+            for key in ("N", "E", "S"):
+                w.add_raid(key, -1)
+            w.note("Wszystkie tory N/E/S −1.")
+        else:
+            w.add_raid(d.track, -2)
+            w.note(f"Tor {TRACK_NAMES[d.track]} −2.")
+
+
+def action_cost(state: GameState, d: Action) -> int:
+    """Koszt akcji po modyfikatorach rundy (wydarzenia)."""
+    flags = state.flags
+    base = state.config.action_cost(d.kind)
+    key = state.board.keys[d.province] if d.province is not None else None
+    if d.kind == "wplyw":
+        cost = base
+        if key == "WIELKOPOLSKA" and flags.wlkp_influence_cost_override is not None:
+            cost = flags.wlkp_influence_cost_override
+        if key == "LITWA" and flags.discount_litwa_wplyw_pos > 0:
+            cost = max(0, base - flags.discount_litwa_wplyw_pos)
+        return cost
+    if d.kind == "posiadlosc":
+        cost = base
+        if key == "WIELKOPOLSKA" and flags.wlkp_estate_cost_override is not None:
+            cost = flags.wlkp_estate_cost_override
+        if key == "LITWA" and flags.discount_litwa_wplyw_pos > 0:
+            cost = max(0, base - flags.discount_litwa_wplyw_pos)
+        return cost
+    if d.kind == "rekrutacja":
+        if flags.recruit_cost_override is not None:
+            return flags.recruit_cost_override
+        return state.config.recruit_cost(d.unit or "P")
+    if d.kind == "zamoznosc":
+        return flags.zamoznosc_cost_override if flags.zamoznosc_cost_override is not None else base
+    return base
+
+
+def _action(w: _Work, d: Action) -> None:
+    if d.kind not in ACTION_COST:
+        raise IllegalMove("Nieznana akcja. Spróbuj ponownie.")
+    seat, name = d.seat, w.name(d.seat)
+    base = w.cfg.action_cost(d.kind)
+    if w.gold[seat] < base:
+        raise IllegalMove(f"Za mało złota. Akcja '{d.kind}' kosztuje {base}, masz {w.gold[seat]}.")
+
+    if d.kind == "administracja":
+        gain = w.flags.admin_yield
+        w.gold[seat] += gain
+        w.note(f"{name} otrzymuje +{gain} zł (teraz {w.gold[seat]}).")
+        return
+
+    prov = d.province
+    if prov is None:
+        raise IllegalMove("Nie rozpoznano prowincji.")
+    pname = w.pname(prov)
+
+    if d.kind == "marsz":
+        dst = d.target
+        if dst is None:
+            raise IllegalMove("Nie rozpoznano prowincji.")
+        if w.nobles_of(prov, seat) <= 0 or w.nobles_of(dst, seat) <= 0:
+            raise IllegalMove("Marsz tylko między prowincjami, gdzie masz szlachcica na obu.")
+        reach = w.cfg.march_range
+        if not w.b.within(prov, dst, reach):
+            targets = ", ".join(w.pname(p) for p in march_targets(w.s, seat, prov, reach)) or "brak"
+            raise IllegalMove(f"Marsz tylko przez sąsiednie prowincje (do {reach} kroków). Możliwe cele: {targets}.")
+        if w.units(prov, seat, d.unit) < 1:
+            raise IllegalMove("Brak jednostek do przesunięcia na prowincji źródłowej.")
+        for ut in (UNITS if d.unit is None else (d.unit,)):
+            if w.units(prov, seat, ut) > 0:
+                w.troops[w._cell(prov, seat, ut)] -= 1
+                w.troops[w._cell(dst, seat, ut)] += 1
+                w._troops_changed(prov, seat)
+                w._troops_changed(dst, seat)
+                break
+        kind = f" ({UNIT_NAMES[d.unit].lower()})" if d.unit else ""
+        w.note(f"{name} maszeruje 1 jednostką{kind}: {pname} -> {w.pname(dst)}.")
+        return
+
+    cost = action_cost(w.s, d)
+    if d.kind in ("posiadlosc", "rekrutacja") and w.nobles_of(prov, seat) <= 0:
+        raise IllegalMove("Musisz mieć szlachcica na tej prowincji.")
+    if d.kind == "zamoznosc" and w.wealth[prov] >= w.cfg.wealth_max:
+        raise IllegalMove(f"Zamożność już wynosi {w.cfg.wealth_max} (maksimum).")
+    if w.gold[seat] < cost:
+        raise IllegalMove(f"Za mało złota. Akcja '{d.kind}' kosztuje {cost}, masz {w.gold[seat]}.")
+
+    if d.kind == "wplyw":
+        w.add_nobles(prov, seat, 1)
+        w.gold[seat] -= cost
+        w.note(f"{name} stawia szlachcica w {pname}. (złoto {w.gold[seat]}, koszt {cost})")
+    elif d.kind == "posiadlosc":
+        if not w.build_estate(prov, seat):
+            raise IllegalMove("Brak wolnych slotów posiadłości w tej prowincji.")
+        w.gold[seat] -= cost
+        w.note(f"{name} buduje posiadłość w {pname}. (złoto {w.gold[seat]}, koszt {cost})")
+    elif d.kind == "rekrutacja":
+        unit = d.unit or "P"
+        w.add_units(prov, seat, 1, unit)
+        w.gold[seat] -= cost
+        w.note(f"{name} rekrutuje 1 jednostkę ({UNIT_NAMES[unit].lower()}) w {pname}. (złoto {w.gold[seat]}, koszt {cost})")
+    elif d.kind == "zamoznosc":
+        before = w.wealth[prov]
+        w.add_wealth(prov, 1)
+        w.gold[seat] -= cost
+        w.note(f"{name} podnosi zamożność {pname} z {before} do {w.wealth[prov]}. (złoto {w.gold[seat]}, koszt {cost})")
+
+
+def _duel(w: _Work, d: Duel) -> None:
+    units_a, units_b = w.units(d.province, d.a), w.units(d.province, d.b)
+    if units_a <= 0 or units_b <= 0:
+        raise IllegalMove("Ktoś nie ma jednostek — potyczki nie ma.")
+    for rolls, units in ((d.rolls_a, units_a), (d.rolls_b, units_b)):
+        if len(rolls) != units or any(r < 1 or r > 6 for r in rolls):
+            raise IllegalMove("Nieprawidłowe dane. Upewnij się, że liczba rzutów i wartości (1–6) się zgadzają.")
+    # straty liczymy po obu seriach, ograniczone do stanu na początku potyczki
+    loss_a = min(duel_kills(d.rolls_b), units_a)
+    loss_b = min(duel_kills(d.rolls_a), units_b)
+    w.remove_units(d.province, d.a, loss_a)
+    w.remove_units(d.province, d.b, loss_b)
+    na, nb = w.name(d.a), w.name(d.b)
+    w.note(f"  {na} zadał {loss_b} strat; {nb} zadał {loss_a} strat.")
+    w.note(f"  Stan po potyczce: {na}={w.units(d.province, d.a)}, {nb}={w.units(d.province, d.b)}.")
+
+
+def _tactical_battle(w: _Work, d: TacticalBattle) -> None:
+    if w.units(d.province, d.a) <= 0 or w.units(d.province, d.b) <= 0:
+        raise IllegalMove("Ktoś nie ma jednostek — potyczki nie ma.")
+    for seat, losses in ((d.a, d.losses_a), (d.b, d.losses_b)):
+        if len(losses) != len(UNITS) or any(x < 0 or x > w.units(d.province, seat, ut) for x, ut in zip(losses, UNITS)):
+            raise IllegalMove("Straty bitwy nie zgadzają się z wojskiem na prowincji.")
+    if d.loser is not None and d.loser not in (d.a, d.b):
+        raise IllegalMove("Pokonany musi być stroną bitwy.")
+    for seat, losses in ((d.a, d.losses_a), (d.b, d.losses_b)):
+        for ut, x in zip(UNITS, losses):
+            w.remove_units(d.province, seat, x, (ut,))
+    na, nb = w.name(d.a), w.name(d.b)
+    w.note(f"  {na} zadał {sum(d.losses_b)} strat; {nb} zadał {sum(d.losses_a)} strat.")
+    if d.loser is not None and w.units(d.province, d.loser) > 0:
+        w.note(f"  {w.name(d.loser)} przegrywa; rozproszone: {w.units(d.province, d.loser)}.")
+        w.remove_units(d.province, d.loser, w.units(d.province, d.loser), UNITS)
+    w.note(f"  Stan po bitwie: {na}={w.units(d.province, d.a)}, {nb}={w.units(d.province, d.b)}.")
+
+
+def _arson(w: _Work, d: Arson) -> None:
+    if w.units(d.province, d.seat) <= 0:
+        raise IllegalMove("Nie masz wojska w tej prowincji.")
+    slot = w.top_slot(d.province)
+    if slot < 0:
+        raise IllegalMove("Brak posiadłości do spalenia.")
+    owner = w.estates[d.province][slot]
+    if owner == d.seat:
+        raise IllegalMove("Nie możesz spalić własnej posiadłości.")
+    w._clear_slot(d.province, slot)
+    before = w.wealth[d.province]
+    after = w.add_wealth(d.province, -1)
+    w.note(f"[Palenie] {w.name(d.seat)} spalił posiadłość gracza {w.name(owner)} w {w.pname(d.province)}; "
+           f"zamożność {before}→{after}.")
+
+
+def _reinforce(w: _Work, d: Reinforce) -> None:
+    if not 1 <= d.roll <= 6:
+        raise IllegalMove("Nieprawidłowe — wpisz liczbę 1–6.")
+    delta = reinforcement(d.roll)
+    name = TRACK_NAMES[d.track]
+    if delta != 0:
+        w.note(f"  {name}: +{delta} → {w.add_raid(d.track, delta)}")
+    else:
+        w.note(f"  {name}: +0 (bez zmian)")
+
+
+def _attack(w: _Work, d: Attack) -> None:
+    units_here = w.units(d.province, d.seat)
+    if units_here <= 0:
+        raise IllegalMove("  Nie masz tu jednostek.")
+    if w.tracks[d.track] <= 0:
+        raise IllegalMove("  Tego najeźdźcy nie można już atakować (tor = 0). Wybierz innego lub 'pass'.")
+    if d.province not in w.b.attack_from.get(d.track, ()):
+        raise IllegalMove("  Z tej prowincji nie można atakować wybranego najeźdźcy.")
+    w.note(f"[Atak] {w.name(d.seat)} atakuje {TRACK_NAMES[d.track]} z {w.pname(d.province)}. Masz {units_here} jednostek.")
+    # „Artyleria koronna”: +1 kość raz na rundę przeciw najeźdźcom
+    used = w.flags.artillery_defense_used
+    if w.flags.artillery_defense_active and not used[d.seat]:
+        w.flags = replace(w.flags, artillery_defense_used=used[:d.seat] + (True,) + used[d.seat + 1:])
+        w.note("  (+1 kość dzięki Artylerii koronnej — obrona przed najazdem)")
+
+
+def _attack_roll(w: _Work, d: AttackRoll) -> None:
+    if not 1 <= d.roll <= 6:
+        raise IllegalMove("Nieprawidłowe — wpisz liczbę 1–6.")
+    if w.tracks[d.track] <= 0:
+        raise IllegalMove("  Tor już ma 0 — dalsze ataki w tej akcji są zabronione.")
+    if d.roll == 1:
+        w.add_units(d.province, d.seat, -1)
+        w.honor_for(d.seat, d.track)
+        w.note("  Wynik 1 → porażka, tracisz 1 jednostkę.")
+    elif d.roll <= 5:
+        w.add_raid(d.track, -1)
+        w.add_units(d.province, d.seat, -1)
+        w.honor_for(d.seat, d.track)
+        w.note("  Wynik 2–5 → sukces: tor -1 i tracisz 1 jednostkę.")
+    else:
+        w.add_raid(d.track, -1)
+        w.honor_for(d.seat, d.track)
+        w.note("  Wynik 6 → sukces: tor -1 i jednostka pozostaje.")
+    if w.tracks[d.track] <= 0:
+        w.note("  Tor zbity do 0 — kończysz tę akcję.")
+
+
+def _raid_target(w: _Work, d: RaidTarget) -> None:
+    if w.tracks[d.track] < w.cfg.plunder_threshold or d.track not in w.b.plunder:
+        raise IllegalMove(f"Tor {TRACK_NAMES[d.track]} nie plądruje w tej rundzie.")
+    if not 1 <= d.roll <= 6:
+        raise IllegalMove("Nieprawidłowe — wpisz liczbę 1–6.")
+    if any(t[0] == d.track for t in w.flags.raid_targets):
+        raise IllegalMove(f"Cel toru {TRACK_NAMES[d.track]} już wylosowany.")
+    first, second = w.b.plunder[d.track]
+    prov = first if d.roll <= 3 else second
+    enemy = w.tracks[d.track]
+    w.flags = replace(w.flags, raid_targets=w.flags.raid_targets + ((d.track, prov, enemy),))
+    w.note(f"[Obrona] {TRACK_NAMES[d.track]}: cel {w.pname(prov)} (tor={enemy}, wróg={enemy} j.).")
+
+
+def _defend(w: _Work, d: Defend) -> None:
+    if not 1 <= d.roll <= 6:
+        raise IllegalMove("Rzut musi być 1..6.")
+    targets = w.flags.raid_targets
+    k = next((i for i, t in enumerate(targets) if t[0] == d.track and t[1] == d.province and t[2] > 0), None)
+    if k is None:
+        raise IllegalMove("Ta prowincja nie jest celem obrony dla wskazanego toru.")
+    if w.units(d.province, d.seat) <= 0:
+        raise IllegalMove("Nie masz jednostek w tej prowincji.")
+    lost, killed = defense_losses(d.roll)
+    w.add_units(d.province, d.seat, -lost)
+    enemy = targets[k][2] - killed
+    w.flags = replace(w.flags, raid_targets=targets[:k] + ((d.track, d.province, enemy),) + targets[k + 1:])
+    w.note({1: "  1 → ginie tylko jednostka obrońcy.",
+            6: "  6 → ginie tylko jednostka wroga (wróg −1)."}.get(d.roll, "  2–5 → giną obie strony (wróg −1, obrońca −1)."))
+    name = TRACK_NAMES[d.track]
+    if enemy == 0:
+        w.note(f"[Obrona] Wróg z toru {name} rozbity w {w.pname(d.province)} — brak spustoszenia z tego toru.")
+    w.note(f"  Po obronie ({name}): wróg={enemy}, {w.name(d.seat)}={w.units(d.province, d.seat)}.")
+
+
+def _plunder(w: _Work, d: Plunder) -> None:
+    if w.tracks[d.track] < w.cfg.plunder_threshold or d.track not in w.b.plunder:
+        raise IllegalMove(f"Tor {TRACK_NAMES[d.track]} nie plądruje w tej rundzie.")
+    target = next((t for t in w.flags.raid_targets if t[0] == d.track), None)
+    if target is not None:
+        if d.roll is not None:
+            raise IllegalMove(f"Cel toru {TRACK_NAMES[d.track]} wylosowano już w fazie obrony.")
+        _, prov, enemy = target
+        if enemy <= 0:
+            w.tracks[d.track] = 1
+            w.note(f"[Spustoszenia] {TRACK_NAMES[d.track]} → {w.pname(prov)}: obrona skuteczna — "
+                   "brak spustoszenia (tor ustawiony na 1).")
+            return
+    elif d.roll is None or not 1 <= d.roll <= 6:
+        raise IllegalMove("Nieprawidłowe — wpisz liczbę 1–6.")
+    else:
+        first, second = w.b.plunder[d.track]
+        prov = first if d.roll <= 3 else second
+    msgs = [f"[Spustoszenie] {w.pname(prov)}: "]
+    if w.fort[prov]:
+        w.fort[prov] = False
+        msgs.append("zniszczono fort; ")
+    else:
+        owner = w.destroy_last_estate_any(prov)
+        if owner is not None:
+            msgs.append(f"zniszczono posiadłość gracza {w.name(owner)}; ")
+        else:
+            msgs.append("brak fortu i posiadłości do zniszczenia; ")
+    before = w.wealth[prov]
+    w.wealth[prov] = max(0, before - 1)
+    msgs.append(f"zamożność {before}→{w.wealth[prov]}.")
+    w.tracks[d.track] = 1  # po splądrowaniu tor spada do 1
+    w.note("".join(msgs) + f" Tor {TRACK_NAMES[d.track]} ustawiony na 1.")
+
+
+def _pay_upkeep(w: _Work, d: PayUpkeep) -> None:
+    for i, (paid, unpaid) in enumerate(upkeep_split(w.s)):
+        if paid + unpaid == 0:
+            continue
+        w.gold[i] -= paid * w.cfg.upkeep_per_unit
+        w.note(f"[Żołd] {w.name(i)}: {paid + unpaid} j., opłacono {paid} (złoto {w.gold[i]}), nieopłacone {unpaid}.")
+
+
+def _desertion(w: _Work, d: Desertion) -> None:
+    seat, name = d.seat, w.name(d.seat)
+    gone = deserters(d.rolls, w.cfg.desertion_max_roll)
+    if len(d.victims) != gone or len(set(d.victims)) != gone:
+        raise IllegalMove(f"Dezercja: oczekiwano {gone} różnych jednostek.")
+    if gone == 0:
+        w.note(f"[Żołd] {name}: nikt nie zdezerterował.")
+        return
+    # numery jednostek 0..units-1 -> (prowincja, typ) wg kolejności planszy
+    holdings: List[Tuple[int, str, int]] = []
+    acc = 0
+    for prov in range(len(w.wealth)):
+        for ut in UNITS:
+            n = w.units(prov, seat, ut)
+            if n > 0:
+                acc += n
+                holdings.append((prov, ut, acc))
+    if any(not 0 <= v < acc for v in d.victims):
+        raise IllegalMove("Dezercja: numer jednostki poza zakresem.")
+    losses: Dict[Tuple[int, str], int] = {}
+    for v in d.victims:
+        prov, ut, _ = next(h for h in holdings if v < h[2])
+        losses[(prov, ut)] = losses.get((prov, ut), 0) + 1
+    for (prov, ut), n in losses.items():
+        w.add_units(prov, seat, -n, ut)
+    where = ", ".join(f"{w.pname(prov)} −{n}{ut}" for (prov, ut), n in losses.items())
+    w.note(f"[Żołd] {name}: dezercja {gone} j. ({where}).")
+
+
+def _end_round(w: _Work, d: EndRound) -> None:
+    w.round += 1
+    w.marshal = (w.marshal + 1) % max(1, w.n)
+    w.last_law = None
+
+
+_HANDLERS = {
+    StartRound: _start_round,
+    Event: _event,
+    Income: _income,
+    OpenAuction: _open_auction,
+    Bid: _bid,
+    CloseAuction: _close_auction,
+    Law: _law,
+    Variant: _variant,
+    Action: _action,
+    Duel: _duel,
+    TacticalBattle: _tactical_battle,
+    Arson: _arson,
+    Reinforce: _reinforce,
+    Attack: _attack,
+    AttackRoll: _attack_roll,
+    RaidTarget: _raid_target,
+    Defend: _defend,
+    Plunder: _plunder,
+    PayUpkeep: _pay_upkeep,
+    Desertion: _desertion,
+    EndRound: _end_round,
+}
+
+
+def apply(state: GameState, decision: Decision) -> Transition:
+    """Nowy stan po decyzji wraz z komunikatami dla gracza. `state` pozostaje nietknięty."""
+    w = _Work(state)
+    _HANDLERS[type(decision)](w, decision)
+    return Transition(w.freeze(), tuple(w.notes))
+
+
+def step(state: GameState, decision: Decision) -> GameState:
+    return apply(state, decision).state
+
+
+# --------------- Dozwolone akcje --------------- #
+
+def action_candidates(state: GameState, seat: int) -> List[Action]:
+    """Wszystkie akcje o poprawnym kształcie (bez sprawdzania zasad), w stałej kolejności."""
+    v = len(state.provinces)
+    out = [Action(seat, "administracja")]
+    for prov in range(v):
+        out.append(Action(seat, "wplyw", prov))
+        out.append(Action(seat, "posiadlosc", prov))
+        out.append(Action(seat, "zamoznosc", prov))
+        for ut in UNITS:
+            out.append(Action(seat, "rekrutacja", prov, unit=ut))
+        for dst in state.board.reachable(prov, state.config.march_range):
+            for ut in UNITS:
+                out.append(Action(seat, "marsz", prov, dst, ut))
+    return out
+
+
+def legal_actions(state: GameState, seat: int) -> List[Action]:
+    """Akcje, które kernel przyjmie w tym stanie (z action_candidates, w tej samej kolejności)."""
+    out = []
+    reach = march_reach(state, seat)   # marsz poza ten zasięg (albo bez wojska na źródle) i tak jest niedozwolony
+    present = state.presence()[seat]
+    for d in action_candidates(state, seat):
+        if d.kind == "marsz" and not (reach >> d.target & 1 and present >> d.province & 1):
+            continue
+        try:
+            apply(state, d)
+        except IllegalMove:
+            continue
+        out.append(d)
+    return out
+
+
+# --------------- Punktacja końcowa --------------- #
+
+class ScoreLine(NamedTuple):
+    """Składniki wyniku końcowego jednego gracza."""
+    estates: int      # liczba posiadłości na mapie
+    estate_pts: int   # +1 za najwięcej posiadłości
+    influence: int    # prowincje z jednoznacznym wpływem
+    honor: int
+    gold_pts: int     # złoto // config.gold_per_point (domyślnie 3)
+
+    @property
+    def total(self) -> int:
+        return self.estate_pts + self.influence + self.honor + self.gold_pts
+
+
+def score_breakdown(state: GameState) -> Tuple[ScoreLine, ...]:
+    """
+    Zasady punktacji końcowej:
+      1) +1 pkt dla gracza(ów) z największą liczbą posiadłości (suma po całej mapie).
+      2) Wpływy z prowincji: +1 pkt tylko przy jednym zwycięzcy (remis bez rozstrzygnięcia: nikt).
+      3) +punkty honoru.
+      4) Za każde 3 złota +1 pkt (config.gold_per_point).
+    """
+    n = state.pcount
+    estates_total = [0] * n
+    for prov in state.provinces:
+        for owner in prov.estates:
+            if 0 <= owner < n:
+                estates_total[owner] += 1
+    max_est = max(estates_total) if estates_total else 0
+    influence = [0] * n
+    for prov in range(len(state.provinces)):
+        winner = single_controller(state, prov)
+        if winner is not None:
+            influence[winner] += 1
+    return tuple(
+        ScoreLine(estates_total[i], int(max_est > 0 and estates_total[i] == max_est),
+                  influence[i], p.honor, p.gold // max(1, state.config.gold_per_point))
+        for i, p in enumerate(state.players)
+    )
+
+
+def final_scores(state: GameState) -> Tuple[Tuple[int, ...], List[str]]:
+    """Wyniki wg miejsc (score_breakdown) i linie raportu końcowego."""
+    n = state.pcount
+    names = state.names
+    lines_by_seat = score_breakdown(state)
+    estate_winners = [i for i, sl in enumerate(lines_by_seat) if sl.estate_pts]
+
+    lines = ["[Punktacja końcowa]"]
+    lines.append("Posiadłości (łącznie): " + ", ".join(f"{names[i]}={lines_by_seat[i].estates}" for i in range(n)))
+    if estate_winners:
+        lines.append("Najwięcej posiadłości: " + ", ".join(names[i] for i in estate_winners) + " (+1)")
+    else:
+        lines.append("Najwięcej posiadłości: nikt (brak posiadłości)")
+    lines.append("Wpływy z prowincji:")
+    for prov, pname in enumerate(state.board.names):
+        winners = influence_winners(state, prov)
+        if not winners:
+            lines.append(f"  • {pname}: brak wpływu")
+        elif len(winners) == 1:
+            lines.append(f"  • {pname}: {names[winners[0]]}")
+        else:
+            lines.append(f"  • {pname}: remis – nikt")
+    lines.append("Honor: " + ", ".join(f"{names[i]}=+{p.honor}" for i, p in enumerate(state.players)))
+    lines.append("Złoto→pkt: " + ", ".join(f"{names[i]}=+{lines_by_seat[i].gold_pts} (z {state.players[i].gold} zł)"
+                                          for i in range(n)))
+    return tuple(sl.total for sl in lines_by_seat), lines
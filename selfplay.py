@@ -0,0 +1,337 @@
+"""
+Self-play data
+--------------
+
+Generator danych treningowych dla uczonych polityk i funkcji wartości. Boty grają partie
+bez konsoli (sim.py), a w każdym punkcie decyzji zapisujemy wiersz:
+
+    obserwacja (float32[D]), maska dozwolonych ruchów (bool[A]), wybrany ruch (int32),
+    wynik partii z perspektywy decydującego (float32: jego wynik − średnia pozostałych)
+
+Wiersze trafiają do shardów `.npy` stałego rozmiaru, pisanych przez np.memmap (open_memmap),
+oraz do `manifest.json` z kształtami i liczbą zapełnionych wierszy w każdym shardzie.
+`ShardReader` losuje minibatche z całego zbioru, czytając tylko potrzebne wiersze z mapowanych plików.
+
+Przestrzeń ruchów jest płaska, z czterema „głowami” pod kolejnymi przesunięciami (ActionSpace):
+akcje z rules.action_candidates, oferty 0..MAX_BID, ustawy 1..6, ataki (pass + tor × prowincja).
+
+Wymaga NumPy.
+
+    $ python selfplay.py --out data/ --games 10000 --bot heuristic --shard-size 65536 --jobs 8
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+import rules
+import sim
+
+MAX_BID = 20          # oferty powyżej są przycinane do tej wartości w kodowaniu
+MANIFEST = "manifest.json"
+KIND_ACTION, KIND_BID, KIND_LAW, KIND_ATTACK = range(4)
+
+
+# --------------- Kodowanie --------------- #
+
+class ActionSpace:
+    """Płaska numeracja ruchów dla danej planszy i zasad (kolejność stała, więc indeksy są stabilne)."""
+
+    def __init__(self, state: rules.GameState) -> None:
+        self.v = len(state.provinces)
+        # kształty akcji niezależne od gracza: kandydaci dla miejsca 0, bez numeru miejsca
+        self._actions = [(d.kind, d.province, d.target, d.unit) for d in rules.action_candidates(state, 0)]
+        self._action_index = {a: i for i, a in enumerate(self._actions)}
+        self.bid_offset = len(self._actions)
+        self.law_offset = self.bid_offset + MAX_BID + 1
+        self.attack_offset = self.law_offset + 6
+        self.size = self.attack_offset + 1 + len(rules.TRACKS) * self.v
+
+    def action(self, d: rules.Action) -> int:
+        return self._action_index[(d.kind, d.province, d.target, d.unit)]
+
+    def bid(self, amount: int) -> int:
+        return self.bid_offset + max(0, min(MAX_BID, amount))
+
+    def law(self, law: int) -> int:
+        return self.law_offset + law - 1
+
+    def attack(self, choice: Optional[Tuple[str, int]]) -> int:
+        if choice is None:
+            return self.attack_offset
+        key, prov = choice
+        return self.attack_offset + 1 + rules.TRACKS.index(key) * self.v + prov
+
+    def mask(self, state: rules.GameState, seat: int, kind: int) -> np.ndarray:
+        m = np.zeros(self.size, dtype=bool)
+        if kind == KIND_ACTION:
+            for d in rules.legal_actions(state, seat):
+                m[self.action(d)] = True
+        elif kind == KIND_BID:
+            m[self.bid_offset:self.bid(state.players[seat].gold) + 1] = True
+        elif kind == KIND_LAW:
+            m[self.law_offset:self.law_offset + 6] = True
+        else:
+            m[self.attack_offset] = True
+            for choice in sim.attack_options(state, seat):
+                m[self.attack(choice)] = True
+        return m
+
+
+def observation_size(pcount: int, provinces: int) -> int:
+    return 4 + 4 + len(rules.TRACKS) + pcount * (4 + provinces * 3) + provinces * 2
+
+
+def encode(state: rules.GameState, seat: int, kind: int) -> np.ndarray:
+    """
+    Wektor obserwacji z perspektywy `seat`: gracze w kolejności od decydującego, więc sieć
+    nie musi uczyć się symetrii miejsc. Wszystkie wartości są liczbami z planszy (bez skalowania).
+    """
+    n, v = state.pcount, len(state.provinces)
+    out: List[float] = [state.round, state.total_rounds, (state.marshal - seat) % n, n]
+    out.extend(1.0 if k == kind else 0.0 for k in range(4))
+    out.extend(state.tracks)
+    for k in range(n):
+        i = (seat + k) % n
+        p = state.players[i]
+        out.extend((p.gold, p.honor, float(p.majority), p.last_bid))
+        for prov in range(v):
+            out.append(state.units(prov, i))
+            out.append(state.noble_count(prov, i))
+            out.append(sum(1 for o in state.provinces[prov].estates if o == i))
+    for ps in state.provinces:
+        out.extend((float(ps.fort), ps.wealth))
+    return np.asarray(out, dtype=np.float32)
+
+
+# --------------- Nagrywanie --------------- #
+
+class RecordingBot:
+    """Opakowanie bota: przekazuje decyzje dalej i zapisuje (obserwacja, maska, ruch) dla siebie."""
+
+    def __init__(self, inner: sim.RandomBot, space: ActionSpace) -> None:
+        self.inner = inner
+        self.seat = inner.seat
+        self.space = space
+        self.rows: List[Tuple[np.ndarray, np.ndarray, int]] = []
+
+    def _record(self, state: rules.GameState, kind: int, index: int) -> None:
+        self.rows.append((encode(state, self.seat, kind), self.space.mask(state, self.seat, kind), index))
+
+    def action(self, state: rules.GameState) -> rules.Action:
+        d = self.inner.action(state)
+        self._record(state, KIND_ACTION, self.space.action(d))
+        return d
+
+    def bid(self, state: rules.GameState) -> int:
+        amount = self.inner.bid(state)
+        self._record(state, KIND_BID, self.space.bid(amount))
+        return amount
+
+    def law(self, state: rules.GameState) -> int:
+        law = self.inner.law(state)
+        self._record(state, KIND_LAW, self.space.law(law))
+        return law
+
+    def attack(self, state: rules.GameState) -> Optional[Tuple[str, int]]:
+        choice = self.inner.attack(state)
+        self._record(state, KIND_ATTACK, self.space.attack(choice))
+        return choice
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)   # wariant, tor, wybór prowincji — bez zapisu
+
+
+# --------------- Shardy --------------- #
+
+class ShardWriter:
+    """
+    Dopisuje wiersze do shardów `{prefix}{nr:05d}.{pole}.npy` po `shard_size` wierszy.
+    Pliki tworzy np.lib.format.open_memmap, więc zapis nie trzyma danych w pamięci.
+    Ostatni shard może być zapełniony częściowo — liczbę wierszy podaje manifest.
+    """
+
+    def __init__(self, root: os.PathLike, obs_dim: int, action_dim: int, shard_size: int = 65536,
+                 prefix: str = "shard-") -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.obs_dim, self.action_dim = obs_dim, action_dim
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.shards: List[Dict[str, object]] = []
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._fill = 0
+
+    def _open(self) -> None:
+        name = f"{self.prefix}{len(self.shards):05d}"
+        shapes = {"obs": ((self.shard_size, self.obs_dim), np.float32),
+                  "mask": ((self.shard_size, self.action_dim), np.bool_),
+                  "action": ((self.shard_size,), np.int32),
+                  "outcome": ((self.shard_size,), np.float32)}
+        self._arrays = {k: np.lib.format.open_memmap(self.root / f"{name}.{k}.npy", mode="w+", dtype=dt, shape=sh)
+                        for k, (sh, dt) in shapes.items()}
+        self.shards.append({"name": name, "rows": 0})
+        self._fill = 0
+
+    def _close_shard(self) -> None:
+        if self._arrays is None:
+            return
+        for arr in self._arrays.values():
+            arr.flush()
+        self.shards[-1]["rows"] = self._fill
+        self._arrays = None
+
+    def append(self, obs: np.ndarray, mask: np.ndarray, action: int, outcome: float) -> None:
+        if self._arrays is None or self._fill >= self.shard_size:
+            self._close_shard()
+            self._open()
+        a, i = self._arrays, self._fill
+        a["obs"][i] = obs
+        a["mask"][i] = mask
+        a["action"][i] = action
+        a["outcome"][i] = outcome
+        self._fill += 1
+
+    def close(self) -> List[Dict[str, object]]:
+        self._close_shard()
+        return self.shards
+
+
+def write_manifest(root: os.PathLike, meta: Dict[str, object], shards: Sequence[Dict[str, object]]) -> None:
+    root = Path(root)
+    data = dict(meta, shards=list(shards), rows=sum(int(s["rows"]) for s in shards))
+    fd, tmp = tempfile.mkstemp(dir=root, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, root / MANIFEST)
+
+
+class ShardReader:
+    """Losowe minibatche z wszystkich shardów; pliki są mapowane (mmap_mode='r'), nie wczytywane."""
+
+    def __init__(self, root: os.PathLike) -> None:
+        self.root = Path(root)
+        with open(self.root / MANIFEST, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.shards = [s for s in self.manifest["shards"] if s["rows"] > 0]
+        self._cum = np.cumsum([s["rows"] for s in self.shards])
+        self._open: Dict[str, Dict[str, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return int(self._cum[-1]) if len(self._cum) else 0
+
+    def _arrays(self, k: int) -> Dict[str, np.ndarray]:
+        name = self.shards[k]["name"]
+        if name not in self._open:
+            self._open[name] = {f: np.load(self.root / f"{name}.{f}.npy", mmap_mode="r")
+                                for f in ("obs", "mask", "action", "outcome")}
+        return self._open[name]
+
+    def sample(self, batch: int, rng: Optional[np.random.Generator] = None) -> Dict[str, np.ndarray]:
+        """Minibatch `batch` wierszy losowanych jednostajnie (ze zwracaniem) z całego zbioru."""
+        rng = rng or np.random.default_rng()
+        idx = np.sort(rng.integers(0, len(self), size=batch))
+        shard_of = np.searchsorted(self._cum, idx, side="right")
+        out = {"obs": np.empty((batch, self.manifest["obs_dim"]), np.float32),
+               "mask": np.empty((batch, self.manifest["action_dim"]), np.bool_),
+               "action": np.empty(batch, np.int32),
+               "outcome": np.empty(batch, np.float32)}
+        for k in np.unique(shard_of):
+            sel = np.nonzero(shard_of == k)[0]
+            local = idx[sel] - (self._cum[k - 1] if k > 0 else 0)
+            arrays = self._arrays(int(k))
+            for field_name, arr in arrays.items():
+                out[field_name][sel] = arr[local]   # odczyt tylko wybranych wierszy (posortowanych)
+        return out
+
+    def batches(self, batch: int, seed: Optional[int] = None) -> Iterator[Dict[str, np.ndarray]]:
+        rng = np.random.default_rng(seed)
+        while True:
+            yield self.sample(batch, rng)
+
+
+# --------------- Generator --------------- #
+
+@dataclass(frozen=True)
+class Job:
+    out: str
+    prefix: str
+    seeds: Tuple[int, ...]
+    players: int
+    rounds: int
+    bot: str
+    shard_size: int
+
+
+def _space_and_dims(players: int) -> Tuple[ActionSpace, int]:
+    state = rules.new_game(sim.map_for().board, tuple(str(i) for i in range(players)))
+    return ActionSpace(state), observation_size(players, len(state.provinces))
+
+
+def generate(job: Job) -> List[Dict[str, object]]:
+    """Rozgrywa partie z `job.seeds` i zapisuje wiersze wszystkich graczy do własnych shardów."""
+    space, obs_dim = _space_and_dims(job.players)
+    writer = ShardWriter(job.out, obs_dim, space.size, job.shard_size, job.prefix)
+    factory = sim.BOTS[job.bot]
+    for seed in job.seeds:
+        recorders: List[RecordingBot] = []
+
+        def recorded(seat: int, rng: random.Random) -> RecordingBot:
+            rec = RecordingBot(factory(seat, rng), space)
+            recorders.append(rec)
+            return rec
+
+        game = sim.play(job.players, job.rounds, seed=seed, lineup=[recorded] * job.players)
+        totals = [sl.total for sl in game.final]
+        for rec in recorders:
+            others = [t for i, t in enumerate(totals) if i != rec.seat]
+            outcome = totals[rec.seat] - (sum(others) / len(others) if others else 0.0)
+            for obs, mask, action in rec.rows:
+                writer.append(obs, mask, action, outcome)
+    return writer.close()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Generator danych self-play (shardy .npy + manifest).")
+    parser.add_argument("--out", required=True, help="katalog wyjściowy")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bot", choices=sorted(sim.BOTS), default="heuristic")
+    parser.add_argument("--shard-size", type=int, default=65536, help="wierszy w shardzie")
+    parser.add_argument("--seed", type=int, default=0, help="pierwsze ziarno partii")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv[1:])
+
+    jobs = max(1, min(args.jobs, args.games))
+    seeds = list(range(args.seed, args.seed + args.games))
+    work = [Job(args.out, f"w{k:02d}-", tuple(seeds[k::jobs]), args.players, args.rounds, args.bot, args.shard_size)
+            for k in range(jobs)]
+    if jobs == 1:
+        shards = generate(work[0])
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            shards = [s for part in pool.map(generate, work) for s in part]
+
+    space, obs_dim = _space_and_dims(args.players)
+    meta = {"obs_dim": obs_dim, "action_dim": space.size, "shard_size": args.shard_size,
+            "players": args.players, "rounds": args.rounds, "bot": sim.BOTS[args.bot].version,
+            "rules": rules.DEFAULT_RULES.digest(), "games": args.games, "first_seed": args.seed,
+            "heads": {"action": 0, "bid": space.bid_offset, "law": space.law_offset, "attack": space.attack_offset}}
+    write_manifest(args.out, meta, shards)
+    print(f"[Self-play] {sum(int(s['rows']) for s in shards)} wierszy w {len(shards)} shardach → {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
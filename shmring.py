@@ -0,0 +1,232 @@
+"""
+Shared-memory results
+---------------------
+
+Transport wyników partii z procesów roboczych bez picklowania: pierścień rekordów o stałym
+układzie w multiprocessing.shared_memory, jeden slot na partię (wyniki, złoto, honor,
+posiadłości, tory, ziarno). Proces główny czyta gotowe sloty bez kopiowania jako tablicę
+strukturalną NumPy (`RESULT_DTYPE`) i zwalnia je po przetworzeniu.
+
+Protokół: nagłówek w osobnym segmencie trzyma licznik biletów zapisu, kursor odczytu i flagę
+zamknięcia. Producent bierze bilet t (pod blokadą), czeka, aż slot t mod pojemność zostanie
+zwolniony, zapisuje pola i na końcu `seq = t + 1` — czytelnik uznaje slot za gotowy dopiero po tym
+polu. Czytelnik, który kończy wcześniej, ustawia flagę zamknięcia: czekający producenci porzucają
+wtedy zapis (RingClosed) zamiast czekać na slot, którego nikt już nie zwolni.
+
+    $ python shmring.py --games 2000 --players 3 --bot heuristic --jobs 8
+
+Wymaga NumPy.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional, Sequence
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+import rules
+import sim
+
+MAX_SEATS = 6
+
+RESULT_DTYPE = np.dtype([
+    ("seq", "<u8"),                    # numer biletu + 1; 0 = slot pusty
+    ("seed", "<i8"),
+    ("players", "u1"),
+    ("rounds", "u1"),
+    ("winner", "i1"),                  # -1 = remis na pierwszym miejscu
+    ("score", "<i2", (MAX_SEATS,)),
+    ("gold", "<i2", (MAX_SEATS,)),
+    ("honor", "<i2", (MAX_SEATS,)),
+    ("estates", "<i2", (MAX_SEATS,)),
+    ("tracks", "<i2", (len(rules.TRACKS),)),
+], align=True)
+
+_WRITE, _READ, _CLOSED = 0, 1, 2  # pola nagłówka
+
+
+class RingClosed(Exception):
+    """Czytelnik zamknął pierścień — producent porzuca zapis."""
+
+
+class ResultRing:
+    """
+    Pierścień rekordów RESULT_DTYPE. Tworzy go proces główny (`create=True`); procesy robocze
+    dostają `handle()` i podłączają się przez `ResultRing.attach(*handle)`.
+    """
+
+    def __init__(self, capacity: int = 4096, *, names: Optional[tuple] = None, lock=None) -> None:
+        self.capacity = capacity
+        self.owner = names is None
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=capacity * RESULT_DTYPE.itemsize)
+            self._hdr_shm = shared_memory.SharedMemory(create=True, size=3 * 8)
+            self.lock = mp.Lock()
+        else:
+            self._shm = shared_memory.SharedMemory(name=names[0])
+            self._hdr_shm = shared_memory.SharedMemory(name=names[1])
+            self.lock = lock
+        self.slots = np.ndarray((capacity,), dtype=RESULT_DTYPE, buffer=self._shm.buf)
+        self.header = np.ndarray((3,), dtype="<i8", buffer=self._hdr_shm.buf)
+        if self.owner:
+            self.slots["seq"] = 0
+            self.header[:] = 0
+
+    def handle(self) -> tuple:
+        """Argumenty dla `attach` w procesie roboczym (nazwy segmentów, pojemność, blokada)."""
+        return (self._shm.name, self._hdr_shm.name), self.capacity, self.lock
+
+    @classmethod
+    def attach(cls, names: tuple, capacity: int, lock) -> "ResultRing":
+        return cls(capacity, names=names, lock=lock)
+
+    @property
+    def closed(self) -> bool:
+        return bool(self.header[_CLOSED])
+
+    # --- producent ---
+    def put(self, seed: int, state: rules.GameState) -> None:
+        """Zapisuje wynik partii; RingClosed, gdy czytelnik zamknął pierścień."""
+        with self.lock:
+            if self.header[_CLOSED]:
+                raise RingClosed
+            ticket = int(self.header[_WRITE])
+            self.header[_WRITE] = ticket + 1
+        while ticket - int(self.header[_READ]) >= self.capacity:
+            if self.header[_CLOSED]:
+                raise RingClosed
+            time.sleep(0.0005)  # pierścień pełny — czekamy, aż czytelnik zwolni slot
+        rec = self.slots[ticket % self.capacity]
+        lines = rules.score_breakdown(state)
+        totals = [sl.total for sl in lines]
+        best = max(totals)
+        n = state.pcount
+        rec["seed"] = seed
+        rec["players"] = n
+        rec["rounds"] = state.total_rounds
+        rec["winner"] = totals.index(best) if totals.count(best) == 1 else -1
+        for field_name, values in (("score", totals), ("gold", [p.gold for p in state.players]),
+                                   ("honor", [p.honor for p in state.players]),
+                                   ("estates", [sl.estates for sl in lines])):
+            row = rec[field_name]
+            row[:] = 0
+            row[:n] = values[:MAX_SEATS]
+        rec["tracks"] = state.tracks
+        rec["seq"] = ticket + 1   # na końcu: od tej chwili slot jest gotowy do odczytu
+
+    # --- czytelnik ---
+    def ready(self) -> np.ndarray:
+        """
+        Widok (bez kopii) na ciągły zakres gotowych slotów od kursora odczytu do końca bufora.
+        Po przetworzeniu trzeba wołać `release(len(view))`.
+        """
+        start = int(self.header[_READ])
+        first = start % self.capacity
+        end = first
+        while end < self.capacity and self.slots["seq"][end] == start + (end - first) + 1:
+            end += 1
+        return self.slots[first:end]
+
+    def release(self, count: int) -> None:
+        self.header[_READ] += count
+
+    def shut(self) -> None:
+        """Koniec odczytu: producenci przestają czekać na wolne sloty i nie biorą nowych biletów."""
+        with self.lock:
+            self.header[_CLOSED] = 1
+
+    def close(self) -> None:
+        del self.slots, self.header
+        self._shm.close()
+        self._hdr_shm.close()
+        if self.owner:
+            self._shm.unlink()
+            self._hdr_shm.unlink()
+
+
+# --------------- Pula procesów --------------- #
+
+_ring: Optional[ResultRing] = None
+
+
+def _init_worker(names: tuple, capacity: int, lock) -> None:
+    global _ring
+    _ring = ResultRing.attach(names, capacity, lock)
+
+
+def _play_into_ring(seeds: Sequence[int], players: int, rounds: int, config: rules.RulesConfig, bot: str) -> int:
+    done = 0
+    for seed in seeds:
+        if _ring.closed:
+            break
+        try:
+            _ring.put(seed, sim.play_final(players, rounds, config, seed, bot))
+        except RingClosed:
+            break
+        done += 1
+    return done
+
+
+def simulate(seeds: Sequence[int], players: int = 3, rounds: int = 3,
+             config: rules.RulesConfig = rules.DEFAULT_RULES, bot: str = "random", jobs: int = 1,
+             capacity: int = 4096, chunk: int = 50) -> Iterator[np.ndarray]:
+    """
+    Rozgrywa partie w puli procesów i oddaje wyniki paczkami — widokami na pamięć współdzieloną.
+    Widok jest ważny do następnego kroku iteracji (potem slot wraca do puli); kto chce go
+    zachować, robi kopię. Przerwanie iteracji (break, wyjątek, także z procesu roboczego) zamyka
+    pierścień: procesy robocze kończą co najwyżej bieżącą partię i pula się zamyka.
+    """
+    ring = ResultRing(capacity)
+    pool = ProcessPoolExecutor(max_workers=max(1, jobs), initializer=_init_worker, initargs=ring.handle())
+    try:
+        futures = {pool.submit(_play_into_ring, seeds[i:i + chunk], players, rounds, config, bot)
+                   for i in range(0, len(seeds), chunk)}
+        remaining = len(seeds)
+        while remaining:
+            view = ring.ready()
+            if len(view):
+                yield view
+                ring.release(len(view))
+                remaining -= len(view)
+                continue
+            done, futures = wait(futures, timeout=0.005, return_when=FIRST_COMPLETED)
+            for fut in done:
+                fut.result()  # wyjątek z procesu roboczego przerywa symulację
+    finally:
+        ring.shut()
+        pool.shutdown(cancel_futures=True)
+        ring.close()
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Szybka symulacja partii z wynikami w pamięci współdzielonej.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bot", choices=sorted(sim.BOTS), default="random")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv[1:])
+
+    n = args.players
+    wins = np.zeros(n + 1, dtype=np.int64)   # ostatnia pozycja: remisy
+    score_sum = np.zeros(n)
+    t0 = time.perf_counter()
+    for view in simulate(range(args.games), n, args.rounds, bot=args.bot, jobs=args.jobs):
+        wins += np.bincount(np.where(view["winner"] < 0, n, view["winner"]), minlength=n + 1)
+        score_sum += view["score"][:, :n].sum(axis=0)
+    dt = time.perf_counter() - t0
+    print(f"Partie: {args.games} w {dt:.1f} s ({args.games / dt:.0f}/s)")
+    print("Wygrane wg miejsc: " + ", ".join(f"{i}: {wins[i] / args.games:.1%}" for i in range(n))
+          + f", remisy: {wins[n] / args.games:.1%}")
+    print("Średni wynik: " + ", ".join(f"{i}: {score_sum[i] / args.games:.2f}" for i in range(n)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,610 @@
+"""
+Headless simulator
+------------------
+
+Pełne partie bez konsoli: kernel zasad (rules.py) prowadzony przez boty. Kolejność faz, rzutów
+i losowań jest taka jak w main.py (GameplayState._start_round), więc statystyki z symulacji
+odpowiadają grze przy stole. Wydarzenia ciągniemy z przetasowanej talii 1..25 (bez powtórzeń).
+
+Losowość jest rozdzielona: kości i talia idą z generatora partii (`seed`), a boty mają własne
+generatory pochodne. Dzięki temu dwie wersje bota grane z tym samym ziarnem widzą te same
+rzuty i wydarzenia (wspólne liczby losowe).
+"""
+from __future__ import annotations
+
+from dataclasses import astuple, dataclass, fields, replace
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import random
+
+import auction
+import rules
+from bounds import ScoreBounds
+from dice import TRACK_STREAM, CounterDice
+from history import GameJournal, GameRecord
+from main import DEFAULT_MAP_PATH, DEFAULT_PHASE_ORDER, PHASES, DuelSchedule, load_map
+from memprof import MemProfile
+
+
+# --------------- Boty --------------- #
+
+class RandomBot:
+    """Losowe, ale zawsze dozwolone decyzje; punkt odniesienia dla innych botów."""
+    version = "random-2"
+
+    def __init__(self, seat: int, rng: random.Random) -> None:
+        self.seat = seat
+        self.rng = rng
+
+    def bid(self, state: rules.GameState) -> int:
+        return self.rng.randint(0, state.players[self.seat].gold // 2)
+
+    def law(self, state: rules.GameState) -> int:
+        return self.rng.randint(1, 6)
+
+    def variant(self, state: rules.GameState, law: int) -> str:
+        return self.rng.choice("AB")
+
+    def track(self, state: rules.GameState) -> str:
+        """Tor dla wariantów B: najgroźniejszy (najwyższy)."""
+        return max(rules.TRACKS, key=state.track)
+
+    def pick_controlled(self, state: rules.GameState, no_fort: bool = False) -> Optional[int]:
+        choices = [p for p in rules.controlled(state, self.seat) if not (no_fort and state.provinces[p].fort)]
+        return self.rng.choice(choices) if choices else None
+
+    def action(self, state: rules.GameState) -> rules.Action:
+        return self.rng.choice(rules.legal_actions(state, self.seat))
+
+    def attack(self, state: rules.GameState) -> Optional[Tuple[str, int]]:
+        """(tor, prowincja) do ataku albo None = pass."""
+        options = attack_options(state, self.seat)
+        if not options or self.rng.random() < 0.5:
+            return None
+        return self.rng.choice(options)
+
+    def arson(self, state: rules.GameState) -> Optional[int]:
+        """Prowincja, w której palimy ostatnią posiadłość przeciwnika, albo None = pass."""
+        targets = rules.arson_targets(state, self.seat)
+        if not targets or self.rng.random() < 0.5:
+            return None
+        return self.rng.choice(targets)
+
+    def defend(self, state: rules.GameState) -> Optional[Tuple[str, int]]:
+        """(tor, prowincja celu) do obrony albo None = pass."""
+        options = rules.defense_options(state, self.seat)
+        if not options or self.rng.random() < 0.5:
+            return None
+        return self.rng.choice(options)
+
+
+@dataclass(frozen=True)
+class Weights:
+    """Wagi bota heurystycznego (tuning: tune.py). Ocena pozycji = wynik wg punktacji końcowej + cechy × wagi."""
+    estate: float = 1.0    # posiadłość (dochód i +1 za najwięcej)
+    noble: float = 0.5     # szlachcic (kontrola prowincji)
+    troop: float = 0.4     # jednostka wojska
+    gold: float = 0.2      # złoto ponad punkty za złoto
+    honor: float = 0.5     # honor ponad punkty za honor
+    danger: float = 0.6    # zagrożenie własnych posiadłości przez tory najazdów
+    bid: float = 0.3       # jaką część złota licytujemy
+
+    def vector(self) -> Tuple[float, ...]:
+        return astuple(self)
+
+    @classmethod
+    def from_vector(cls, values: Sequence[float]) -> "Weights":
+        return cls(*(float(v) for v in values))
+
+    @classmethod
+    def load(cls, path: str) -> "Weights":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(**{f.name: float(data[f.name]) for f in fields(cls) if f.name in data})
+
+
+DEFAULT_WEIGHTS = Weights()
+
+
+def danger(state: rules.GameState, seat: int) -> float:
+    """Zagrożenie gracza: posiadłości bez fortu w prowincjach plądrowanych, ważone bliskością progu toru."""
+    threshold = max(1, state.config.plunder_threshold)
+    total = 0.0
+    for key, pair in state.board.plunder.items():
+        pressure = min(1.0, state.track(key) / threshold)
+        for prov in pair:
+            if not state.provinces[prov].fort:
+                total += pressure * sum(1 for o in state.provinces[prov].estates if o == seat) / len(pair)
+    return total
+
+
+def evaluate(state: rules.GameState, seat: int, w: Weights = DEFAULT_WEIGHTS) -> float:
+    """Heurystyczna wartość pozycji dla gracza `seat` (im więcej, tym lepiej)."""
+    score = rules.score_breakdown(state)[seat]
+    nobles = sum(state.noble_count(p, seat) for p in range(len(state.provinces)))
+    return (score.total + w.estate * score.estates + w.noble * nobles + w.troop * state.player_units(seat)
+            + w.gold * state.players[seat].gold + w.honor * score.honor - w.danger * danger(state, seat))
+
+
+class HeuristicBot(RandomBot):
+    """
+    Zachłanny bot z oceną `evaluate`: wybiera akcję i ustawę dającą najlepszą ocenę pozycji po ruchu.
+    Losowość (rng) rozstrzyga tylko remisy ocen.
+    """
+    version = "heuristic-2"
+
+    def __init__(self, seat: int, rng: random.Random, weights: Weights = DEFAULT_WEIGHTS) -> None:
+        super().__init__(seat, rng)
+        self.w = weights
+        self._plan: Optional[Tuple[str, Optional[str]]] = None  # (wariant, tor) wybrany razem z ustawą
+
+    def _best(self, scored: List[Tuple[float, object]]):
+        top = max(v for v, _ in scored)
+        return self.rng.choice([d for v, d in scored if v >= top - 1e-9])
+
+    def value(self, state: rules.GameState) -> float:
+        return evaluate(state, self.seat, self.w)
+
+    def bid(self, state: rules.GameState) -> int:
+        gold = state.players[self.seat].gold
+        return max(0, min(gold, int(round(self.w.bid * gold))))
+
+    def law(self, state: rules.GameState) -> int:
+        law, choice, track = self._best(self.law_options(state))
+        self._plan = (choice, track)
+        return law
+
+    def law_options(self, state: rules.GameState) -> List[Tuple[float, Tuple[int, Optional[str], Optional[str]]]]:
+        """Ocena pozycji po każdej dozwolonej (ustawa, wariant, tor) — gracz musi mieć większość."""
+        options = []
+        for law in range(1, 7):
+            after_law = rules.step(state, rules.Law(self.seat, law))
+            for choice, track in self._variants(after_law, law):
+                picks = [None] * state.pcount
+                if (law, choice) in ((3, "A"), (4, "A")) or law == 5:
+                    picks[self.seat] = self.pick_controlled(after_law, no_fort=law == 5)
+                try:
+                    after = rules.step(after_law, rules.Variant(choice, track, tuple(picks)))
+                except rules.IllegalMove:
+                    continue
+                options.append((self.value(after), (law, choice, track)))
+        return options
+
+    @staticmethod
+    def _variants(state: rules.GameState, law: int) -> List[Tuple[Optional[str], Optional[str]]]:
+        if law == 5:
+            return [(None, None)]
+        if law in (1, 2):
+            return [("A", None), ("B", None)]
+        return [("A", None)] + [("B", key) for key in rules.TRACKS]
+
+    def variant(self, state: rules.GameState, law: int) -> str:
+        return self._plan[0] if self._plan and self._plan[0] else "A"
+
+    def track(self, state: rules.GameState) -> str:
+        if self._plan and self._plan[1]:
+            return self._plan[1]
+        return super().track(state)
+
+    def pick_controlled(self, state: rules.GameState, no_fort: bool = False) -> Optional[int]:
+        """Kontrolowana prowincja z największą liczbą własnych posiadłości (fort/wojsko chroni dochód)."""
+        choices = [p for p in rules.controlled(state, self.seat) if not (no_fort and state.provinces[p].fort)]
+        if not choices:
+            return None
+        return max(choices, key=lambda p: (sum(1 for o in state.provinces[p].estates if o == self.seat), -p))
+
+    def action(self, state: rules.GameState) -> rules.Action:
+        return self._best([(self.value(rules.step(state, d)), d) for d in rules.legal_actions(state, self.seat)])
+
+    def attack(self, state: rules.GameState) -> Optional[Tuple[str, int]]:
+        """
+        Atak, gdy oczekiwany zysk jest dodatni: honor i spadek toru (k6: 2–6) kontra
+        utrata jednostki (k6: 1–5); najpierw tor najbliższy spustoszenia.
+        """
+        options = attack_options(state, self.seat)
+        if not options:
+            return None
+        gain = self.w.honor + 1.0 + self.w.danger * 5 / 6 - self.w.troop * 5 / 6
+        if gain <= 0:
+            return None
+        return max(options, key=lambda o: (state.track(o[0]), -o[1]))
+
+    def arson(self, state: rules.GameState) -> Optional[int]:
+        """
+        Palimy posiadłość najlepszego w punktacji przeciwnika, ale nie tam, gdzie mamy własne
+        posiadłości (spadek zamożności obniżyłby nasz dochód).
+        """
+        targets = [p for p in rules.arson_targets(state, self.seat)
+                   if self.seat not in state.provinces[p].estates]
+        if not targets:
+            return None
+        totals = [sl.total for sl in rules.score_breakdown(state)]
+        return max(targets, key=lambda p: (totals[rules.last_estate(state, p)[1]], -p))
+
+    def defend(self, state: rules.GameState) -> Optional[Tuple[str, int]]:
+        """Bronimy, gdy spustoszenie zniszczy własną posiadłość, a wojska wystarczy na cały najazd."""
+        for key, prov in rules.defense_options(state, self.seat):
+            last = rules.last_estate(state, prov)
+            _, enemy = rules.raid_target(state, key)
+            if (not state.provinces[prov].fort and last is not None and last[1] == self.seat
+                    and state.units(prov, self.seat) >= enemy):
+                return key, prov
+        return None
+
+
+# dolna granica krańcowej wartości złota w `majority_value`: tune.py przeszukuje wagi bez ograniczeń,
+# więc w.gold może zbić mianownik do zera albo poniżej (dzielenie przez zero, odwrócony znak ofert)
+_MIN_GOLD_VALUE = 0.05
+
+
+def majority_value(state: rules.GameState, seat: int, w: Weights = DEFAULT_WEIGHTS) -> float:
+    """
+    Ile złota warta jest dla gracza większość w Sejmie: zysk oceny `evaluate` z najlepszej ustawy
+    względem braku ustawy, przeliczony po krańcowej wartości złota w tej ocenie (co najmniej _MIN_GOLD_VALUE).
+    """
+    players = tuple(replace(p, majority=i == seat) for i, p in enumerate(state.players))
+    hypo = replace(state, players=players)
+    bot = HeuristicBot(seat, random.Random(0), w)
+    gain = max(v for v, _ in bot.law_options(hypo)) - evaluate(state, seat, w)
+    return max(0.0, gain / max(_MIN_GOLD_VALUE, 1 / max(1, state.config.gold_per_point) + w.gold))
+
+
+class EquilibriumBot(HeuristicBot):
+    """
+    Bot heurystyczny, który licytuje wg przybliżonej równowagi aukcji (auction.py): wartość
+    większości dla każdego gracza szacuje `majority_value`, a ofertę losuje z tabeli strategii.
+    """
+    version = "equilibrium-2"
+
+    def __init__(self, seat: int, rng: random.Random, weights: Weights = DEFAULT_WEIGHTS,
+                 table: Optional[auction.BidTable] = None) -> None:
+        super().__init__(seat, rng, weights)
+        self.table = table if table is not None else auction.TABLE
+
+    def bid(self, state: rules.GameState) -> int:
+        values = [majority_value(state, i, self.w) for i in range(state.pcount)]
+        gold = [p.gold for p in state.players]
+        return self.table.bid(self.seat, gold, values, auction.tiebreak_holder(state), self.rng)
+
+
+BOTS: Dict[str, Callable[[int, random.Random], RandomBot]] = {
+    "random": RandomBot,
+    "heuristic": HeuristicBot,
+    "equilibrium": EquilibriumBot,
+}
+
+
+def attack_options(state: rules.GameState, seat: int) -> List[Tuple[str, int]]:
+    """Dozwolone ataki na najeźdźców: (tor, prowincja z własnym wojskiem w zasięgu toru)."""
+    out = []
+    for key in rules.TRACKS:
+        if state.track(key) <= 0:
+            continue
+        for prov in sorted(state.board.attack_from.get(key, ())):
+            if state.units(prov, seat) > 0:
+                out.append((key, prov))
+    return out
+
+
+# --------------- Rozgrywka --------------- #
+
+@lru_cache(maxsize=None)
+def map_for(map_path: str = str(DEFAULT_MAP_PATH)):
+    """Mapa (GameMap) z pliku, wczytana raz na proces."""
+    return load_map(map_path)
+
+
+def _dice(rng: random.Random, count: int) -> Tuple[int, ...]:
+    return tuple(rng.randint(1, 6) for _ in range(count))
+
+
+class _Decided(Exception):
+    """Zwycięzca jest już pewny (bounds.ScoreBounds) — przerywamy partię."""
+
+
+class Simulation:
+    """
+    Jedna partia: stan kernela, generator kości i boty. `run()` gra do końca i zwraca stan końcowy.
+
+    Z `dice` (dice.CounterDice) kości partii idą z generatora licznikowego: rzut to funkcja
+    (runda, faza, strumień, numer rzutu w fazie), więc gałęzie i powtórki z tym samym ziarnem
+    widzą te same kości niezależnie od wcześniejszych losowań. Talia i wybory losowe zostają na `rng`.
+
+    Z `early_stop=True` po każdej fazie liczymy ograniczenia wyników (bounds.ScoreBounds) i kończymy
+    partię, gdy zwycięzca jest już pewny: `run()` zwraca wtedy stan z chwili przerwania, a pewny
+    zwycięzca jest w `winner`. Wyniki w tym stanie nie są końcowe — do statystyk samych zwycięstw.
+
+    `phase_order` to kolejność faz rundy (nazwy z main.PHASES, jak --phases konsoli): warianty zasad
+    grają w sim tak samo jak w konsoli, a ograniczenia wyników liczą pozostałe fazy wg tej kolejności.
+    """
+
+    # faza rundy (nazwa z main.PHASES) -> metoda, która rozgrywa ją botami
+    _HANDLERS: Dict[str, str] = {
+        "EventsPhase": "_event_phase",
+        "IncomePhase": "_income",
+        "AuctionPhase": "_auction",
+        "SejmPhase": "_sejm",
+        "ActionPhase": "_actions",
+        "PlayerBattlePhase": "_duels",
+        "ArsonPhase": "_arson",
+        "EnemyReinforcementPhase": "_reinforce",
+        "AttackInvadersPhase": "_attacks",
+        "DefensePhase": "_defense",
+        "DevastationPhase": "_devastation",
+        "UpkeepPhase": "_upkeep",
+    }
+
+    def __init__(self, board: rules.Board, bots: Sequence[RandomBot], rounds: int = 3,
+                 config: rules.RulesConfig = rules.DEFAULT_RULES, seed: Optional[int] = None,
+                 journal: Optional[GameJournal] = None, early_stop: bool = False,
+                 names: Optional[Sequence[str]] = None, profile: Optional[MemProfile] = None,
+                 dice: Optional[CounterDice] = None, phase_order: Sequence[str] = DEFAULT_PHASE_ORDER) -> None:
+        unknown = [name for name in phase_order if name not in self._HANDLERS]
+        if unknown:
+            raise ValueError(f"Nieznane fazy: {', '.join(unknown)} (dostępne: {', '.join(self._HANDLERS)})")
+        self.phase_order: Tuple[str, ...] = tuple(phase_order)
+        names = tuple(names) if names is not None else tuple(f"Bot{i + 1}" for i in range(len(bots)))
+        self.state = rules.new_game(board, names, rounds, config)
+        self.bots = list(bots)
+        self.rng = random.Random(seed)
+        self.journal = journal
+        self.deck = list(range(1, rules.EVENT_COUNT + 1))
+        self.rng.shuffle(self.deck)
+        self.bounds = ScoreBounds(board, config, self.phase_order) if early_stop else None
+        self.phases = 0                       # rozegrane fazy
+        self.winner: Optional[int] = None
+        self.stopped_early = False
+        self.profile = profile                # memprof.MemProfile: pamięć per faza
+        self.dice = dice
+        self._phase = 0                       # indeks bieżącej fazy rundy (adres kości)
+        self._cursor: Dict[int, int] = {}     # strumień -> rzuty wykonane w bieżącej fazie
+
+    def do(self, decision: rules.Decision) -> rules.GameState:
+        self.state = rules.step(self.state, decision)
+        if self.journal is not None:
+            self.journal.observe(decision, self.state)
+        return self.state
+
+    def roll(self, stream: int, count: int = 1) -> Tuple[int, ...]:
+        """`count` kości strumienia `stream` (miejsce gracza albo dice.TRACK_STREAM + indeks toru)."""
+        if self.dice is None:
+            return _dice(self.rng, count)
+        start = self._cursor.get(stream, 0)
+        self._cursor[stream] = start + count
+        return self.dice.rolls(self.state.round, self._phase, stream, start, count)
+
+    def _track_die(self, key: str) -> int:
+        return self.roll(TRACK_STREAM + rules.TRACKS.index(key))[0]
+
+    def _phase_done(self, name: str) -> None:
+        self.phases += 1
+        if self.journal is not None:
+            self.journal.phase_done(name, self.state)
+        s = self.state
+        if self.bounds is not None and s.round == s.total_rounds and name in self.bounds.decisive:
+            self.bounds.update(s, name)
+            if self.bounds.winner is not None:
+                raise _Decided()
+
+    def order(self) -> List[int]:
+        n, m = self.state.pcount, self.state.marshal
+        return list(range(m, n)) + list(range(0, m))
+
+    def run(self, start: Optional[str] = None) -> rules.GameState:
+        """Gra do końca; pierwsza runda od fazy `start` (np. dogrywka ze stanu w środku rundy), domyślnie od początku."""
+        try:
+            while True:
+                self.play_round(start)
+                start = None
+                if self.state.round >= self.state.total_rounds:
+                    break
+                self.do(rules.EndRound())
+        except _Decided:
+            self.stopped_early = True
+            self.winner = self.bounds.winner
+            return self.state
+        totals = [sl.total for sl in rules.score_breakdown(self.state)]
+        best = max(totals)
+        self.winner = totals.index(best) if totals.count(best) == 1 else None
+        return self.state
+
+    def play_round(self, start: Optional[str] = None) -> None:
+        """
+        Runda w kolejności `phase_order`, od fazy `start` (domyślnie pierwszej). Fazy, których reguły
+        skip_when (main.PHASES — te same, co w konsoli w trybie headless) są spełnione, pomijamy bez
+        wołania botów.
+        """
+        first = 0 if start is None else self.phase_order.index(start)
+        for i, name in enumerate(self.phase_order[first:], first):
+            if PHASES[name].skipped(self.state):
+                self._phase_done(name)
+                continue
+            phase = getattr(self, self._HANDLERS[name])
+            self._phase = i
+            self._cursor.clear()
+            if self.profile is None:
+                phase()
+            else:
+                with self.profile.span(name):
+                    phase()
+            self._phase_done(name)
+
+    # --- fazy ---
+    def _income(self) -> None:
+        self.do(rules.Income())
+
+    def _event_phase(self) -> None:
+        self.do(rules.StartRound())
+        self._event()
+
+    def _event(self) -> None:
+        n = self.deck.pop() if self.deck else self.rng.randint(1, rules.EVENT_COUNT)
+        s = self.state
+        if n == 13:
+            pool = rules.fortification_pool(s)
+            self.do(rules.Event(n, province=self.rng.choice(pool) if pool else None))
+            return
+        if n == 20:
+            candidates = rules.roszady_candidates(s)
+            if candidates:
+                prov, present = self.rng.choice(candidates)
+                self.do(rules.Event(n, province=prov, victim=self.rng.choice(present)))
+                return
+        self.do(rules.Event(n))
+
+    def _auction(self) -> None:
+        if self.state.flags.sejm_canceled:
+            return
+        self.do(rules.OpenAuction())
+        for seat in self.order():
+            self.do(rules.Bid(seat, self.bots[seat].bid(self.state)))
+        self.do(rules.CloseAuction())
+
+    def _sejm(self) -> None:
+        s = self.state
+        if s.flags.sejm_canceled:
+            return
+        maj = next((i for i, p in enumerate(s.players) if p.majority), None)
+        if maj is None:
+            return
+        law = self.bots[maj].law(s)
+        s = self.do(rules.Law(maj, law))
+        bot = self.bots[maj]
+        if law == 5:
+            picks = tuple(b.pick_controlled(s, no_fort=True) for b in self.bots)
+            self.do(rules.Variant(picks=picks))
+            return
+        choice = bot.variant(s, law)
+        if choice == "A" and law in (3, 4):
+            self.do(rules.Variant("A", picks=tuple(b.pick_controlled(s) for b in self.bots)))
+        elif choice == "B" and law in (3, 4, 6):
+            self.do(rules.Variant("B", track=bot.track(s)))
+        else:
+            self.do(rules.Variant(choice))
+
+    def _actions(self) -> None:
+        for _ in range(2):
+            for seat in self.order():
+                self.do(self.bots[seat].action(self.state))
+
+    def _duels(self) -> None:
+        for prov in range(len(self.state.provinces)):
+            s = self.state
+            seats = [i for i in range(s.pcount) if s.units(prov, i) > 0]
+            schedule = DuelSchedule(seats, s.marshal, s.pcount)
+            while True:
+                pair = schedule.next_pair()
+                if pair is None:
+                    break
+                a, b = pair
+                s = self.state
+                self.do(rules.Duel(prov, a, b, self.roll(a, s.units(prov, a)), self.roll(b, s.units(prov, b))))
+                for seat in pair:
+                    if self.state.units(prov, seat) > 0:
+                        schedule.push(seat)
+
+    def _arson(self) -> None:
+        passed = [False] * self.state.pcount
+        while not all(passed):
+            for seat in self.order():
+                if passed[seat]:
+                    continue
+                prov = self.bots[seat].arson(self.state) if rules.arson_targets(self.state, seat) else None
+                if prov is None:
+                    passed[seat] = True
+                    continue
+                self.do(rules.Arson(seat, prov))
+                passed = [False] * self.state.pcount
+
+    def _reinforce(self) -> None:
+        for key in ("N", "S", "E"):
+            self.do(rules.Reinforce(key, self._track_die(key)))
+
+    def _attacks(self) -> None:
+        passed = [False] * self.state.pcount
+        while not all(passed) and any(self.state.troops):
+            for seat in self.order():
+                choice = self.bots[seat].attack(self.state) if attack_options(self.state, seat) else None
+                if choice is None:
+                    passed[seat] = True
+                    continue
+                passed[seat] = False
+                key, prov = choice
+                dice = rules.attack_dice(self.state, seat, prov)
+                self.do(rules.Attack(seat, key, prov))
+                for _ in range(dice):
+                    if self.state.track(key) <= 0:
+                        break
+                    self.do(rules.AttackRoll(seat, key, prov, self.roll(seat)[0]))
+
+    def _defense(self) -> None:
+        for key in ("N", "S", "E"):
+            s = self.state
+            if s.track(key) >= s.config.plunder_threshold and key in s.board.plunder:
+                self.do(rules.RaidTarget(key, self._track_die(key)))
+        passed = [False] * self.state.pcount
+        while not all(passed):
+            for seat in self.order():
+                if passed[seat]:
+                    continue
+                choice = self.bots[seat].defend(self.state) if rules.defense_options(self.state, seat) else None
+                if choice is None:
+                    passed[seat] = True
+                    continue
+                key, prov = choice
+                self.do(rules.Defend(seat, key, prov, self.roll(seat)[0]))
+                passed = [False] * self.state.pcount
+
+    def _devastation(self) -> None:
+        for key in ("N", "S", "E"):
+            s = self.state
+            if s.track(key) >= s.config.plunder_threshold and key in s.board.plunder:
+                # cel wylosowany w fazie obrony (RaidTarget); bez niej rzut wybiera prowincję z pary
+                roll = None if rules.raid_target(s, key) is not None else self._track_die(key)
+                self.do(rules.Plunder(key, roll))
+
+    def _upkeep(self) -> None:
+        s = self.state
+        unpaid = [u for _, u in rules.upkeep_split(s)]
+        self.do(rules.PayUpkeep())
+        for seat in self.order():
+            if unpaid[seat] == 0:
+                continue
+            rolls = self.roll(seat, unpaid[seat])
+            gone = rules.deserters(rolls, self.state.config.desertion_max_roll)
+            units = self.state.player_units(seat)
+            victims = tuple(self.rng.sample(range(units), gone)) if gone else ()
+            self.do(rules.Desertion(seat, rolls, victims))
+
+
+def play(players: int = 3, rounds: int = 3, config: rules.RulesConfig = rules.DEFAULT_RULES,
+         seed: Optional[int] = None, bot: str = "random", map_path: str = str(DEFAULT_MAP_PATH),
+         lineup: Optional[Sequence[Callable[[int, random.Random], RandomBot]]] = None,
+         names: Optional[Sequence[str]] = None, dice: bool = False,
+         phase_order: Sequence[str] = DEFAULT_PHASE_ORDER) -> GameRecord:
+    """
+    Rozgrywa jedną partię i zwraca jej rekord (jak w historii partii). Domyślnie wszyscy gracze
+    to boty typu `bot`; `lineup` podaje fabrykę bota osobno dla każdego miejsca, a `names`
+    nazwy graczy w rekordzie (domyślnie Bot1, Bot2, …). Z `dice=True` kości idą z
+    dice.CounterDice(seed): partie z tym samym ziarnem dostają te same rzuty w tych samych
+    miejscach (runda, faza, gracz), nawet gdy boty grają inaczej. `phase_order` — wariant kolejności
+    faz rundy (jak --phases konsoli).
+    """
+    journal = GameJournal(seed=seed, map_name=map_for(map_path).name)
+    final = play_final(players, rounds, config, seed, bot, map_path, lineup, journal, names, dice, phase_order)
+    return journal.finish(final)
+
+
+def play_final(players: int = 3, rounds: int = 3, config: rules.RulesConfig = rules.DEFAULT_RULES,
+               seed: Optional[int] = None, bot: str = "random", map_path: str = str(DEFAULT_MAP_PATH),
+               lineup: Optional[Sequence[Callable[[int, random.Random], RandomBot]]] = None,
+               journal: Optional[GameJournal] = None, names: Optional[Sequence[str]] = None,
+               dice: bool = False, phase_order: Sequence[str] = DEFAULT_PHASE_ORDER) -> rules.GameState:
+    """Jak `play`, ale zwraca stan końcowy kernela (bez budowania rekordu, gdy journal=None)."""
+    if dice and seed is None:
+        raise ValueError("dice=True wymaga ziarna partii (seed)")
+    factories = list(lineup) if lineup is not None else [BOTS[bot]] * players
+    bots = [factory(i, random.Random(f"{seed}:{i}")) for i, factory in enumerate(factories)]
+    return Simulation(map_for(map_path).board, bots, rounds, config, seed, journal, names=names,
+                      dice=CounterDice(seed) if dice else None, phase_order=phase_order).run()
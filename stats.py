@@ -0,0 +1,303 @@
+"""
+Streaming statistics
+--------------------
+
+Statystyki turniejowe liczone w locie, bez przechowywania partii: każdy wynik (history.GameRecord)
+trafia do `TournamentStats.add` i od razu przepada. Pamięć jest stała niezależnie od liczby partii:
+
+- średnia i wariancja wyniku dla każdego miejsca przy stole (Welford),
+- skuteczność per numer wydarzenia i per ustawa/wariant,
+- przybliżone kwantyle końcowego złota i honoru (t-digest),
+- próbki "ciekawych" partii (reservoir sampling).
+
+Wszystkie agregaty da się tanio scalać (`merge`), więc każdy proces roboczy liczy własną część,
+a koordynator dodaje je na końcu. Obiekty są picklowalne.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from math import asin, pi, sqrt
+from typing import Dict, Iterable, List, Optional, Tuple
+import random
+
+from history import GameRecord
+
+
+# --------------- Welford --------------- #
+
+@dataclass
+class Welford:
+    """Bieżąca średnia i wariancja (Welford); scalanie wzorem Chana."""
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+    lo: float = float("inf")
+    hi: float = float("-inf")
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        self.lo = min(self.lo, x)
+        self.hi = max(self.hi, x)
+
+    def merge(self, other: "Welford") -> "Welford":
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2, self.lo, self.hi = other.n, other.mean, other.m2, other.lo, other.hi
+            return self
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+        self.lo = min(self.lo, other.lo)
+        self.hi = max(self.hi, other.hi)
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def stdev(self) -> float:
+        return sqrt(self.variance)
+
+
+# --------------- T-digest --------------- #
+
+class TDigest:
+    """
+    Scalający t-digest (Dunning): posortowane centroidy [średnia, waga] skompresowane funkcją skali k1.
+    Liczba centroidów jest ograniczona przez `compression`, dokładność najlepsza przy ogonach.
+    """
+
+    def __init__(self, compression: float = 100.0) -> None:
+        self.compression = compression
+        self.centroids: List[List[float]] = []
+        self.total = 0.0
+        self.lo = float("inf")
+        self.hi = float("-inf")
+        self._buffer: List[Tuple[float, float]] = []
+        self._buffer_cap = int(5 * compression)
+
+    def add(self, x: float, w: float = 1.0) -> None:
+        self._buffer.append((x, w))
+        self.lo = min(self.lo, x)
+        self.hi = max(self.hi, x)
+        if len(self._buffer) >= self._buffer_cap:
+            self._flush()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * pi) * asin(2 * q - 1)
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted([(m, w) for m, w in self.centroids] + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in points)
+        merged: List[List[float]] = []
+        done = 0.0                      # waga przed bieżącym centroidem
+        k_lo = self._k(0.0)
+        cur_m, cur_w = points[0]
+        for m, w in points[1:]:
+            if self._k((done + cur_w + w) / total) - k_lo <= 1.0:
+                cur_w += w
+                cur_m += (m - cur_m) * w / cur_w
+            else:
+                merged.append([cur_m, cur_w])
+                done += cur_w
+                k_lo = self._k(done / total)
+                cur_m, cur_w = m, w
+        merged.append([cur_m, cur_w])
+        self.centroids = merged
+        self.total = total
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        other._flush()
+        self._buffer.extend((m, w) for m, w in other.centroids)
+        self.lo = min(self.lo, other.lo)
+        self.hi = max(self.hi, other.hi)
+        self._flush()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._flush()
+        cs = self.centroids
+        if not cs:
+            return None
+        if len(cs) == 1:
+            return cs[0][0]
+        target = min(max(q, 0.0), 1.0) * self.total
+        # środek i-tego centroidu leży w punkcie (waga przed nim + połowa jego wagi)
+        cum = 0.0
+        prev_pos, prev_m = 0.0, self.lo
+        for m, w in cs:
+            pos = cum + w / 2
+            if target < pos:
+                span = pos - prev_pos
+                return prev_m + (m - prev_m) * ((target - prev_pos) / span if span > 0 else 0.0)
+            prev_pos, prev_m = pos, m
+            cum += w
+        span = self.total - prev_pos
+        return prev_m + (self.hi - prev_m) * ((target - prev_pos) / span if span > 0 else 0.0)
+
+
+# --------------- Reservoir --------------- #
+
+class Reservoir:
+    """Jednostajna próbka `k` elementów ze strumienia (algorytm R); scalanie ważone liczbą widzianych."""
+
+    def __init__(self, k: int = 10, seed: Optional[int] = None) -> None:
+        self.k = k
+        self.seen = 0
+        self.items: List[object] = []
+        self.rng = random.Random(seed)
+
+    def offer(self, item: object) -> None:
+        self.seen += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+        else:
+            j = self.rng.randrange(self.seen)
+            if j < self.k:
+                self.items[j] = item
+
+    def merge(self, other: "Reservoir") -> "Reservoir":
+        seen = self.seen + other.seen
+        if seen == 0:
+            return self
+        mine, theirs = list(self.items), list(other.items)
+        self.rng.shuffle(mine)
+        self.rng.shuffle(theirs)
+        out: List[object] = []
+        a, b = self.seen, other.seen   # ile elementów strumienia "reprezentuje" każda strona
+        while len(out) < self.k and (mine or theirs):
+            if mine and (not theirs or self.rng.random() * (a + b) < a):
+                out.append(mine.pop())
+                a -= 1
+            else:
+                out.append(theirs.pop())
+                b -= 1
+        self.items, self.seen = out, seen
+        return self
+
+
+# --------------- Tournament aggregate --------------- #
+
+@dataclass
+class GameSummary:
+    """Zwięzły ślad partii trzymany w próbkach (bez przebiegu rund)."""
+    seed: Optional[int]
+    map: str
+    names: Tuple[str, ...]
+    totals: Tuple[int, ...]
+    winner: Optional[int]
+
+
+@dataclass
+class TournamentStats:
+    """
+    Agregat strumienia wyników. `landslide` to przewaga zwycięzcy nad drugim miejscem, od której
+    partia trafia do próbki "pogromów"; remisy na pierwszym miejscu mają osobną próbkę.
+    """
+    sample_size: int = 10
+    landslide: int = 10
+    seed: Optional[int] = None
+    games: int = 0
+    scores: Dict[Tuple[int, int], Welford] = field(default_factory=dict)     # (liczba graczy, miejsce)
+    seat_wins: Dict[Tuple[int, int], int] = field(default_factory=dict)
+    events: Dict[int, List[int]] = field(default_factory=dict)               # nr -> [rundy, wygrane marszałka]
+    laws: Dict[Tuple[int, Optional[str]], List[int]] = field(default_factory=dict)  # (ustawa, wariant) -> [partie, wygrane]
+    gold: TDigest = field(default_factory=TDigest)
+    honor: TDigest = field(default_factory=TDigest)
+    samples: Dict[str, Reservoir] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        for i, tag in enumerate(("wszystkie", "remisy", "pogromy")):
+            if tag not in self.samples:
+                self.samples[tag] = self._reservoir(i)
+
+    def _reservoir(self, i: int) -> Reservoir:
+        """Pusta próbka nr `i` z ziarnem pochodnym od `seed` (powtarzalne losowanie próbek)."""
+        return Reservoir(self.sample_size, None if self.seed is None else self.seed * 3 + i)
+
+    def add(self, rec: GameRecord) -> None:
+        self.games += 1
+        pcount = len(rec.names)
+        totals = tuple(sl.total for sl in rec.final)
+        winner = rec.winner
+        for seat, total in enumerate(totals):
+            self.scores.setdefault((pcount, seat), Welford()).add(total)
+            self.gold.add(rec.gold[seat])
+            self.honor.add(rec.final[seat].honor)
+        if winner is not None:
+            self.seat_wins[(pcount, winner)] = self.seat_wins.get((pcount, winner), 0) + 1
+
+        for r in rec.rounds:
+            if r.event is not None:
+                e = self.events.setdefault(r.event, [0, 0])
+                e[0] += 1
+                e[1] += winner is not None and winner == r.marshal
+            if r.law is not None:
+                l = self.laws.setdefault((r.law, r.variant), [0, 0])
+                l[0] += 1
+                l[1] += winner is not None and winner == r.auction_winner
+
+        summary = GameSummary(rec.seed, rec.map, rec.names, totals, winner)
+        self.samples["wszystkie"].offer(summary)
+        if winner is None:
+            self.samples["remisy"].offer(summary)
+        elif pcount > 1 and totals[winner] - sorted(totals)[-2] >= self.landslide:
+            self.samples["pogromy"].offer(summary)
+
+    def extend(self, records: Iterable[GameRecord]) -> "TournamentStats":
+        for rec in records:
+            self.add(rec)
+        return self
+
+    def merge(self, other: "TournamentStats") -> "TournamentStats":
+        self.games += other.games
+        for key, w in other.scores.items():
+            self.scores.setdefault(key, Welford()).merge(w)
+        for key, n in other.seat_wins.items():
+            self.seat_wins[key] = self.seat_wins.get(key, 0) + n
+        for table, theirs in ((self.events, other.events), (self.laws, other.laws)):
+            for key, (n, wins) in theirs.items():
+                mine = table.setdefault(key, [0, 0])
+                mine[0] += n
+                mine[1] += wins
+        self.gold.merge(other.gold)
+        self.honor.merge(other.honor)
+        for tag, res in other.samples.items():
+            if tag not in self.samples:
+                self.samples[tag] = self._reservoir(len(self.samples))
+            self.samples[tag].merge(res)
+        return self
+
+    def report(self) -> str:
+        def pct(n: int, wins: int) -> str:
+            return f"{100.0 * wins / n:5.1f}%" if n else "    —"
+
+        lines = [f"Partie: {self.games}"]
+        lines.append("Wynik wg miejsca (gracze, miejsce): średnia ± odch. [min..max], wygrane")
+        for (pcount, seat), w in sorted(self.scores.items()):
+            wins = self.seat_wins.get((pcount, seat), 0)
+            lines.append(f"  {pcount}/{seat}: {w.mean:6.2f} ± {w.stdev:5.2f} [{w.lo:g}..{w.hi:g}], "
+                         f"wygrane {pct(w.n, wins)}")
+        if self.events:
+            lines.append("Wydarzenia: nr — rundy, wygrane marszałka rundy")
+            for num, (n, wins) in sorted(self.events.items()):
+                lines.append(f"  {num:2d} — {n}, {pct(n, wins)}")
+        if self.laws:
+            lines.append("Ustawy: nr+wariant — przegłosowane, wygrane zwycięzcy licytacji")
+            for (law, var), (n, wins) in sorted(self.laws.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+                lines.append(f"  {law}{var or ' '} — {n}, {pct(n, wins)}")
+        for label, td in (("Złoto", self.gold), ("Honor", self.honor)):
+            qs = [td.quantile(q) for q in (0.1, 0.5, 0.9, 0.99)]
+            if qs[0] is not None:
+                lines.append(f"{label} końcowe: p10={qs[0]:.1f} p50={qs[1]:.1f} p90={qs[2]:.1f} p99={qs[3]:.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,253 @@
+"""
+Rules sweep
+-----------
+
+Przegląd parametrów zasad (rules.RulesConfig): siatka albo losowe próbkowanie przestrzeni,
+dla każdej konfiguracji seria partii botów (sim.py) liczona równolegle w procesach.
+
+Wynik każdej partii trafia do cache na dysku adresowanego treścią: kluczem jest skrót
+(konfiguracja zasad, liczba graczy i rund, mapa, ziarno, wersja bota). Ponowny przegląd, który
+nakłada się na poprzedni, liczy tylko nowe komórki — reszta jest czytana z cache.
+
+    $ python sweep.py --grid start_gold=4,6,8 --grid plunder_threshold=2,3 --games 200 --jobs 4
+    $ python sweep.py --random 20 --range start_gold=4..10 --range cost_wplyw=1..3 --games 100
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+
+import rules
+import sim
+from history import GameRecord
+from stats import TournamentStats
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / ".sweep-cache"
+CHUNK = 25  # partii na zadanie dla procesu roboczego
+
+
+# --------------- Cache wyników --------------- #
+
+class ResultCache:
+    """
+    Cache adresowany treścią: jeden plik JSON na partię, `root/ab/abcdef….json`.
+    Zapis atomowy (plik tymczasowy + os.replace), więc wiele procesów może pisać naraz.
+    """
+
+    def __init__(self, root: os.PathLike = DEFAULT_CACHE_DIR) -> None:
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, data: Dict) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+
+_MAP_DIGESTS: Dict[str, str] = {}
+
+
+def map_digest(map_path: str) -> str:
+    """Skrót pliku mapy (zmiana mapy unieważnia wyniki)."""
+    digest = _MAP_DIGESTS.get(map_path)
+    if digest is None:
+        digest = _MAP_DIGESTS[map_path] = hashlib.sha256(Path(map_path).read_bytes()).hexdigest()
+    return digest
+
+
+@dataclass(frozen=True)
+class Cell:
+    """Jedna komórka przeglądu: zasady + ustawienia partii."""
+    config: rules.RulesConfig
+    players: int = 3
+    rounds: int = 3
+    bot: str = "random"
+    map_path: str = str(sim.DEFAULT_MAP_PATH)
+
+    def key(self, seed: int) -> str:
+        """Klucz cache partii: skrót (zasady, gracze, rundy, mapa, wersja bota, ziarno)."""
+        payload = {
+            "rules": self.config.to_dict(),
+            "players": self.players,
+            "rounds": self.rounds,
+            "map": map_digest(self.map_path),
+            "bot": sim.BOTS[self.bot].version,
+            "seed": seed,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+# --------------- Przestrzeń parametrów --------------- #
+
+PARAMS = tuple(f.name for f in fields(rules.RulesConfig))
+
+
+def grid(space: Mapping[str, Sequence[int]], base: rules.RulesConfig = rules.DEFAULT_RULES) -> Iterator[rules.RulesConfig]:
+    """Wszystkie kombinacje wartości (iloczyn kartezjański), reszta parametrów z `base`."""
+    names = list(space)
+    for values in itertools.product(*(space[n] for n in names)):
+        yield replace(base, **dict(zip(names, values)))
+
+
+def random_search(space: Mapping[str, Sequence[int]], count: int, seed: Optional[int] = None,
+                  base: rules.RulesConfig = rules.DEFAULT_RULES) -> Iterator[rules.RulesConfig]:
+    """`count` różnych konfiguracji wylosowanych jednostajnie z przestrzeni (mniej, jeśli przestrzeń mała)."""
+    rng = random.Random(seed)
+    names = list(space)
+    total = 1
+    for n in names:
+        total *= len(space[n])
+    seen = set()
+    while len(seen) < min(count, total):
+        values = tuple(rng.choice(list(space[n])) for n in names)
+        if values in seen:
+            continue
+        seen.add(values)
+        yield replace(base, **dict(zip(names, values)))
+
+
+# --------------- Wykonanie --------------- #
+
+def _play_chunk(cell: Cell, seeds: Sequence[int], cache_root: Optional[str]) -> List[Dict]:
+    """Zadanie procesu roboczego: rozgrywa partie i od razu zapisuje je w cache."""
+    cache = ResultCache(cache_root) if cache_root else None
+    out = []
+    for seed in seeds:
+        data = sim.play(cell.players, cell.rounds, cell.config, seed, cell.bot, cell.map_path).to_dict()
+        if cache is not None:
+            cache.put(cell.key(seed), data)
+        out.append(data)
+    return out
+
+
+@dataclass
+class CellResult:
+    cell: Cell
+    stats: TournamentStats
+    cached: int = 0    # partie wzięte z cache
+    computed: int = 0  # partie policzone w tym przebiegu
+
+
+def run_sweep(cells: Sequence[Cell], seeds: Sequence[int], jobs: int = 1,
+              cache: Optional[ResultCache] = None) -> List[CellResult]:
+    """
+    Rozgrywa `seeds` dla każdej komórki; gotowe wyniki bierze z cache, brakujące liczy w `jobs`
+    procesach (jobs ≤ 1: w bieżącym procesie). Zwraca agregaty w kolejności komórek.
+    """
+    results = [CellResult(cell, TournamentStats()) for cell in cells]
+    tasks: List[Tuple[int, List[int]]] = []
+    for idx, cell in enumerate(cells):
+        missing = []
+        for seed in seeds:
+            data = cache.get(cell.key(seed)) if cache is not None else None
+            if data is None:
+                missing.append(seed)
+            else:
+                results[idx].stats.add(GameRecord.from_dict(data))
+                results[idx].cached += 1
+        tasks.extend((idx, missing[i:i + CHUNK]) for i in range(0, len(missing), CHUNK))
+
+    cache_root = str(cache.root) if cache is not None else None
+
+    def collect(idx: int, games: List[Dict]) -> None:
+        for data in games:
+            results[idx].stats.add(GameRecord.from_dict(data))
+        results[idx].computed += len(games)
+
+    if jobs <= 1:
+        for idx, chunk in tasks:
+            collect(idx, _play_chunk(cells[idx], chunk, cache_root))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [(idx, pool.submit(_play_chunk, cells[idx], chunk, cache_root)) for idx, chunk in tasks]
+            for idx, fut in futures:
+                collect(idx, fut.result())
+    return results
+
+
+def summary(res: CellResult) -> str:
+    """Jedna linia na komórkę: zmienione parametry, średni wynik, rozrzut skuteczności miejsc."""
+    changed = {k: v for k, v in res.cell.config.to_dict().items() if v != getattr(rules.DEFAULT_RULES, k)}
+    label = ", ".join(f"{k}={v}" for k, v in changed.items()) or "(domyślne)"
+    st = res.stats
+    n = res.cell.players
+    means = [st.scores[(n, s)].mean for s in range(n) if (n, s) in st.scores]
+    rates = [st.seat_wins.get((n, s), 0) / st.games for s in range(n)] if st.games else []
+    spread = (max(rates) - min(rates)) * 100 if rates else 0.0
+    mean = sum(means) / len(means) if means else 0.0
+    return (f"{label}: partie={st.games} (cache {res.cached}), śr. wynik={mean:.2f}, "
+            f"wygrane wg miejsc=" + "/".join(f"{r * 100:.0f}%" for r in rates) + f", rozrzut={spread:.1f} pp")
+
+
+def _parse_values(spec: str, ranged: bool) -> Tuple[str, List[int]]:
+    name, _, vals = spec.partition("=")
+    name = name.strip()
+    if name not in PARAMS:
+        raise argparse.ArgumentTypeError(f"Nieznany parametr zasad: {name} (dostępne: {', '.join(PARAMS)})")
+    try:
+        if ranged:
+            lo, _, hi = vals.partition("..")
+            return name, list(range(int(lo), int(hi) + 1))
+        return name, [int(v) for v in vals.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Nieprawidłowe wartości: {spec}")
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Przegląd parametrów zasad z cache wyników.")
+    parser.add_argument("--grid", action="append", default=[], metavar="PARAM=v1,v2,...",
+                        help="wartości parametru do siatki (można powtarzać)")
+    parser.add_argument("--range", action="append", default=[], metavar="PARAM=lo..hi",
+                        help="zakres całkowity parametru (siatka lub próbkowanie)")
+    parser.add_argument("--random", type=int, metavar="N", help="zamiast pełnej siatki: N losowych konfiguracji")
+    parser.add_argument("--games", type=int, default=100, help="partii na konfigurację (ziarna 0..N-1)")
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bot", choices=sorted(sim.BOTS), default="random")
+    parser.add_argument("--map", default=str(sim.DEFAULT_MAP_PATH))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE_DIR), help="katalog cache ('' = bez cache)")
+    parser.add_argument("--seed", type=int, default=0, help="ziarno losowania konfiguracji (--random)")
+    parser.add_argument("--verbose", action="store_true", help="pełny raport statystyk dla każdej konfiguracji")
+    args = parser.parse_args(argv[1:])
+
+    try:
+        space = dict(_parse_values(s, False) for s in args.grid)
+        space.update(_parse_values(s, True) for s in args.range)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    configs = list(random_search(space, args.random, args.seed) if args.random else grid(space))
+    cells = [Cell(cfg, args.players, args.rounds, args.bot, args.map) for cfg in configs]
+    cache = ResultCache(args.cache) if args.cache else None
+
+    for res in run_sweep(cells, range(args.games), args.jobs, cache):
+        print(summary(res))
+        if args.verbose:
+            print(res.stats.report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,207 @@
+"""
+Bot tuning
+----------
+
+Strojenie wag bota heurystycznego (sim.Weights) strategią ewolucyjną w stylu CMA-ES:
+(μ/μ_w, λ) z ważoną rekombinacją, adaptacją kroku (CSA) i diagonalną macierzą kowariancji.
+
+Przystosowanie kandydata to średnia przewaga jego wyniku nad przeciwnikami w partiach
+z botami bazowymi, z kandydatem kolejno na każdym miejscu. Wszyscy kandydaci pokolenia grają
+te same ziarna (wspólne liczby losowe): talię wydarzeń tasujemy z ziarna przed pierwszym ruchem,
+a kości idą z dice.CounterDice(seed), więc rzut w danej rundzie, fazie i miejscu przy stole jest
+ten sam, choćby wcześniejsze decyzje były inne. Z generatora partii zostają tylko drobne wybory
+losowe (np. które oddziały dezerterują), więc różnice w przystosowaniu wynikają głównie z wag.
+Partie liczy pula procesów.
+
+Po każdym pokoleniu stan strategii zapisujemy atomowo do pliku kontrolnego; `--resume`
+wznawia od ostatniego zapisanego pokolenia.
+
+    $ python tune.py --generations 30 --games 20 --jobs 8 --checkpoint tune.json --out weights.json
+    $ python tune.py --resume --checkpoint tune.json --generations 60
+"""
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from math import exp, log, sqrt
+from typing import Dict, List, Optional, Sequence, Tuple
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+import rules
+import sim
+
+OPPONENTS = ("heuristic", "random")
+
+
+def fitness(vector: Sequence[float], seeds: Sequence[int], players: int, rounds: int, opponent: str) -> float:
+    """Średnia przewaga (wynik kandydata − średnia przeciwników) po ziarnach i miejscach przy stole."""
+    weights = sim.Weights.from_vector(vector)
+
+    def candidate(seat: int, rng: random.Random) -> sim.RandomBot:
+        return sim.HeuristicBot(seat, rng, weights)
+
+    total = 0.0
+    for seed in seeds:
+        for seat in range(players):
+            lineup = [candidate if i == seat else sim.BOTS[opponent] for i in range(players)]
+            rec = sim.play(players, rounds, rules.DEFAULT_RULES, seed, lineup=lineup, dice=True)
+            totals = [sl.total for sl in rec.final]
+            others = [t for i, t in enumerate(totals) if i != seat]
+            total += totals[seat] - sum(others) / len(others)
+    return total / (len(seeds) * players)
+
+
+def _fitness_task(args: Tuple[Sequence[float], Sequence[int], int, int, str]) -> float:
+    return fitness(*args)
+
+
+# --------------- Strategia --------------- #
+
+@dataclass
+class ESState:
+    """Stan strategii (zapisywany w pliku kontrolnym)."""
+    mean: List[float]
+    sigma: float
+    diag: List[float]                       # wariancje (diagonalna kowariancja)
+    path: List[float]                       # ścieżka ewolucyjna kroku (CSA)
+    generation: int = 0
+    seed: int = 0
+    best: Optional[Tuple[List[float], float]] = None
+    log: List[Dict[str, float]] = field(default_factory=list)
+
+
+class Strategy:
+    """(μ/μ_w, λ)-ES z CSA i diagonalną adaptacją kowariancji (sep-CMA-ES bez ścieżki rank-one)."""
+
+    def __init__(self, state: ESState, popsize: Optional[int] = None) -> None:
+        self.s = state
+        n = len(state.mean)
+        self.n = n
+        self.lam = popsize or 4 + int(3 * log(n))
+        self.mu = self.lam // 2
+        raw = [log(self.mu + 0.5) - log(i + 1) for i in range(self.mu)]
+        self.weights = [r / sum(raw) for r in raw]
+        self.mueff = 1.0 / sum(w * w for w in self.weights)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.ds = 1 + 2 * max(0.0, sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.cmu = min(1.0, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff) * (n + 2) / 3)
+        self.chi = sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n * n))
+
+    def ask(self) -> List[Tuple[List[float], List[float]]]:
+        """λ kandydatów (z, x); losowanie zależy tylko od ziarna i numeru pokolenia (powtarzalne przy wznowieniu)."""
+        rng = random.Random(f"{self.s.seed}:{self.s.generation}")
+        out = []
+        for _ in range(self.lam):
+            z = [rng.gauss(0.0, 1.0) for _ in range(self.n)]
+            x = [m + self.s.sigma * sqrt(d) * zi for m, d, zi in zip(self.s.mean, self.s.diag, z)]
+            out.append((z, x))
+        return out
+
+    def tell(self, candidates: List[Tuple[List[float], List[float]]], scores: List[float]) -> None:
+        s = self.s
+        ranked = sorted(zip(scores, candidates), key=lambda t: -t[0])[:self.mu]
+        zw = [sum(w * c[0][i] for w, (_, c) in zip(self.weights, ranked)) for i in range(self.n)]
+        ys = [[sqrt(d) * zi for d, zi in zip(s.diag, c[0])] for _, c in ranked]
+        yw = [sum(w * y[i] for w, y in zip(self.weights, ys)) for i in range(self.n)]
+        s.mean = [m + s.sigma * y for m, y in zip(s.mean, yw)]
+        c = sqrt(self.cs * (2 - self.cs) * self.mueff)
+        s.path = [(1 - self.cs) * p + c * z for p, z in zip(s.path, zw)]
+        norm = sqrt(sum(p * p for p in s.path))
+        s.sigma *= exp(self.cs / self.ds * (norm / self.chi - 1))
+        s.diag = [(1 - self.cmu) * d + self.cmu * sum(w * y[i] * y[i] for w, y in zip(self.weights, ys))
+                  for i, d in enumerate(s.diag)]
+        top_score, (_, top_x) = ranked[0]
+        if s.best is None or top_score > s.best[1]:
+            s.best = (list(top_x), top_score)
+        s.log.append({"generation": s.generation, "best": top_score, "mean": sum(scores) / len(scores),
+                      "sigma": s.sigma})
+        s.generation += 1
+
+
+def save_checkpoint(path: str, state: ESState, settings: Dict[str, object]) -> None:
+    """Atomowy zapis (plik tymczasowy + os.replace): przerwanie w trakcie nie psuje poprzedniego punktu."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "state": asdict(state)}, f, indent=1)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> Tuple[ESState, Dict[str, object]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    st = data["state"]
+    if st.get("best") is not None:
+        st["best"] = (st["best"][0], st["best"][1])
+    return ESState(**st), data["settings"]
+
+
+def run(state: ESState, settings: Dict[str, object], generations: int, jobs: int,
+        checkpoint: Optional[str] = None) -> ESState:
+    """Pokolenia aż do numeru `generations` (łącznie z wcześniejszymi przy wznowieniu)."""
+    es = Strategy(state, settings.get("popsize"))
+    games, players, rounds = settings["games"], settings["players"], settings["rounds"]
+    opponent = settings["opponent"]
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    try:
+        while state.generation < generations:
+            cands = es.ask()
+            base = (state.seed * 1_000_003 + state.generation) * games
+            seeds = list(range(base, base + games))  # te same ziarna dla całego pokolenia
+            tasks = [(x, seeds, players, rounds, opponent) for _, x in cands]
+            scores = list(pool.map(_fitness_task, tasks)) if pool else [_fitness_task(t) for t in tasks]
+            es.tell(cands, scores)
+            last = state.log[-1]
+            print(f"[Tuning] pokolenie {last['generation']}: najlepszy {last['best']:+.3f}, "
+                  f"średnio {last['mean']:+.3f}, sigma {last['sigma']:.3f}")
+            if checkpoint:
+                save_checkpoint(checkpoint, state, settings)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return state
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Strojenie wag bota heurystycznego (strategia ewolucyjna).")
+    parser.add_argument("--generations", type=int, default=20, help="docelowa liczba pokoleń")
+    parser.add_argument("--games", type=int, default=10, help="ziaren na kandydata (każde gra się na wszystkich miejscach)")
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--popsize", type=int, help="λ — kandydatów w pokoleniu (domyślnie 4 + 3 ln n)")
+    parser.add_argument("--sigma", type=float, default=0.3, help="początkowy krok")
+    parser.add_argument("--opponent", choices=OPPONENTS, default="heuristic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default="tune-checkpoint.json")
+    parser.add_argument("--resume", action="store_true", help="wznów z pliku kontrolnego")
+    parser.add_argument("--out", help="zapisz najlepsze wagi do pliku JSON (dla sim.Weights.load)")
+    args = parser.parse_args(argv[1:])
+
+    if args.resume:
+        state, settings = load_checkpoint(args.checkpoint)
+        print(f"[Tuning] wznawiam od pokolenia {state.generation}")
+    else:
+        start = list(sim.DEFAULT_WEIGHTS.vector())
+        state = ESState(mean=start, sigma=args.sigma, diag=[1.0] * len(start), path=[0.0] * len(start),
+                        seed=args.seed)
+        settings = {"games": args.games, "players": args.players, "rounds": args.rounds,
+                    "opponent": args.opponent, "popsize": args.popsize}
+
+    state = run(state, settings, args.generations, args.jobs, args.checkpoint)
+    if state.best is not None:
+        best = sim.Weights.from_vector(state.best[0])
+        print(f"[Tuning] najlepsze wagi ({state.best[1]:+.3f}): {best}")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(asdict(best), f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,208 @@
+"""
+Sejm what-if
+------------
+
+Podgląd skutków ustaw dla gracza z większością: każdą dozwoloną kombinację (ustawa, wariant,
+tor albo własna prowincja) rozgrywamy na kopii stanu kernela i oceniamy
+
+- od razu — heurystyką pozycji (sim.evaluate),
+- w czasie `budget` sekund — dogrywkami do końca partii botami (sim.Simulation od fazy akcji),
+  liczonymi w puli procesów; wszystkie opcje grają te same ziarna (wspólne liczby losowe).
+  Kości dogrywek idą z dice.CounterDice: rzut zależy od (runda, faza, gracz, numer rzutu), a nie
+  od wcześniejszych losowań, więc opcje dostają te same kości, nawet gdy ich dogrywki rozchodzą się.
+  Talia wydarzeń dogrywki jest tasowana od nowa (stan kernela nie pamięta zagranych kart).
+
+Wynik to tabela posortowana od najlepszej opcji: średnia przewaga nad najlepszym przeciwnikiem
+w dogrywkach, skuteczność i błąd standardowy. Ustawy 2 i 4 działają jak 1 i 3, więc pokazujemy
+je razem. Prowincje innych graczy (Pospolite ruszenie A, Fortyfikacje) wybiera za nich polityka
+`others` — domyślnie jak bot heurystyczny.
+
+    $ python main.py --whatif 2      # w konsoli: tabela przed wyborem ustawy (budżet 2 s)
+"""
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from math import sqrt
+from typing import Callable, List, Optional, Sequence
+import random
+import time
+
+import rules
+import sim
+from dice import CounterDice
+
+LAW_NAMES = {1: "Podatek", 3: "Pospolite ruszenie", 5: "Fortyfikacje", 6: "Pokój"}
+LAW_LABELS = {1: "1–2", 3: "3–4", 5: "5", 6: "6"}
+
+PickPolicy = Callable[[rules.GameState, int, bool], Optional[int]]
+
+
+def heuristic_pick(state: rules.GameState, seat: int, no_fort: bool) -> Optional[int]:
+    """Wybór prowincji za innego gracza — jak sim.HeuristicBot.pick_controlled."""
+    return sim.HeuristicBot(seat, random.Random(0)).pick_controlled(state, no_fort)
+
+
+@dataclass(frozen=True)
+class Option:
+    law: int
+    variant: Optional[str] = None
+    track: Optional[str] = None
+    pick: Optional[int] = None       # prowincja gracza z większością (3/4 A, 5)
+
+    def label(self, board: rules.Board) -> str:
+        parts = [f"{LAW_LABELS[self.law]} {LAW_NAMES[self.law]}"]
+        if self.variant:
+            parts.append(self.variant)
+        if self.track:
+            parts.append(f"tor {rules.TRACK_NAMES[self.track]}")
+        if self.pick is not None:
+            parts.append(board.names[self.pick])
+        return " ".join(parts)
+
+
+def branch(state: rules.GameState, seat: int, option: Option, others: PickPolicy = heuristic_pick) -> rules.GameState:
+    """Stan po przegłosowaniu opcji przez gracza `seat` (IllegalMove, gdy opcja niedozwolona)."""
+    after_law = rules.step(state, rules.Law(seat, option.law))
+    picks: tuple = ()
+    no_fort = option.law == 5
+    if option.law == 5 or (option.law == 3 and option.variant == "A"):
+        picks = tuple(option.pick if i == seat else others(after_law, i, no_fort) for i in range(state.pcount))
+    return rules.step(after_law, rules.Variant(option.variant, option.track, picks))
+
+
+def options(state: rules.GameState, seat: int) -> List[Option]:
+    """Wszystkie dozwolone opcje Sejmu dla gracza z większością (bez powtórzeń 2≡1 i 4≡3)."""
+    own = rules.controlled(state, seat)
+    free = [p for p in own if not state.provinces[p].fort]
+    candidates = [Option(1, "A"), Option(1, "B")]
+    candidates += [Option(3, "A", pick=p) for p in own] or [Option(3, "A")]
+    candidates += [Option(3, "B", track=k) for k in rules.TRACKS]
+    candidates += [Option(5, pick=p) for p in free] or [Option(5)]
+    candidates += [Option(6, "A")] + [Option(6, "B", track=k) for k in rules.TRACKS]
+    out = []
+    for opt in candidates:
+        try:
+            branch(state, seat, opt, lambda s, i, nf: None)
+        except rules.IllegalMove:
+            continue
+        out.append(opt)
+    return out
+
+
+# --------------- Dogrywki --------------- #
+
+def rollout(state: rules.GameState, seat: int, bot: str, seed: int, dice: bool = True) -> float:
+    """Dogrywka od fazy akcji do końca partii; przewaga gracza nad najlepszym z pozostałych."""
+    bots = [sim.BOTS[bot](i, random.Random(f"{seed}:{i}")) for i in range(state.pcount)]
+    game = sim.Simulation(state.board, bots, state.total_rounds, state.config, seed,
+                          dice=CounterDice(seed) if dice else None)
+    game.state = state
+    final = game.run(start="ActionPhase")
+    totals = [sl.total for sl in rules.score_breakdown(final)]
+    return totals[seat] - max(t for i, t in enumerate(totals) if i != seat)
+
+
+def _rollouts(state: rules.GameState, seat: int, bot: str, seeds: Sequence[int],
+              dice: bool = True) -> List[float]:
+    return [rollout(state, seat, bot, s, dice) for s in seeds]
+
+
+@dataclass
+class Row:
+    option: Option
+    label: str
+    heuristic: float
+    margins: List[float]
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.margins) / len(self.margins) if self.margins else None
+
+    @property
+    def win_rate(self) -> Optional[float]:
+        if not self.margins:
+            return None
+        return sum(1.0 if m > 0 else 0.5 if m == 0 else 0.0 for m in self.margins) / len(self.margins)
+
+    @property
+    def stderr(self) -> Optional[float]:
+        n = len(self.margins)
+        if n < 2:
+            return None
+        mean = self.mean
+        return sqrt(sum((m - mean) ** 2 for m in self.margins) / (n - 1) / n)
+
+
+def evaluate(state: rules.GameState, seat: int, budget: float = 1.0, jobs: int = 1, bot: str = "heuristic",
+             seed: int = 0, batch: int = 4, others: PickPolicy = heuristic_pick,
+             weights: sim.Weights = sim.DEFAULT_WEIGHTS, dice: bool = True) -> List[Row]:
+    """
+    Tabela opcji posortowana od najlepszej: wg średniej przewagi w dogrywkach, a bez dogrywek
+    (budget=0) wg heurystyki. Dogrywki idą paczkami po `batch` ziaren na opcję, kolejnymi falami
+    z tymi samymi ziarnami dla wszystkich opcji, aż do upływu `budget` sekund. `dice=False` wraca
+    do kości z generatora partii (wspólne tylko ziarna, nie rzuty).
+    """
+    deadline = time.monotonic() + budget
+    table, branches = [], []
+    for opt in options(state, seat):
+        after = branch(state, seat, opt, others)
+        table.append(Row(opt, opt.label(state.board), sim.evaluate(after, seat, weights), []))
+        branches.append(after)
+
+    results = {}   # (opcja, fala) -> przewagi
+    def seeds_of(wave: int) -> List[int]:
+        return list(range(seed + wave * batch, seed + (wave + 1) * batch))
+
+    if budget > 0 and jobs <= 1:
+        wave = 0
+        while time.monotonic() < deadline:
+            for i, after in enumerate(branches):
+                if time.monotonic() >= deadline:
+                    break
+                results[i, wave] = _rollouts(after, seat, bot, seeds_of(wave), dice)
+            wave += 1
+    elif budget > 0:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        try:
+            pending = {}
+            def submit_wave(wave: int) -> None:
+                for i, after in enumerate(branches):
+                    pending[pool.submit(_rollouts, after, seat, bot, seeds_of(wave), dice)] = (i, wave)
+            # dwie fale w locie, żeby procesy nie czekały na zbieranie wyników
+            submit_wave(0)
+            submit_wave(1)
+            wave = 2
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[pending.pop(fut)] = fut.result()
+                if len(pending) <= len(branches):
+                    submit_wave(wave)
+                    wave += 1
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # tylko fale policzone dla wszystkich opcji: każda opcja gra te same ziarna
+    waves = sorted({w for _, w in results})
+    complete = [w for w in waves if all((i, w) in results for i in range(len(table)))]
+    for i, row in enumerate(table):
+        for w in complete:
+            row.margins.extend(results[i, w])
+    table.sort(key=lambda r: (-(r.mean if r.mean is not None else float("-inf")), -r.heuristic))
+    return table
+
+
+def format_table(rows: Sequence[Row]) -> str:
+    lines = [f"{'opcja':<36} {'heur.':>7} {'przewaga':>9} {'±':>5} {'wygrane':>8} {'n':>4}"]
+    for r in rows:
+        if r.margins:
+            err = f"{r.stderr:5.2f}" if r.stderr is not None else "    —"
+            lines.append(f"{r.label:<36} {r.heuristic:7.2f} {r.mean:+9.2f} {err} {r.win_rate:8.0%} {len(r.margins):4d}")
+        else:
+            lines.append(f"{r.label:<36} {r.heuristic:7.2f} {'—':>9} {'':>5} {'—':>8} {0:4d}")
+    return "\n".join(lines)
+